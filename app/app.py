@@ -1,43 +1,66 @@
+import time
+_IMPORT_START = time.perf_counter()
 import os
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import psycopg2
-from psycopg2 import OperationalError
-import pandas as pd
-import time
 from concurrent.futures import ThreadPoolExecutor
-import platform
-import subprocess
-from PIL import Image
-import cv2
-from dataclasses import dataclass, field 
-from typing import Dict, List, Tuple, Optional
-from classes import MediaFile, MediaFolder, MediaManager, TreeviewManager, GridManager, ImageManager, MultiSlideshowWindow
-
-def connect_to_db(retries=5, delay=3):
-    for i in range(retries):
-        try:
-            conn = psycopg2.connect(
-                dbname="media_manager",
-                user="youruser",
-                password="yourpassword",
-                host="localhost",
-                port="5432"
-            )
-            print("Connected to PostgreSQL!")
-            return conn
-        except OperationalError as e:
-            print(f"Connection attempt {i + 1} failed: {e}")
-            if i < retries - 1:
-                time.sleep(delay)
-    raise Exception("Could not connect to PostgreSQL after several retries.")
+from typing import Any, Callable, Dict, List, Tuple, Optional
+from classes import TreeviewManager, GridManager, ImageManager, MediaLibrary, connect_to_db
+from classes import instrumentation, DiagnosticsWindow, CollectionDialog, CollectionFilter, SlideshowLayout
+# Heavy modules (Pillow, OpenCV) are imported by the classes that need them, when they are first used
+IMPORT_MS = (time.perf_counter() - _IMPORT_START) * 1000
+
+# Startup budget in milliseconds, measured from the start of this module's imports
+STARTUP_BUDGET_MS = {
+    'import_ms': 500,
+    'first_paint_ms': 1000,
+}
+
+# Tree items inserted per event loop iteration while populating at startup
+POPULATE_CHUNK_SIZE = 500
+
+
+def check_startup_budget(timings: Dict[str, float], budget: Dict[str, float] = STARTUP_BUDGET_MS) -> List[str]:
+    """
+    Compare startup timings against a budget.
+
+    Args:
+        timings: Measured startup timings in milliseconds
+        budget: Maximum allowed milliseconds per timing
+
+    Returns:
+        A message for every timing over its budget, empty if all are within it
+    """
+    return [
+        f"{name} {timings[name]:.0f}ms is over its {limit:.0f}ms budget"
+        for name, limit in budget.items()
+        if name in timings and timings[name] > limit
+    ]
+
 
 class MediaManagerApp:
-    def __init__(self, root, conn):
+    def __init__(self, root, conn, connect: Optional[Callable[[], Any]] = None):
         self.root = root
         self.conn = conn
-        self.rootfolder = self.get_rootfolder()
-        self.root.title(self.rootfolder)
+        # Opens another connection for the loader thread, without one it shares conn
+        self.connect = connect
+        # Scanning, saving and loading, shared with the command line
+        self.library = MediaLibrary(conn)
+        self.media_manager = None
+        self.startup_timings: Dict[str, float] = {'import_ms': round(IMPORT_MS, 1)}
+        self._starting = True
+        self._load_generation = 0  # Results of a load that was superseded by a newer one are dropped
+
+        # Timing spans are off unless switched on in the Diagnostics menu or the parameters
+        instrumentation.enable(str(self.get_parameter('diagnostics_enabled', 'false')).lower() == 'true')
+
+        # A library needs at least one root folder
+        if not self.library.list_roots() and not self._prompt_first_root():
+            return
+
+        # The roots shown in the treeview, None shows all of them combined
+        self.active_root_ids = self._get_active_root_ids()
+        self._update_title()
 
         # Initialize GridManager with 2x2 grid (1 row for content, 1 row for status bar)
         grid_config = {
@@ -67,6 +90,57 @@ class MediaManagerApp:
         # Initialize TreeviewManager
         self.treeview_manager = TreeviewManager(self.tree, self.image_manager)
         #self.treeview_manager.multi_slideshow_manager = self.multi_slideshow_manager
+        self.treeview_manager.library = self.library
+        self.treeview_manager.on_new_collection = (
+            lambda folder: self.new_collection(CollectionFilter(folder_path=folder.folder_path))
+        )
+
+        # Optionally log slideshow render timings as JSON lines
+        metrics_log_path = self.get_parameter('slideshow_metrics_log')
+        if metrics_log_path:
+            self.treeview_manager.slideshow_options['metrics_log_path'] = metrics_log_path
+        # Optionally cut long videos short in slideshows
+        max_clip_seconds = self.get_parameter('slideshow_max_clip_seconds')
+        if max_clip_seconds:
+            try:
+                self.treeview_manager.slideshow_options['max_clip_ms'] = int(float(max_clip_seconds) * 1000)
+            except ValueError:
+                print(f"Ignoring invalid slideshow_max_clip_seconds: {max_clip_seconds}")
+        # Crossfade length between slideshow images, 0 for hard cuts
+        transition_ms = self.get_parameter('slideshow_transition_ms')
+        if transition_ms:
+            try:
+                transition_ms = int(transition_ms)
+            except ValueError:
+                print(f"Ignoring invalid slideshow_transition_ms: {transition_ms}")
+            else:
+                self.treeview_manager.slideshow_options['transition_ms'] = transition_ms
+                if transition_ms <= 0:
+                    self.treeview_manager.slideshow_options['transition_steps'] = 0
+        # Grid, merged cells and renderer of slideshows
+        layout = self._get_slideshow_layout()
+        if layout is not None:
+            self.treeview_manager.slideshow_options['layout'] = layout
+        renderer = self.get_parameter('slideshow_renderer')
+        if renderer in ("frames", "canvas"):
+            self.treeview_manager.slideshow_options['renderer'] = renderer
+        elif renderer:
+            print(f"Ignoring invalid slideshow_renderer: {renderer}, use frames or canvas")
+        # Optionally decode slideshow and preview images in worker processes instead of threads
+        self.decode_backend = None
+        decode_processes = self.get_parameter('decode_processes')
+        if decode_processes:
+            try:
+                decode_processes = int(decode_processes)
+            except ValueError:
+                print(f"Ignoring invalid decode_processes: {decode_processes}")
+            else:
+                if decode_processes > 0:
+                    # The processes are only started by the first decode
+                    from classes.decode_backend import ProcessDecodeBackend
+                    self.decode_backend = ProcessDecodeBackend(decode_processes)
+                    self.image_manager.decode_backend = self.decode_backend
+                    self.treeview_manager.slideshow_options['decode_backend'] = self.decode_backend
 
         # Add a scrollbar to the treeview
         scrollbar = ttk.Scrollbar(self.treeview_frame, orient="vertical", command=self.tree.yview)
@@ -79,9 +153,24 @@ class MediaManagerApp:
 
         # Add a "File" menu
         self.file_menu = tk.Menu(self.menubar, tearoff=0)
-        self.file_menu.add_command(label="Select New Root Folder", command=self.change_rootfolder)
+        self.file_menu.add_command(label="Add Root Folder...", command=self.add_root_folder)
+        self.file_menu.add_command(label="Rescan Shown Roots", command=self.rescan_active_roots)
+        self.file_menu.add_command(label="Remove Shown Root...", command=self.remove_active_root)
+        self.file_menu.add_command(label="Extract Metadata", command=self.extract_metadata)
+        self.roots_menu = tk.Menu(self.file_menu, tearoff=0)
+        self.file_menu.add_cascade(label="Show Root", menu=self.roots_menu)
+        self.active_roots_var = tk.StringVar()
+        self._rebuild_roots_menu()
         self.menubar.add_cascade(label="File", menu=self.file_menu)
 
+        # Add a "Collections" menu with the smart collections
+        self.collections_menu = tk.Menu(self.menubar, tearoff=0)
+        self._rebuild_collections_menu()
+        self.menubar.add_cascade(label="Collections", menu=self.collections_menu)
+
+        # Add a "Diagnostics" menu
+        self._create_diagnostics_menu()
+
         # Create a status bar frame that spans both columns in the second row
         self.status_frame = self.grid_manager.get_frame(row=1, column=0, columnspan=2)
 
@@ -89,361 +178,434 @@ class MediaManagerApp:
         self.status = ttk.Label(self.status_frame, text="Ready", anchor="w", relief="sunken")
         self.status.pack(fill="x", padx=5, pady=2)
 
-        # Load media type mappings
-        self._load_media_type_mappings()
+        # Show the window first, the data is loaded once it is on screen
+        self.status["text"] = "Starting..."
+        self.root.after_idle(self._on_first_paint)
 
-        # Load data
-        self.load_data()
+    def _startup_ms(self) -> float:
+        """Milliseconds since the start of the app's imports"""
+        return round((time.perf_counter() - _IMPORT_START) * 1000, 1)
 
-        # Populate treeview
-        if self.media_manager:
-            self.treeview_manager.populate(self.media_manager)
+    def _on_first_paint(self):
+        """The window has been drawn, start loading the data"""
+        self.root.update_idletasks()
+        self.startup_timings['first_paint_ms'] = self._startup_ms()
+        self.status["text"] = "Loading media data from database..."
+        # Let the status text paint before the database is queried
+        self.root.after(1, self._load_startup_data)
 
-    def _load_media_type_mappings(self):
-        """Load media type mappings from the database"""
+    def _load_startup_data(self):
+        """Offer to resume interrupted scans and scan roots that haven't been scanned yet, then load the shown roots"""
         try:
-            cur = self.conn.cursor()
-            cur.execute("SELECT media_type_extension, media_type_description FROM media_types;")
-            self.extension_to_type = {row[0].lower(): row[1] for row in cur.fetchall()}
-            self.valid_extensions = set(self.extension_to_type.keys())
+            resumable = self.library.resumable_roots()
+            resumable_ids = {root.root_id for root in resumable}
+            unscanned = [root for root in self._active_roots()
+                         if not root.is_scanned and root.root_id not in resumable_ids]
         except Exception as e:
-            print(f"Error loading media type mappings: {e}")
-            self.extension_to_type = {}
-            self.valid_extensions = set()
-
-    def get_rootfolder(self, force_new=False):
-        cur = self.conn.cursor()
-        if not force_new:
-            # Only fetch the existing root folder if not forcing a new one
-            cur.execute("SELECT Parameter_Value FROM Parameters WHERE Parameter_Name = 'rootfolder';")
-            result = cur.fetchone()
-            if result and result[0]:
-                return result[0]
-
-        # Prompt for a new root folder
-        rootfolder = filedialog.askdirectory(title="Select Root Folder")
-        if not rootfolder:
-            self.root.destroy()
-            return None
-
-        # Save the new root folder to the database
-        cur.execute(
-            "INSERT INTO Parameters (Parameter_Name, Parameter_Value) "
-            "VALUES ('rootfolder', %s) "
-            "ON CONFLICT (Parameter_Name) DO UPDATE SET Parameter_Value = EXCLUDED.Parameter_Value;",
-            (rootfolder,)
-        )
-        self.conn.commit()
-        return rootfolder
+            messagebox.showerror("Error", f"Failed to load media data: {e}")
+            self.status["text"] = "Error loading media data."
+            return
 
-    def change_rootfolder(self):
-        # Warn the user about data loss
-        if not messagebox.askyesno(
-            "Warning",
-            "This will DELETE all folder and file metadata. "
-            "Are you sure you want to continue?"
+        if resumable and messagebox.askyesno(
+            "Resume Scan", f"The scan of {len(resumable)} root folder(s) was interrupted. Resume it now?"
         ):
-            return  # User canceled
+            self.scan_roots(resumable, resume=True)
+        if unscanned and messagebox.askyesno(
+            "Scan Media", f"{len(unscanned)} root folder(s) have not been scanned yet. Scan now?"
+        ):
+            self.scan_roots(unscanned)
+        self._load_library_async()
+
+    def _load_library_async(self):
+        """Read the shown roots from the database in a worker thread, then populate the treeview"""
+        self._load_generation += 1
+        generation = self._load_generation
+        root_ids = self.active_root_ids
+        self.status["text"] = "Loading media data from database..."
+
+        def read_media():
+            # A connection of its own, the menus stay live and commit on self.conn meanwhile
+            conn = self.connect() if self.connect is not None else None
+            try:
+                library = self.library.on_connection(conn) if conn is not None else self.library
+                with instrumentation.span("load_data"):
+                    return library.load(root_ids)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(read_media)
+        executor.shutdown(wait=False)
+        self.root.after(20, self._poll_library_load, future, generation)
+
+    def _poll_library_load(self, future, generation):
+        """Wait for the worker thread without blocking the event loop"""
+        if generation != self._load_generation:
+            return  # A newer load replaced this one
+        if not future.done():
+            self.root.after(20, self._poll_library_load, future, generation)
+            return
+
         try:
-            # Delete all folder and file metadata
-            cur = self.conn.cursor()
-            cur.execute("DELETE FROM Media_Files;")
-            cur.execute("DELETE FROM Media_Folders;")
-            self.conn.commit()
-
-            # Clear the treeview
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-
-            # Reuse get_rootfolder with force_new=True to prompt for a new folder
-            self.rootfolder = self.get_rootfolder(force_new=True)
-            self.root.title(self.rootfolder)
-
-            # Scan the new root folder
-            self.status["text"] = "Scanning new root folder..."
-            self.root.update_idletasks()
+            self.media_manager = future.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load media data: {e}")
+            self.status["text"] = "Error loading media data."
+            return
 
-            folders_data, files_data = self.scan_media(self.rootfolder)
-            if len(folders_data) > 0:
-                self.save_to_db(folders_data, files_data)
-
-            # Create MediaFolder and MediaFile objects from scan results
-            folders = []
-            for row in folders_data:
-                folder = MediaFolder(
-                    folder_id=row[0],
-                    folder_path=row[1],
-                    parent_folder_id=row[2]
-                )
-                folders.append(folder)
-
-            files = []
-            for row in files_data:
-                file = MediaFile(
-                    folder_id=row[0],
-                    file_name=row[1],
-                    file_extension=row[2],
-                    file_size_kb=row[3],
-                    folder_path=row[4]
-                )
-                file._media_type = self.extension_to_type.get(file.file_extension.lower(), "unknown")
-                files.append(file)
+        self.status["text"] = f"Loaded {len(self.media_manager.files)} media files."
+        self._on_library_loaded()
 
-            # Create and return MediaManager
-            self.media_manager = MediaManager(folders, files, self.extension_to_type)
+    def _on_library_loaded(self):
+        """Populate the treeview a chunk at a time"""
+        if self._starting:
+            self.startup_timings['data_loaded_ms'] = self._startup_ms()
 
-            # Refresh the treeview
-            self.status["text"] = "Populating treeview..."
-            self.root.update_idletasks()
-            self.treeview_manager.populate(self.media_manager)
+        loaded_text = self.status["text"]
 
-            self.status["text"] = "Ready."
-            self.root.update_idletasks()
+        def on_progress(inserted):
+            self.status["text"] = f"Populating treeview... {inserted} items"
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to change root folder: {e}")
-            self.status["text"] = "Error"
+        def on_done(inserted):
+            self.status["text"] = loaded_text
+            if self._starting:
+                self.startup_timings['tree_populated_ms'] = self._startup_ms()
+                self._report_startup()
 
-    def load_data(self):
-        """
-        Load media data from the database or scan for new data if none exists.
-        Returns a MediaManager instance or None if loading failed.
-        """
-        try:
-            cur = self.conn.cursor()
-
-            # Check if we have any media files in the database
-            cur.execute("SELECT COUNT(*) FROM media_files;")
-            file_count = cur.fetchone()[0]
-
-            if file_count == 0:
-                # No files found, ask user if they want to scan
-                if messagebox.askyesno("Scan Media", "No media data found. Scan now?"):
-                    self.status["text"] = "Scanning for media files..."
-                    self.root.update_idletasks()
-
-                    # Scan for media files
-                    folders_data, files_data = self.scan_media(self.rootfolder)
-
-                    # Save to database
-                    self.save_to_db(folders_data, files_data)
-
-                    # Create MediaFolder and MediaFile objects from scan results
-                    folders = []
-                    for row in folders_data:
-                        folder = MediaFolder(
-                            folder_id=row[0],
-                            folder_path=row[1],
-                            parent_folder_id=row[2]
-                        )
-                        folders.append(folder)
-
-                    files = []
-                    for row in files_data:
-                        file = MediaFile(
-                            folder_id=row[0],
-                            file_name=row[1],
-                            file_extension=row[2],
-                            file_size_kb=row[3],
-                            folder_path=row[4]
-                        )
-                        file._media_type = self.extension_to_type.get(file.file_extension.lower(), "unknown")
-                        files.append(file)
-
-                    # Create and return MediaManager
-                    self.media_manager = MediaManager(folders, files, self.extension_to_type)
-                    self.status["text"] = "Media scan completed."
-                    return self.media_manager
-                else:
-                    self.status["text"] = "No media data available."
-                    return None
-            else:
-                # Load existing data from the database
-                self.status["text"] = "Loading media data from database..."
-                self.root.update_idletasks()
+        self.treeview_manager.populate_progressive(
+            self.media_manager, chunk_size=POPULATE_CHUNK_SIZE, on_progress=on_progress, on_done=on_done
+        )
 
-                # Load folders
-                cur.execute("""
-                    SELECT folder_id, folder_path, parent_folder_id
-                    FROM media_folders
-                    ORDER BY folder_path
-                """)
-                folders = []
-                for row in cur.fetchall():
-                    folder = MediaFolder(
-                        folder_id=row[0],
-                        folder_path=row[1],
-                        parent_folder_id=row[2]
-                    )
-                    folders.append(folder)
-
-                # Load files
-                cur.execute("""
-                    SELECT folder_id, file_name, file_extension, file_size_kb, folder_path
-                    FROM media_files
-                    ORDER BY folder_path, file_name
-                """)
-                files = []
-                for row in cur.fetchall():
-                    file = MediaFile(
-                        folder_id=row[0],
-                        file_name=row[1],
-                        file_extension=row[2],
-                        file_size_kb=row[3],
-                        folder_path=row[4]
-                    )
-                    file._media_type = self.extension_to_type.get(file.file_extension.lower(), "unknown")
-                    files.append(file)
-
-                # Create and return MediaManager
-                self.media_manager = MediaManager(folders, files, self.extension_to_type)
-                self.status["text"] = f"Loaded {len(files)} media files."
-                return self.media_manager
+    def _report_startup(self):
+        """Print the startup timings and any that are over budget"""
+        self._starting = False
+        timings = ", ".join(f"{name} {value:.0f}ms" for name, value in self.startup_timings.items())
+        print(f"Startup: {timings}")
+        for message in check_startup_budget(self.startup_timings):
+            print(f"Startup budget exceeded: {message}")
+
+    def _create_diagnostics_menu(self):
+        """Create the Diagnostics menu for timing spans and profiling"""
+        self.diagnostics_menu = tk.Menu(self.menubar, tearoff=0)
+
+        self.timing_enabled = tk.BooleanVar(value=instrumentation.is_enabled())
+        self.diagnostics_menu.add_checkbutton(
+            label="Record Timings", variable=self.timing_enabled,
+            command=lambda: instrumentation.enable(self.timing_enabled.get())
+        )
+        self.diagnostics_menu.add_command(label="Show Timings...", command=lambda: DiagnosticsWindow(self.root))
+
+        # Profile the next run of an operation, with cProfile or tracemalloc
+        for mode, label in (("cprofile", "Profile Next (CPU)"), ("tracemalloc", "Profile Next (Memory)")):
+            profile_menu = tk.Menu(self.diagnostics_menu, tearoff=0)
+            for operation in instrumentation.OPERATIONS:
+                profile_menu.add_command(
+                    label=operation,
+                    command=lambda operation=operation, mode=mode: self._profile_next(operation, mode)
+                )
+            self.diagnostics_menu.add_cascade(label=label, menu=profile_menu)
 
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load media data: {e}")
-            self.status["text"] = "Error loading media data."
-            return None
+        self.menubar.add_cascade(label="Diagnostics", menu=self.diagnostics_menu)
+
+    def _profile_next(self, operation, mode):
+        """Capture a profile of the next run of an operation"""
+        instrumentation.profile_next(operation, mode)
+        self.timing_enabled.set(True)
+        self.status["text"] = f"Profiling the next {operation} ({mode}), see Diagnostics > Show Timings."
 
-    def scan_media(self, folder_path):
+    @property
+    def extension_to_type(self) -> Dict[str, str]:
+        """Extension to media type mappings"""
+        return self.library.extension_to_type
+
+    def get_parameter(self, parameter_name, default=None):
+        """Get a value from the Parameters table, or the default if it isn't set"""
+        return self.library.get_parameter(parameter_name, default)
+
+    def _get_slideshow_layout(self) -> Optional[SlideshowLayout]:
         """
-        Scan media files in a single pass, building folder hierarchy and collecting files.
-        Returns a tuple of (folders_data, files_data) with complete hierarchy information.
+        The slideshow layout from the 'slideshow_rows', 'slideshow_columns' and
+        'slideshow_merged_cells' parameters, None for the default 2x4 grid
         """
+        rows = self.get_parameter('slideshow_rows')
+        columns = self.get_parameter('slideshow_columns')
+        merged = self.get_parameter('slideshow_merged_cells', '')
+        if not (rows or columns or merged):
+            return None
         try:
-            self.status["text"] = "Scanning for media files..."
-            self.root.update_idletasks()
+            return SlideshowLayout.from_spec(int(rows or 2), int(columns or 4), merged or '')
+        except ValueError as e:
+            print(f"Ignoring invalid slideshow layout parameters: {e}")
+            return None
 
-            # Use the pre-loaded valid extensions
-            valid_extensions = self.valid_extensions
-
-            # Data structures to store our scan results
-            folders_data = []  # List of MediaFolder tuples
-            files_data = []    # List of MediaFile tuples
-
-            # Assign unique IDs to folders as we encounter them
-            folder_id_counter = 1
-            folder_id_map = {}  # {folder_path: folder_id}
-
-            processed_files = 0
-            file_count = 0  # Count of media files found
-
-            # Single pass through all files and folders
-            for root, dirs, files in os.walk(folder_path):
-                # Process current folder
-                if root not in folder_id_map:
-                    # Assign ID to current folder
-                    folder_id_map[root] = folder_id_counter
-                    folder_id_counter += 1
-
-                    # Determine parent folder ID
-                    parent_id = None
-                    parent_path = os.path.dirname(root)
-
-                    # If parent exists in our map, use its ID
-                    if parent_path in folder_id_map:
-                        parent_id = folder_id_map[parent_path]
-
-                    # Add to folders_data
-                    folders_data.append((folder_id_map[root], root, parent_id))
-
-                # Process files in current folder
-                for file in files:
-                    processed_files += 1
-                    if processed_files % 100 == 0:  # Update progress every 100 files
-                        self.status["text"] = f"Scanning {processed_files} files, found {file_count} media files..."
-                        self.root.update_idletasks()
-
-                    ext = os.path.splitext(file)[1].lower()
-                    if ext in valid_extensions:
-                        file_count += 1
-                        full_path = os.path.join(root, file)
-                        size = os.path.getsize(full_path) // 1024  # Size in KB
-
-                        files_data.append((
-                            folder_id_map[root],
-                            file,
-                            ext,
-                            size,
-                            root  # folder_path
-                        ))
-
-            self.status["text"] = f"Scanned {processed_files} files, found {file_count} media files."
-            return folders_data, files_data
+    def _prompt_first_root(self) -> bool:
+        """Ask for the first root folder, closes the app if none is chosen"""
+        root_path = filedialog.askdirectory(title="Select Root Folder")
+        if not root_path:
+            self.root.destroy()
+            return False
+        self.library.add_root(root_path)
+        return True
+
+    def _get_active_root_ids(self) -> Optional[List[int]]:
+        """Get the roots shown last time from the parameters, None for all roots"""
+        value = self.get_parameter('active_roots', 'all')
+        if value == 'all':
+            return None
+        existing = {root.root_id for root in self.library.list_roots()}
+        root_ids = [int(root_id) for root_id in value.split(",") if root_id.strip().isdigit()]
+        root_ids = [root_id for root_id in root_ids if root_id in existing]
+        return root_ids or None
+
+    def _active_roots(self):
+        """Get the MediaRoot objects that are shown"""
+        roots = self.library.list_roots()
+        if self.active_root_ids is None:
+            return roots
+        return [root for root in roots if root.root_id in self.active_root_ids]
+
+    def _update_title(self):
+        """Show the shown roots in the window title"""
+        if self.active_root_ids is None:
+            self.root.title("All roots")
+        else:
+            self.root.title(", ".join(root.root_path for root in self._active_roots()))
+
+    def _rebuild_roots_menu(self):
+        """Fill the Show Root menu with one entry per root, plus all roots combined"""
+        self.roots_menu.delete(0, "end")
+        self.roots_menu.add_radiobutton(
+            label="All Roots", value="all", variable=self.active_roots_var,
+            command=lambda: self.show_roots(None)
+        )
+        self.roots_menu.add_separator()
+        for root in self.library.list_roots():
+            label = root.root_path if root.is_scanned else f"{root.root_path} ({root.scan_status})"
+            self.roots_menu.add_radiobutton(
+                label=label, value=str(root.root_id), variable=self.active_roots_var,
+                command=lambda root_id=root.root_id: self.show_roots([root_id])
+            )
+        self.active_roots_var.set(
+            "all" if self.active_root_ids is None else ",".join(str(root_id) for root_id in self.active_root_ids)
+        )
 
+    def _rebuild_collections_menu(self):
+        """Fill the Collections menu with one submenu per smart collection"""
+        self.collections_menu.delete(0, "end")
+        self.collections_menu.add_command(label="New Collection...", command=self.new_collection)
+        self.collections_menu.add_command(label="Refresh Collections", command=self.refresh_collections)
+        try:
+            collections = self.library.list_collections()
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to scan media: {e}")
-            self.status["text"] = "Error scanning media."
+            print(f"Error loading smart collections: {e}")
+            collections = []
+        if collections:
+            self.collections_menu.add_separator()
+        for collection in collections:
+            collection_menu = tk.Menu(self.collections_menu, tearoff=0)
+            collection_menu.add_command(
+                label="Start Slideshow", command=lambda c=collection: self.start_collection_slideshow(c)
+            )
+            collection_menu.add_command(label="Edit...", command=lambda c=collection: self.edit_collection(c))
+            collection_menu.add_command(label="Delete", command=lambda c=collection: self.delete_collection(c))
+            self.collections_menu.add_cascade(label=f"{collection.name} ({collection.member_count})",
+                                              menu=collection_menu)
+
+    def new_collection(self, collection_filter: Optional[CollectionFilter] = None):
+        """Open the dialog to define a smart collection, optionally starting from a filter"""
+        media_types = sorted(set(self.extension_to_type.values()))
+        CollectionDialog(self.root, media_types, self._save_collection, collection_filter=collection_filter)
+
+    def edit_collection(self, collection):
+        """Open the dialog with a smart collection's filter; saving under another name makes a copy"""
+        media_types = sorted(set(self.extension_to_type.values()))
+        CollectionDialog(self.root, media_types, self._save_collection, name=collection.name,
+                         collection_filter=collection.filter, order_by=collection.order_by)
+
+    def _save_collection(self, name: str, collection_filter: CollectionFilter, order_by: str):
+        """Store a smart collection and materialize its members; ValueErrors are shown by the dialog"""
+        try:
+            collection = self.library.save_collection(name, collection_filter, order_by)
+        except ValueError:
             raise
+        except Exception as e:
+            raise ValueError(f"Failed to save collection: {e}") from e
+        self.status["text"] = f"Collection {collection.name} holds {collection.member_count} files."
+        self._rebuild_collections_menu()
 
+    def refresh_collections(self):
+        """Re-evaluate the files added or changed since the smart collections were last refreshed"""
+        try:
+            counts = self.library.refresh_collections()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to refresh collections: {e}")
+            return
+        self.status["text"] = f"Refreshed {counts['collections']} collections with {counts['files']} changed files."
+        self._rebuild_collections_menu()
+
+    def start_collection_slideshow(self, collection):
+        """Start a slideshow of a smart collection's members, drawn from the database a block at a time"""
+        from classes import DatabaseSource
+        from classes.slideshow_engine import SLIDESHOW_MEDIA_TYPES
+        source = DatabaseSource(self.library, collection_id=collection.collection_id,
+                                media_types=SLIDESHOW_MEDIA_TYPES)
+        try:
+            has_files = source.has_files()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load collection: {e}")
+            return
+        if not has_files:
+            messagebox.showinfo("Start Slideshow", f"Collection {collection.name} is empty.")
+            return
+        # The slideshow pulls in Pillow and OpenCV, so it is only imported when one is started
+        from classes import MultiSlideshowWindow
+        self.treeview_manager.multi_slideshow_manager = MultiSlideshowWindow(
+            source, **self.treeview_manager.slideshow_options
+        )
 
-    def save_to_db(self, folders_data, files_data):
-        """
-        Save folders and files to the database using pre-assigned IDs and parent relationships.
-        """
+    def delete_collection(self, collection):
+        """Delete a smart collection, its files are left alone"""
+        if not messagebox.askyesno("Delete Collection", f"Delete the collection {collection.name}?"):
+            return
         try:
-            cur = self.conn.cursor()
+            self.library.delete_collection(collection.collection_id)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to delete collection: {e}")
+            return
+        self._rebuild_collections_menu()
 
-            # Convert to tuples for batch insertion
-            folders_tuples = folders_data  # Already tuples
-            files_tuples = files_data      # Already tuples
+    def show_roots(self, root_ids: Optional[List[int]]):
+        """
+        Switch the treeview to other roots. Nothing is rescanned, the roots are read from the database.
 
-            # Batch insert folders with their parent relationships
-            if folders_tuples:
-                self.status["text"] = f"Saving {len(folders_tuples)} folders to database..."
-                self.root.update_idletasks()
+        Args:
+            root_ids: The roots to show, None shows all roots combined
+        """
+        self.active_root_ids = root_ids
+        self.library.set_parameter(
+            'active_roots', "all" if root_ids is None else ",".join(str(root_id) for root_id in root_ids)
+        )
+        self._update_title()
+        self._rebuild_roots_menu()
+        self._load_library_async()
+
+    def add_root_folder(self):
+        """Add a root folder, scan only that root and show it"""
+        root_path = filedialog.askdirectory(title="Add Root Folder")
+        if not root_path:
+            return
+        try:
+            root = self.library.add_root(root_path)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        if not root.is_scanned:
+            self.scan_roots([root])
+        self.show_roots([root.root_id])
+
+    def rescan_active_roots(self):
+        """Scan the shown roots again and reload them"""
+        self.scan_roots(self._active_roots())
+        self._rebuild_roots_menu()
+        self._load_library_async()
+
+    def remove_active_root(self):
+        """Remove the shown root from the library, its files on disk are left alone"""
+        roots = self._active_roots()
+        if len(roots) != 1:
+            messagebox.showinfo("Remove Root", "Show a single root first (File > Show Root).")
+            return
+        root = roots[0]
+        if not messagebox.askyesno(
+            "Warning",
+            f"This will DELETE all folder and file metadata of {root.root_path}. "
+            "Are you sure you want to continue?"
+        ):
+            return  # User canceled
+        try:
+            self.library.remove_root(root.root_id)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to remove root folder: {e}")
+            return
+        self.show_roots(None)
 
-                from psycopg2.extras import execute_values
-                execute_values(
-                    cur,
-                    """
-                    INSERT INTO media_folders (folder_id, folder_path, parent_folder_id)
-                    VALUES %s
-                    ON CONFLICT (folder_id) DO UPDATE
-                    SET folder_path = EXCLUDED.folder_path,
-                        parent_folder_id = EXCLUDED.parent_folder_id;
-                    """,
-                    folders_tuples,
-                    template="(%s, %s, %s)",
-                    page_size=100
-                )
+    def scan_roots(self, roots, resume: bool = False):
+        """
+        Scan roots one after another, updating their stored folders and files.
+        Other roots are left alone.
 
-            # Batch insert files (without media_type)
-            if files_tuples:
-                self.status["text"] = f"Saving {len(files_tuples)} files to database..."
+        Args:
+            roots: The MediaRoot objects to scan
+            resume: Continue interrupted scans from their last checkpoint
+        """
+        for root in roots:
+            try:
+                self.status["text"] = f"Scanning {root.root_path}..."
                 self.root.update_idletasks()
-
-                execute_values(
-                    cur,
-                    """
-                    INSERT INTO media_files (folder_id, file_name, file_extension, file_size_kb, folder_path)
-                    VALUES %s
-                    ON CONFLICT (folder_id, file_name) DO UPDATE
-                    SET file_extension = EXCLUDED.file_extension,
-                        file_size_kb = EXCLUDED.file_size_kb;
-                    """,
-                    files_tuples,
-                    template="(%s, %s, %s, %s, %s)",
-                    page_size=100
-                )
-
-            self.conn.commit()
-            self.status["text"] = f"Saved {len(files_tuples)} files to database."
+                root = self.library.scan_root(root, progress=self._show_library_progress, resume=resume)
+                skipped = self.library.skip_counts.to_dict()
+                self.status["text"] = (f"Scanned {root.folder_count} folders, found {root.file_count} media files, "
+                                       f"skipped {skipped['directories']} folders and {skipped['files']} files.")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to scan {root.root_path}: {e}")
+                self.status["text"] = "Error scanning media."
+        # Scans refresh the smart collections, their member counts changed
+        self._rebuild_collections_menu()
+
+    def extract_metadata(self):
+        """
+        Read the EXIF of new and changed images, the metadata of new videos and the colours
+        of both in the shown roots, then reload them
+        """
+        try:
+            self.status["text"] = "Reading metadata..."
+            self.root.update_idletasks()
+            counts = self.library.extract_metadata(self.active_root_ids, progress=self._show_library_progress)
+            video_counts = self.library.extract_video_metadata(self.active_root_ids,
+                                                               progress=self._show_library_progress)
+            # After the videos, whose posters they are computed from
+            color_counts = self.library.extract_color_features(self.active_root_ids,
+                                                               progress=self._show_library_progress)
         except Exception as e:
-            self.conn.rollback()
-            messagebox.showerror("Error", f"Failed to save to database: {e}")
-            self.status["text"] = "Error saving to database."
-            raise
+            messagebox.showerror("Error", f"Failed to extract metadata: {e}")
+            self.status["text"] = "Error extracting metadata."
+            return
+        self.status["text"] = (f"Read metadata of {counts['files']} files, "
+                               f"{counts['with_capture_date']} with a capture date, "
+                               f"and of {video_counts['files']} videos, {video_counts['unreadable']} unreadable; "
+                               f"colours of {color_counts['files']} files.")
+        if counts['files'] or video_counts['files'] or color_counts['files']:
+            self._rebuild_collections_menu()
+            self._load_library_async()
+
+    def _show_library_progress(self, event, **details):
+        """Show scan and save progress from the MediaLibrary in the status bar"""
+        if event == "scan":
+            self.status["text"] = (f"Scanning {details['files']} files in {details['directories']} folders, "
+                                   f"found {details['media_files']} media files...")
+        elif event == "save":
+            self.status["text"] = f"Saving {details['rows']} rows to {details['table']}..."
+        elif event == "metadata":
+            self.status["text"] = f"Reading metadata of {details['files']} of {details['total']} files..."
+        elif event == "video_metadata":
+            self.status["text"] = f"Reading metadata of {details['files']} of {details['total']} videos..."
+        elif event == "color_features":
+            self.status["text"] = f"Reading colours of {details['files']} of {details['total']} files..."
+        self.root.update_idletasks()
 
 
 if __name__ == "__main__": 
     try:
         conn = connect_to_db()
         root = tk.Tk()
-        app = MediaManagerApp(root, conn)
+        app = MediaManagerApp(root, conn, connect=lambda: connect_to_db(retries=1))
         root.mainloop()
     except Exception as e:
         messagebox.showerror("Error", f"Failed to start application: {e}")
     finally:
+        if getattr(locals().get('app'), 'decode_backend', None) is not None:
+            app.decode_backend.shutdown()
         if 'conn' in locals():
             conn.close()
@@ -0,0 +1,2 @@
+# /app/benchmarks/__init__.py
+# Benchmarks are run from the app directory, e.g. python -m benchmarks.run_benchmarks --help
@@ -0,0 +1,484 @@
+# /app/benchmarks/run_benchmarks.py
+"""
+End-to-end benchmarks for the media manager.
+
+Generates a synthetic library, then times scanning, saving, loading, building
+the MediaManager, renaming files in place, populating the treeview, decoding
+images (in threads and in worker processes), computing and querying colour features, building and reading
+thumbnail atlases, and the app's
+startup (import time, time to first paint) against its budget. Results are
+written as JSON so runs can be compared over time.
+
+Run from the app directory:
+    python -m benchmarks.run_benchmarks --depth 3 --fanout 4 --files 20 --output results.json
+    python -m benchmarks.run_benchmarks --compare results.json --output new.json
+    python -m benchmarks.run_benchmarks --check-budget  # exits with 1 when startup is over budget
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.synthetic_library import LibrarySpec, generate_library
+from benchmarks.sqlite_standin import StandInConnection
+
+# Prefetch threads, and worker processes, the threaded and process decode backends are compared with
+DECODE_BACKEND_WORKERS = 4
+
+
+class _HeadlessRoot:
+    """Stands in for the Tk root, the app only calls update_idletasks on it while working"""
+
+    def update_idletasks(self):
+        pass
+
+
+def make_headless_app(conn, rootfolder: str):
+    """
+    Create a MediaManagerApp without running its Tk __init__, so its library's scan
+    and load can be timed on machines without a display.
+
+    Args:
+        conn: A psycopg2 connection or a StandInConnection
+        rootfolder: The library root to scan
+
+    Returns:
+        The MediaManagerApp instance
+    """
+    from app import MediaManagerApp
+    from classes import MediaLibrary
+
+    app = MediaManagerApp.__new__(MediaManagerApp)
+    app.conn = conn
+    app.library = MediaLibrary(conn)
+    app.root = _HeadlessRoot()
+    app.status = {}  # Receives the status bar texts
+    app.media_root = app.library.add_root(rootfolder)
+    app.active_root_ids = None
+    app.media_manager = None
+    return app
+
+
+def time_runs(function: Callable[[], object], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict:
+    """
+    Time a function several times.
+
+    Args:
+        function: The function to time
+        repeat: Number of runs
+        setup: Called before every run, not included in the timing
+
+    Returns:
+        A dictionary with all run times and their min/median/mean in seconds
+    """
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    return {
+        'runs': [round(r, 6) for r in runs],
+        'min': round(min(runs), 6),
+        'median': round(statistics.median(runs), 6),
+        'mean': round(statistics.mean(runs), 6),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    """Get the current git commit, if the benchmark runs from a checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _clear_tables(conn):
+    """Empty the media tables between scan runs"""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM media_files;")
+    cur.execute("DELETE FROM media_folders;")
+    cur.execute("DELETE FROM scan_queue;")
+    cur.execute("DELETE FROM collection_changes;")
+    conn.commit()
+
+
+def run_library_benchmarks(conn, library_path: str, repeat: int) -> Tuple[Dict[str, Dict], object]:
+    """Time the scan, load and model building steps against one library, returns the results and the loaded MediaManager"""
+    from classes import MediaManager
+
+    app = make_headless_app(conn, library_path)
+    results = {}
+
+    library = app.library
+    # Scanning straight into the database with checkpoints
+    results['scan_root'] = time_runs(
+        lambda: library.scan_root(app.media_root), repeat, setup=lambda: _clear_tables(conn)
+    )
+
+    # What the app's loader thread runs
+    results['load_data'] = time_runs(lambda: library.load(app.active_root_ids), repeat)
+    media_manager = library.load(app.active_root_ids)
+
+    folders = media_manager.folders
+    files = media_manager.files
+
+    def build_media_manager():
+        # Relationships are stored on the folder objects, so reset them every run
+        for folder in folders:
+            folder._parent = None
+            folder._files = []
+            folder._subfolders = []
+        return MediaManager(folders, files, app.extension_to_type)
+
+    results['media_manager_init'] = time_runs(build_media_manager, repeat)
+    media_manager = build_media_manager()
+
+    root_folders = media_manager.get_root_folders()
+    results['get_files_recursive'] = time_runs(
+        lambda: [folder.get_files_recursive() for folder in root_folders], repeat
+    )
+    # Opening a smart collection reads its members in order, compare with get_files_recursive + filtering
+    from classes.smart_collection import CollectionFilter
+    collection = library.save_collection("benchmark", CollectionFilter(media_types=["image", "gif"]))
+    results['collection_files'] = time_runs(lambda: library.collection_files(collection.collection_id), repeat)
+
+    # Renaming every file on disk, in the database and in the model, without a rescan
+    from classes.file_operations import plan_rename, run_operations
+
+    def rename_all():
+        operations = []
+        for folder in media_manager.folders:
+            operations += plan_rename(list(folder.files), "{name}_r{ext}", media_manager.extension_to_type,
+                                      media_manager.folder_by_id)
+        run_operations(operations)
+        library.apply_file_operations(operations)
+        media_manager.apply_file_operations(operations)
+
+    results['file_operations_rename'] = time_runs(rename_all, repeat)
+    results['file_operations_rename']['files'] = len(media_manager.files)
+    return results, media_manager
+
+
+def run_tag_benchmarks(repeat: int, size: int = 1_000_000, seed: int = 0) -> Dict[str, Dict]:
+    """Time a boolean tag query over a synthetic ordinal space, independent of the generated library"""
+    import random
+    from classes.tag_index import TagIndex
+
+    rng = random.Random(seed)
+    index = TagIndex(size, {i: i for i in range(size)}, lambda folder_id: [])
+    for tag, share in (("family", 0.2), ("2020", 0.1), ("blurry", 0.05), ("holiday", 0.15)):
+        index.add_files(tag, rng.sample(range(size), int(size * share)))
+    return {
+        'tag_query': time_runs(lambda: index.query("family AND 2020 AND NOT blurry OR holiday"), repeat),
+    }
+
+
+def run_color_benchmarks(media_manager, repeat: int, size: int = 1_000_000, seed: int = 0) -> Dict[str, Dict]:
+    """
+    Time computing the colour features of the library's images in one process, batch by batch
+    as a worker does, and a nearest-colour query and a colour sort over a synthetic index of size files.
+    """
+    import numpy as np
+    from classes.color_features import BINS, ColorIndex, extract_color_batch, parse_color
+    from classes.media_library import COLOR_BATCH_SIZE
+
+    images = [(i, os.path.join(f.folder_path, f.file_name), f.file_mtime)
+              for i, f in enumerate(media_manager.get_all_files()) if f.media_type == "image"]
+
+    def extract():
+        for start in range(0, len(images), COLOR_BATCH_SIZE):
+            extract_color_batch(images[start:start + COLOR_BATCH_SIZE])
+
+    rng = np.random.default_rng(seed)
+    histograms = rng.dirichlet(np.full(BINS, 0.2), size).astype(np.float32) * 255
+    index = ColorIndex(np.arange(size), rng.integers(0, 1 << 24, size), histograms.astype(np.uint8))
+    warm = parse_color("warm")
+    sample = rng.choice(size, 10_000, replace=False)
+
+    results = {
+        'color_features_extract': time_runs(extract, repeat),
+        'color_query': time_runs(lambda: index.nearest(warm, limit=1000), repeat),
+        'color_sort': time_runs(lambda: index.sort_keys(sample.tolist()).argsort(kind="stable"), repeat),
+    }
+    results['color_features_extract']['images'] = len(images)
+    results['color_query']['files'] = size
+    return results
+
+
+def run_decode_benchmarks(media_manager, repeat: int, sample_size: int, box_size=(460, 520)) -> Dict[str, Dict]:
+    """Time image decoding and scaling the way the preview pane and slideshow cells do it"""
+    from PIL import Image
+    from classes.image_loading import fit_size, load_scaled_image
+
+    images = [f for f in media_manager.get_all_files() if f.media_type == "image"][:sample_size]
+    paths = [os.path.join(f.folder_path, f.file_name) for f in images]
+    results = {}
+
+    def image_manager_decode():
+        # ImageManager opens the full image and resizes it on every display
+        for path in paths:
+            with Image.open(path) as pil_image:
+                pil_image.resize(fit_size(pil_image.size, box_size), Image.LANCZOS)
+
+    def slideshow_decode():
+        for path in paths:
+            load_scaled_image(path, box_size)
+
+    # Slideshow workers blend a crossfade from the image a cell shows to the next one
+    from classes.slideshow_transition import DEFAULT_TRANSITION_STEPS, build_crossfade
+    scaled = [load_scaled_image(path, box_size) for path in paths]
+
+    def crossfade_build():
+        for previous, following in zip(scaled, scaled[1:]):
+            build_crossfade(previous, following, DEFAULT_TRANSITION_STEPS)
+
+    results['image_manager_decode'] = time_runs(image_manager_decode, repeat)
+    results['slideshow_cell_decode'] = time_runs(slideshow_decode, repeat)
+    results['crossfade_build'] = time_runs(crossfade_build, repeat)
+    results['image_manager_decode']['images'] = len(paths)
+    results['slideshow_cell_decode']['images'] = len(paths)
+    results['crossfade_build']['crossfades'] = max(len(scaled) - 1, 0)
+    results.update(run_decode_backend_benchmarks(paths, repeat, box_size))
+    return results
+
+
+def run_decode_backend_benchmarks(paths: List[str], repeat: int, box_size=(460, 520),
+                                  workers: int = DECODE_BACKEND_WORKERS) -> Dict[str, Dict]:
+    """
+    Decode the same images from as many prefetch threads as there are workers, once with
+    every thread decoding itself and once through a ProcessDecodeBackend of that many processes
+    """
+    from classes.decode_backend import DecodeBackend, ProcessDecodeBackend
+
+    results = {}
+    for name, backend in (('threaded_decode', DecodeBackend()), ('process_decode', ProcessDecodeBackend(workers))):
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as threads:
+                # Start the worker processes outside the timed runs
+                list(threads.map(lambda path: backend.decode(path, box_size), paths[:workers]))
+
+                def decode_all():
+                    list(threads.map(lambda path: backend.decode(path, box_size), paths))
+
+                results[name] = time_runs(decode_all, repeat)
+        finally:
+            backend.shutdown()
+        results[name]['images'] = len(paths)
+        results[name]['workers'] = workers
+    if results['process_decode']['mean']:
+        results['process_decode']['speedup'] = round(
+            results['threaded_decode']['mean'] / results['process_decode']['mean'], 2
+        )
+    return results
+
+
+def run_thumbnail_benchmarks(media_manager, repeat: int, page_size: int = 48) -> Dict[str, Dict]:
+    """
+    Time the thumbnail browser's worker side over every folder: building the folders' atlases
+    from the originals, then reading them a screenful at a time the way scrolling does.
+    """
+    from classes.thumbnail_atlas import FolderThumbnails
+    from classes.thumbnail_store import ThumbnailStore
+
+    folders = [(folder.folder_path, [f for f in folder.files if f.media_type == "image"])
+               for folder in media_manager.folders]
+    folders = [(path, images) for path, images in folders if images]
+    store = ThumbnailStore(tempfile.mkdtemp(prefix="media_bench_thumbnails_"))
+    try:
+        def build():
+            for folder_path, images in folders:
+                thumbnails = FolderThumbnails(images, store, folder_path)
+                thumbnails.build_missing(0, len(images))
+                thumbnails.close()
+
+        def clear_atlases():
+            shutil.rmtree(store.directory, ignore_errors=True)
+
+        def scroll():
+            for folder_path, images in folders:
+                thumbnails = FolderThumbnails(images, store, folder_path)
+                for start in range(0, len(images), page_size):
+                    thumbnails.load(list(range(start, min(start + page_size, len(images)))))
+                thumbnails.close()
+
+        results = {'thumbnail_atlas_build': time_runs(build, repeat, setup=clear_atlases)}
+        results['thumbnail_atlas_scroll'] = time_runs(scroll, repeat)
+        results['thumbnail_atlas_build']['images'] = sum(len(images) for _, images in folders)
+        results['thumbnail_atlas_scroll']['folders'] = len(folders)
+        return results
+    finally:
+        shutil.rmtree(store.directory, ignore_errors=True)
+
+
+def run_tk_benchmarks(media_manager, repeat: int) -> Dict[str, Dict]:
+    """Time the Tk bound steps, skipped when there is no display"""
+    import tkinter as tk
+    from tkinter import ttk
+    from classes import TreeviewManager
+
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        return {'treeview_populate': {'skipped': f"No display: {e}"}}
+
+    try:
+        root.withdraw()
+        tree = ttk.Treeview(root)
+        treeview_manager = TreeviewManager(tree)
+        return {'treeview_populate': time_runs(lambda: treeview_manager.populate(media_manager), repeat)}
+    finally:
+        root.destroy()
+
+
+def _seconds_stats(values_ms: List[float]) -> Dict:
+    """Summarize millisecond timings the way time_runs does, in seconds"""
+    runs = [value / 1000 for value in values_ms]
+    return {
+        'runs': [round(r, 6) for r in runs],
+        'min': round(min(runs), 6),
+        'median': round(statistics.median(runs), 6),
+        'mean': round(statistics.mean(runs), 6),
+    }
+
+
+def run_startup_benchmarks(library_path: str, repeat: int) -> Dict[str, Dict]:
+    """
+    Start the app in a fresh interpreter per run and check its startup against STARTUP_BUDGET_MS.
+    The import time is always measured, first paint and treeview population only with a display.
+    """
+    from app import STARTUP_BUDGET_MS, check_startup_budget
+
+    app_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    probes = []
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup_probe", "--library", library_path],
+            cwd=app_dir, capture_output=True, text=True, check=True
+        )
+        probes.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    results = {}
+    for name in ("import_ms", "first_paint_ms", "data_loaded_ms", "tree_populated_ms"):
+        values = [p[name] for p in probes if name in p]
+        if values:
+            results[f"startup_{name[:-3]}"] = _seconds_stats(values)
+
+    medians = {name: statistics.median(p[name] for p in probes) for name in STARTUP_BUDGET_MS
+               if all(name in p for p in probes)}
+    results['startup_budget'] = {
+        'budget_ms': STARTUP_BUDGET_MS,
+        'median_ms': medians,
+        'over_budget': check_startup_budget(medians),
+        'heavy_modules': probes[-1]['heavy_modules'],
+    }
+    if 'skipped' in probes[-1]:
+        results['startup_budget']['first_paint'] = probes[-1]['skipped']
+    return results
+
+
+def compare_results(old: Dict, new: Dict):
+    """Print the median change of every benchmark between two result files"""
+    print(f"{'benchmark':<25} {'old (s)':>10} {'new (s)':>10} {'change':>8}")
+    for name, result in new['results'].items():
+        old_result = old.get('results', {}).get(name, {})
+        if 'median' not in result or 'median' not in old_result:
+            continue
+        change = (result['median'] - old_result['median']) / old_result['median'] * 100 if old_result['median'] else 0.0
+        print(f"{name:<25} {old_result['median']:>10.4f} {result['median']:>10.4f} {change:>+7.1f}%")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the media manager on a synthetic library")
+    parser.add_argument("--depth", type=int, default=3, help="Folder levels below the root")
+    parser.add_argument("--fanout", type=int, default=4, help="Subfolders per folder")
+    parser.add_argument("--files", type=int, default=20, help="Media files per folder")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark")
+    parser.add_argument("--decode-sample", type=int, default=50, help="Images to decode per decode run")
+    parser.add_argument("--library", help="Use (and keep) the library in this folder instead of a temporary one")
+    parser.add_argument("--dsn", help="PostgreSQL DSN of a scratch database; its media tables are emptied! "
+                                      "Without it an in-memory SQLite stand-in is used")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Compare against an earlier results file")
+    parser.add_argument("--check-budget", action="store_true",
+                        help="Exit with status 1 when the startup timings are over budget")
+    args = parser.parse_args(argv)
+
+    spec = LibrarySpec(depth=args.depth, fanout=args.fanout, files_per_folder=args.files, seed=args.seed)
+    library_path = args.library or tempfile.mkdtemp(prefix="media_bench_")
+    try:
+        start = time.perf_counter()
+        library = generate_library(library_path, spec)
+        library['generate_seconds'] = round(time.perf_counter() - start, 3)
+        print(f"Generated {library['media_files']} media files in {library['folders']} folders")
+
+        if args.dsn:
+            import psycopg2
+            conn = psycopg2.connect(args.dsn)
+        else:
+            conn = StandInConnection()
+
+        try:
+            results, media_manager = run_library_benchmarks(conn, library_path, args.repeat)
+            results.update(run_decode_benchmarks(media_manager, args.repeat, args.decode_sample))
+            results.update(run_tag_benchmarks(args.repeat))
+            results.update(run_color_benchmarks(media_manager, args.repeat))
+            results.update(run_thumbnail_benchmarks(media_manager, args.repeat))
+            results.update(run_tk_benchmarks(media_manager, args.repeat))
+        finally:
+            conn.close()
+        results.update(run_startup_benchmarks(library_path, args.repeat))
+    finally:
+        if not args.library:
+            shutil.rmtree(library_path, ignore_errors=True)
+
+    output = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_commit': _git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'database': 'postgresql' if args.dsn else 'sqlite-standin',
+            'library_spec': spec.to_dict(),
+            'library': library,
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+
+    for name, result in results.items():
+        if 'median' in result:
+            print(f"{name:<25} median {result['median']:.4f}s")
+        else:
+            print(f"{name:<25} {result}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), output)
+
+    over_budget = results['startup_budget']['over_budget']
+    for message in over_budget:
+        print(f"Startup budget exceeded: {message}")
+    if args.check_budget and over_budget:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
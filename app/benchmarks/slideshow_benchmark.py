@@ -0,0 +1,207 @@
+# /app/benchmarks/slideshow_benchmark.py
+"""
+Headless slideshow benchmark.
+
+Runs the slideshow engine offscreen for a grid size, window resolution and
+library, and reports sustained cells/second, per-tick latency percentiles
+and memory use. Needs no display, so it can run on CI-like machines.
+
+Run from the app directory:
+    python -m benchmarks.slideshow_benchmark --rows 2 --columns 4 --window 1920x1080 --ticks 50
+    python -m benchmarks.slideshow_benchmark --library /media/photos --delay-ms 8000 --stagger --ticks 40
+    python -m benchmarks.slideshow_benchmark --rows 3 --columns 4 --decode-processes 8 --ticks 50
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+from benchmarks.synthetic_library import LibrarySpec, generate_library
+from benchmarks.sqlite_standin import MEDIA_TYPES
+
+
+def collect_media_files(library_path: str) -> List:
+    """Build MediaFile objects for every media file below a folder, without a database"""
+    from classes.media_file import MediaFile
+
+    extension_to_type = {extension: media_type for media_type, extension in MEDIA_TYPES}
+    media_files = []
+    for folder_id, (root, _, files) in enumerate(os.walk(library_path), start=1):
+        for file_name in files:
+            extension = os.path.splitext(file_name)[1].lower()
+            if extension in extension_to_type:
+                media_file = MediaFile(folder_id, file_name, extension, 0, root)
+                media_file.media_type = extension_to_type[extension]
+                media_files.append(media_file)
+    return media_files
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Get a percentile of a list of values"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * percent / 100), len(values) - 1)]
+
+
+def max_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB, None where it can't be measured"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS reports bytes
+    return round(max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_slideshow_benchmark(media_files: List, rows: int, columns: int, window_size, ticks: int,
+                            delay_ms: int, stagger: bool, workers: int,
+                            save_frame: Optional[str] = None, decode_processes: int = 0) -> Dict:
+    """
+    Run an offscreen slideshow and measure it.
+
+    Args:
+        media_files: MediaFile objects to show
+        rows: Grid rows
+        columns: Grid columns
+        window_size: The (width, height) of the simulated window
+        ticks: Number of ticks to run
+        delay_ms: Time per tick, 0 runs ticks back to back to measure maximum throughput
+        stagger: Advance one cell per tick in turn, like staggered per-cell timers, instead of all cells
+        workers: Decode worker threads
+        save_frame: Optional path to save the last composited frame to
+        decode_processes: Decode in this many worker processes (ProcessDecodeBackend), 0 in the threads
+
+    Returns:
+        The benchmark results
+    """
+    from classes.slideshow_engine import SlideshowEngine
+    from classes.slideshow_layout import SlideshowLayout
+    from classes.offscreen_slideshow import OffscreenSlideshow
+    from classes.decode_backend import DecodeBackend, ProcessDecodeBackend
+
+    tracemalloc.start()
+    decode_backend = ProcessDecodeBackend(decode_processes) if decode_processes > 0 else DecodeBackend()
+    engine = SlideshowEngine(media_files, SlideshowLayout(rows, columns), max_workers=workers,
+                             decode_backend=decode_backend)
+    slideshow = OffscreenSlideshow(engine, window_size)
+    cell_count = engine.cell_count
+    # With staggered timers a tick happens every delay / cells, advancing one cell
+    tick_interval = delay_ms / 1000 / (cell_count if stagger else 1)
+
+    latencies, waits = [], []
+    cells_drawn = late_ticks = 0
+    try:
+        slideshow.start()
+        # The first fill is a cold start, measure it separately from the sustained ticks
+        first = slideshow.tick()
+        cells_drawn += first.cells_drawn
+
+        start = time.perf_counter()
+        next_tick = start
+        for tick_index in range(ticks):
+            if tick_interval:
+                next_tick += tick_interval
+                time.sleep(max(next_tick - time.perf_counter(), 0.0))
+
+            cells = [tick_index % cell_count] if stagger else None
+            result = slideshow.tick(cells)
+            latencies.append(result.latency_ms)
+            waits.append(result.wait_ms)
+            cells_drawn += result.cells_drawn
+            if result.late_cells:
+                late_ticks += 1
+        elapsed = time.perf_counter() - start
+
+        if save_frame:
+            slideshow.save_frame(save_frame)
+    finally:
+        slideshow.shutdown()
+        decode_backend.shutdown()
+        _, peak_traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    sustained_cells = cells_drawn - first.cells_drawn
+    return {
+        'grid': f"{rows}x{columns}",
+        'window': f"{window_size[0]}x{window_size[1]}",
+        'cell_size': slideshow.cell_sizes[0],
+        'media_files': len(media_files),
+        'workers': workers,
+        'decode_backend': decode_backend.name,
+        'decode_processes': decode_backend.workers,
+        'delay_ms': delay_ms,
+        'stagger': stagger,
+        'ticks': ticks,
+        'first_fill_ms': round(first.latency_ms, 2),
+        'cells_per_second': round(sustained_cells / elapsed, 2) if elapsed else 0.0,
+        'tick_latency_ms': {
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+            'max': round(max(latencies, default=0.0), 2),
+        },
+        'wait_ms_p95': round(percentile(waits, 95), 2),
+        'late_ticks': late_ticks,
+        'prefetch': engine.stats.to_dict(),
+        'memory': {
+            'python_peak_mb': round(peak_traced / (1024 * 1024), 1),
+            'max_rss_mb': max_rss_mb(),
+        },
+    }
+
+
+def _parse_size(value: str):
+    """Parse WIDTHxHEIGHT"""
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark the slideshow offscreen, without a display")
+    parser.add_argument("--rows", type=int, default=2)
+    parser.add_argument("--columns", type=int, default=4)
+    parser.add_argument("--window", type=_parse_size, default=(1920, 1080), help="Window size, WIDTHxHEIGHT")
+    parser.add_argument("--ticks", type=int, default=50)
+    parser.add_argument("--delay-ms", type=int, default=0, help="Time per tick, 0 measures maximum throughput")
+    parser.add_argument("--stagger", action="store_true", help="Advance one cell per tick, like staggered timers")
+    parser.add_argument("--workers", type=int, default=2, help="Decode worker threads")
+    parser.add_argument("--decode-processes", type=int, default=0,
+                        help="Decode in this many worker processes instead of the threads")
+    parser.add_argument("--library", help="Library folder to use, a synthetic one is generated otherwise")
+    parser.add_argument("--depth", type=int, default=2, help="Synthetic library: folder levels")
+    parser.add_argument("--fanout", type=int, default=3, help="Synthetic library: subfolders per folder")
+    parser.add_argument("--files", type=int, default=20, help="Synthetic library: media files per folder")
+    parser.add_argument("--save-frame", help="Save the last composited frame to this image file")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    library_path = args.library or tempfile.mkdtemp(prefix="media_bench_")
+    try:
+        if not args.library:
+            spec = LibrarySpec(depth=args.depth, fanout=args.fanout, files_per_folder=args.files,
+                               image_sizes=[(640, 480), (1920, 1080), (4000, 3000)])
+            generate_library(library_path, spec)
+
+        results = run_slideshow_benchmark(
+            collect_media_files(library_path), args.rows, args.columns, args.window, args.ticks,
+            args.delay_ms, args.stagger, args.workers, args.save_frame, args.decode_processes
+        )
+    finally:
+        if not args.library:
+            shutil.rmtree(library_path, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
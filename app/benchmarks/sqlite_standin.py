@@ -0,0 +1,200 @@
+# /app/benchmarks/sqlite_standin.py
+import sqlite3
+from typing import Any, Iterable, Optional
+
+# Mirrors the Media_Types rows inserted by sql/init.sql
+MEDIA_TYPES = [
+    ('image', '.jpg'), ('image', '.jpeg'), ('image', '.png'), ('image', '.webp'), ('image', '.tiff'),
+    ('image', '.tif'), ('image', '.bmp'), ('image', '.svg'), ('image', '.heic'), ('image', '.heif'),
+    ('image', '.avif'),
+    ('video', '.mp4'), ('video', '.mov'), ('video', '.avi'), ('video', '.mkv'), ('video', '.flv'),
+    ('video', '.wmv'), ('video', '.webm'), ('video', '.mpeg'), ('video', '.mpg'), ('video', '.3gp'),
+    ('video', '.ts'),
+    ('gif', '.gif'), ('gif', '.gifv'),
+]
+
+SCHEMA = """
+CREATE TABLE media_roots (
+    root_id INTEGER PRIMARY KEY,
+    root_path TEXT UNIQUE NOT NULL,
+    scan_status TEXT NOT NULL DEFAULT 'new',
+    folder_count INTEGER NOT NULL DEFAULT 0,
+    file_count INTEGER NOT NULL DEFAULT 0,
+    last_scan_started TIMESTAMP,
+    last_scan_finished TIMESTAMP
+);
+CREATE TABLE media_types (
+    media_type_id INTEGER PRIMARY KEY,
+    media_type_description TEXT NOT NULL,
+    media_type_extension TEXT NOT NULL,
+    UNIQUE (media_type_description, media_type_extension)
+);
+CREATE TABLE media_folders (
+    folder_id INTEGER PRIMARY KEY,
+    folder_path TEXT UNIQUE NOT NULL,
+    parent_folder_id INTEGER REFERENCES media_folders(folder_id) ON DELETE CASCADE,
+    root_id INTEGER REFERENCES media_roots(root_id) ON DELETE CASCADE
+);
+CREATE TABLE media_files (
+    media_file_id INTEGER PRIMARY KEY,
+    folder_id INTEGER REFERENCES media_folders(folder_id) ON DELETE CASCADE,
+    file_name TEXT NOT NULL,
+    file_extension TEXT NOT NULL,
+    file_size_kb INTEGER,
+    folder_path TEXT,
+    root_id INTEGER REFERENCES media_roots(root_id) ON DELETE CASCADE,
+    file_mtime REAL,
+    metadata_mtime REAL,
+    captured_at TIMESTAMP,
+    camera_make TEXT,
+    camera_model TEXT,
+    orientation INTEGER,
+    gps_latitude REAL,
+    gps_longitude REAL,
+    duration_s REAL,
+    fps REAL,
+    media_width INTEGER,
+    media_height INTEGER,
+    video_codec TEXT,
+    UNIQUE (folder_id, file_name)
+);
+CREATE TABLE scan_queue (
+    root_id INTEGER REFERENCES media_roots(root_id) ON DELETE CASCADE,
+    folder_id INTEGER NOT NULL,
+    folder_path TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    PRIMARY KEY (root_id, folder_id)
+);
+CREATE TABLE tags (
+    tag_id INTEGER PRIMARY KEY,
+    tag_name TEXT UNIQUE NOT NULL
+);
+CREATE TABLE file_tags (
+    tag_id INTEGER REFERENCES tags(tag_id) ON DELETE CASCADE,
+    media_file_id INTEGER REFERENCES media_files(media_file_id) ON DELETE CASCADE,
+    PRIMARY KEY (tag_id, media_file_id)
+);
+CREATE TABLE folder_tags (
+    tag_id INTEGER REFERENCES tags(tag_id) ON DELETE CASCADE,
+    folder_id INTEGER REFERENCES media_folders(folder_id) ON DELETE CASCADE,
+    PRIMARY KEY (tag_id, folder_id)
+);
+CREATE TABLE smart_collections (
+    collection_id INTEGER PRIMARY KEY,
+    collection_name TEXT UNIQUE NOT NULL,
+    filter_json TEXT NOT NULL,
+    order_by TEXT NOT NULL DEFAULT 'path'
+);
+CREATE TABLE collection_members (
+    collection_id INTEGER REFERENCES smart_collections(collection_id) ON DELETE CASCADE,
+    media_file_id INTEGER REFERENCES media_files(media_file_id) ON DELETE CASCADE,
+    sort_key TEXT NOT NULL,
+    PRIMARY KEY (collection_id, media_file_id)
+);
+CREATE INDEX collection_members_order ON collection_members (collection_id, sort_key, media_file_id);
+CREATE TABLE collection_changes (
+    change_id INTEGER PRIMARY KEY,
+    media_file_id INTEGER NOT NULL
+);
+CREATE TABLE color_features (
+    media_file_id INTEGER PRIMARY KEY REFERENCES media_files(media_file_id) ON DELETE CASCADE,
+    feature_mtime REAL,
+    dominant_rgb INTEGER,
+    histogram BLOB
+);
+CREATE TABLE id_counters (
+    counter_name TEXT PRIMARY KEY,
+    next_id INTEGER NOT NULL
+);
+INSERT INTO id_counters (counter_name, next_id) VALUES ('folder_id', 1);
+CREATE TABLE parameters (
+    parameter_name TEXT PRIMARY KEY,
+    parameter_value TEXT
+);
+"""
+
+
+def _quote(value: Any) -> str:
+    """Render a Python value as an SQL literal, like psycopg2's mogrify does"""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class StandInCursor:
+    """Just enough of a psycopg2 cursor for the app's queries and execute_values"""
+
+    def __init__(self, connection: 'StandInConnection'):
+        self.connection = connection
+        self._cursor = connection.sqlite.cursor()
+
+    def mogrify(self, query, params: Optional[Iterable] = None) -> bytes:
+        if isinstance(query, bytes):
+            query = query.decode("utf-8")
+        if params is not None:
+            query = query % tuple(_quote(p) for p in params)
+        return query.encode("utf-8")
+
+    def execute(self, query, params: Optional[Iterable] = None):
+        if isinstance(query, bytes):
+            query = query.decode("utf-8")
+        if params is not None:
+            self._cursor.execute(query.replace("%s", "?"), tuple(params))
+        else:
+            self._cursor.execute(query)
+
+    def executemany(self, query, params_list: Iterable[Iterable]):
+        self._cursor.executemany(query.replace("%s", "?"), [tuple(params) for params in params_list])
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self) -> int:
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class StandInConnection:
+    """
+    An in-memory SQLite database that stands in for PostgreSQL in benchmarks.
+    It runs the app's own SQL, so the Python side of saving and loading is
+    measured, but the numbers are not a substitute for a real Postgres run.
+    """
+
+    # Looked up by psycopg2.extras.execute_values to encode the query
+    encoding = "UTF8"
+
+    def __init__(self):
+        # Like a psycopg2 connection it may be used from a worker thread, e.g. the startup load
+        self.sqlite = sqlite3.connect(":memory:", check_same_thread=False)
+        self.sqlite.executescript(SCHEMA)
+        self.sqlite.executemany(
+            "INSERT INTO media_types (media_type_description, media_type_extension) VALUES (?, ?)",
+            MEDIA_TYPES
+        )
+        self.sqlite.commit()
+
+    def cursor(self) -> StandInCursor:
+        return StandInCursor(self)
+
+    def commit(self):
+        self.sqlite.commit()
+
+    def rollback(self):
+        self.sqlite.rollback()
+
+    def close(self):
+        self.sqlite.close()
@@ -0,0 +1,103 @@
+# /app/benchmarks/startup_probe.py
+"""
+Measures the app's startup in a fresh interpreter: how long importing app.py
+takes, which heavy modules that pulls in, and, when a display is available,
+the time to first paint and until the treeview is populated.
+
+run_benchmarks starts it in a subprocess once per run. To run it by hand,
+from the app directory:
+    python -m benchmarks.startup_probe --library /path/to/library
+The result is printed as a single JSON line.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+from benchmarks.sqlite_standin import MEDIA_TYPES, StandInConnection
+
+# Modules that should not be imported just to show the main window
+HEAVY_MODULES = ["PIL", "cv2", "numpy", "pandas"]
+
+# Give up waiting for the treeview after this many seconds
+TIMEOUT_SECONDS = 120
+
+
+def fill_standin(conn: StandInConnection, library_path: str):
+    """Store a library in the stand-in database the way a scan would, without importing the app"""
+    extension_to_type = {extension: media_type for media_type, extension in MEDIA_TYPES}
+    library_path = os.path.normpath(os.path.abspath(library_path))
+    folder_ids = {}
+    folders, files = [], []
+    for root, _, file_names in os.walk(library_path):
+        folder_ids[root] = len(folder_ids) + 1
+        folders.append((folder_ids[root], root, folder_ids.get(os.path.dirname(root)), 1))
+        for file_name in file_names:
+            extension = os.path.splitext(file_name)[1].lower()
+            if extension in extension_to_type:
+                size = os.path.getsize(os.path.join(root, file_name)) // 1024
+                files.append((folder_ids[root], file_name, extension, size, root, 1))
+
+    conn.sqlite.execute(
+        "INSERT INTO media_roots (root_id, root_path, scan_status, folder_count, file_count) "
+        "VALUES (1, ?, 'scanned', ?, ?)", (library_path, len(folders), len(files))
+    )
+    conn.sqlite.executemany("INSERT INTO media_folders VALUES (?, ?, ?, ?)", folders)
+    conn.sqlite.executemany(
+        "INSERT INTO media_files (folder_id, file_name, file_extension, file_size_kb, folder_path, root_id) "
+        "VALUES (?, ?, ?, ?, ?, ?)", files
+    )
+    conn.sqlite.commit()
+
+
+def probe(library_path: str) -> dict:
+    """Import the app and, if possible, start it against a stand-in database"""
+    conn = StandInConnection()
+    fill_standin(conn, library_path)
+
+    import app
+    result = {
+        'import_ms': round(app.IMPORT_MS, 1),
+        'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        result['skipped'] = f"No display: {e}"
+        return result
+
+    media_manager_app = app.MediaManagerApp(root, conn)
+    deadline = time.perf_counter() + TIMEOUT_SECONDS
+
+    def wait_for_tree():
+        timings = media_manager_app.startup_timings
+        done = 'tree_populated_ms' in timings or ('data_loaded_ms' in timings and not media_manager_app.media_manager)
+        if done or time.perf_counter() > deadline:
+            root.quit()
+        else:
+            root.after(10, wait_for_tree)
+
+    root.after(10, wait_for_tree)
+    root.mainloop()
+    root.destroy()
+    conn.close()
+
+    result.update(media_manager_app.startup_timings)
+    # Heavy modules imported while the window came up, not just by importing app.py
+    result['heavy_modules'] = [name for name in HEAVY_MODULES if name in sys.modules]
+    return result
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Measure the app's import time and time to first paint")
+    parser.add_argument("--library", required=True, help="Library folder to load into the stand-in database")
+    args = parser.parse_args(argv)
+    print(json.dumps(probe(args.library)))
+
+
+if __name__ == "__main__":
+    main()
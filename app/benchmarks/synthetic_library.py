@@ -0,0 +1,94 @@
+# /app/benchmarks/synthetic_library.py
+import io
+import os
+import random
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Tuple
+from PIL import Image
+
+
+@dataclass
+class LibrarySpec:
+    """Shape of a synthetic media library"""
+    depth: int = 3  # Levels of folders below the root
+    fanout: int = 4  # Subfolders per folder
+    files_per_folder: int = 20  # Media files per folder
+    other_files_per_folder: int = 2  # Non media files per folder, which the scanner should skip
+    image_sizes: List[Tuple[int, int]] = field(default_factory=lambda: [(64, 48), (640, 480), (1920, 1080)])
+    format_weights: Dict[str, int] = field(default_factory=lambda: {'.jpg': 6, '.png': 3, '.gif': 1})
+    seed: int = 0
+
+    def to_dict(self) -> Dict:
+        """Convert to a dictionary for the results file"""
+        return asdict(self)
+
+
+def _encode_image(extension: str, size: Tuple[int, int], seed: int) -> bytes:
+    """Encode a small real image with some structure, so decoders do actual work"""
+    rng = random.Random(seed)
+    image = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+    # A few blocks of colour keep the files from compressing to nothing
+    for _ in range(8):
+        x0, y0 = rng.randrange(size[0]), rng.randrange(size[1])
+        box = (x0, y0, min(x0 + size[0] // 3 + 1, size[0]), min(y0 + size[1] // 3 + 1, size[1]))
+        image.paste(tuple(rng.randrange(256) for _ in range(3)), box)
+
+    buffer = io.BytesIO()
+    if extension == ".gif":
+        frames = [image, image.transpose(Image.FLIP_LEFT_RIGHT), image.transpose(Image.FLIP_TOP_BOTTOM)]
+        frames[0].save(buffer, format="GIF", save_all=True, append_images=frames[1:], duration=100, loop=0)
+    elif extension == ".png":
+        image.save(buffer, format="PNG")
+    else:
+        image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def generate_library(root_path: str, spec: LibrarySpec) -> Dict[str, int]:
+    """
+    Generate a synthetic media library on disk.
+    Every distinct (format, size) image is encoded once and written many times,
+    so generating large trees is limited by the disk rather than the encoder.
+
+    Args:
+        root_path: Folder to create the library in
+        spec: The shape of the library
+
+    Returns:
+        Counts of the folders, media files and other files that were written
+    """
+    rng = random.Random(spec.seed)
+    extensions = list(spec.format_weights.keys())
+    weights = list(spec.format_weights.values())
+    encoded = {
+        (extension, size): _encode_image(extension, size, spec.seed + index)
+        for index, (extension, size) in enumerate(
+            (extension, size) for extension in extensions for size in spec.image_sizes
+        )
+    }
+
+    counts = {'folders': 0, 'media_files': 0, 'other_files': 0, 'bytes': 0}
+
+    def fill_folder(folder_path: str, level: int):
+        os.makedirs(folder_path, exist_ok=True)
+        counts['folders'] += 1
+
+        for i in range(spec.files_per_folder):
+            extension = rng.choices(extensions, weights)[0]
+            data = encoded[(extension, rng.choice(spec.image_sizes))]
+            with open(os.path.join(folder_path, f"media_{i:05d}{extension}"), "wb") as f:
+                f.write(data)
+            counts['media_files'] += 1
+            counts['bytes'] += len(data)
+
+        for i in range(spec.other_files_per_folder):
+            with open(os.path.join(folder_path, f"notes_{i:03d}.txt"), "w") as f:
+                f.write("not media\n")
+            counts['other_files'] += 1
+
+        if level < spec.depth:
+            for i in range(spec.fanout):
+                fill_folder(os.path.join(folder_path, f"folder_{level}_{i:03d}"), level + 1)
+
+    fill_folder(root_path, 0)
+    return counts
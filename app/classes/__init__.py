@@ -1,10 +1,53 @@
 # /app/classes/__init__.py
-from .media_file import MediaFile
-from .media_folder import MediaFolder
-from .media_manager import MediaManager
-from .treeview_manager import TreeviewManager
-from .grid_manager import GridManager
-from .image_manager import ImageManager
-from .slideshow_manager import MultiSlideshowWindow
-
-__all__ = ['MediaFile', 'MediaFolder', 'MediaManager', 'TreeviewManager', 'GridManager', 'ImageManager', 'MultiSlideshowWindow']
+# Classes are imported when first used, so importing the package doesn't pull
+# in Tk, Pillow or OpenCV until something actually needs them.
+import importlib
+
+_EXPORTS = {
+    'MediaFile': '.media_file',
+    'MediaFolder': '.media_folder',
+    'MediaRoot': '.media_root',
+    'MediaManager': '.media_manager',
+    'TreeviewManager': '.treeview_manager',
+    'GridManager': '.grid_manager',
+    'ImageManager': '.image_manager',
+    'MultiSlideshowWindow': '.slideshow_manager',
+    'ImagePrefetcher': '.image_prefetcher',
+    'SlideshowScheduler': '.slideshow_scheduler',
+    'SlideshowTimer': '.slideshow_scheduler',
+    'SlideshowLayout': '.slideshow_layout',
+    'CellSpec': '.slideshow_layout',
+    'SlideshowEngine': '.slideshow_engine',
+    'OffscreenSlideshow': '.offscreen_slideshow',
+    'DiagnosticsWindow': '.diagnostics_window',
+    'CollectionDialog': '.collection_dialog',
+    'SmartCollection': '.smart_collection',
+    'CollectionFilter': '.smart_collection',
+    'PlaylistSource': '.playlist_source',
+    'ShuffleBagSource': '.playlist_source',
+    'OrderedSource': '.playlist_source',
+    'DatabaseSource': '.playlist_source',
+    'ThumbnailBrowser': '.thumbnail_browser',
+    'ThumbnailAtlas': '.thumbnail_atlas',
+    'ColorIndex': '.color_features',
+    'DecodeBackend': '.decode_backend',
+    'ProcessDecodeBackend': '.decode_backend',
+    'instrumentation': '.instrumentation',
+    'MediaLibrary': '.media_library',
+    'connect_to_db': '.media_library',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_EXPORTS[name], __name__)
+    value = module if module.__name__.endswith('.' + name) else getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,109 @@
+# /app/classes/collection_dialog.py
+import tkinter as tk
+from tkinter import ttk, messagebox
+from typing import Callable, List, Optional
+from .smart_collection import DEFAULT_ORDER, ORDERS, CollectionFilter
+
+
+class CollectionDialog:
+    """
+    A window to define a smart collection: a name, the filter fields and the order.
+    Blank fields don't filter.
+    """
+
+    def __init__(self, parent: tk.Misc, media_types: List[str],
+                 on_save: Callable[[str, CollectionFilter, str], None],
+                 name: str = "", collection_filter: Optional[CollectionFilter] = None,
+                 order_by: str = DEFAULT_ORDER):
+        """
+        Initialize the CollectionDialog.
+
+        Args:
+            parent: The parent window
+            media_types: The media types to offer, e.g. ['gif', 'image', 'video']
+            on_save: Called with the name, filter and order; a ValueError it raises is shown and the window stays open
+            name: Initial name
+            collection_filter: Initial filter, e.g. with the folder a collection is created from
+            order_by: Initial order, a key of ORDERS
+        """
+        self.on_save = on_save
+        collection_filter = collection_filter or CollectionFilter()
+        self.window = tk.Toplevel(parent)
+        self.window.title("Smart Collection")
+        self.window.transient(parent)
+
+        form = ttk.Frame(self.window, padding=10)
+        form.pack(fill="both", expand=True)
+        self.fields = {}
+        rows = [
+            ("name", "Name", name),
+            ("folder_path", "Folder (and subfolders)", collection_filter.folder_path),
+            ("extensions", "Extensions, e.g. .jpg .png", " ".join(collection_filter.extensions)),
+            ("min_size_kb", "Minimum size (KB)", collection_filter.min_size_kb),
+            ("max_size_kb", "Maximum size (KB)", collection_filter.max_size_kb),
+            ("captured_from", "Captured from (YYYY-MM-DD)", collection_filter.captured_from),
+            ("captured_before", "Captured before", collection_filter.captured_before),
+            ("modified_from", "Modified from", collection_filter.modified_from),
+            ("modified_before", "Modified before", collection_filter.modified_before),
+            ("camera_model", "Camera model", collection_filter.camera_model),
+        ]
+        for row, (key, label, value) in enumerate(rows):
+            ttk.Label(form, text=label).grid(row=row, column=0, sticky="w", pady=2)
+            variable = tk.StringVar(value="" if value is None else str(value))
+            ttk.Entry(form, textvariable=variable, width=40).grid(row=row, column=1, sticky="ew", pady=2)
+            self.fields[key] = variable
+
+        row = len(rows)
+        ttk.Label(form, text="Media types").grid(row=row, column=0, sticky="nw", pady=2)
+        type_frame = ttk.Frame(form)
+        type_frame.grid(row=row, column=1, sticky="w")
+        self.media_type_vars = {}
+        for media_type in media_types:
+            variable = tk.BooleanVar(value=media_type in collection_filter.media_types)
+            ttk.Checkbutton(type_frame, text=media_type, variable=variable).pack(side="left")
+            self.media_type_vars[media_type] = variable
+
+        ttk.Label(form, text="Order").grid(row=row + 1, column=0, sticky="w", pady=2)
+        self.order_var = tk.StringVar(value=order_by)
+        ttk.Combobox(form, textvariable=self.order_var, values=list(ORDERS), state="readonly",
+                     width=12).grid(row=row + 1, column=1, sticky="w")
+        form.columnconfigure(1, weight=1)
+
+        button_frame = ttk.Frame(self.window)
+        button_frame.pack(fill="x")
+        ttk.Button(button_frame, text="Save", command=self._save).pack(side="right", padx=5, pady=5)
+        ttk.Button(button_frame, text="Cancel", command=self.window.destroy).pack(side="right", padx=5, pady=5)
+
+    def _number(self, key: str) -> Optional[int]:
+        text = self.fields[key].get().strip()
+        if not text:
+            return None
+        try:
+            return int(text)
+        except ValueError:
+            raise ValueError(f"{key} must be a whole number, not {text!r}") from None
+
+    def _text(self, key: str) -> Optional[str]:
+        return self.fields[key].get().strip() or None
+
+    def _save(self):
+        """Build the filter from the fields and hand it to on_save"""
+        try:
+            collection_filter = CollectionFilter(
+                folder_path=self._text("folder_path"),
+                media_types=[media_type for media_type, variable in self.media_type_vars.items() if variable.get()],
+                extensions=[ext if ext.startswith(".") else "." + ext
+                            for ext in self.fields["extensions"].get().replace(",", " ").split()],
+                min_size_kb=self._number("min_size_kb"),
+                max_size_kb=self._number("max_size_kb"),
+                captured_from=self._text("captured_from"),
+                captured_before=self._text("captured_before"),
+                modified_from=self._text("modified_from"),
+                modified_before=self._text("modified_before"),
+                camera_model=self._text("camera_model"),
+            )
+            self.on_save(self.fields["name"].get(), collection_filter, self.order_var.get())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e), parent=self.window)
+            return
+        self.window.destroy()
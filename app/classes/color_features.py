@@ -0,0 +1,271 @@
+# /app/classes/color_features.py
+"""
+Colour features of images and video posters, and an index to query them by colour.
+
+A file's features are a colour histogram of BINS bins (LEVELS levels per
+channel) holding the share of its pixels in each bin, and its dominant colour:
+the mean colour of the pixels in its fullest bin. They are computed from a
+SAMPLE_SIZE sample decoded at thumbnail scale (JPEG draft mode reads only the
+DCT scale that is needed), so a batch of files becomes one (files, pixels, 3)
+array and the histograms and dominant colours of the whole batch come out of a
+few vectorized bincounts. extract_color_batch() runs in worker processes of
+MediaLibrary.extract_color_features(), so it must stay importable without Tk
+and keep its arguments and results picklable.
+
+ColorIndex keeps the features of a library packed in NumPy arrays, one row per
+file, so "files that are mostly orange" is one matrix-vector product over all
+histograms and sorting by colour never opens a file.
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+# Levels per channel of the histogram, and its number of bins
+LEVELS = 4
+BINS = LEVELS ** 3
+# Pixels sampled per file
+SAMPLE_SIZE = (32, 32)
+# Histogram shares are stored as bytes, 0..HISTOGRAM_SCALE
+HISTOGRAM_SCALE = 255
+# How far (in RGB units) a pixel may be from a colour and still count as that colour
+COLOR_SPREAD = 60.0
+# Share of a file's pixels that must be near a colour for the file to match it
+DEFAULT_MIN_SHARE = 0.3
+# Below this saturation a dominant colour is a grey, sorted after the hues by lightness
+GREY_SATURATION = 0.15
+
+RGB = Tuple[int, int, int]
+
+# Named colours for queries; a name with several colours matches files near any of them
+COLOR_NAMES: Dict[str, List[RGB]] = {
+    'red': [(200, 30, 30)],
+    'orange': [(235, 130, 30)],
+    'yellow': [(235, 210, 50)],
+    'green': [(60, 150, 50)],
+    'teal': [(30, 150, 150)],
+    'blue': [(40, 80, 200)],
+    'purple': [(120, 50, 170)],
+    'pink': [(235, 130, 180)],
+    'brown': [(120, 75, 40)],
+    'white': [(240, 240, 240)],
+    'grey': [(128, 128, 128)],
+    'black': [(15, 15, 15)],
+    'warm': [(200, 30, 30), (235, 130, 30), (235, 210, 50), (190, 120, 80)],
+    'cool': [(40, 80, 200), (30, 150, 150), (60, 150, 50), (120, 140, 170)],
+}
+
+_STEP = 256 // LEVELS
+_SHIFT = 8 - (LEVELS - 1).bit_length()
+# The RGB centre of every bin, in bin order: red is the slowest varying channel
+_levels = np.arange(LEVELS) * _STEP + _STEP / 2
+BIN_CENTRES = np.stack(np.meshgrid(_levels, _levels, _levels, indexing="ij"), axis=-1).reshape(BINS, 3)
+
+
+def parse_color(text: str) -> List[RGB]:
+    """
+    Turn a colour name of COLOR_NAMES or a #rrggbb value into the colours to query.
+
+    Raises:
+        ValueError: If the text is neither
+    """
+    text = text.strip().lower()
+    if text in COLOR_NAMES:
+        return COLOR_NAMES[text]
+    digits = text[1:] if text.startswith("#") else text
+    if len(digits) == 6:
+        try:
+            value = int(digits, 16)
+        except ValueError:
+            pass
+        else:
+            return [unpack_rgb(value)]
+    raise ValueError(f"Unknown colour {text!r}, use #rrggbb or one of {', '.join(COLOR_NAMES)}")
+
+
+def unpack_rgb(value: int) -> RGB:
+    return (value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF
+
+
+def _sample(path: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+    """
+    Decode a file at reduced size into a SAMPLE_SIZE RGB array.
+    Runs in worker processes, whose stdout is the CLI's, so errors are returned rather than printed.
+
+    Returns:
+        The array and None, or None and the error if the file can't be read
+    """
+    try:
+        with Image.open(path) as pil_image:
+            pil_image.draft("RGB", SAMPLE_SIZE)
+            if pil_image.mode != "RGB":
+                pil_image = pil_image.convert("RGB")
+            return np.asarray(pil_image.resize(SAMPLE_SIZE, Image.BILINEAR), dtype=np.uint8), None
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return None, str(e)
+
+
+def compute_features(pixels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the histograms and dominant colours of a batch of samples at once.
+
+    Args:
+        pixels: uint8 array of shape (files, pixels, 3)
+
+    Returns:
+        The histograms as uint8 shares of shape (files, BINS), and the dominant colours packed as 0xRRGGBB
+    """
+    files, count, _ = pixels.shape
+    levels = (pixels >> _SHIFT).astype(np.int64)
+    bins = (levels[..., 0] * LEVELS + levels[..., 1]) * LEVELS + levels[..., 2]
+    # One bincount over the whole batch, every file's bins offset into its own row
+    offset_bins = bins + (np.arange(files) * BINS)[:, None]
+    counts = np.bincount(offset_bins.ravel(), minlength=files * BINS).reshape(files, BINS)
+    histograms = np.rint(counts * (HISTOGRAM_SCALE / count)).astype(np.uint8)
+
+    top = counts.argmax(axis=1)
+    in_top = bins == top[:, None]
+    sums = np.einsum("fpc,fp->fc", pixels.astype(np.int64), in_top.astype(np.int64))
+    dominant = sums // counts[np.arange(files), top][:, None]
+    packed = (dominant[:, 0] << 16) | (dominant[:, 1] << 8) | dominant[:, 2]
+    return histograms, packed
+
+
+def extract_color_batch(batch: List[Tuple[int, str, Optional[float]]]
+                        ) -> List[Tuple[int, Optional[float], Optional[int], Optional[bytes], Optional[str]]]:
+    """
+    Compute the colour features of a batch of files, run in a worker process.
+
+    Args:
+        batch: (media_file_id, path to sample, file_mtime) per file
+
+    Returns:
+        (media_file_id, file_mtime, dominant colour, histogram bytes, error) per file,
+        the features None and the error set for files that can't be read
+    """
+    sampled = [_sample(path) for _, path, _ in batch]
+    samples = [sample for sample, _ in sampled]
+    readable = [sample for sample in samples if sample is not None]
+    features = iter(())
+    if readable:
+        histograms, dominant = compute_features(np.stack(readable).reshape(len(readable), -1, 3))
+        features = zip(dominant.tolist(), histograms)
+    results = []
+    for (media_file_id, _, file_mtime), (sample, error) in zip(batch, sampled):
+        if sample is None:
+            results.append((media_file_id, file_mtime, None, None, error))
+        else:
+            color, histogram = next(features)
+            results.append((media_file_id, file_mtime, color, histogram.tobytes(), None))
+    return results
+
+
+def _hue_keys(dominant: np.ndarray) -> np.ndarray:
+    """Sort keys of dominant colours: the hue in 0..1, greys after all hues from light to dark"""
+    rgb = dominant.astype(np.float32) / 255
+    high, low = rgb.max(axis=1), rgb.min(axis=1)
+    chroma = high - low
+    saturation = np.divide(chroma, high, out=np.zeros_like(chroma), where=high > 0)
+    safe = np.where(chroma > 0, chroma, 1)
+    red, green, blue = rgb[:, 0], rgb[:, 1], rgb[:, 2]
+    hue = np.select(
+        [high == red, high == green],
+        [((green - blue) / safe) % 6, (blue - red) / safe + 2],
+        (red - green) / safe + 4
+    ) / 6
+    return np.where(saturation < GREY_SATURATION, 2 - high, hue)
+
+
+class ColorIndex:
+    """The colour features of a set of files, packed for vectorized queries"""
+
+    def __init__(self, media_file_ids: Sequence[int], dominant: Sequence[int], histograms: np.ndarray):
+        """
+        Initialize the ColorIndex.
+
+        Args:
+            media_file_ids: The files, one per row
+            dominant: Their dominant colours packed as 0xRRGGBB
+            histograms: Their histograms, uint8 of shape (files, BINS)
+        """
+        ids = np.asarray(media_file_ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        self.ids = ids[order]
+        packed = np.asarray(dominant, dtype=np.int64)[order]
+        self.dominant = np.stack([(packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF], axis=1).astype(np.uint8)
+        self.histograms = np.asarray(histograms, dtype=np.float32).reshape(-1, BINS)[order] / HISTOGRAM_SCALE
+        self.hue_keys = _hue_keys(self.dominant)
+
+    @classmethod
+    def from_rows(cls, rows: List[Tuple[int, int, bytes]]) -> 'ColorIndex':
+        """Build the index from (media_file_id, dominant_rgb, histogram) rows of color_features"""
+        histograms = np.frombuffer(b"".join(bytes(row[2]) for row in rows), dtype=np.uint8).reshape(-1, BINS)
+        return cls([row[0] for row in rows], [row[1] for row in rows], histograms)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _rows(self, media_file_ids: Iterable[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """The rows of some files and a mask of the files the index has"""
+        ids = np.fromiter(media_file_ids, dtype=np.int64)
+        rows = np.searchsorted(self.ids, ids)
+        found = rows < len(self.ids)
+        found[found] = self.ids[rows[found]] == ids[found]
+        return rows, found
+
+    def color_shares(self, colors: Sequence[RGB], spread: float = COLOR_SPREAD) -> np.ndarray:
+        """
+        The share of every file's pixels near any of some colours, in row order.
+        Each bin counts by how close its centre is to the nearest colour, so it is
+        one product of the (files, BINS) histograms with a BINS vector.
+        """
+        targets = np.asarray(colors, dtype=np.float32).reshape(-1, 3)
+        distances = ((BIN_CENTRES[:, None, :] - targets[None, :, :]) ** 2).sum(axis=2).min(axis=1)
+        weights = np.exp(-distances / (2 * spread ** 2)).astype(np.float32)
+        return self.histograms @ weights
+
+    def nearest(self, colors: Sequence[RGB], min_share: float = DEFAULT_MIN_SHARE,
+                limit: Optional[int] = None) -> List[int]:
+        """
+        Find the files whose pixels are mostly near some colours.
+
+        Args:
+            colors: The colours, e.g. from parse_color()
+            min_share: Share of a file's pixels that must be near them
+            limit: Return at most this many files
+
+        Returns:
+            media_file_ids, closest match first
+        """
+        shares = self.color_shares(colors)
+        rows = np.flatnonzero(shares >= min_share)
+        if limit is not None and limit < len(rows):
+            rows = rows[np.argpartition(-shares[rows], limit)[:limit]]
+        rows = rows[np.argsort(-shares[rows], kind="stable")]
+        return self.ids[rows].tolist()
+
+    def similar_to(self, media_file_id: int, limit: int = 50) -> List[int]:
+        """The files whose histograms are closest to a file's (by L1 distance), closest first, without the file"""
+        rows, found = self._rows([media_file_id])
+        if not found[0]:
+            return []
+        distances = np.abs(self.histograms - self.histograms[rows[0]]).sum(axis=1)
+        distances[rows[0]] = np.inf
+        limit = min(limit, len(self.ids) - 1)
+        if limit <= 0:
+            return []
+        nearest = np.argpartition(distances, limit - 1)[:limit]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return self.ids[nearest].tolist()
+
+    def sort_keys(self, media_file_ids: Iterable[int]) -> np.ndarray:
+        """Hue sort keys of some files (see _hue_keys), inf for files without features"""
+        rows, found = self._rows(media_file_ids)
+        keys = np.full(len(rows), np.inf)
+        keys[found] = self.hue_keys[rows[found]]
+        return keys
+
+    def dominant_color(self, media_file_id: int) -> Optional[RGB]:
+        """The dominant colour of a file, None if it has no features"""
+        rows, found = self._rows([media_file_id])
+        return tuple(int(c) for c in self.dominant[rows[0]]) if found[0] else None
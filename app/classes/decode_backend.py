@@ -0,0 +1,168 @@
+# /app/classes/decode_backend.py
+"""
+Where slideshow cells, the prefetcher and the image pane decode and scale images.
+
+DecodeBackend decodes on the calling thread, e.g. a prefetch worker thread.
+Pillow releases the GIL for parts of decoding and resampling only, so with
+many cells one core ends up doing most of the work.
+
+ProcessDecodeBackend runs open/decode/scale in a pool of worker processes
+instead. The pixels don't travel back pickled through a pipe: the parent keeps
+one shared memory slot per worker, a worker writes the scaled image's bytes
+into the slot it is handed, and the parent copies them straight into a new
+Pillow image. Slots are reused and only grow, so after warm-up a decode costs
+no allocations of shared memory. Animated GIFs are still decoded by
+GifFrameCache in the calling thread.
+
+Both are safe to call from several threads at once.
+"""
+import multiprocessing
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from .instrumentation import span
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Bytes per pixel a slot must hold, scaled images are RGB or RGBA
+MAX_BANDS = 4
+# Shared memory segments a worker process keeps mapped
+WORKER_ATTACHED_LIMIT = 16
+
+# The slots mapped in this worker process, by name
+_attached: Dict[str, SharedMemory] = {}
+
+
+class DecodeBackend:
+    """Decodes and scales images on the calling thread"""
+
+    name = "threads"
+    workers = 0  # Worker processes, 0 when decoding happens on the calling thread
+
+    def decode(self, image_path: str, box_size: Tuple[int, int],
+               timings: Optional[Dict[str, float]] = None) -> 'Image.Image':
+        """
+        Open, decode and scale an image so it fits inside a box, see image_loading.load_scaled_image.
+
+        Args:
+            image_path: Path to the image file
+            box_size: The (width, height) of the box to fit into
+            timings: Optional dictionary that receives the stage timings in ms
+
+        Returns:
+            The scaled PIL image
+        """
+        from .image_loading import load_scaled_image
+        return load_scaled_image(image_path, box_size, timings)
+
+    def shutdown(self):
+        """Release the backend's workers and memory"""
+
+
+def _attach(slot_name: str) -> SharedMemory:
+    """Map a slot of the parent in this worker process, once"""
+    shared_memory = _attached.get(slot_name)
+    if shared_memory is None:
+        if len(_attached) >= WORKER_ATTACHED_LIMIT:
+            # Slots that were replaced by bigger ones are never handed out again
+            for stale in _attached.values():
+                stale.close()
+            _attached.clear()
+        # Spawned workers share the parent's resource tracker, so attaching doesn't
+        # make the slot go away with the worker; the parent unlinks it
+        shared_memory = SharedMemory(slot_name)
+        _attached[slot_name] = shared_memory
+    return shared_memory
+
+
+def _decode_into_slot(image_path: str, box_size: Tuple[int, int],
+                      slot_name: str) -> Tuple[Tuple[int, int], str, Dict[str, float]]:
+    """
+    Decode and scale an image and write its pixels into a shared memory slot, run in a worker process.
+
+    Returns:
+        The image's size, mode and stage timings; the pixels are in the slot
+    """
+    from .image_loading import load_scaled_image
+    timings: Dict[str, float] = {}
+    image = load_scaled_image(image_path, box_size, timings)
+    start = time.perf_counter()
+    data = image.tobytes()
+    _attach(slot_name).buf[:len(data)] = data
+    timings["shm_write_ms"] = (time.perf_counter() - start) * 1000
+    return image.size, image.mode, timings
+
+
+class ProcessDecodeBackend(DecodeBackend):
+    """Decodes and scales images in worker processes, returning the pixels through shared memory"""
+
+    name = "processes"
+
+    def __init__(self, workers: int = 4):
+        """
+        Initialize the ProcessDecodeBackend. The worker processes are started on the first decode.
+
+        Args:
+            workers: Number of worker processes, and of shared memory slots
+        """
+        self.workers = max(workers, 1)
+        # Spawned rather than forked, the app has threads running (prefetching, loading)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        self._free_slots: 'queue.Queue[Optional[SharedMemory]]' = queue.Queue()
+        self._slots: List[SharedMemory] = []  # Every slot, to release them on shutdown
+        for _ in range(self.workers):
+            self._free_slots.put(None)  # Created on first use, at the size it is first needed
+        self._is_shutdown = False
+
+    def _acquire_slot(self, size: int) -> SharedMemory:
+        """Take a free slot, waiting while every slot is in use, replaced by a bigger one if it is too small"""
+        slot = self._free_slots.get()
+        if slot is not None and slot.size >= size:
+            return slot
+        if slot is not None:
+            self._release(slot)
+        slot = SharedMemory(create=True, size=size)
+        self._slots.append(slot)
+        return slot
+
+    def _release(self, slot: SharedMemory):
+        """Unmap and delete a slot"""
+        self._slots.remove(slot)
+        slot.close()
+        slot.unlink()
+
+    def decode(self, image_path: str, box_size: Tuple[int, int],
+               timings: Optional[Dict[str, float]] = None) -> 'Image.Image':
+        from PIL import Image
+        if self._is_shutdown:
+            raise RuntimeError("The decode backend has been shut down")
+        slot = self._acquire_slot(max(box_size[0], 1) * max(box_size[1], 1) * MAX_BANDS)
+        try:
+            with span("image_decode"):
+                start = time.perf_counter()
+                size, mode, worker_timings = self._executor.submit(
+                    _decode_into_slot, image_path, box_size, slot.name
+                ).result()
+                returned = time.perf_counter()
+                length = size[0] * size[1] * len(mode)
+                image = Image.frombytes(mode, size, slot.buf[:length])
+        finally:
+            self._free_slots.put(slot)
+        if timings is not None:
+            timings.update(worker_timings)
+            timings["process_ms"] = (returned - start) * 1000
+            timings["shm_read_ms"] = (time.perf_counter() - returned) * 1000
+        return image
+
+    def shutdown(self):
+        """Stop the worker processes and delete the shared memory slots"""
+        if self._is_shutdown:
+            return
+        self._is_shutdown = True
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for slot in list(self._slots):
+            self._release(slot)
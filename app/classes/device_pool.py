@@ -0,0 +1,178 @@
+# /app/classes/device_pool.py
+"""
+Per-device worker pools for scanning.
+
+Directories are listed by the pool of the device (st_dev) they live on, so a
+spinning disk, an SSD and a network mount each get their own concurrency
+limit. Limits are tuned AIMD style from the observed listing latency: while
+latency stays near the best seen so far the limit grows by one per window,
+when it climbs well above it (the device is saturated, e.g. a disk seeking)
+or listings fail, the limit is halved.
+"""
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# Latency, relative to the best seen, below which the limit is raised
+LATENCY_TOLERANCE = 1.5
+# Latency, relative to the best seen, above which the limit is halved
+LATENCY_BACKOFF = 3.0
+# The best latency slowly drifts up, so a single lucky window doesn't pin it
+BASELINE_DRIFT = 1.05
+# Listings faster than this (e.g. from the OS cache) are never a reason to back off
+MIN_BACKOFF_SECONDS = 0.001
+DEFAULT_INITIAL_LIMIT = 4
+
+
+def find_mount_point(path: str) -> str:
+    """Get the mount point of the filesystem a path is on"""
+    path = os.path.abspath(path)
+    while not os.path.ismount(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+@dataclass
+class DeviceStats:
+    """Throughput and concurrency of one device during a scan"""
+    device: int
+    mount_point: str
+    directories: int = 0
+    entries: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0  # Sum of all listing times
+    first_start: Optional[float] = None
+    last_end: Optional[float] = None
+    limit: int = 0
+    peak_limit: int = 0
+    increases: int = 0
+    decreases: int = 0
+
+    def to_dict(self) -> Dict:
+        """Convert to a dictionary for progress output"""
+        wall = (self.last_end - self.first_start) if self.first_start is not None and self.last_end else 0.0
+        return {
+            'device': self.device,
+            'mount_point': self.mount_point,
+            'directories': self.directories,
+            'entries': self.entries,
+            'errors': self.errors,
+            'directories_per_s': round(self.directories / wall, 1) if wall else 0.0,
+            'entries_per_s': round(self.entries / wall, 1) if wall else 0.0,
+            'mean_listing_ms': round(self.busy_seconds * 1000 / self.directories, 3) if self.directories else 0.0,
+            'limit': self.limit,
+            'peak_limit': self.peak_limit,
+            'increases': self.increases,
+            'decreases': self.decreases,
+        }
+
+
+class DevicePool:
+    """
+    Worker threads for one device with an adaptive concurrency limit.
+    Only used from the scanning thread: it queues directories, submits up to
+    `limit` of them at a time and records each result when it completes.
+    """
+
+    def __init__(self, device: int, mount_point: str, max_limit: int,
+                 initial_limit: int = DEFAULT_INITIAL_LIMIT, min_limit: int = 1):
+        """
+        Initialize the DevicePool.
+
+        Args:
+            device: The st_dev of the device
+            mount_point: Where the device is mounted, for the stats
+            max_limit: Maximum concurrent listings, also the number of threads
+            initial_limit: Concurrent listings to start with
+            min_limit: The limit never drops below this
+        """
+        self.max_limit = max(max_limit, 1)
+        self.min_limit = min(max(min_limit, 1), self.max_limit)
+        self.limit = min(max(initial_limit, self.min_limit), self.max_limit)
+        self.queue: Deque[Any] = deque()  # Directories waiting to be listed
+        self.in_flight = 0
+        self.stats = DeviceStats(device, mount_point, limit=self.limit, peak_limit=self.limit)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_limit, thread_name_prefix=f"scan-dev{device}")
+        self._window: List[float] = []  # Latency per entry of the listings since the last adjustment
+        self._window_seconds = 0.0
+        self._baseline: Optional[float] = None
+
+    def submit_ready(self, function: Callable[[Any], object]) -> List[Future]:
+        """
+        Submit queued directories while the pool is below its limit.
+
+        Args:
+            function: Called with a queued directory in a worker thread
+
+        Returns:
+            The new futures
+        """
+        futures = []
+        while self.queue and self.in_flight < self.limit:
+            if self.stats.first_start is None:
+                self.stats.first_start = time.perf_counter()
+            self.in_flight += 1
+            futures.append(self.executor.submit(function, self.queue.popleft()))
+        return futures
+
+    def record(self, seconds: float, entries: int, error: bool):
+        """
+        Record a completed listing and adjust the limit once per window of `limit` listings.
+
+        Args:
+            seconds: How long the listing took in the worker
+            entries: Number of entries in the directory
+            error: Whether the listing failed
+        """
+        self.in_flight -= 1
+        self.stats.directories += 1
+        self.stats.entries += entries
+        self.stats.busy_seconds += seconds
+        self.stats.last_end = time.perf_counter()
+
+        if error:
+            self.stats.errors += 1
+            self._decrease()
+            return
+
+        # Latency per entry, so large and small directories can be compared
+        self._window.append(seconds / (entries + 1))
+        self._window_seconds += seconds
+        if len(self._window) >= self.limit:
+            self._adjust(sum(self._window) / len(self._window), self._window_seconds / len(self._window))
+            self._window.clear()
+            self._window_seconds = 0.0
+
+    def _adjust(self, latency: float, mean_seconds: float):
+        """Additive increase while latency stays low, multiplicative decrease when it climbs"""
+        if self._baseline is None or latency < self._baseline:
+            self._baseline = latency
+        if latency <= self._baseline * LATENCY_TOLERANCE:
+            if self.limit < self.max_limit:
+                self.limit += 1
+                self.stats.increases += 1
+                self.stats.peak_limit = max(self.stats.peak_limit, self.limit)
+        elif latency > self._baseline * LATENCY_BACKOFF and mean_seconds >= MIN_BACKOFF_SECONDS:
+            self._decrease()
+        self._baseline *= BASELINE_DRIFT
+        self.stats.limit = self.limit
+
+    def _decrease(self):
+        """Halve the limit"""
+        new_limit = max(self.limit // 2, self.min_limit)
+        if new_limit < self.limit:
+            self.limit = new_limit
+            self.stats.decreases += 1
+        self._window.clear()
+        self._window_seconds = 0.0
+        self.stats.limit = self.limit
+
+    def shutdown(self):
+        """Stop the worker threads"""
+        self.executor.shutdown(wait=False)
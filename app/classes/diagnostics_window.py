@@ -0,0 +1,73 @@
+# /app/classes/diagnostics_window.py
+import tkinter as tk
+from tkinter import ttk, filedialog
+from . import instrumentation
+
+
+class DiagnosticsWindow:
+    """
+    A window showing the aggregated timing spans (count/total/p50/p95),
+    with buttons to refresh, reset and export them, and any captured profiles.
+    """
+
+    COLUMNS = ("count", "total_ms", "mean_ms", "p50_ms", "p95_ms", "max_ms")
+
+    def __init__(self, parent: tk.Misc):
+        """
+        Initialize the DiagnosticsWindow.
+
+        Args:
+            parent: The parent window
+        """
+        self.window = tk.Toplevel(parent)
+        self.window.title("Diagnostics")
+        self.window.geometry("760x480")
+
+        self.tree = ttk.Treeview(self.window, columns=self.COLUMNS)
+        self.tree.column("#0", width=200, stretch=True)
+        self.tree.heading("#0", text="Operation")
+        for column in self.COLUMNS:
+            self.tree.column(column, width=80, anchor="e")
+            self.tree.heading(column, text=column.replace("_ms", " (ms)"))
+        self.tree.pack(fill="both", expand=True)
+
+        self.profile_text = tk.Text(self.window, height=12, wrap="none", font=("Courier", 9))
+        self.profile_text.pack(fill="both", expand=True)
+
+        button_frame = ttk.Frame(self.window)
+        button_frame.pack(fill="x")
+        ttk.Button(button_frame, text="Refresh", command=self.refresh).pack(side="left", padx=5, pady=5)
+        ttk.Button(button_frame, text="Reset", command=self._reset).pack(side="left", padx=5, pady=5)
+        ttk.Button(button_frame, text="Export JSON...", command=self._export).pack(side="left", padx=5, pady=5)
+
+        self.status = ttk.Label(button_frame, anchor="e")
+        self.status.pack(side="right", padx=5)
+
+        self.refresh()
+
+    def refresh(self):
+        """Reload the statistics and profile reports"""
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        for name, stats in instrumentation.get_stats().items():
+            self.tree.insert("", "end", text=name, values=tuple(stats[column] for column in self.COLUMNS))
+
+        self.profile_text.delete("1.0", "end")
+        for name, report in instrumentation.get_profile_reports().items():
+            self.profile_text.insert("end", f"==== {name} ====\n{report}\n")
+
+        self.status["text"] = "Recording" if instrumentation.is_enabled() else "Recording is off"
+
+    def _reset(self):
+        """Forget all recorded spans"""
+        instrumentation.reset()
+        self.refresh()
+
+    def _export(self):
+        """Export the statistics as JSON"""
+        file_path = filedialog.asksaveasfilename(
+            parent=self.window, defaultextension=".json", filetypes=[("JSON", "*.json")]
+        )
+        if file_path:
+            instrumentation.export_json(file_path)
+            self.status["text"] = f"Exported to {file_path}"
@@ -0,0 +1,134 @@
+# /app/classes/exif_metadata.py
+"""
+Reading EXIF metadata (capture time, camera, orientation, GPS) from image headers.
+
+Only the header is parsed: Pillow's Image.open reads the file lazily and getexif()
+comes from the APP1/IFD blocks, so no pixels are decoded. The batch function runs
+in worker processes of MediaLibrary.extract_metadata(), so it must stay importable
+without Tk and keep its arguments and results picklable.
+"""
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Extensions whose files can carry EXIF that Pillow reads
+EXIF_EXTENSIONS = ['.jpg', '.jpeg', '.tif', '.tiff', '.webp', '.png']
+
+# EXIF tag numbers
+TAG_MAKE = 271
+TAG_MODEL = 272
+TAG_ORIENTATION = 274
+TAG_DATETIME = 306
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_DATETIME_ORIGINAL = 36867
+TAG_DATETIME_DIGITIZED = 36868
+GPS_LATITUDE_REF, GPS_LATITUDE, GPS_LONGITUDE_REF, GPS_LONGITUDE = 1, 2, 3, 4
+
+EXIF_DATETIME_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+
+@dataclass
+class ExifData:
+    """The EXIF fields stored for a file"""
+    captured_at: Optional[datetime] = None
+    camera_make: Optional[str] = None
+    camera_model: Optional[str] = None
+    orientation: Optional[int] = None
+    gps_latitude: Optional[float] = None
+    gps_longitude: Optional[float] = None
+
+    def to_tuple(self):
+        """Convert to tuple for database updates, in column order"""
+        return (self.captured_at, self.camera_make, self.camera_model, self.orientation,
+                self.gps_latitude, self.gps_longitude)
+
+
+def _text(value) -> Optional[str]:
+    """Clean up an EXIF string, camera makes are often padded with NULs and spaces"""
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="replace")
+    if not isinstance(value, str):
+        return None
+    value = value.strip("\x00 ").strip()
+    return value[:100] or None
+
+
+def _parse_datetime(value) -> Optional[datetime]:
+    """Parse an EXIF date like '2019:07:14 18:03:22', None for blanks like '0000:00:00 00:00:00'"""
+    value = _text(value)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value[:19], EXIF_DATETIME_FORMAT)
+    except ValueError:
+        return None
+
+
+def _degrees(dms, ref) -> Optional[float]:
+    """Convert GPS (degrees, minutes, seconds) rationals to signed decimal degrees"""
+    try:
+        degrees, minutes, seconds = (float(part) for part in dms)
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    value = degrees + minutes / 60 + seconds / 3600
+    if _text(ref) in ("S", "W"):
+        value = -value
+    return round(value, 7) if -180 <= value <= 180 else None
+
+
+def read_exif(path: str) -> Optional[ExifData]:
+    """
+    Read the EXIF fields of an image from its header.
+
+    Args:
+        path: Path to the image file
+
+    Returns:
+        The fields found, None if the file can't be read
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            exif = image.getexif()
+            exif_ifd = exif.get_ifd(TAG_EXIF_IFD)
+            gps_ifd = exif.get_ifd(TAG_GPS_IFD)
+    except Exception:
+        return None
+
+    orientation = exif.get(TAG_ORIENTATION)
+    data = ExifData(
+        captured_at=(_parse_datetime(exif_ifd.get(TAG_DATETIME_ORIGINAL))
+                     or _parse_datetime(exif_ifd.get(TAG_DATETIME_DIGITIZED))
+                     or _parse_datetime(exif.get(TAG_DATETIME))),
+        camera_make=_text(exif.get(TAG_MAKE)),
+        camera_model=_text(exif.get(TAG_MODEL)),
+        orientation=orientation if isinstance(orientation, int) and 1 <= orientation <= 8 else None,
+    )
+    if GPS_LATITUDE in gps_ifd and GPS_LONGITUDE in gps_ifd:
+        data.gps_latitude = _degrees(gps_ifd[GPS_LATITUDE], gps_ifd.get(GPS_LATITUDE_REF))
+        data.gps_longitude = _degrees(gps_ifd[GPS_LONGITUDE], gps_ifd.get(GPS_LONGITUDE_REF))
+    return data
+
+
+def extract_batch(batch: List[Tuple[int, str, Optional[float]]]) -> List[Tuple[int, Optional[float], Optional[ExifData]]]:
+    """
+    Read the EXIF of a batch of files, run in a worker process.
+
+    Args:
+        batch: (media_file_id, path, file_mtime) per file; file_mtime is None for rows scanned before it was stored
+
+    Returns:
+        (media_file_id, file_mtime, ExifData or None) per file, file_mtime from os.stat where it was missing
+    """
+    results = []
+    for media_file_id, path, file_mtime in batch:
+        if file_mtime is None:
+            try:
+                file_mtime = os.stat(path).st_mtime
+            except OSError:
+                pass
+        results.append((media_file_id, file_mtime, read_exif(path)))
+    return results
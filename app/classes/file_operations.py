@@ -0,0 +1,151 @@
+# /app/classes/file_operations.py
+"""
+Moving, renaming and deleting media files from the app.
+
+A batch is planned and checked up front (plan_move, plan_rename, plan_delete),
+the filesystem work then runs in parallel worker threads (run_operations), and
+whatever succeeded is written to the database in one transaction
+(MediaLibrary.apply_file_operations) and patched into the MediaManager and the
+treeview in place, so nothing has to be rescanned or rebuilt.
+"""
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+from .media_file import MediaFile
+from .media_folder import MediaFolder
+
+MOVE = "move"
+RENAME = "rename"
+DELETE = "delete"
+DEFAULT_WORKERS = 8
+
+
+@dataclass
+class FileOperation:
+    """One file to move, rename or delete, and how it went"""
+    kind: str  # MOVE, RENAME or DELETE
+    media_file: MediaFile
+    target_folder: Optional[MediaFolder] = None  # The folder the file ends up in, its own folder for renames
+    target_name: Optional[str] = None
+    error: Optional[str] = None  # Set by run_operations when the filesystem operation failed
+
+    @property
+    def source_path(self) -> str:
+        return os.path.join(self.media_file.folder_path, self.media_file.file_name)
+
+    @property
+    def target_path(self) -> Optional[str]:
+        if self.target_folder is None:
+            return None
+        return os.path.join(self.target_folder.folder_path, self.target_name)
+
+
+def _check_targets(operations: List[FileOperation]):
+    """Raise ValueError if two files would get the same path or a target is taken on disk"""
+    seen = set()
+    for operation in operations:
+        target = os.path.normcase(operation.target_path)
+        if target in seen:
+            raise ValueError(f"More than one file would become {operation.target_path}")
+        seen.add(target)
+        if os.path.lexists(operation.target_path) and \
+                os.path.normcase(operation.source_path) != target:
+            raise ValueError(f"{operation.target_path} already exists")
+
+
+def plan_move(files: List[MediaFile], folder: MediaFolder) -> List[FileOperation]:
+    """
+    Plan moving files into a library folder, keeping their names.
+
+    Args:
+        files: The files to move; files already in the folder are left out
+        folder: The destination, a folder of the MediaManager
+
+    Returns:
+        The operations, raises ValueError if a file name is taken in the destination
+    """
+    operations = [FileOperation(MOVE, f, folder, f.file_name) for f in files if f.folder_id != folder.folder_id]
+    _check_targets(operations)
+    return operations
+
+
+def plan_rename(files: List[MediaFile], pattern: str, extension_to_type: Dict[str, str],
+                folders: Dict[int, MediaFolder]) -> List[FileOperation]:
+    """
+    Plan renaming files in place.
+
+    Args:
+        files: The files to rename, numbered in this order
+        pattern: The new name; {name} is the old name without extension, {ext} its extension
+                 and {n} the file's number from 1, e.g. 'holiday_{n:03}{ext}'
+        extension_to_type: The media extensions, a file must stay a media file
+        folders: The MediaManager's folders by folder_id
+
+    Returns:
+        The operations, files whose name doesn't change are left out.
+        Raises ValueError for an invalid pattern or clashing names.
+    """
+    if len(files) > 1 and "{" not in pattern:
+        raise ValueError("Renaming several files needs a pattern with {n} or {name}")
+    operations = []
+    for number, media_file in enumerate(files, start=1):
+        stem, extension = os.path.splitext(media_file.file_name)
+        try:
+            new_name = pattern.format(name=stem, ext=extension, n=number).strip()
+        except (KeyError, IndexError, ValueError) as e:
+            raise ValueError(f"Invalid rename pattern {pattern!r}: {e}") from None
+        if not new_name or new_name in (".", "..") or "/" in new_name or os.sep in new_name:
+            raise ValueError(f"{new_name!r} is not a valid file name")
+        if os.path.splitext(new_name)[1].lower() not in extension_to_type:
+            raise ValueError(f"{new_name} doesn't have a media file extension")
+        if new_name != media_file.file_name:
+            operations.append(FileOperation(RENAME, media_file, folders[media_file.folder_id], new_name))
+    _check_targets(operations)
+    return operations
+
+
+def plan_delete(files: List[MediaFile]) -> List[FileOperation]:
+    """Plan deleting files from disk"""
+    return [FileOperation(DELETE, f) for f in files]
+
+
+def _run_one(operation: FileOperation):
+    """Carry out one operation, recording a failure on it instead of raising"""
+    try:
+        if operation.kind == DELETE:
+            os.remove(operation.source_path)
+            return
+        # Checked again right before, the file may have appeared since the batch was planned
+        if os.path.lexists(operation.target_path) and \
+                os.path.normcase(operation.target_path) != os.path.normcase(operation.source_path):
+            raise FileExistsError(f"{operation.target_path} already exists")
+        if operation.kind == RENAME:
+            os.rename(operation.source_path, operation.target_path)
+        else:
+            # Renames on the same device, copies and deletes across devices
+            shutil.move(operation.source_path, operation.target_path)
+    except OSError as e:
+        operation.error = str(e)
+
+
+def run_operations(operations: List[FileOperation], workers: int = DEFAULT_WORKERS,
+                   progress: Optional[Callable[[int, int], None]] = None) -> List[FileOperation]:
+    """
+    Carry out the filesystem side of a batch in worker threads.
+    Does not touch Tk or the database, so it can run off the Tk thread.
+
+    Args:
+        operations: The planned operations, their error is set when they fail
+        workers: Number of threads, moves across devices and network mounts overlap
+        progress: Called with the number of operations done and the total
+
+    Returns:
+        The operations
+    """
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="file-operations") as executor:
+        for done, _ in enumerate(executor.map(_run_one, operations), start=1):
+            if progress:
+                progress(done, len(operations))
+    return operations
@@ -0,0 +1,188 @@
+# /app/classes/gif_frame_cache.py
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+from PIL import Image, ImageSequence
+from .image_loading import fit_size
+
+# Browsers treat tiny or missing frame durations as "as fast as possible", which in practice is 100ms
+DEFAULT_FRAME_DURATION_MS = 100
+MIN_FRAME_DURATION_MS = 20
+
+
+@dataclass(eq=False)
+class GifFrames:
+    """The decoded frames of a GIF, scaled to one box size"""
+    frames: List[Image.Image]
+    durations_ms: List[int]
+    size: Tuple[int, int]
+    # PhotoImages built from the frames as they are first shown, None until then; only touched on the Tk thread
+    photo_frames: list = field(default_factory=list, repr=False)
+    photo_count: int = 0
+
+    @property
+    def is_animated(self) -> bool:
+        """Check whether there is more than one frame"""
+        return len(self.frames) > 1
+
+    @property
+    def byte_size(self) -> int:
+        """Approximate memory used by the decoded frames and the PhotoImages built from them"""
+        return (len(self.frames) + self.photo_count) * self.size[0] * self.size[1] * 4
+
+    def photo_frame(self, index: int):
+        """
+        Get the PhotoImage of a frame, building it the first time it is shown,
+        so a tick only ever converts one frame. Call on the Tk thread only.
+        """
+        if len(self.photo_frames) != len(self.frames):
+            self.photo_frames = [None] * len(self.frames)
+        photo = self.photo_frames[index]
+        if photo is None:
+            from PIL import ImageTk
+            photo = self.photo_frames[index] = ImageTk.PhotoImage(self.frames[index])
+            self.photo_count += 1
+        return photo
+
+    def drop_photos(self):
+        """Release the PhotoImages, cells still playing the GIF build them again. Call on the Tk thread only."""
+        self.photo_frames = []
+        self.photo_count = 0
+
+
+def load_gif_frames(gif_path: str, box_size: Tuple[int, int], max_frames: int = 300) -> GifFrames:
+    """
+    Decode all frames of a GIF and scale them to fit inside a box.
+    Safe to call from worker threads, it does not touch any Tk objects.
+
+    Args:
+        gif_path: Path to the GIF file
+        box_size: The (width, height) of the box to fit into
+        max_frames: Frames beyond this are dropped to bound memory
+
+    Returns:
+        The GifFrames
+    """
+    frames = []
+    durations = []
+    with Image.open(gif_path) as gif:
+        size = fit_size(gif.size, box_size)
+        for frame in ImageSequence.Iterator(gif):
+            # Converting composites the frame with the ones before it, as the GIF's disposal requires
+            frames.append(frame.convert("RGBA").resize(size, Image.LANCZOS))
+
+            duration = frame.info.get("duration") or DEFAULT_FRAME_DURATION_MS
+            durations.append(max(int(duration), MIN_FRAME_DURATION_MS))
+            if len(frames) >= max_frames:
+                break
+
+    return GifFrames(frames=frames, durations_ms=durations, size=size)
+
+
+class GifFrameCache:
+    """
+    A bounded, least recently used cache of decoded GIF frames, shared by all slideshow cells.
+    Frames are cached per file and box size, so the same GIF in two cells of the
+    same size is only decoded once. Safe to use from multiple threads.
+
+    The PhotoImages cells build from the frames count towards the budget. They
+    must be released on the Tk thread, so evicted entries that have any wait
+    for drop_evicted_photos() instead of being dropped by a worker thread.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, max_frames_per_file: int = 300):
+        """
+        Initialize the GifFrameCache.
+
+        Args:
+            max_bytes: Approximate memory budget for all cached frames
+            max_frames_per_file: Frames per GIF beyond this are dropped
+        """
+        self.max_bytes = max_bytes
+        self.max_frames_per_file = max_frames_per_file
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, Tuple[int, int]], GifFrames]" = OrderedDict()
+        self._loading: Dict[Tuple[str, Tuple[int, int]], Future] = {}
+        self._evicted: List[GifFrames] = []  # Evicted entries holding PhotoImages
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, gif_path: str, box_size: Tuple[int, int]) -> GifFrames:
+        """
+        Get the frames of a GIF from the cache, decoding them if needed.
+        When another thread is already decoding the same GIF, waits for that instead.
+
+        Args:
+            gif_path: Path to the GIF file
+            box_size: The (width, height) of the box to fit into
+
+        Returns:
+            The GifFrames
+        """
+        key = (gif_path, tuple(box_size))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            self.misses += 1
+            loading = self._loading.get(key)
+            if loading is None:
+                loading = Future()
+                self._loading[key] = loading
+                is_loader = True
+            else:
+                is_loader = False
+
+        if not is_loader:
+            return loading.result()
+
+        try:
+            entry = load_gif_frames(gif_path, box_size, self.max_frames_per_file)
+        except Exception as e:
+            with self._lock:
+                del self._loading[key]
+            loading.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[key]
+            self._entries[key] = entry
+            self._evict()
+        loading.set_result(entry)
+        return entry
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is within budget. Call with the lock held."""
+        # Summed again each time, the Tk thread adds PhotoImages to entries after they are cached
+        self._bytes = sum(entry.byte_size for entry in self._entries.values())
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.byte_size
+            self._drop(entry)
+
+    def _drop(self, entry: GifFrames):
+        """Forget an entry, keeping it for drop_evicted_photos() if it has PhotoImages. Call with the lock held."""
+        if entry.photo_count:
+            self._evicted.append(entry)
+
+    def drop_evicted_photos(self):
+        """Release the PhotoImages of evicted entries, and count them against the budget. Call on the Tk thread only."""
+        with self._lock:
+            evicted, self._evicted = self._evicted, []
+            self._evict()
+        for entry in evicted:
+            entry.drop_photos()
+
+    def clear(self):
+        """Drop all cached frames"""
+        with self._lock:
+            for entry in self._entries.values():
+                self._drop(entry)
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,81 @@
+# /app/classes/image_loading.py
+import time
+from typing import Dict, Optional, Tuple
+from PIL import Image
+from .instrumentation import span
+
+# Same margins the image panes have always used when fitting media to a frame
+DEFAULT_PADDING = 20
+MIN_DISPLAY_SIZE = (100, 100)
+
+
+def get_display_box(frame_width: int, frame_height: int) -> Tuple[int, int]:
+    """
+    Get the box an image should be fitted into for a frame of the given size.
+
+    Args:
+        frame_width: Width of the frame in pixels
+        frame_height: Height of the frame in pixels
+
+    Returns:
+        A (width, height) tuple for the usable display area
+    """
+    # Frames report 1x1 until they have been mapped, use a sane default then
+    if frame_width <= 1 or frame_height <= 1:
+        frame_width, frame_height = 400, 300
+
+    display_width = max(frame_width - DEFAULT_PADDING, MIN_DISPLAY_SIZE[0])
+    display_height = max(frame_height - DEFAULT_PADDING, MIN_DISPLAY_SIZE[1])
+    return display_width, display_height
+
+
+def fit_size(image_size: Tuple[int, int], box_size: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Scale an image size to fit inside a box while maintaining aspect ratio.
+
+    Args:
+        image_size: The (width, height) of the source image
+        box_size: The (width, height) of the box to fit into
+
+    Returns:
+        The scaled (width, height), never smaller than 1x1
+    """
+    width, height = image_size
+    ratio = min(box_size[0] / width, box_size[1] / height)
+    return max(int(width * ratio), 1), max(int(height * ratio), 1)
+
+
+def load_scaled_image(image_path: str, box_size: Tuple[int, int],
+                      timings: Optional[Dict[str, float]] = None) -> Image.Image:
+    """
+    Open, decode and scale an image so it fits inside the given box.
+    Safe to call from worker threads, it does not touch any Tk objects.
+
+    Args:
+        image_path: Path to the image file
+        box_size: The (width, height) of the box to fit into
+        timings: Optional dictionary that receives open_ms, decode_ms and resize_ms
+
+    Returns:
+        The decoded and resized PIL image
+    """
+    start = time.perf_counter()
+    with span("image_decode"), Image.open(image_path) as pil_image:
+        opened = time.perf_counter()
+        new_size = fit_size(pil_image.size, box_size)
+
+        # Let the JPEG decoder skip detail we are going to throw away anyway
+        pil_image.draft("RGB", new_size)
+        pil_image.load()
+
+        if pil_image.mode not in ("RGB", "RGBA"):
+            pil_image = pil_image.convert("RGBA" if "transparency" in pil_image.info else "RGB")
+        decoded = time.perf_counter()
+
+        resized_image = pil_image.resize(fit_size(pil_image.size, box_size), Image.LANCZOS)
+
+    if timings is not None:
+        timings["open_ms"] = (opened - start) * 1000
+        timings["decode_ms"] = (decoded - opened) * 1000
+        timings["resize_ms"] = (time.perf_counter() - decoded) * 1000
+    return resized_image
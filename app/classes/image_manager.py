@@ -1,9 +1,14 @@
 # /app/classes/image_manager.py
 import tkinter as tk
 from tkinter import ttk
-from typing import Optional, Callable
-from PIL import Image, ImageTk
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Callable, Tuple, TYPE_CHECKING
 import os
+from .instrumentation import timed
+
+if TYPE_CHECKING:
+    from PIL import Image
+    from .decode_backend import DecodeBackend
 
 class ImageManager:
     """
@@ -22,7 +27,16 @@ class ImageManager:
         self.current_image_label: Optional[ttk.Label] = None
         self.current_image_path: Optional[str] = None
         self.on_image_error: Optional[Callable] = None
-        self.current_pil_image: Optional[Image.Image] = None  # Store the PIL image
+        self.current_pil_image: Optional['Image.Image'] = None  # Store the PIL image
+        # When set, images are decoded and scaled to the frame by this backend (e.g. in worker
+        # processes) in a background thread instead of keeping the full size image; resizes
+        # rescale the decoded copy, and decode again only when the frame grows past it
+        self.decode_backend: Optional['DecodeBackend'] = None
+        self._decoder: Optional[ThreadPoolExecutor] = None  # Waits for the backend off the Tk thread
+        self._decode_future: Optional[Future] = None
+        self._decode_generation = 0  # Results of older decodes are dropped
+        self._decoded_image: Optional['Image.Image'] = None
+        self._decoded_box: Optional[Tuple[int, int]] = None  # The box _decoded_image was scaled to fit
 
         # Create a placeholder label
         self._create_placeholder()
@@ -62,7 +76,15 @@ class ImageManager:
             return
 
         try:
-            # Open the image
+            if self.decode_backend is not None:
+                self.current_pil_image = None
+                self.current_image_path = file_path
+                self._decoded_image = self._decoded_box = None
+                self._request_decode()
+                return
+
+            # Open the image, Pillow is only imported once the first image is shown
+            from PIL import Image
             pil_image = Image.open(file_path)
             self.current_pil_image = pil_image
             self.current_image_path = file_path
@@ -76,28 +98,73 @@ class ImageManager:
             if self.on_image_error:
                 self.on_image_error(str(e))
 
-    def _display_scaled_image(self):
-        """Display the current image scaled to fit the frame"""
-        if not self.current_pil_image or not self.current_image_path:
+    def _display_size(self) -> Tuple[int, int]:
+        """The box images are scaled to fit, the frame less a margin"""
+        # Minimum dimensions to prevent tiny images
+        min_width, min_height = 100, 100
+        return max(self.frame.winfo_width() - 20, min_width), max(self.frame.winfo_height() - 20, min_height)
+
+    def _request_decode(self):
+        """Have the backend decode the current image for the current frame size, in a background thread"""
+        if self._decoder is None:
+            self._decoder = ThreadPoolExecutor(max_workers=1)
+        if self._decode_future is not None:
+            self._decode_future.cancel()  # Not started yet, a newer image or size replaces it
+        self._decode_generation += 1
+        box_size = self._display_size()
+        self._decode_future = self._decoder.submit(self.decode_backend.decode, self.current_image_path, box_size)
+        self.frame.after(20, self._poll_decode, self._decode_future, self._decode_generation, box_size)
+
+    def _poll_decode(self, future: Future, generation: int, box_size: Tuple[int, int]):
+        """Wait for a background decode without blocking the event loop, then show the image"""
+        if generation != self._decode_generation:
+            return  # A newer image or size replaced this decode
+        if not future.done():
+            self.frame.after(20, self._poll_decode, future, generation, box_size)
             return
-
+        self._decode_future = None
         try:
-            # Get current frame dimensions
-            frame_width = self.frame.winfo_width()
-            frame_height = self.frame.winfo_height()
+            self._decoded_image = future.result()
+        except Exception as e:
+            print(f"Error loading image: {e}")
+            self._create_placeholder()
+            if self.on_image_error:
+                self.on_image_error(str(e))
+            return
+        self._decoded_box = box_size
+        self._display_scaled_image()
 
-            # Minimum dimensions to prevent tiny images
-            min_width, min_height = 100, 100
-            display_width = max(frame_width - 20, min_width)
-            display_height = max(frame_height - 20, min_height)
+    @timed("image_manager_display")
+    def _display_scaled_image(self):
+        """Display the current image scaled to fit the frame"""
+        if not self._has_image():
+            return
 
-            # Scale image to fit while maintaining aspect ratio
-            width, height = self.current_pil_image.size
-            ratio = min(display_width/width, display_height/height)
-            new_size = (int(width * ratio), int(height * ratio))
+        from PIL import Image, ImageTk
 
-            # Resize the image
-            resized_image = self.current_pil_image.resize(new_size, Image.LANCZOS)
+        try:
+            display_width, display_height = self._display_size()
+
+            if self.decode_backend is not None:
+                if self._decoded_image is None:
+                    return  # Shown once the background decode is done
+                if display_width > self._decoded_box[0] or display_height > self._decoded_box[1]:
+                    # Sharper than scaling the decoded copy up, shown once it is done
+                    if self._decode_future is None:
+                        self._request_decode()
+                from .image_loading import fit_size
+                new_size = fit_size(self._decoded_image.size, (display_width, display_height))
+                resized_image = self._decoded_image
+                if new_size != resized_image.size:
+                    resized_image = resized_image.resize(new_size, Image.LANCZOS)
+            else:
+                # Scale image to fit while maintaining aspect ratio
+                width, height = self.current_pil_image.size
+                ratio = min(display_width/width, display_height/height)
+                new_size = (int(width * ratio), int(height * ratio))
+
+                # Resize the image
+                resized_image = self.current_pil_image.resize(new_size, Image.LANCZOS)
 
             # Convert to PhotoImage
             tk_image = ImageTk.PhotoImage(resized_image)
@@ -114,9 +181,15 @@ class ImageManager:
             print(f"Error displaying scaled image: {e}")
             self._create_placeholder()
 
+    def _has_image(self) -> bool:
+        """Whether an image is shown, opened or to be decoded by the backend"""
+        if not self.current_image_path:
+            return False
+        return self.decode_backend is not None or self.current_pil_image is not None
+
     def _on_frame_resize(self, event):
         """Handle frame resize events"""
-        if self.current_pil_image and self.current_image_path:
+        if self._has_image():
             self._display_scaled_image()
 
     def clear(self):
@@ -124,6 +197,8 @@ class ImageManager:
         self._create_placeholder()
         self.current_image_path = None
         self.current_pil_image = None
+        self._decoded_image = self._decoded_box = None
+        self._decode_generation += 1
 
     def refresh(self):
         """Refresh the current image (useful when frame size changes)"""
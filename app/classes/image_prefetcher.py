@@ -0,0 +1,215 @@
+# /app/classes/image_prefetcher.py
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+from PIL import Image
+from .media_file import MediaFile
+from .decode_backend import DecodeBackend
+from .gif_frame_cache import GifFrameCache, GifFrames
+from .playlist_source import FileKey, PlaylistSource, ShuffleBagSource, file_key
+from .slideshow_transition import DEFAULT_TRANSITION_MS, Crossfade, build_crossfade
+
+
+@dataclass
+class PreparedImage:
+    """A media file that has been picked, and for images decoded and scaled, for one slideshow cell"""
+    cell_index: int
+    media_file: MediaFile
+    image_path: str
+    target_size: Tuple[int, int]
+    image: Optional[Image.Image] = None
+    gif_frames: Optional[GifFrames] = None  # Set instead of image for animated GIFs
+    transition: Optional[Crossfade] = None  # Frames from the image the cell showed when this one was requested
+    error: Optional[str] = None
+    prepare_seconds: float = 0.0
+    timings_ms: Dict[str, float] = field(default_factory=dict)  # Worker stages, e.g. open/decode/resize
+
+    @property
+    def is_video(self) -> bool:
+        """Videos are decoded while they play, so they carry no prepared image"""
+        return self.media_file.media_type.lower() == "video"
+
+
+@dataclass
+class PrefetchStats:
+    """Counters describing how well the prefetcher keeps up with the slideshow ticks"""
+    requested: int = 0
+    prepared: int = 0
+    shown: int = 0
+    errors: int = 0
+    late_frames: int = 0
+    total_late_ms: float = 0.0
+    max_late_ms: float = 0.0
+    total_prepare_seconds: float = 0.0
+
+    def record_late(self, late_ms: float):
+        """Record a cell that had to show its image later than scheduled"""
+        self.late_frames += 1
+        self.total_late_ms += late_ms
+        self.max_late_ms = max(self.max_late_ms, late_ms)
+
+    def to_dict(self) -> Dict[str, float]:
+        """Convert to a dictionary for logging"""
+        avg_prepare = self.total_prepare_seconds / self.prepared if self.prepared else 0.0
+        avg_late = self.total_late_ms / self.late_frames if self.late_frames else 0.0
+        return {
+            'requested': self.requested,
+            'prepared': self.prepared,
+            'shown': self.shown,
+            'errors': self.errors,
+            'late_frames': self.late_frames,
+            'avg_late_ms': round(avg_late, 1),
+            'max_late_ms': round(self.max_late_ms, 1),
+            'avg_prepare_ms': round(avg_prepare * 1000, 1),
+        }
+
+
+class ImagePrefetcher:
+    """
+    Picks and prepares the next image for every slideshow cell in worker threads.
+    Only PIL work happens in the workers, the Tk thread converts the ready
+    image to a PhotoImage when the cell's tick comes around.
+    """
+
+    def __init__(self, media_files: Union[List[MediaFile], PlaylistSource], max_workers: int = 2,
+                 gif_cache: Optional[GifFrameCache] = None, decode_backend: Optional[DecodeBackend] = None):
+        """
+        Initialize the ImagePrefetcher.
+
+        Args:
+            media_files: The PlaylistSource to draw files from, or a list of MediaFiles to shuffle
+            max_workers: Number of decode worker threads
+            gif_cache: Cache for decoded GIF frames, shared between all cells
+            decode_backend: Where still images are decoded and scaled, by default in the worker threads.
+                            With a process backend there is a worker thread for each of its processes.
+        """
+        self.source = media_files if isinstance(media_files, PlaylistSource) else ShuffleBagSource(media_files)
+        self.gif_cache = gif_cache or GifFrameCache()
+        self.decode_backend = decode_backend or DecodeBackend()
+        self.stats = PrefetchStats()
+        self._executor = ThreadPoolExecutor(max_workers=max(max_workers, self.decode_backend.workers),
+                                            thread_name_prefix="slideshow-prefetch")
+        self._pending: Dict[int, Future] = {}  # {cell_index: Future[PreparedImage]}
+        self._late_since: Dict[int, float] = {}  # {cell_index: perf_counter when the tick found nothing ready}
+        self._pending_keys: Dict[int, FileKey] = {}  # {cell_index: key of the file being prepared}
+        self._showing_keys: Dict[int, FileKey] = {}  # {cell_index: key of the file last taken}
+        self._showing_images: Dict[int, Image.Image] = {}  # {cell_index: still image last taken}, faded from
+        self._is_shutdown = False
+
+    def _pick_file(self, cell_index: int) -> Optional[MediaFile]:
+        """Draw the next media file for a cell, avoiding the files the other cells show or prepare"""
+        exclude = {key for cell, key in self._showing_keys.items() if cell != cell_index}
+        exclude.update(key for cell, key in self._pending_keys.items() if cell != cell_index)
+        return self.source.next(exclude)
+
+    def request(self, cell_index: int, target_size: Tuple[int, int], transition_steps: int = 0,
+                transition_ms: int = DEFAULT_TRANSITION_MS):
+        """
+        Start preparing the next image for a cell, unless one is already pending.
+
+        Args:
+            cell_index: Index of the cell the image is for
+            target_size: The (width, height) box the image must fit into
+            transition_steps: Crossfade frames to build from the still image the cell shows, 0 for a hard cut
+            transition_ms: Length of the crossfade
+        """
+        if self._is_shutdown or cell_index in self._pending:
+            return
+
+        media_file = self._pick_file(cell_index)
+        if media_file is None:
+            return
+        self._pending_keys[cell_index] = file_key(media_file)
+        image_path = os.path.join(media_file.folder_path, media_file.file_name)
+        self.stats.requested += 1
+        previous = self._showing_images.get(cell_index) if transition_steps > 0 else None
+        self._pending[cell_index] = self._executor.submit(
+            self._prepare, cell_index, media_file, image_path, target_size,
+            previous, transition_steps, transition_ms
+        )
+
+    def _prepare(self, cell_index: int, media_file: MediaFile, image_path: str, target_size: Tuple[int, int],
+                 previous: Optional[Image.Image] = None, transition_steps: int = 0,
+                 transition_ms: int = DEFAULT_TRANSITION_MS) -> PreparedImage:
+        """Decode and scale an image, and blend the crossfade to it from previous. Runs in a worker thread."""
+        prepared = PreparedImage(cell_index, media_file, image_path, target_size)
+        if prepared.is_video:
+            return prepared
+
+        start = time.perf_counter()
+        try:
+            if media_file.media_type.lower() == "gif":
+                gif_frames = self.gif_cache.get_or_load(image_path, target_size)
+                prepared.timings_ms["decode_ms"] = (time.perf_counter() - start) * 1000
+                if gif_frames.is_animated:
+                    prepared.gif_frames = gif_frames
+                else:
+                    prepared.image = gif_frames.frames[0]
+            else:
+                prepared.image = self.decode_backend.decode(image_path, target_size, prepared.timings_ms)
+            if previous is not None and prepared.image is not None:
+                blend_start = time.perf_counter()
+                prepared.transition = build_crossfade(previous, prepared.image, transition_steps, transition_ms)
+                prepared.timings_ms["crossfade_ms"] = (time.perf_counter() - blend_start) * 1000
+        except Exception as e:
+            prepared.error = str(e)
+        prepared.prepare_seconds = time.perf_counter() - start
+        return prepared
+
+    def take(self, cell_index: int, timeout: Optional[float] = 0.0) -> Optional[PreparedImage]:
+        """
+        Take the prepared image for a cell if it is ready, by default without blocking.
+        When nothing is ready yet the cell is marked late, and the lateness is
+        recorded once the image does get taken.
+
+        Args:
+            cell_index: Index of the cell
+            timeout: Seconds to wait for the image, None waits until it is ready.
+                     The Tk thread must keep the default of 0.
+
+        Returns:
+            The PreparedImage, or None if it is still being prepared
+        """
+        future = self._pending.get(cell_index)
+        if future is not None and not future.done() and timeout != 0:
+            self._late_since.setdefault(cell_index, time.perf_counter())
+            wait([future], timeout=timeout)
+
+        if future is None or not future.done():
+            self._late_since.setdefault(cell_index, time.perf_counter())
+            return None
+
+        del self._pending[cell_index]
+        self._showing_keys[cell_index] = self._pending_keys.pop(cell_index)
+        late_since = self._late_since.pop(cell_index, None)
+        if late_since is not None:
+            self.stats.record_late((time.perf_counter() - late_since) * 1000)
+
+        prepared = future.result()
+        if prepared.image is not None:
+            self._showing_images[cell_index] = prepared.image
+        else:
+            self._showing_images.pop(cell_index, None)
+        self.stats.prepared += 1
+        self.stats.total_prepare_seconds += prepared.prepare_seconds
+        if prepared.error:
+            self.stats.errors += 1
+            print(f"Error preparing image {prepared.image_path}: {prepared.error}")
+        return prepared
+
+    def mark_shown(self):
+        """Count an image that made it onto the screen"""
+        self.stats.shown += 1
+
+    def shutdown(self):
+        """Stop the worker threads and drop any pending work"""
+        self._is_shutdown = True
+        for future in self._pending.values():
+            future.cancel()
+        self._pending.clear()
+        self._pending_keys.clear()
+        self._showing_images.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.source.close()
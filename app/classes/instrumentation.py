@@ -0,0 +1,245 @@
+# /app/classes/instrumentation.py
+"""
+Lightweight timing spans for the scan, database and render paths.
+
+    with span("scan_root"):
+        ...
+
+    @timed("load_data")
+    def load_data(self): ...
+
+Spans are disabled by default and then cost a single flag check. When enabled,
+every span records its duration, and get_stats() aggregates them per name.
+profile_next() captures a cProfile or tracemalloc report of the next run of
+one named operation.
+"""
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import deque
+from functools import wraps
+from typing import Callable, Deque, Dict, Optional
+
+# Names of the instrumented operations, offered for profiling in the Diagnostics menu
+OPERATIONS = [
+    "scan_root",
+    "extract_metadata",
+    "extract_video_metadata",
+    "extract_color_features",
+    "load_data",
+    "media_manager_init",
+    "tag_query",
+    "color_query",
+    "treeview_populate",
+    "image_decode",
+    "image_manager_display",
+    "thumbnail_load",
+]
+
+# Recent durations kept per span name for the percentiles
+_HISTORY = 10000
+
+_enabled = False
+_lock = threading.Lock()
+_durations: Dict[str, Deque[float]] = {}
+_counts: Dict[str, int] = {}
+_totals: Dict[str, float] = {}
+_profile_request: Optional[tuple] = None  # (operation name, "cprofile" or "tracemalloc")
+_profile_reports: Dict[str, str] = {}
+
+
+def enable(enabled: bool = True):
+    """Turn recording of spans on or off"""
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    """Check whether spans are being recorded"""
+    return _enabled
+
+
+def record(name: str, seconds: float):
+    """Record a duration for a span name"""
+    with _lock:
+        if name not in _durations:
+            _durations[name] = deque(maxlen=_HISTORY)
+            _counts[name] = 0
+            _totals[name] = 0.0
+        _durations[name].append(seconds)
+        _counts[name] += 1
+        _totals[name] += seconds
+
+
+class _Span:
+    """A running span, records its duration when the with block ends"""
+    __slots__ = ("name", "start", "profiler")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.profiler = None
+
+    def __enter__(self):
+        if _profile_request is not None and _profile_request[0] == self.name:
+            self.profiler = _start_profile(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record(self.name, time.perf_counter() - self.start)
+        if self.profiler is not None:
+            _finish_profile(self.name, self.profiler)
+        return False
+
+
+class _NullSpan:
+    """Stands in for a span while recording is disabled"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str):
+    """
+    Time a block of code.
+
+    Args:
+        name: Name the duration is recorded under
+
+    Returns:
+        A context manager
+    """
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def timed(name: str) -> Callable:
+    """
+    Decorator that times every call of a function.
+
+    Args:
+        name: Name the duration is recorded under
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _percentile(sorted_values, percent: float) -> float:
+    """Get a percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * percent / 100), len(sorted_values) - 1)]
+
+
+def get_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Get aggregated statistics per span name.
+    Counts and totals cover every recorded span, percentiles the most recent ones.
+
+    Returns:
+        {name: {count, total_ms, mean_ms, p50_ms, p95_ms, max_ms}}
+    """
+    with _lock:
+        snapshot = {name: (list(values), _counts[name], _totals[name]) for name, values in _durations.items()}
+
+    stats = {}
+    for name, (values, count, total) in sorted(snapshot.items()):
+        values.sort()
+        stats[name] = {
+            'count': count,
+            'total_ms': round(total * 1000, 2),
+            'mean_ms': round(total * 1000 / count, 3) if count else 0.0,
+            'p50_ms': round(_percentile(values, 50) * 1000, 3),
+            'p95_ms': round(_percentile(values, 95) * 1000, 3),
+            'max_ms': round(max(values, default=0.0) * 1000, 3),
+        }
+    return stats
+
+
+def reset():
+    """Forget all recorded spans"""
+    with _lock:
+        _durations.clear()
+        _counts.clear()
+        _totals.clear()
+
+
+def export_json(file_path: str):
+    """Write the aggregated statistics and any profile reports to a JSON file"""
+    with open(file_path, "w") as f:
+        json.dump({'stats': get_stats(), 'profiles': dict(_profile_reports)}, f, indent=2)
+
+
+def profile_next(name: str, mode: str = "cprofile"):
+    """
+    Capture a profile of the next run of an operation. Enables recording if needed.
+
+    Args:
+        name: The span name of the operation, see OPERATIONS
+        mode: "cprofile" for a CPU profile, "tracemalloc" for the top memory allocations
+    """
+    global _profile_request
+    if mode not in ("cprofile", "tracemalloc"):
+        raise ValueError(f"Unknown profile mode: {mode}")
+    enable()
+    _profile_request = (name, mode)
+
+
+def get_profile_reports() -> Dict[str, str]:
+    """Get the captured profile reports, keyed by operation name and mode"""
+    return dict(_profile_reports)
+
+
+def _start_profile(name: str):
+    """Start the requested profiler for an operation, once"""
+    global _profile_request
+    with _lock:
+        if _profile_request is None or _profile_request[0] != name:
+            return None
+        _, mode = _profile_request
+        _profile_request = None
+
+    if mode == "tracemalloc":
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        return ("tracemalloc", tracemalloc.take_snapshot(), was_tracing)
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return ("cprofile", profiler, None)
+
+
+def _finish_profile(name: str, profiler_state):
+    """Stop a profiler and store its report"""
+    mode, profiler, was_tracing = profiler_state
+    if mode == "tracemalloc":
+        snapshot = tracemalloc.take_snapshot()
+        if not was_tracing:
+            tracemalloc.stop()
+        lines = [str(stat) for stat in snapshot.compare_to(profiler, "lineno")[:25]]
+        report = "\n".join(lines)
+    else:
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(30)
+        report = output.getvalue()
+
+    _profile_reports[f"{name} ({mode})"] = report
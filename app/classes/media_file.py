@@ -1,5 +1,7 @@
 # /app/classes/media_file.py
 from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
 
 @dataclass
 class MediaFile:
@@ -8,6 +10,22 @@ class MediaFile:
     file_extension: str
     file_size_kb: int
     folder_path: str
+    root_id: Optional[int] = None
+    media_file_id: Optional[int] = None
+    file_mtime: Optional[float] = None
+    # EXIF, filled in by MediaLibrary.extract_metadata()
+    captured_at: Optional[datetime] = None
+    camera_make: Optional[str] = None
+    camera_model: Optional[str] = None
+    orientation: Optional[int] = None
+    gps_latitude: Optional[float] = None
+    gps_longitude: Optional[float] = None
+    # Video metadata, filled in by MediaLibrary.extract_video_metadata()
+    duration_s: Optional[float] = None
+    fps: Optional[float] = None
+    media_width: Optional[int] = None
+    media_height: Optional[int] = None
+    video_codec: Optional[str] = None
     _media_type: str = field(init=False, default="unknown", repr=False)
 
     @property
@@ -8,6 +8,7 @@ class MediaFolder:
     folder_id: int
     folder_path: str
     parent_folder_id: Optional[int] = None
+    root_id: Optional[int] = None
     _parent: Optional['MediaFolder'] = field(init=False, default=None, repr=False)
     _files: List[MediaFile] = field(init=False, default_factory=list, repr=False)
     _subfolders: List['MediaFolder'] = field(init=False, default_factory=list, repr=False)
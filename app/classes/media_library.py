@@ -0,0 +1,1732 @@
+# /app/classes/media_library.py
+"""
+Scanning, saving and loading the media library, without any user interface.
+Used by the Tk app and by the command line (cli.py), so it must never import Tk.
+"""
+import copy
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, as_completed, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Pattern, Set, Tuple, TYPE_CHECKING
+import psycopg2
+from psycopg2 import OperationalError
+from psycopg2.extras import execute_values
+from .media_file import MediaFile
+from .media_folder import MediaFolder
+from .media_manager import MediaManager
+from .media_root import MediaRoot
+from .device_pool import DevicePool, DeviceStats, find_mount_point
+from .scan_rules import ScanRules, SkipCounts, compile_globs, read_ignore_file
+from .exif_metadata import EXIF_EXTENSIONS, ExifData, extract_batch
+from .thumbnail_store import ThumbnailStore
+from .video_metadata import DEFAULT_TIMEOUT_S, VideoInfo, VideoProbePool
+from .smart_collection import DEFAULT_ORDER, ORDERS, CollectionFilter, SmartCollection
+from .file_operations import DELETE, FileOperation
+from .instrumentation import timed
+
+if TYPE_CHECKING:
+    from .color_features import ColorIndex
+
+# Called with an event name and its details, e.g. progress("scan", directories=10, files=250)
+ProgressCallback = Callable[..., None]
+
+# The EXIF columns of media_files, in the order of ExifData.to_tuple()
+EXIF_COLUMNS = ["captured_at", "camera_make", "camera_model", "orientation", "gps_latitude", "gps_longitude"]
+# Files whose EXIF is read by one worker process task
+METADATA_BATCH_SIZE = 64
+# Files whose colour features are computed by one worker process task, as one NumPy batch
+COLOR_BATCH_SIZE = 128
+# The video columns of media_files, in the order of VideoInfo.to_tuple()
+VIDEO_COLUMNS = ["duration_s", "fps", "media_width", "media_height", "video_codec"]
+
+
+def connect_to_db(retries: int = 5, delay: float = 3, dsn: Optional[str] = None):
+    """
+    Connect to the PostgreSQL database, retrying while it starts up.
+
+    Args:
+        retries: Number of attempts
+        delay: Seconds between attempts
+        dsn: Connection string, defaults to the docker-compose database
+
+    Returns:
+        A psycopg2 connection
+    """
+    for i in range(retries):
+        try:
+            if dsn:
+                conn = psycopg2.connect(dsn)
+            else:
+                conn = psycopg2.connect(
+                    dbname="media_manager",
+                    user="youruser",
+                    password="yourpassword",
+                    host="localhost",
+                    port="5432"
+                )
+            print("Connected to PostgreSQL!")
+            return conn
+        except OperationalError as e:
+            print(f"Connection attempt {i + 1} failed: {e}")
+            if i < retries - 1:
+                time.sleep(delay)
+    raise Exception("Could not connect to PostgreSQL after several retries.")
+
+
+# Idempotent schema changes for databases created by an older sql/init.sql,
+# run in order by MediaLibrary.ensure_schema(). (check, statements): the
+# statements run when the check query fails.
+SCHEMA_MIGRATIONS = [
+    (None, [
+        """
+        CREATE TABLE IF NOT EXISTS media_roots (
+            root_id SERIAL PRIMARY KEY,
+            root_path TEXT UNIQUE NOT NULL,
+            scan_status VARCHAR(20) NOT NULL DEFAULT 'new',
+            folder_count INTEGER NOT NULL DEFAULT 0,
+            file_count INTEGER NOT NULL DEFAULT 0,
+            last_scan_started TIMESTAMP,
+            last_scan_finished TIMESTAMP
+        );
+        """,
+    ]),
+    ("SELECT root_id FROM media_folders LIMIT 0;", [
+        "ALTER TABLE media_folders ADD COLUMN root_id INTEGER REFERENCES media_roots(root_id) ON DELETE CASCADE;",
+    ]),
+    ("SELECT root_id FROM media_files LIMIT 0;", [
+        "ALTER TABLE media_files ADD COLUMN root_id INTEGER REFERENCES media_roots(root_id) ON DELETE CASCADE;",
+    ]),
+    (None, [
+        "CREATE INDEX IF NOT EXISTS media_folders_root_id ON media_folders (root_id);",
+        "CREATE INDEX IF NOT EXISTS media_files_root_id ON media_files (root_id);",
+    ]),
+    (None, [
+        """
+        CREATE TABLE IF NOT EXISTS scan_queue (
+            root_id INTEGER REFERENCES media_roots(root_id) ON DELETE CASCADE,
+            folder_id INTEGER NOT NULL,
+            folder_path TEXT NOT NULL,
+            depth INTEGER NOT NULL,
+            device BIGINT NOT NULL,
+            inode BIGINT NOT NULL,
+            status VARCHAR(10) NOT NULL DEFAULT 'pending',
+            PRIMARY KEY (root_id, folder_id)
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS media_folders_parent_folder_id ON media_folders (parent_folder_id);",
+    ]),
+    ("SELECT file_mtime FROM media_files LIMIT 0;", [
+        "ALTER TABLE media_files ADD COLUMN file_mtime DOUBLE PRECISION;",
+    ]),
+    ("SELECT captured_at FROM media_files LIMIT 0;", [
+        "ALTER TABLE media_files ADD COLUMN metadata_mtime DOUBLE PRECISION;",
+        "ALTER TABLE media_files ADD COLUMN captured_at TIMESTAMP;",
+        "ALTER TABLE media_files ADD COLUMN camera_make TEXT;",
+        "ALTER TABLE media_files ADD COLUMN camera_model TEXT;",
+        "ALTER TABLE media_files ADD COLUMN orientation SMALLINT;",
+        "ALTER TABLE media_files ADD COLUMN gps_latitude DOUBLE PRECISION;",
+        "ALTER TABLE media_files ADD COLUMN gps_longitude DOUBLE PRECISION;",
+    ]),
+    (None, [
+        "CREATE INDEX IF NOT EXISTS media_files_captured_at ON media_files (captured_at);",
+        "CREATE INDEX IF NOT EXISTS media_files_camera ON media_files (camera_make, camera_model);",
+    ]),
+    ("SELECT duration_s FROM media_files LIMIT 0;", [
+        "ALTER TABLE media_files ADD COLUMN duration_s DOUBLE PRECISION;",
+        "ALTER TABLE media_files ADD COLUMN fps REAL;",
+        "ALTER TABLE media_files ADD COLUMN media_width INTEGER;",
+        "ALTER TABLE media_files ADD COLUMN media_height INTEGER;",
+        "ALTER TABLE media_files ADD COLUMN video_codec VARCHAR(16);",
+    ]),
+    (None, [
+        """
+        CREATE TABLE IF NOT EXISTS tags (
+            tag_id SERIAL PRIMARY KEY,
+            tag_name TEXT UNIQUE NOT NULL
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS file_tags (
+            tag_id INTEGER REFERENCES tags(tag_id) ON DELETE CASCADE,
+            media_file_id INTEGER REFERENCES media_files(media_file_id) ON DELETE CASCADE,
+            PRIMARY KEY (tag_id, media_file_id)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS folder_tags (
+            tag_id INTEGER REFERENCES tags(tag_id) ON DELETE CASCADE,
+            folder_id INTEGER REFERENCES media_folders(folder_id) ON DELETE CASCADE,
+            PRIMARY KEY (tag_id, folder_id)
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS file_tags_media_file_id ON file_tags (media_file_id);",
+        "CREATE INDEX IF NOT EXISTS folder_tags_folder_id ON folder_tags (folder_id);",
+    ]),
+    (None, [
+        """
+        CREATE TABLE IF NOT EXISTS smart_collections (
+            collection_id SERIAL PRIMARY KEY,
+            collection_name TEXT UNIQUE NOT NULL,
+            filter_json TEXT NOT NULL,
+            order_by VARCHAR(20) NOT NULL DEFAULT 'path'
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS collection_members (
+            collection_id INTEGER REFERENCES smart_collections(collection_id) ON DELETE CASCADE,
+            media_file_id INTEGER REFERENCES media_files(media_file_id) ON DELETE CASCADE,
+            sort_key TEXT NOT NULL,
+            PRIMARY KEY (collection_id, media_file_id)
+        );
+        """,
+        "CREATE INDEX IF NOT EXISTS collection_members_order ON collection_members (collection_id, sort_key, media_file_id);",
+        "CREATE INDEX IF NOT EXISTS collection_members_media_file_id ON collection_members (media_file_id);",
+        """
+        CREATE TABLE IF NOT EXISTS collection_changes (
+            change_id SERIAL PRIMARY KEY,
+            media_file_id INTEGER NOT NULL
+        );
+        """,
+    ]),
+    (None, [
+        """
+        CREATE TABLE IF NOT EXISTS color_features (
+            media_file_id INTEGER PRIMARY KEY REFERENCES media_files(media_file_id) ON DELETE CASCADE,
+            feature_mtime DOUBLE PRECISION,
+            dominant_rgb INTEGER,
+            histogram BYTEA
+        );
+        """,
+    ]),
+    # Folder ids are handed out in blocks from a counter, so scans of different roots never share one
+    ("SELECT next_id FROM id_counters LIMIT 0;", [
+        """
+        CREATE TABLE id_counters (
+            counter_name VARCHAR(50) PRIMARY KEY,
+            next_id INTEGER NOT NULL
+        );
+        """,
+        "INSERT INTO id_counters (counter_name, next_id) "
+        "SELECT 'folder_id', COALESCE(MAX(folder_id), 0) + 1 FROM media_folders;",
+    ]),
+]
+
+
+# The media_files columns _make_media_file() reads, in its order
+FILE_COLUMNS = (["folder_id", "file_name", "file_extension", "file_size_kb", "folder_path", "root_id",
+                 "media_file_id", "file_mtime"] + EXIF_COLUMNS + VIDEO_COLUMNS)
+
+# Files queued for the smart collections up to a change_id, see refresh_collections()
+CHANGED_FILES = "SELECT media_file_id FROM collection_changes WHERE change_id <= %s"
+
+# Seconds between "scan" progress events
+PROGRESS_INTERVAL = 0.5
+# A scan into the database writes what it found after this many seconds or directories, whichever comes first
+CHECKPOINT_INTERVAL = 2.0
+CHECKPOINT_DIRECTORIES = 1000
+
+
+@dataclass
+class ScanTask:
+    """A directory waiting to be listed"""
+    path: str
+    relative_path: str  # Relative to the scanned root, with '/' separators
+    depth: int  # The root is 0
+    ignores: Tuple[Tuple[int, Pattern], ...]  # (start of the path relative to the ignore file, its globs)
+    identity: Tuple[int, int]  # (st_dev, st_ino)
+
+
+@dataclass
+class DirectoryListing:
+    """The result of listing one directory"""
+    directory: str
+    subdirectories: List[ScanTask] = field(default_factory=list)
+    media_files: List[Tuple[str, str, int, float]] = field(default_factory=list)  # (file_name, file_extension, size_kb, mtime)
+    files_seen: int = 0
+    entry_count: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+    ignored: bool = False  # Holds an empty ignore file
+    skipped: SkipCounts = field(default_factory=SkipCounts)
+
+
+def default_workers() -> int:
+    """Maximum concurrent directory listings per device when none is given"""
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
+class MediaLibrary:
+    """
+    The media library stored in the database: one or more root folders,
+    scanning them, saving the results, loading them back into a MediaManager
+    and maintenance like pruning. Every folder and file row carries the
+    root_id of its root, so roots are scanned, loaded and removed independently.
+    """
+
+    def __init__(self, conn):
+        """
+        Initialize the MediaLibrary.
+
+        Args:
+            conn: A psycopg2 connection (or anything with the same interface)
+        """
+        self.conn = conn
+        self.extension_to_type: Dict[str, str] = {}
+        self.valid_extensions = set()
+        self.device_stats: List[DeviceStats] = []  # Per device throughput of the last scan
+        self.skip_counts = SkipCounts()  # What the last scan skipped
+        self._thumbnail_store: Optional[ThumbnailStore] = None
+        self._scan_rules = ScanRules()
+        self.ensure_schema()
+        self.load_media_types()
+
+    def on_connection(self, conn) -> 'MediaLibrary':
+        """
+        A MediaLibrary with this one's media types and settings on another connection,
+        e.g. for a worker thread, so its transactions don't interleave with this one's.
+        The schema is not checked again.
+
+        Args:
+            conn: The other connection, closed by the caller
+        """
+        library = copy.copy(self)
+        library.conn = conn
+        return library
+
+    def ensure_schema(self):
+        """Bring an existing database up to date with SCHEMA_MIGRATIONS and adopt legacy single-root data"""
+        cur = self.conn.cursor()
+        for check, statements in SCHEMA_MIGRATIONS:
+            if check is not None:
+                try:
+                    cur.execute(check)
+                    self.conn.commit()
+                    continue
+                except Exception:
+                    self.conn.rollback()
+            for statement in statements:
+                cur.execute(statement)
+            self.conn.commit()
+        self._adopt_legacy_rows()
+
+    def _adopt_legacy_rows(self):
+        """Put folders and files scanned before roots existed under a root for the old 'rootfolder' parameter"""
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM media_folders WHERE root_id IS NULL;")
+        if cur.fetchone()[0] == 0:
+            return
+
+        root_path = self.get_parameter('rootfolder')
+        if not root_path:
+            cur.execute("SELECT folder_path FROM media_folders WHERE parent_folder_id IS NULL ORDER BY folder_id LIMIT 1;")
+            root_path = cur.fetchone()[0]
+        root = self.add_root(root_path, check_overlap=False)
+        cur.execute("UPDATE media_folders SET root_id = %s WHERE root_id IS NULL;", (root.root_id,))
+        cur.execute("UPDATE media_files SET root_id = %s WHERE root_id IS NULL;", (root.root_id,))
+        self.conn.commit()
+        self._update_root_status(root.root_id, "scanned", finished=True)
+
+    def load_media_types(self):
+        """Load the extension to media type mappings"""
+        try:
+            cur = self.conn.cursor()
+            cur.execute("SELECT media_type_extension, media_type_description FROM media_types;")
+            self.extension_to_type = {row[0].lower(): row[1] for row in cur.fetchall()}
+            self.valid_extensions = set(self.extension_to_type.keys())
+        except Exception as e:
+            print(f"Error loading media type mappings: {e}", file=sys.stderr)
+            self.extension_to_type = {}
+            self.valid_extensions = set()
+
+    def get_parameter(self, parameter_name: str, default=None):
+        """Get a value from the Parameters table, or the default if it isn't set"""
+        cur = self.conn.cursor()
+        cur.execute("SELECT Parameter_Value FROM Parameters WHERE Parameter_Name = %s;", (parameter_name,))
+        result = cur.fetchone()
+        return result[0] if result and result[0] is not None else default
+
+    def set_parameter(self, parameter_name: str, value):
+        """Store a value in the Parameters table"""
+        cur = self.conn.cursor()
+        cur.execute(
+            "INSERT INTO Parameters (Parameter_Name, Parameter_Value) "
+            "VALUES (%s, %s) "
+            "ON CONFLICT (Parameter_Name) DO UPDATE SET Parameter_Value = EXCLUDED.Parameter_Value;",
+            (parameter_name, value)
+        )
+        self.conn.commit()
+
+    def file_count(self, root_ids: Optional[List[int]] = None) -> int:
+        """Number of media files in the database, optionally only in some roots"""
+        cur = self.conn.cursor()
+        where, params = self._root_filter(root_ids)
+        cur.execute(f"SELECT COUNT(*) FROM media_files{where};", params)
+        return cur.fetchone()[0]
+
+    @staticmethod
+    def _root_filter(root_ids: Optional[List[int]]) -> Tuple[str, tuple]:
+        """WHERE clause and parameters limiting a query to some roots, none for all roots"""
+        if root_ids is None:
+            return "", ()
+        if not root_ids:
+            return " WHERE 1 = 0", ()
+        return f" WHERE root_id IN ({', '.join(['%s'] * len(root_ids))})", tuple(root_ids)
+
+    def list_roots(self) -> List[MediaRoot]:
+        """Get all roots, ordered by path"""
+        cur = self.conn.cursor()
+        cur.execute("""
+            SELECT root_id, root_path, scan_status, folder_count, file_count, last_scan_finished
+            FROM media_roots
+            ORDER BY root_path
+        """)
+        return [
+            MediaRoot(row[0], row[1], row[2], row[3], row[4], str(row[5]) if row[5] is not None else None)
+            for row in cur.fetchall()
+        ]
+
+    def get_root(self, root_id: int) -> Optional[MediaRoot]:
+        """Get a root by id"""
+        return next((root for root in self.list_roots() if root.root_id == root_id), None)
+
+    def find_root(self, root_path: str) -> Optional[MediaRoot]:
+        """Get the root for a folder path, if it is one"""
+        root_path = os.path.normpath(os.path.abspath(root_path))
+        return next((root for root in self.list_roots() if os.path.normpath(root.root_path) == root_path), None)
+
+    def add_root(self, root_path: str, check_overlap: bool = True) -> MediaRoot:
+        """
+        Add a root folder, without scanning it. Adding an existing root returns it.
+        Raises ValueError when the folder is inside another root or contains one,
+        since a folder can only belong to one root.
+
+        Args:
+            root_path: The folder to add
+            check_overlap: Refuse folders that overlap an existing root
+
+        Returns:
+            The MediaRoot
+        """
+        root_path = os.path.normpath(os.path.abspath(root_path))
+        existing = self.find_root(root_path)
+        if existing:
+            return existing
+
+        if check_overlap:
+            for root in self.list_roots():
+                common = os.path.commonpath([root_path, os.path.normpath(root.root_path)])
+                if common in (root_path, os.path.normpath(root.root_path)):
+                    raise ValueError(f"{root_path} overlaps the existing root {root.root_path}")
+
+        cur = self.conn.cursor()
+        cur.execute("INSERT INTO media_roots (root_path) VALUES (%s);", (root_path,))
+        self.conn.commit()
+        return self.find_root(root_path)
+
+    def remove_root(self, root_id: int):
+        """Remove a root with all its folders and files from the database"""
+        try:
+            self._delete_root_rows(root_id)
+            cur = self.conn.cursor()
+            cur.execute("DELETE FROM media_roots WHERE root_id = %s;", (root_id,))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def _delete_root_rows(self, root_id: int):
+        """Delete the folder and file rows of a root, without committing"""
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM media_files WHERE root_id = %s;", (root_id,))
+        cur.execute("DELETE FROM media_folders WHERE root_id = %s;", (root_id,))
+
+    def _update_root_status(self, root_id: int, scan_status: str, started: bool = False, finished: bool = False):
+        """Store the scan status of a root, and its folder and file counts once it is scanned"""
+        cur = self.conn.cursor()
+        cur.execute("UPDATE media_roots SET scan_status = %s WHERE root_id = %s;", (scan_status, root_id))
+        if started:
+            cur.execute("UPDATE media_roots SET last_scan_started = CURRENT_TIMESTAMP WHERE root_id = %s;", (root_id,))
+        if finished:
+            cur.execute("UPDATE media_roots SET last_scan_finished = CURRENT_TIMESTAMP WHERE root_id = %s;", (root_id,))
+            self._refresh_root_counts(root_id)
+        self.conn.commit()
+
+    def _refresh_root_counts(self, root_id: int):
+        """Store the folder and file counts of a root, without committing"""
+        cur = self.conn.cursor()
+        cur.execute("""
+            UPDATE media_roots
+            SET folder_count = (SELECT COUNT(*) FROM media_folders WHERE root_id = %s),
+                file_count = (SELECT COUNT(*) FROM media_files WHERE root_id = %s)
+            WHERE root_id = %s;
+        """, (root_id, root_id, root_id))
+
+    def allocate_folder_ids(self, count: int = 1) -> int:
+        """
+        Reserve a block of folder ids, unique across all roots and all connections.
+        The counter row is locked only until the reservation is committed, here,
+        so scans of other roots running at the same time get blocks of their own.
+
+        Args:
+            count: Number of ids to reserve
+
+        Returns:
+            The first id of the block
+        """
+        try:
+            cur = self.conn.cursor()
+            cur.execute("UPDATE id_counters SET next_id = next_id + %s WHERE counter_name = 'folder_id' "
+                        "RETURNING next_id - %s;", (count, count))
+            first_id = cur.fetchone()[0]
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return first_id
+
+    def _list_directory(self, task: ScanTask) -> DirectoryListing:
+        """
+        List one directory, pruning excluded and ignored entries and subdirectories
+        below the maximum depth before they are descended into. Runs in a worker
+        thread of the directory's device pool.
+        """
+        rules = self._scan_rules
+        start = time.perf_counter()
+        listing = DirectoryListing(task.path)
+        skipped = listing.skipped
+        try:
+            with os.scandir(task.path) as entries:
+                entries = sorted(entries, key=lambda entry: entry.name)
+            listing.entry_count = len(entries)
+
+            ignores = task.ignores
+            if rules.ignore_file and any(entry.name == rules.ignore_file for entry in entries):
+                globs = read_ignore_file(os.path.join(task.path, rules.ignore_file))
+                if globs == []:
+                    # An empty ignore file skips the directory it is in
+                    listing.ignored = True
+                    listing.seconds = time.perf_counter() - start
+                    return listing
+                pattern = compile_globs(globs or [])
+                if pattern is not None:
+                    ignores = ignores + ((len(task.path) + 1, pattern),)
+
+            descend = rules.max_depth is None or task.depth < rules.max_depth
+            for entry in entries:
+                relative_path = f"{task.relative_path}/{entry.name}" if task.relative_path else entry.name
+                is_directory = entry.is_dir(follow_symlinks=False)
+                is_symlinked_directory = not is_directory and entry.is_symlink() and entry.is_dir()
+                if not (is_directory or is_symlinked_directory or entry.is_file()):
+                    continue
+                if is_directory or is_symlinked_directory:
+                    if rules.excludes(relative_path):
+                        skipped.excluded_directories += 1
+                    elif any(p.match(entry.path[start_index:]) for start_index, p in ignores):
+                        skipped.ignored_directories += 1
+                    elif is_symlinked_directory and not rules.follow_symlinks:
+                        skipped.symlinks += 1
+                    elif not descend:
+                        skipped.too_deep += 1
+                    else:
+                        stat = entry.stat(follow_symlinks=is_symlinked_directory)
+                        listing.subdirectories.append(
+                            ScanTask(entry.path, relative_path, task.depth + 1, ignores, (stat.st_dev, stat.st_ino))
+                        )
+                    continue
+
+                listing.files_seen += 1
+                ext = os.path.splitext(entry.name)[1].lower()
+                if ext not in self.valid_extensions:
+                    continue
+                if rules.excludes(relative_path):
+                    skipped.excluded_files += 1
+                elif any(p.match(entry.path[start_index:]) for start_index, p in ignores):
+                    skipped.ignored_files += 1
+                else:
+                    stat = entry.stat()
+                    listing.media_files.append((entry.name, ext, stat.st_size // 1024, stat.st_mtime))
+        except OSError as e:
+            listing.subdirectories, listing.media_files, listing.files_seen = [], [], 0
+            listing.skipped = SkipCounts()
+            listing.error = str(e)
+        listing.seconds = time.perf_counter() - start
+        return listing
+
+    def scan_rules(self) -> ScanRules:
+        """The exclusion rules stored in the Parameters table"""
+        return ScanRules.from_parameters(self.get_parameter)
+
+    def _walk(self, tasks: List[ScanTask], visited: Set[Tuple[int, int]], rules: ScanRules,
+              workers: Optional[int] = None,
+              progress: Optional[ProgressCallback] = None) -> Iterator[DirectoryListing]:
+        """
+        List directory trees in parallel and yield each directory's listing as it completes.
+        Every device (st_dev) gets its own DevicePool, whose concurrency limit adapts to
+        how fast that device answers. A listing is always yielded before the listings of
+        its subdirectories. Per-device statistics are kept in self.device_stats and what
+        was skipped in self.skip_counts.
+
+        Args:
+            tasks: The directories to start from
+            visited: (st_dev, st_ino) of directories that are listed already or queued,
+                     extended as the walk goes on, so no directory is listed twice
+            rules: What to skip
+            workers: Maximum concurrent listings per device, defaults to default_workers()
+            progress: Called with "scan" events while scanning, a "scan_error" event per directory
+                      that can't be listed and a "devices" event at the end
+        """
+        self._scan_rules = rules.compile()
+        max_limit = workers or default_workers()
+        pools: Dict[int, DevicePool] = {}
+        pending: Dict[Future, DevicePool] = {}
+        skipped = SkipCounts()
+        directories = files_seen = media_file_count = errors = 0
+        start = last_progress = time.perf_counter()
+
+        def queue_directory(task: ScanTask):
+            device = task.identity[0]
+            if device not in pools:
+                pools[device] = DevicePool(device, find_mount_point(task.path), max_limit)
+            pools[device].queue.append(task)
+
+        for task in tasks:
+            visited.add(task.identity)
+            queue_directory(task)
+        try:
+            while True:
+                for pool in pools.values():
+                    for future in pool.submit_ready(self._list_directory):
+                        pending[future] = pool
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pool = pending.pop(future)
+                    listing = future.result()
+                    pool.record(listing.seconds, listing.entry_count, listing.error is not None)
+                    if listing.error:
+                        errors += 1
+                        print(f"Error scanning {listing.directory}: {listing.error}", file=sys.stderr)
+                        if progress:
+                            progress("scan_error", directory=listing.directory, message=str(listing.error))
+                    directories += 1
+                    files_seen += listing.files_seen
+                    media_file_count += len(listing.media_files)
+                    skipped.add(listing.skipped)
+                    if listing.ignored:
+                        skipped.ignored_directories += 1
+
+                    subdirectories = []
+                    for task in listing.subdirectories:
+                        if task.identity in visited:
+                            skipped.revisited += 1
+                            continue
+                        visited.add(task.identity)
+                        subdirectories.append(task)
+                        queue_directory(task)
+                    listing.subdirectories = subdirectories
+                    yield listing
+
+                now = time.perf_counter()
+                if progress and now - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = now
+                    progress("scan", directories=directories, files=files_seen,
+                             media_files=media_file_count, errors=errors,
+                             skipped_directories=skipped.to_dict()['directories'],
+                             elapsed_s=round(now - start, 3),
+                             limits={pool.stats.mount_point: pool.limit for pool in pools.values()})
+        finally:
+            for pool in pools.values():
+                pool.shutdown()
+            self.device_stats = [pool.stats for pool in pools.values()]
+            self.skip_counts = skipped
+
+        if progress:
+            progress("scan", directories=directories, files=files_seen,
+                     media_files=media_file_count, errors=errors, skipped=skipped.to_dict(),
+                     elapsed_s=round(time.perf_counter() - start, 3))
+            progress("devices", devices=[stats.to_dict() for stats in self.device_stats])
+
+    @staticmethod
+    def _root_task(folder_path: str) -> ScanTask:
+        """The task listing a root folder"""
+        stat = os.stat(folder_path)
+        return ScanTask(folder_path, "", 0, (), (stat.st_dev, stat.st_ino))
+
+    @timed("scan_root")
+    def scan_root(self, root: MediaRoot, workers: Optional[int] = None,
+                  progress: Optional[ProgressCallback] = None,
+                  rules: Optional[ScanRules] = None, resume: bool = False) -> MediaRoot:
+        """
+        Scan a root into the database, leaving other roots alone.
+
+        Listings are checkpointed as they complete: every CHECKPOINT_INTERVAL seconds
+        (or CHECKPOINT_DIRECTORIES directories) the finished directories' folder and file
+        rows are written in one transaction together with the scan_queue journal, which
+        records every directory found and whether it has been listed. Completed
+        subtrees can be loaded straight away, and a scan that crashed or was stopped
+        continues from its last checkpoint with resume=True.
+
+        Folders keep their folder_id and files their media_file_id across rescans; rows
+        of folders and files that are gone are deleted as their parent is listed again.
+
+        Args:
+            root: The root to scan
+            workers: Maximum concurrent listings per device
+            progress: Called with "scan", "checkpoint" and "devices" events
+            rules: What to skip, defaults to the rules in the Parameters table
+            resume: Continue an interrupted scan of the root instead of starting over
+
+        Returns:
+            The root with its new status and counts
+        """
+        rules = rules or self.scan_rules()
+        self._update_root_status(root.root_id, "scanning", started=not resume)
+        try:
+            if resume and self._journal_size(root.root_id):
+                tasks, visited = self._resume_journal(root, rules)
+            else:
+                tasks, visited = self._start_journal(root)
+            folder_ids = self._root_folder_ids(root.root_id)
+            batch: List[DirectoryListing] = []
+            last_checkpoint = time.perf_counter()
+            for listing in self._walk(tasks, visited, rules, workers, progress):
+                batch.append(listing)
+                now = time.perf_counter()
+                if len(batch) >= CHECKPOINT_DIRECTORIES or now - last_checkpoint >= CHECKPOINT_INTERVAL:
+                    self._checkpoint(root, batch, folder_ids, progress)
+                    batch = []
+                    last_checkpoint = now
+            self._checkpoint(root, batch, folder_ids, progress)
+
+            cur = self.conn.cursor()
+            cur.execute("DELETE FROM scan_queue WHERE root_id = %s;", (root.root_id,))
+            self.conn.commit()
+        except Exception:
+            # The journal stays, so the scan can be resumed
+            self.conn.rollback()
+            self._update_root_status(root.root_id, "failed")
+            raise
+        self._update_root_status(root.root_id, "scanned", finished=True)
+        self.refresh_collections()
+        return self.get_root(root.root_id)
+
+    def _journal_size(self, root_id: int) -> int:
+        """Number of directories in the scan_queue journal of a root, 0 if it isn't being scanned"""
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM scan_queue WHERE root_id = %s;", (root_id,))
+        return cur.fetchone()[0]
+
+    def resumable_roots(self) -> List[MediaRoot]:
+        """Roots whose last scan was interrupted and can be resumed"""
+        cur = self.conn.cursor()
+        cur.execute("SELECT DISTINCT root_id FROM scan_queue;")
+        root_ids = {row[0] for row in cur.fetchall()}
+        return [root for root in self.list_roots() if root.root_id in root_ids]
+
+    def _root_folder_ids(self, root_id: int) -> Dict[str, int]:
+        """{folder_path: folder_id} of the stored folders of a root"""
+        cur = self.conn.cursor()
+        cur.execute("SELECT folder_path, folder_id FROM media_folders WHERE root_id = %s;", (root_id,))
+        return dict(cur.fetchall())
+
+    def _start_journal(self, root: MediaRoot) -> Tuple[List[ScanTask], Set[Tuple[int, int]]]:
+        """Start a new journal with only the root folder in it"""
+        task = self._root_task(root.root_path)
+        folder_id = self._root_folder_ids(root.root_id).get(root.root_path)
+        cur = self.conn.cursor()
+        if folder_id is None:
+            folder_id = self.allocate_folder_ids()
+            cur.execute(
+                "INSERT INTO media_folders (folder_id, folder_path, parent_folder_id, root_id) "
+                "VALUES (%s, %s, NULL, %s);",
+                (folder_id, root.root_path, root.root_id)
+            )
+        cur.execute("DELETE FROM scan_queue WHERE root_id = %s;", (root.root_id,))
+        cur.execute(
+            "INSERT INTO scan_queue (root_id, folder_id, folder_path, depth, device, inode) "
+            "VALUES (%s, %s, %s, 0, %s, %s);",
+            (root.root_id, folder_id, root.root_path) + task.identity
+        )
+        self.conn.commit()
+        return [task], set()
+
+    def _resume_journal(self, root: MediaRoot, rules: ScanRules) -> Tuple[List[ScanTask], Set[Tuple[int, int]]]:
+        """Tasks for the directories of the journal that weren't listed yet, and the identities of all of them"""
+        cur = self.conn.cursor()
+        cur.execute("SELECT folder_path, depth, device, inode, status FROM scan_queue WHERE root_id = %s;",
+                    (root.root_id,))
+        rows = cur.fetchall()
+        visited = {(device, inode) for _, _, device, inode, _ in rows}
+        ignore_cache: Dict[str, tuple] = {}
+        tasks = []
+        for folder_path, depth, device, inode, status in sorted(rows):
+            if status == 'pending':
+                relative_path = os.path.relpath(folder_path, root.root_path).replace(os.sep, "/")
+                tasks.append(ScanTask(
+                    folder_path, "" if relative_path == "." else relative_path, depth,
+                    self._inherited_ignores(root.root_path, folder_path, rules, ignore_cache), (device, inode)
+                ))
+        visited.difference_update(task.identity for task in tasks)  # _walk() adds them back as it queues them
+        return tasks, visited
+
+    @staticmethod
+    def _inherited_ignores(root_path: str, folder_path: str, rules: ScanRules, cache: Dict[str, tuple]) -> tuple:
+        """The ignore file globs a folder inherits from the folders above it, up to the root"""
+        if not rules.ignore_file or folder_path == root_path:
+            return ()
+        parent = os.path.dirname(folder_path)
+        if parent not in cache:
+            ignores = MediaLibrary._inherited_ignores(root_path, parent, rules, cache)
+            globs = read_ignore_file(os.path.join(parent, rules.ignore_file))
+            pattern = compile_globs(globs or [])
+            cache[parent] = ignores + ((len(parent) + 1, pattern),) if pattern is not None else ignores
+        return cache[parent]
+
+    def _checkpoint(self, root: MediaRoot, batch: List[DirectoryListing], folder_ids: Dict[str, int],
+                    progress: Optional[ProgressCallback] = None):
+        """
+        Write finished listings and mark them done in the journal, in one transaction.
+        New subfolders get ids from a block reserved by allocate_folder_ids(); existing
+        folders keep theirs. New folders are inserted without ON CONFLICT, so an id
+        taken by another root raises instead of moving that root's folder.
+        """
+        if not batch:
+            return
+        root_id, root_path = root.root_id, root.root_path
+        # Number the new subfolders first, a subfolder may have been listed in the same batch as its parent
+        new_paths = list(dict.fromkeys(task.path for listing in batch for task in listing.subdirectories
+                                       if task.path not in folder_ids))
+        if new_paths:
+            first_id = self.allocate_folder_ids(len(new_paths))
+            folder_ids.update((path, first_id + offset) for offset, path in enumerate(new_paths))
+        new_paths = set(new_paths)
+
+        cur = self.conn.cursor()
+        # Listings that failed keep their stored rows
+        listed = [listing for listing in batch if listing.error is None]
+        listed_ids = [folder_ids[listing.directory] for listing in listed]
+        stored_subfolders: Dict[int, Dict[str, int]] = {}
+        stored_files: Dict[int, Dict[str, Tuple[int, int, Optional[float]]]] = {}
+        if listed_ids:
+            placeholders = ", ".join(["%s"] * len(listed_ids))
+            cur.execute(f"SELECT parent_folder_id, folder_path, folder_id FROM media_folders "
+                        f"WHERE parent_folder_id IN ({placeholders});", listed_ids)
+            for parent_id, path, folder_id in cur.fetchall():
+                stored_subfolders.setdefault(parent_id, {})[path] = folder_id
+            cur.execute(f"SELECT folder_id, file_name, media_file_id, file_size_kb, file_mtime FROM media_files "
+                        f"WHERE folder_id IN ({placeholders});", listed_ids)
+            for folder_id, file_name, file_id, size, mtime in cur.fetchall():
+                stored_files.setdefault(folder_id, {})[file_name] = (file_id, size, mtime)
+
+        folder_rows, moved_folders, file_rows, journal_rows = [], [], [], []
+        gone_folders, gone_files = [], []
+        changed_files = []  # (folder_id, file_name) of new and modified files, for the smart collections
+        for listing in listed:
+            folder_id = folder_ids[listing.directory]
+            subfolders = stored_subfolders.get(folder_id, {})
+            files = stored_files.get(folder_id, {})
+            if listing.ignored:
+                if listing.directory != root_path:
+                    gone_folders.append((folder_id,))
+                continue
+            for task in listing.subdirectories:
+                subfolder_id = folder_ids[task.path]
+                subfolders.pop(task.path, None)
+                if task.path in new_paths:
+                    folder_rows.append((subfolder_id, task.path, folder_id, root_id))
+                else:
+                    moved_folders.append((folder_id, subfolder_id, root_id))
+                journal_rows.append((root_id, subfolder_id, task.path, task.depth) + task.identity)
+            for name, ext, size, mtime in listing.media_files:
+                stored = files.pop(name, None)
+                if stored is None or stored[1:] != (size, mtime):
+                    changed_files.append((folder_id, name))
+                file_rows.append((folder_id, name, ext, size, listing.directory, mtime, root_id))
+            gone_folders.extend((subfolder_id,) for subfolder_id in subfolders.values())
+            gone_files.extend((stored[0],) for stored in files.values())
+
+        try:
+            if folder_rows:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO media_folders (folder_id, folder_path, parent_folder_id, root_id)
+                    VALUES %s;
+                    """,
+                    folder_rows,
+                    template="(%s, %s, %s, %s)",
+                    page_size=100
+                )
+            if moved_folders:
+                cur.executemany("UPDATE media_folders SET parent_folder_id = %s WHERE folder_id = %s AND root_id = %s;",
+                                moved_folders)
+            if file_rows:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO media_files
+                        (folder_id, file_name, file_extension, file_size_kb, folder_path, file_mtime, root_id)
+                    VALUES %s
+                    ON CONFLICT (folder_id, file_name) DO UPDATE
+                    SET file_extension = EXCLUDED.file_extension,
+                        file_size_kb = EXCLUDED.file_size_kb,
+                        file_mtime = EXCLUDED.file_mtime;
+                    """,
+                    file_rows,
+                    template="(%s, %s, %s, %s, %s, %s, %s)",
+                    page_size=100
+                )
+            if changed_files:
+                cur.executemany("INSERT INTO collection_changes (media_file_id) "
+                                "SELECT media_file_id FROM media_files WHERE folder_id = %s AND file_name = %s;",
+                                changed_files)
+            if journal_rows:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO scan_queue (root_id, folder_id, folder_path, depth, device, inode)
+                    VALUES %s
+                    ON CONFLICT (root_id, folder_id) DO NOTHING;
+                    """,
+                    journal_rows,
+                    template="(%s, %s, %s, %s, %s, %s)",
+                    page_size=100
+                )
+            # After the inserts, a folder with an empty ignore file may have been added in this batch
+            if gone_files:
+                cur.executemany("DELETE FROM media_files WHERE media_file_id = %s;", gone_files)
+            if gone_folders:
+                # Their subfolders and files go with them (ON DELETE CASCADE)
+                cur.executemany("DELETE FROM media_folders WHERE folder_id = %s;", gone_folders)
+            cur.executemany(
+                "UPDATE scan_queue SET status = 'done' WHERE root_id = %s AND folder_id = %s;",
+                [(root_id, folder_ids[listing.directory]) for listing in batch]
+            )
+            self._refresh_root_counts(root_id)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        if progress:
+            progress("checkpoint", directories=len(batch), folders=len(folder_rows) + len(moved_folders),
+                     files=len(file_rows), deleted_folders=len(gone_folders), deleted_files=len(gone_files))
+
+    @timed("extract_metadata")
+    def extract_metadata(self, root_ids: Optional[List[int]] = None, workers: Optional[int] = None,
+                         progress: Optional[ProgressCallback] = None,
+                         batch_size: int = METADATA_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Read the EXIF of new and changed images and store it in the EXIF_COLUMNS.
+        Headers are parsed in batches by a pool of worker processes (the parsing is
+        pure Python, so threads would serialize on the GIL). A file is read when its
+        metadata_mtime differs from the file_mtime the last scan stored, so re-runs
+        only read files that were added or modified since. Results are committed
+        every CHECKPOINT_INTERVAL seconds, an interrupted run keeps what it did.
+
+        Args:
+            root_ids: Only these roots, None for all roots
+            workers: Number of worker processes, defaults to the number of CPUs
+            progress: Called with "metadata" events
+            batch_size: Files per worker task
+
+        Returns:
+            Number of files read, of those with a capture date and of unreadable ones
+        """
+        cur = self.conn.cursor()
+        where, params = self._root_filter(root_ids)
+        condition = (f"file_extension IN ({', '.join(['%s'] * len(EXIF_EXTENSIONS))}) "
+                     f"AND (metadata_mtime IS NULL OR metadata_mtime <> file_mtime)")
+        where = f"{where} AND {condition}" if where else f" WHERE {condition}"
+        cur.execute(f"SELECT media_file_id, folder_path, file_name, file_mtime FROM media_files{where};",
+                    params + tuple(EXIF_EXTENSIONS))
+        files = [(file_id, os.path.join(folder_path, file_name), file_mtime)
+                 for file_id, folder_path, file_name, file_mtime in cur.fetchall()]
+        counts = {'files': len(files), 'with_capture_date': 0, 'unreadable': 0}
+        if not files:
+            return counts
+
+        update = (f"UPDATE media_files SET file_mtime = %s, metadata_mtime = %s, "
+                  f"{', '.join(f'{column} = %s' for column in EXIF_COLUMNS)} WHERE media_file_id = %s;")
+        rows = []
+        done = 0
+        last_commit = last_progress = time.perf_counter()
+        # Spawned rather than forked, the app has threads running (prefetching, loading)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context) as executor:
+            futures = [executor.submit(extract_batch, files[i:i + batch_size])
+                       for i in range(0, len(files), batch_size)]
+            try:
+                for future in as_completed(futures):
+                    for file_id, file_mtime, exif in future.result():
+                        if exif is None:
+                            counts['unreadable'] += 1
+                            exif = ExifData()
+                        elif exif.captured_at is not None:
+                            counts['with_capture_date'] += 1
+                        rows.append((file_mtime, file_mtime) + exif.to_tuple() + (file_id,))
+                    done += batch_size
+
+                    now = time.perf_counter()
+                    if now - last_commit >= CHECKPOINT_INTERVAL:
+                        self._write_metadata(update, rows)
+                        rows = []
+                        last_commit = now
+                    if progress and now - last_progress >= PROGRESS_INTERVAL:
+                        last_progress = now
+                        progress("metadata", files=min(done, len(files)), total=len(files), **counts)
+                self._write_metadata(update, rows)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        if progress:
+            progress("metadata", files=len(files), total=len(files), **counts)
+        self.refresh_collections()
+        return counts
+
+    @property
+    def thumbnail_store(self) -> ThumbnailStore:
+        """The ThumbnailStore in the directory of the 'thumbnail_dir' parameter, or the default one"""
+        if self._thumbnail_store is None:
+            self._thumbnail_store = ThumbnailStore(self.get_parameter('thumbnail_dir'))
+        return self._thumbnail_store
+
+    @timed("extract_video_metadata")
+    def extract_video_metadata(self, root_ids: Optional[List[int]] = None, workers: Optional[int] = None,
+                               progress: Optional[ProgressCallback] = None,
+                               timeout_s: float = DEFAULT_TIMEOUT_S) -> Dict[str, int]:
+        """
+        Read duration, fps, resolution and codec of new and changed videos into the
+        VIDEO_COLUMNS and write a poster frame of each into the thumbnail store.
+        Containers are opened by a VideoProbePool, a file that takes longer than
+        timeout_s gets its worker killed and is skipped until it changes. Like
+        extract_metadata(), only files whose metadata_mtime differs from their
+        file_mtime are read, and results are committed every CHECKPOINT_INTERVAL seconds.
+
+        Args:
+            root_ids: Only these roots, None for all roots
+            workers: Number of worker processes, defaults to the number of CPUs
+            progress: Called with "video_metadata" events
+            timeout_s: Seconds a single file may take
+
+        Returns:
+            Number of files read, with a poster, unreadable, timed out and crashed
+        """
+        video_extensions = sorted(ext for ext, media_type in self.extension_to_type.items() if media_type == "video")
+        counts = {'files': 0, 'with_poster': 0, 'unreadable': 0, 'timed_out': 0, 'crashed': 0}
+        if not video_extensions:
+            return counts
+
+        cur = self.conn.cursor()
+        where, params = self._root_filter(root_ids)
+        condition = (f"file_extension IN ({', '.join(['%s'] * len(video_extensions))}) "
+                     f"AND (metadata_mtime IS NULL OR metadata_mtime <> file_mtime)")
+        where = f"{where} AND {condition}" if where else f" WHERE {condition}"
+        cur.execute(f"SELECT media_file_id, folder_path, file_name, file_mtime FROM media_files{where};",
+                    params + tuple(video_extensions))
+        rows = cur.fetchall()
+        counts['files'] = len(rows)
+        if not rows:
+            return counts
+
+        store = self.thumbnail_store
+        file_mtimes = {}
+        tasks = []
+        for file_id, folder_path, file_name, file_mtime in rows:
+            path = os.path.join(folder_path, file_name)
+            if file_mtime is None:
+                # Scanned before mtimes were stored
+                try:
+                    file_mtime = os.stat(path).st_mtime
+                except OSError:
+                    pass
+            file_mtimes[file_id] = file_mtime
+            tasks.append((file_id, path, store.prepare(file_id)))
+
+        update = (f"UPDATE media_files SET file_mtime = %s, metadata_mtime = %s, "
+                  f"{', '.join(f'{column} = %s' for column in VIDEO_COLUMNS)} WHERE media_file_id = %s;")
+        pending_rows = []
+        done = 0
+        last_commit = last_progress = time.perf_counter()
+
+        def on_result(file_id: int, info: Optional[VideoInfo], failure: Optional[str]):
+            nonlocal pending_rows, done, last_commit, last_progress
+            done += 1
+            if failure:
+                counts['timed_out' if failure == "timeout" else 'crashed'] += 1
+            elif info is None:
+                counts['unreadable'] += 1
+            elif info.has_poster:
+                counts['with_poster'] += 1
+            if info is None or not info.has_poster:
+                store.remove(file_id)
+            file_mtime = file_mtimes[file_id]
+            pending_rows.append((file_mtime, file_mtime) + (info or VideoInfo()).to_tuple() + (file_id,))
+
+            now = time.perf_counter()
+            if now - last_commit >= CHECKPOINT_INTERVAL:
+                self._write_metadata(update, pending_rows)
+                pending_rows = []
+                last_commit = now
+            if progress and now - last_progress >= PROGRESS_INTERVAL:
+                last_progress = now
+                progress("video_metadata", files=done, total=len(tasks),
+                         **{key: value for key, value in counts.items() if key != 'files'})
+
+        VideoProbePool(min(workers or os.cpu_count() or 1, len(tasks)), timeout_s).run(tasks, on_result)
+        self._write_metadata(update, pending_rows)
+        if progress:
+            progress("video_metadata", files=len(tasks), total=len(tasks),
+                     **{key: value for key, value in counts.items() if key != 'files'})
+        self.refresh_collections()
+        return counts
+
+    @timed("extract_color_features")
+    def extract_color_features(self, root_ids: Optional[List[int]] = None, workers: Optional[int] = None,
+                               progress: Optional[ProgressCallback] = None,
+                               batch_size: int = COLOR_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Compute the colour histogram and dominant colour of new and changed images,
+        GIFs and video posters into color_features. Batches are decoded at thumbnail
+        scale and reduced with NumPy by a pool of worker processes (see
+        color_features.extract_color_batch). A file is read when it has no features
+        or its feature_mtime differs from its file_mtime; videos only once
+        extract_video_metadata() has written their poster. Results are committed
+        every CHECKPOINT_INTERVAL seconds, an interrupted run keeps what it did.
+
+        Args:
+            root_ids: Only these roots, None for all roots
+            workers: Number of worker processes, defaults to the number of CPUs
+            progress: Called with "color_features" events, and a "color_error" event per file that can't be read
+            batch_size: Files per worker task
+
+        Returns:
+            Number of files read and of unreadable ones
+        """
+        # Pulls in NumPy and Pillow, only when colours are extracted
+        from .color_features import extract_color_batch
+
+        types = {ext: media_type for ext, media_type in self.extension_to_type.items()
+                 if media_type in ("image", "gif", "video")}
+        counts = {'files': 0, 'unreadable': 0}
+        if not types:
+            return counts
+        cur = self.conn.cursor()
+        where, params = self._root_filter(root_ids)
+        condition = (f"f.file_extension IN ({', '.join(['%s'] * len(types))}) "
+                     f"AND (c.media_file_id IS NULL OR c.feature_mtime <> f.file_mtime)")
+        where = f"{where} AND {condition}" if where else f" WHERE {condition}"
+        cur.execute(f"""
+            SELECT f.media_file_id, f.folder_path, f.file_name, f.file_extension, f.file_mtime
+            FROM media_files f
+            LEFT JOIN color_features c ON c.media_file_id = f.media_file_id{where};
+        """, params + tuple(types))
+        store = self.thumbnail_store
+        files = []
+        for file_id, folder_path, file_name, extension, file_mtime in cur.fetchall():
+            if types[extension.lower()] != "video":
+                files.append((file_id, os.path.join(folder_path, file_name), file_mtime))
+            elif store.has(file_id):
+                files.append((file_id, store.path_for(file_id), file_mtime))
+        counts['files'] = len(files)
+        if not files:
+            return counts
+
+        paths = {file_id: path for file_id, path, _ in files}
+        rows = []
+        done = 0
+        last_commit = last_progress = time.perf_counter()
+        # Spawned rather than forked, the app has threads running (prefetching, loading)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context) as executor:
+            futures = [executor.submit(extract_color_batch, files[i:i + batch_size])
+                       for i in range(0, len(files), batch_size)]
+            try:
+                for future in as_completed(futures):
+                    for file_id, file_mtime, dominant_rgb, histogram, error in future.result():
+                        if histogram is None:
+                            counts['unreadable'] += 1
+                            print(f"Error reading colours of {paths[file_id]}: {error}", file=sys.stderr)
+                            if progress:
+                                progress("color_error", file=paths[file_id], message=error)
+                        rows.append((file_id, file_mtime, dominant_rgb, histogram))
+                    done += batch_size
+
+                    now = time.perf_counter()
+                    if now - last_commit >= CHECKPOINT_INTERVAL:
+                        self._write_color_features(rows)
+                        rows = []
+                        last_commit = now
+                    if progress and now - last_progress >= PROGRESS_INTERVAL:
+                        last_progress = now
+                        progress("color_features", files=min(done, len(files)), total=len(files),
+                                 unreadable=counts['unreadable'])
+                self._write_color_features(rows)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+        if progress:
+            progress("color_features", files=len(files), total=len(files), unreadable=counts['unreadable'])
+        return counts
+
+    def _write_color_features(self, rows: List[tuple]):
+        """Store a batch of (media_file_id, feature_mtime, dominant_rgb, histogram) rows"""
+        if not rows:
+            return
+        try:
+            cur = self.conn.cursor()
+            cur.executemany("""
+                INSERT INTO color_features (media_file_id, feature_mtime, dominant_rgb, histogram)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (media_file_id) DO UPDATE
+                SET feature_mtime = EXCLUDED.feature_mtime, dominant_rgb = EXCLUDED.dominant_rgb,
+                    histogram = EXCLUDED.histogram;
+            """, rows)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def load_color_index(self, root_ids: Optional[List[int]] = None) -> Optional['ColorIndex']:
+        """
+        Read the colour features of the files in some roots into a ColorIndex.
+
+        Args:
+            root_ids: Only files in these roots, None for all roots
+
+        Returns:
+            The index, None if none of the files has colour features
+        """
+        cur = self.conn.cursor()
+        where, params = self._root_filter(root_ids)
+        cur.execute(f"""
+            SELECT c.media_file_id, c.dominant_rgb, c.histogram
+            FROM color_features c
+            WHERE c.histogram IS NOT NULL
+              AND c.media_file_id IN (SELECT media_file_id FROM media_files{where})
+        """, params)
+        rows = cur.fetchall()
+        if not rows:
+            return None
+        # NumPy is only imported once colour features exist
+        from .color_features import ColorIndex
+        return ColorIndex.from_rows(rows)
+
+    def vacuum_thumbnails(self) -> Dict[str, int]:
+        """Delete thumbnails of files, and thumbnail atlases of folders, that are no longer in the library"""
+        cur = self.conn.cursor()
+        cur.execute("SELECT media_file_id FROM media_files;")
+        keep_ids = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT folder_path FROM media_folders;")
+        return self.thumbnail_store.vacuum(keep_ids, [row[0] for row in cur.fetchall()])
+
+    def _write_metadata(self, update: str, rows: List[tuple]):
+        """Store a batch of extracted metadata"""
+        if not rows:
+            return
+        try:
+            cur = self.conn.cursor()
+            cur.executemany(update, rows)
+            # Capture dates, cameras and mtimes are smart collection criteria
+            cur.executemany("INSERT INTO collection_changes (media_file_id) VALUES (%s);", [(row[-1],) for row in rows])
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def list_tags(self) -> Dict[str, Dict[str, int]]:
+        """Every tag with the number of files and folders it is on directly"""
+        cur = self.conn.cursor()
+        cur.execute("""
+            SELECT t.tag_name,
+                   (SELECT COUNT(*) FROM file_tags ft WHERE ft.tag_id = t.tag_id),
+                   (SELECT COUNT(*) FROM folder_tags fdt WHERE fdt.tag_id = t.tag_id)
+            FROM tags t
+            ORDER BY t.tag_name
+        """)
+        return {row[0]: {'files': row[1], 'folders': row[2]} for row in cur.fetchall()}
+
+    def load_tags(self, root_ids: Optional[List[int]] = None) -> Tuple[Dict[str, List[int]], Dict[str, List[int]]]:
+        """
+        Read the tags of files and folders.
+
+        Args:
+            root_ids: Only files and folders in these roots, None for all roots
+
+        Returns:
+            media_file_ids per tag and folder_ids per tag
+        """
+        cur = self.conn.cursor()
+        where, params = self._root_filter(root_ids)
+        tagged = []
+        for table, id_column, owner in (("file_tags", "media_file_id", "media_files"),
+                                        ("folder_tags", "folder_id", "media_folders")):
+            cur.execute(f"""
+                SELECT t.tag_name, x.{id_column}
+                FROM {table} x
+                JOIN tags t ON t.tag_id = x.tag_id
+                WHERE x.{id_column} IN (SELECT {id_column} FROM {owner}{where})
+            """, params)
+            ids_by_tag: Dict[str, List[int]] = {}
+            for tag_name, object_id in cur.fetchall():
+                ids_by_tag.setdefault(tag_name, []).append(object_id)
+            tagged.append(ids_by_tag)
+        return tagged[0], tagged[1]
+
+    def _tag_id(self, tag_name: str) -> int:
+        """Get the id of a tag, creating it if it doesn't exist yet"""
+        cur = self.conn.cursor()
+        cur.execute("INSERT INTO tags (tag_name) VALUES (%s) ON CONFLICT (tag_name) DO NOTHING;", (tag_name,))
+        cur.execute("SELECT tag_id FROM tags WHERE tag_name = %s;", (tag_name,))
+        return cur.fetchone()[0]
+
+    def tag(self, tag_name: str, media_file_ids: List[int] = (), folder_ids: List[int] = ()) -> str:
+        """
+        Add a tag to files and folders in one transaction; a folder's tag applies to everything below it.
+
+        Returns:
+            The tag name as stored (see normalize_tag), raises ValueError for an invalid one
+        """
+        from .tag_index import normalize_tag
+        tag_name = normalize_tag(tag_name)
+        try:
+            tag_id = self._tag_id(tag_name)
+            cur = self.conn.cursor()
+            for table, id_column, ids in (("file_tags", "media_file_id", media_file_ids),
+                                          ("folder_tags", "folder_id", folder_ids)):
+                if ids:
+                    execute_values(
+                        cur,
+                        f"INSERT INTO {table} (tag_id, {id_column}) VALUES %s ON CONFLICT DO NOTHING;",
+                        [(tag_id, object_id) for object_id in ids],
+                        page_size=1000
+                    )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return tag_name
+
+    def untag(self, tag_name: str, media_file_ids: List[int] = (), folder_ids: List[int] = ()):
+        """Take a tag off files and folders; the tag itself goes once nothing has it anymore"""
+        from .tag_index import normalize_tag
+        tag_name = normalize_tag(tag_name)
+        try:
+            cur = self.conn.cursor()
+            cur.execute("SELECT tag_id FROM tags WHERE tag_name = %s;", (tag_name,))
+            row = cur.fetchone()
+            if row is None:
+                return
+            tag_id = row[0]
+            for table, id_column, ids in (("file_tags", "media_file_id", media_file_ids),
+                                          ("folder_tags", "folder_id", folder_ids)):
+                if ids:
+                    cur.executemany(f"DELETE FROM {table} WHERE tag_id = %s AND {id_column} = %s;",
+                                    [(tag_id, object_id) for object_id in ids])
+            cur.execute("""
+                DELETE FROM tags WHERE tag_id = %s
+                AND NOT EXISTS (SELECT 1 FROM file_tags WHERE tag_id = %s)
+                AND NOT EXISTS (SELECT 1 FROM folder_tags WHERE tag_id = %s);
+            """, (tag_id, tag_id, tag_id))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def list_collections(self) -> List[SmartCollection]:
+        """Get all smart collections with their member counts, ordered by name"""
+        cur = self.conn.cursor()
+        cur.execute("""
+            SELECT c.collection_id, c.collection_name, c.filter_json, c.order_by,
+                   (SELECT COUNT(*) FROM collection_members m WHERE m.collection_id = c.collection_id)
+            FROM smart_collections c
+            ORDER BY c.collection_name
+        """)
+        return [SmartCollection(row[0], row[1], CollectionFilter.from_json(row[2]), row[3], row[4])
+                for row in cur.fetchall()]
+
+    def find_collection(self, name: str) -> Optional[SmartCollection]:
+        """Get a smart collection by name"""
+        return next((collection for collection in self.list_collections() if collection.name == name), None)
+
+    def save_collection(self, name: str, collection_filter: CollectionFilter,
+                        order_by: str = DEFAULT_ORDER) -> SmartCollection:
+        """
+        Create a smart collection, or replace the filter of the one with this name, and materialize its members.
+
+        Raises:
+            ValueError: If the name is empty, the order unknown or the filter invalid
+        """
+        name = name.strip()
+        if not name:
+            raise ValueError("A collection needs a name")
+        if order_by not in ORDERS:
+            raise ValueError(f"Unknown order {order_by!r}, expected one of {', '.join(ORDERS)}")
+        collection_filter.validate()
+        try:
+            cur = self.conn.cursor()
+            cur.execute("""
+                INSERT INTO smart_collections (collection_name, filter_json, order_by)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (collection_name) DO UPDATE
+                SET filter_json = EXCLUDED.filter_json, order_by = EXCLUDED.order_by;
+            """, (name, collection_filter.to_json(), order_by))
+            cur.execute("SELECT collection_id FROM smart_collections WHERE collection_name = %s;", (name,))
+            collection = SmartCollection(cur.fetchone()[0], name, collection_filter, order_by)
+            self._materialize_collection(collection)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return self.find_collection(name)
+
+    def delete_collection(self, collection_id: int):
+        """Delete a smart collection and its members"""
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM collection_members WHERE collection_id = %s;", (collection_id,))
+        cur.execute("DELETE FROM smart_collections WHERE collection_id = %s;", (collection_id,))
+        self.conn.commit()
+
+    def _collection_insert(self, collection: SmartCollection,
+                           changes_through: Optional[int] = None) -> Tuple[str, list]:
+        """
+        The INSERT adding the matching files to a collection.
+
+        Args:
+            collection: The collection
+            changes_through: Only files queued in collection_changes up to this change_id, None for all files
+        """
+        condition, params = collection.filter.to_sql(self.extension_to_type)
+        params = [collection.collection_id] + params
+        if changes_through is not None:
+            condition = f"media_file_id IN ({CHANGED_FILES}) AND {condition}"
+            params.insert(1, changes_through)
+        return (f"INSERT INTO collection_members (collection_id, media_file_id, sort_key) "
+                f"SELECT %s, media_file_id, {ORDERS[collection.order_by]} FROM media_files "
+                f"WHERE {condition};"), params
+
+    def _materialize_collection(self, collection: SmartCollection):
+        """Rebuild the members of a collection from scratch, inside the caller's transaction"""
+        cur = self.conn.cursor()
+        cur.execute("DELETE FROM collection_members WHERE collection_id = %s;", (collection.collection_id,))
+        insert, params = self._collection_insert(collection)
+        cur.execute(insert, params)
+
+    def refresh_collections(self, full: bool = False) -> Dict[str, int]:
+        """
+        Bring the members of all smart collections up to date.
+        Only the files queued in collection_changes since the last refresh (added or
+        modified by scans, new metadata) are re-evaluated against each filter; removed
+        files have already left through ON DELETE CASCADE.
+
+        Args:
+            full: Rebuild every collection from scratch instead, e.g. after media types changed
+
+        Returns:
+            The number of collections and of changed files re-evaluated
+        """
+        cur = self.conn.cursor()
+        # Changes queued while this runs (e.g. by the command line) wait for the next refresh
+        cur.execute("SELECT MAX(change_id), COUNT(DISTINCT media_file_id) FROM collection_changes;")
+        last_change, changed = cur.fetchone()
+        if last_change is None and not full:
+            return {'collections': 0, 'files': 0}
+        collections = self.list_collections()
+        try:
+            for collection in collections:
+                if full:
+                    self._materialize_collection(collection)
+                    continue
+                cur.execute(f"DELETE FROM collection_members WHERE collection_id = %s "
+                            f"AND media_file_id IN ({CHANGED_FILES});", (collection.collection_id, last_change))
+                insert, params = self._collection_insert(collection, last_change)
+                cur.execute(insert, params)
+            if last_change is not None:
+                cur.execute("DELETE FROM collection_changes WHERE change_id <= %s;", (last_change,))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return {'collections': len(collections), 'files': self.file_count() if full else changed}
+
+    def collection_files(self, collection_id: int) -> List[MediaFile]:
+        """The files of a smart collection in its order, read through the collection_members index"""
+        columns = ", ".join(f"f.{column}" for column in FILE_COLUMNS)
+        cur = self.conn.cursor()
+        cur.execute(f"""
+            SELECT {columns}
+            FROM collection_members m
+            JOIN media_files f ON f.media_file_id = m.media_file_id
+            WHERE m.collection_id = %s
+            ORDER BY m.sort_key, m.media_file_id
+        """, (collection_id,))
+        return [self._make_media_file(row) for row in cur.fetchall()]
+
+    def file_paths(self, media_file_ids: List[int]) -> Dict[int, str]:
+        """The paths of some files by media_file_id, ids that aren't in the library are left out"""
+        if not media_file_ids:
+            return {}
+        cur = self.conn.cursor()
+        cur.execute(f"SELECT media_file_id, folder_path, file_name FROM media_files "
+                    f"WHERE media_file_id IN ({', '.join(['%s'] * len(media_file_ids))});", tuple(media_file_ids))
+        return {file_id: os.path.join(folder_path, file_name) for file_id, folder_path, file_name in cur.fetchall()}
+
+    def media_file_id_range(self, collection_id: Optional[int] = None,
+                            root_ids: Optional[List[int]] = None) -> Optional[Tuple[int, int]]:
+        """
+        The lowest and highest media_file_id of a smart collection or of some roots, for keyset sampling.
+
+        Returns:
+            (lowest, highest), None if there are no files
+        """
+        cur = self.conn.cursor()
+        if collection_id is not None:
+            cur.execute("SELECT MIN(media_file_id), MAX(media_file_id) FROM collection_members "
+                        "WHERE collection_id = %s;", (collection_id,))
+        else:
+            where, params = self._root_filter(root_ids)
+            cur.execute(f"SELECT MIN(media_file_id), MAX(media_file_id) FROM media_files{where};", params)
+        low, high = cur.fetchone()
+        return None if low is None else (low, high)
+
+    def files_from_id(self, low: int, high: int, limit: int, collection_id: Optional[int] = None,
+                      root_ids: Optional[List[int]] = None,
+                      media_types: Optional[List[str]] = None) -> List[MediaFile]:
+        """
+        Up to limit files with a media_file_id in [low, high), lowest ids first, read through
+        the primary key of media_files (or of collection_members) from low on.
+
+        Args:
+            low: Lowest media_file_id, need not be the id of a file
+            high: media_file_ids below this
+            limit: Most files to return
+            collection_id: Only members of this smart collection
+            root_ids: Only files in these roots, None for all roots
+            media_types: Only files of these media types, None for all
+        """
+        columns = ", ".join(f"f.{column}" for column in FILE_COLUMNS)
+        if collection_id is not None:
+            source = "collection_members m JOIN media_files f ON f.media_file_id = m.media_file_id"
+            conditions = ["m.collection_id = %s", "m.media_file_id >= %s", "m.media_file_id < %s"]
+            params = [collection_id, low, high]
+        else:
+            source = "media_files f"
+            conditions = ["f.media_file_id >= %s", "f.media_file_id < %s"]
+            params = [low, high]
+        if root_ids is not None:
+            conditions.append(f"f.root_id IN ({', '.join(['%s'] * len(root_ids))})" if root_ids else "1 = 0")
+            params += root_ids
+        if media_types is not None:
+            wanted = {media_type.lower() for media_type in media_types}
+            extensions = sorted(ext for ext, media_type in self.extension_to_type.items() if media_type in wanted)
+            conditions.append(f"LOWER(f.file_extension) IN ({', '.join(['%s'] * len(extensions))})"
+                              if extensions else "1 = 0")
+            params += extensions
+        cur = self.conn.cursor()
+        order = "m.media_file_id" if collection_id is not None else "f.media_file_id"
+        cur.execute(f"SELECT {columns} FROM {source} WHERE {' AND '.join(conditions)} ORDER BY {order} LIMIT %s;",
+                    params + [limit])
+        return [self._make_media_file(row) for row in cur.fetchall()]
+
+    def load(self, root_ids: Optional[List[int]] = None) -> MediaManager:
+        """
+        Read the folders and files from the database and build a MediaManager.
+        Doesn't touch any widgets, so it can run in a worker thread.
+
+        Args:
+            root_ids: Only load these roots, None loads all of them (a combined view)
+        """
+        cur = self.conn.cursor()
+        where, params = self._root_filter(root_ids)
+
+        # Load folders
+        cur.execute(f"""
+            SELECT folder_id, folder_path, parent_folder_id, root_id
+            FROM media_folders{where}
+            ORDER BY folder_path
+        """, params)
+        folders = []
+        for row in cur.fetchall():
+            folder = MediaFolder(
+                folder_id=row[0],
+                folder_path=row[1],
+                parent_folder_id=row[2],
+                root_id=row[3]
+            )
+            folders.append(folder)
+
+        # Load files
+        cur.execute(f"""
+            SELECT folder_id, file_name, file_extension, file_size_kb, folder_path, root_id,
+                   media_file_id, file_mtime, {', '.join(EXIF_COLUMNS)}, {', '.join(VIDEO_COLUMNS)}
+            FROM media_files{where}
+            ORDER BY folder_path, file_name
+        """, params)
+        files = [self._make_media_file(row) for row in cur.fetchall()]
+
+        # Create the MediaManager, with the tag and colour indexes if anything is tagged or has colours
+        manager = MediaManager(folders, files, self.extension_to_type)
+        file_tags, folder_tags = self.load_tags(root_ids)
+        if file_tags or folder_tags:
+            manager.build_tag_index(file_tags, folder_tags)
+        manager.color_index = self.load_color_index(root_ids)
+        return manager
+
+    def _make_media_file(self, row) -> MediaFile:
+        """
+        Create a MediaFile from the columns selected by load(): the file row, its root_id,
+        then optionally media_file_id, file_mtime, the EXIF_COLUMNS and the VIDEO_COLUMNS
+        """
+        file = MediaFile(
+            folder_id=row[0],
+            file_name=row[1],
+            file_extension=row[2],
+            file_size_kb=row[3],
+            folder_path=row[4],
+            root_id=row[5],
+            media_file_id=row[6] if len(row) > 6 else None,
+            file_mtime=row[7] if len(row) > 7 else None
+        )
+        if len(row) > 8:
+            captured_at = row[8]
+            if isinstance(captured_at, str):
+                # SQLite hands timestamps back as text
+                captured_at = datetime.fromisoformat(captured_at)
+            file.captured_at = captured_at
+            file.camera_make, file.camera_model, file.orientation, file.gps_latitude, file.gps_longitude = row[9:14]
+        if len(row) > 14:
+            file.duration_s, file.fps, file.media_width, file.media_height, file.video_codec = row[14:19]
+        file._media_type = self.extension_to_type.get(file.file_extension.lower(), "unknown")
+        return file
+
+    def stats(self) -> Dict:
+        """
+        Summarize the library.
+
+        Returns:
+            Folder and file counts, total size, file counts and sizes per media type, and the roots
+        """
+        cur = self.conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM media_folders;")
+        folder_count = cur.fetchone()[0]
+        cur.execute("""
+            SELECT file_extension, COUNT(*), COALESCE(SUM(file_size_kb), 0)
+            FROM media_files
+            GROUP BY file_extension
+        """)
+        media_types: Dict[str, Dict[str, int]] = {}
+        for extension, count, size_kb in cur.fetchall():
+            media_type = self.extension_to_type.get(extension.lower(), "unknown")
+            totals = media_types.setdefault(media_type, {'files': 0, 'size_kb': 0})
+            totals['files'] += count
+            totals['size_kb'] += size_kb
+
+        return {
+            'roots': [
+                {'root_id': root.root_id, 'root_path': root.root_path, 'scan_status': root.scan_status,
+                 'folders': root.folder_count, 'files': root.file_count, 'last_scanned': root.last_scanned}
+                for root in self.list_roots()
+            ],
+            'folders': folder_count,
+            'files': sum(t['files'] for t in media_types.values()),
+            'size_kb': sum(t['size_kb'] for t in media_types.values()),
+            'media_types': media_types,
+        }
+
+    def prune(self, progress: Optional[ProgressCallback] = None) -> Dict[str, int]:
+        """
+        Delete the rows of files and folders that no longer exist on disk.
+        Subfolders and files of a deleted folder go with it (ON DELETE CASCADE).
+
+        Returns:
+            Number of folders and files deleted
+        """
+        cur = self.conn.cursor()
+        cur.execute("SELECT folder_id, folder_path FROM media_folders;")
+        missing_folders = [(folder_id,) for folder_id, path in cur.fetchall() if not os.path.isdir(path)]
+        cur.execute("SELECT media_file_id, folder_path, file_name FROM media_files;")
+        missing_files = [
+            (file_id,) for file_id, folder_path, file_name in cur.fetchall()
+            if not os.path.isfile(os.path.join(folder_path, file_name))
+        ]
+        if progress:
+            progress("prune", missing_folders=len(missing_folders), missing_files=len(missing_files))
+
+        try:
+            if missing_files:
+                cur.executemany("DELETE FROM media_files WHERE media_file_id = %s;", missing_files)
+            if missing_folders:
+                cur.executemany("DELETE FROM media_folders WHERE folder_id = %s;", missing_folders)
+            for root in self.list_roots():
+                self._refresh_root_counts(root.root_id)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return {'folders': len(missing_folders), 'files': len(missing_files)}
+
+    def apply_file_operations(self, operations: List[FileOperation]) -> Dict[str, int]:
+        """
+        Store the outcome of moving, renaming and deleting files in one transaction.
+        Operations that failed on disk are skipped; the smart collections are
+        refreshed for the moved and renamed files, deleted files leave by cascade.
+
+        Args:
+            operations: Operations that have been run, see run_operations()
+
+        Returns:
+            Number of files updated, deleted and failed
+        """
+        done = [op for op in operations if op.error is None and op.media_file.media_file_id is not None]
+        updates = [
+            (op.target_folder.folder_id, op.target_name, os.path.splitext(op.target_name)[1].lower(),
+             op.target_folder.folder_path, op.target_folder.root_id, op.media_file.media_file_id)
+            for op in done if op.kind != DELETE
+        ]
+        deletes = [(op.media_file.media_file_id,) for op in done if op.kind == DELETE]
+        root_ids = {op.media_file.root_id for op in done} | {op.target_folder.root_id for op in done if op.kind != DELETE}
+        cur = self.conn.cursor()
+        try:
+            if updates:
+                # A row left behind by a file that was removed outside the app would break UNIQUE (folder_id, file_name)
+                cur.executemany("DELETE FROM media_files WHERE folder_id = %s AND file_name = %s "
+                                "AND media_file_id <> %s;", [(row[0], row[1], row[-1]) for row in updates])
+                cur.executemany("UPDATE media_files SET folder_id = %s, file_name = %s, file_extension = %s, "
+                                "folder_path = %s, root_id = %s WHERE media_file_id = %s;", updates)
+                cur.executemany("INSERT INTO collection_changes (media_file_id) VALUES (%s);",
+                                [(row[-1],) for row in updates])
+            if deletes:
+                cur.executemany("DELETE FROM media_files WHERE media_file_id = %s;", deletes)
+            for root_id in root_ids - {None}:
+                self._refresh_root_counts(root_id)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        for (media_file_id,) in deletes:
+            self.thumbnail_store.remove(media_file_id)
+        self.refresh_collections()
+        return {'updated': len(updates), 'deleted': len(deletes),
+                'failed': sum(1 for op in operations if op.error is not None)}
+
+    def vacuum(self):
+        """Reclaim space and refresh the planner statistics of the media tables (PostgreSQL only)"""
+        # VACUUM can't run inside a transaction
+        autocommit = self.conn.autocommit
+        self.conn.autocommit = True
+        try:
+            cur = self.conn.cursor()
+            cur.execute("VACUUM ANALYZE media_folders;")
+            cur.execute("VACUUM ANALYZE media_files;")
+        finally:
+            self.conn.autocommit = autocommit
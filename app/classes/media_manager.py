@@ -1,11 +1,21 @@
 # /app/classes/media_manager.py
+import bisect
+import os
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Set
+from datetime import datetime
+from typing import Iterable, List, Dict, Optional, Set, TYPE_CHECKING
 from .media_folder import MediaFolder
 from .media_file import MediaFile
+from .file_operations import DELETE, MOVE, FileOperation
+from .instrumentation import timed
+
+if TYPE_CHECKING:
+    from .color_features import ColorIndex
+    from .tag_index import TagIndex
 
 @dataclass
 class MediaManager:
+    @timed("media_manager_init")
     def __init__(self, folders: List[MediaFolder], files: List[MediaFile], extension_to_type: Dict[str, str]):
         """
         Initialize the MediaManager with lists of folders and files.
@@ -28,6 +38,16 @@ class MediaManager:
         # Assign files to their folders
         self._assign_files_to_folders()
 
+        # Files with a capture date sorted by it, built on first use by _capture_index()
+        self._captured_files: Optional[List[MediaFile]] = None
+        self._capture_dates: List[datetime] = []
+
+        # User tags, set by build_tag_index() once they are loaded
+        self.tag_index: Optional['TagIndex'] = None
+
+        # Colour features, set by MediaLibrary.load() when any are stored
+        self.color_index: Optional['ColorIndex'] = None
+
     def _set_media_types(self):
         """Set media types for all files based on their extensions"""
         for file in self.files:
@@ -72,3 +92,173 @@ class MediaManager:
     def get_files_by_type(self, media_type: str) -> List[MediaFile]:
         """Get all files of a specific media type"""
         return [f for f in self.files if f.media_type.lower() == media_type.lower()]
+
+    def _capture_index(self) -> List[MediaFile]:
+        """Files with a capture date, sorted by it; the dates are in self._capture_dates for bisect"""
+        if self._captured_files is None:
+            self._captured_files = sorted(
+                (f for f in self.files if f.captured_at is not None), key=lambda f: f.captured_at
+            )
+            self._capture_dates = [f.captured_at for f in self._captured_files]
+        return self._captured_files
+
+    def get_files_captured_between(self, start: Optional[datetime] = None,
+                                   end: Optional[datetime] = None) -> List[MediaFile]:
+        """
+        Get the files captured in [start, end), sorted by capture date, from the capture date index.
+
+        Args:
+            start: Earliest capture date, None for no lower bound
+            end: Capture dates before this, None for no upper bound
+        """
+        captured_files = self._capture_index()
+        low = bisect.bisect_left(self._capture_dates, start) if start else 0
+        high = bisect.bisect_left(self._capture_dates, end) if end else len(captured_files)
+        return captured_files[low:high]
+
+    def get_files_from_year(self, year: int) -> List[MediaFile]:
+        """Get the files captured in a year, sorted by capture date"""
+        return self.get_files_captured_between(datetime(year, 1, 1), datetime(year + 1, 1, 1))
+
+    def get_capture_years(self, files: Optional[Iterable[MediaFile]] = None) -> Dict[int, int]:
+        """
+        Count files per capture year, in year order.
+
+        Args:
+            files: Only count these, e.g. a folder's files, defaults to all files
+        """
+        if files is None:
+            self._capture_index()
+            dates = self._capture_dates
+        else:
+            dates = sorted(f.captured_at for f in files if f.captured_at is not None)
+        counts: Dict[int, int] = {}
+        for date in dates:
+            counts[date.year] = counts.get(date.year, 0) + 1
+        return counts
+
+    def get_files_sorted_by_capture_date(self, files: Optional[Iterable[MediaFile]] = None) -> List[MediaFile]:
+        """
+        Sort files by capture date, files without one come last in path order.
+
+        Args:
+            files: The files to sort, defaults to all files
+        """
+        if files is None:
+            undated = [f for f in self.files if f.captured_at is None]
+            return self._capture_index() + undated
+        files = list(files)
+        dated = sorted((f for f in files if f.captured_at is not None), key=lambda f: f.captured_at)
+        return dated + [f for f in files if f.captured_at is None]
+
+    def build_tag_index(self, file_tags: Dict[str, List[int]], folder_tags: Dict[str, List[int]]) -> 'TagIndex':
+        """
+        Build the bitmap index of user tags over self.files.
+
+        Args:
+            file_tags: The media_file_ids of the files with each tag
+            folder_tags: The folder_ids of the folders with each tag
+        """
+        # NumPy is only imported once tags are used
+        from .tag_index import TagIndex
+
+        ordinal_by_file_id = {f.media_file_id: i for i, f in enumerate(self.files) if f.media_file_id is not None}
+
+        def folder_ordinals(folder_id: int):
+            folder = self.folder_by_id.get(folder_id)
+            if folder is None:
+                return []
+            return [ordinal_by_file_id[f.media_file_id] for f in folder.get_files_recursive()
+                    if f.media_file_id in ordinal_by_file_id]
+
+        self.tag_index = TagIndex(len(self.files), ordinal_by_file_id, folder_ordinals)
+        for tag, media_file_ids in file_tags.items():
+            self.tag_index.add_files(tag, media_file_ids)
+        for tag, folder_ids in folder_tags.items():
+            self.tag_index.add_folders(tag, folder_ids)
+        return self.tag_index
+
+    @timed("tag_query")
+    def get_files_matching(self, expression: str) -> List[MediaFile]:
+        """
+        Get the files matching a tag query like 'family AND 2020 AND NOT blurry', in library order.
+        Raises ValueError if the query can't be parsed.
+        """
+        if self.tag_index is None:
+            self.build_tag_index({}, {})
+        return [self.files[i] for i in self.tag_index.query(expression)]
+
+    @timed("color_query")
+    def get_files_by_color(self, colors: List[tuple], min_share: Optional[float] = None,
+                           files: Optional[Iterable[MediaFile]] = None) -> List[MediaFile]:
+        """
+        Get the files whose pixels are mostly near some colours, from the stored colour features only.
+
+        Args:
+            colors: RGB tuples, e.g. from color_features.parse_color()
+            min_share: Share of a file's pixels that must be near the colours, see DEFAULT_MIN_SHARE
+            files: Only these files, None for all files
+
+        Returns:
+            The files, closest match first; none if no colour features are loaded
+        """
+        if self.color_index is None:
+            return []
+        from .color_features import DEFAULT_MIN_SHARE
+        by_id = {f.media_file_id: f for f in (self.files if files is None else files) if f.media_file_id is not None}
+        media_file_ids = self.color_index.nearest(colors, DEFAULT_MIN_SHARE if min_share is None else min_share)
+        return [by_id[i] for i in media_file_ids if i in by_id]
+
+    def sort_files_by_color(self, files: Iterable[MediaFile]) -> List[MediaFile]:
+        """
+        Sort files by the hue of their dominant colour, greys after the colours from light to dark,
+        files without colour features last in their original order.
+        """
+        files = list(files)
+        if self.color_index is None:
+            return files
+        keys = self.color_index.sort_keys(-1 if f.media_file_id is None else f.media_file_id for f in files)
+        return [files[i] for i in keys.argsort(kind="stable")]
+
+    def apply_file_operations(self, operations: List[FileOperation]):
+        """
+        Patch moved, renamed and deleted files into the folders and indexes in place,
+        instead of loading everything again. Operations that failed are skipped.
+        """
+        done = [op for op in operations if op.error is None]
+        if not done:
+            return
+        changed = {id(op.media_file) for op in done}
+        arrivals: Dict[int, List[MediaFile]] = {}  # New files per folder_id
+        touched: Dict[int, MediaFolder] = {}
+        for op in done:
+            media_file = op.media_file
+            source = self.folder_by_id.get(media_file.folder_id)
+            if source is not None:
+                touched[source.folder_id] = source
+            if op.kind == DELETE:
+                continue
+            target = self.folder_by_id.get(op.target_folder.folder_id, op.target_folder)
+            media_file.folder_id = target.folder_id
+            media_file.folder_path = target.folder_path
+            media_file.root_id = target.root_id
+            media_file.file_name = op.target_name
+            media_file.file_extension = os.path.splitext(op.target_name)[1].lower()
+            media_file.media_type = self.extension_to_type.get(media_file.file_extension.lower(), "unknown")
+            touched[target.folder_id] = target
+            arrivals.setdefault(target.folder_id, []).append(media_file)
+
+        # Every touched folder's file list is rebuilt once, in name order like a fresh load
+        for folder_id, folder in touched.items():
+            files = [f for f in folder._files if id(f) not in changed] + arrivals.get(folder_id, [])
+            folder._files[:] = sorted(files, key=lambda f: f.file_name)
+
+        deleted = {id(op.media_file) for op in done if op.kind == DELETE}
+        if deleted:
+            ordinals = [i for i, f in enumerate(self.files) if id(f) in deleted]
+            self.files = [f for f in self.files if id(f) not in deleted]
+            self._captured_files = None
+            if self.tag_index is not None:
+                self.tag_index.remove_ordinals(ordinals)
+        if self.tag_index is not None and any(op.kind == MOVE for op in done):
+            self.tag_index.refresh_folders()
@@ -0,0 +1,24 @@
+# /app/classes/media_root.py
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass
+class MediaRoot:
+    """A library root folder; its folders and files are stored and scanned independently of other roots"""
+    root_id: int
+    root_path: str
+    scan_status: str = "new"  # new, scanning, scanned or failed
+    folder_count: int = 0
+    file_count: int = 0
+    last_scanned: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        """Short name for menus and titles"""
+        return os.path.basename(self.root_path.rstrip("/\\")) or self.root_path
+
+    @property
+    def is_scanned(self) -> bool:
+        """Whether the root has been scanned completely at least once"""
+        return self.scan_status == "scanned"
@@ -0,0 +1,109 @@
+# /app/classes/offscreen_slideshow.py
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from PIL import Image
+from .slideshow_engine import SlideshowEngine
+
+
+@dataclass
+class OffscreenTick:
+    """Result of one offscreen tick"""
+    latency_ms: float  # From the start of the tick until every cell was drawn
+    wait_ms: float  # Part of the latency spent waiting for the workers
+    cells_drawn: int = 0
+    videos_skipped: int = 0
+    errors: int = 0
+    late_cells: List[int] = field(default_factory=list)  # Cells whose image wasn't ready at the start
+
+
+class OffscreenSlideshow:
+    """
+    Runs a SlideshowEngine without Tk, drawing every cell into a single PIL image.
+    Used to benchmark slideshow throughput on machines without a display.
+    Videos are not played offscreen, their cells are left black.
+    """
+
+    def __init__(self, engine: SlideshowEngine, window_size: Tuple[int, int] = (1920, 1080)):
+        """
+        Initialize the OffscreenSlideshow.
+
+        Args:
+            engine: The engine that prepares the images
+            window_size: The (width, height) of the simulated slideshow window
+        """
+        self.engine = engine
+        self.window_size = window_size
+        self.rects = engine.layout.compute_rects(*window_size)
+        self.cell_sizes = engine.compute_cell_sizes(*window_size)
+        self.frame = Image.new("RGB", window_size, "black")
+
+    def start(self):
+        """Start preparing the first image for every cell"""
+        for cell_index, size in enumerate(self.cell_sizes):
+            self.engine.request(cell_index, size)
+
+    def tick(self, cells: Optional[List[int]] = None, timeout: Optional[float] = None) -> OffscreenTick:
+        """
+        Draw the next image in the given cells, waiting for the workers where needed.
+
+        Args:
+            cells: Indices of the cells to advance, defaults to all cells
+            timeout: Seconds to wait per cell, None waits until its image is ready
+
+        Returns:
+            The OffscreenTick with the timings of this tick
+        """
+        cells = cells if cells is not None else list(range(len(self.rects)))
+        start = time.perf_counter()
+        wait_seconds = 0.0
+        result = OffscreenTick(latency_ms=0.0, wait_ms=0.0)
+
+        for cell_index in cells:
+            prepared = self.engine.take(cell_index)
+            if prepared is None:
+                result.late_cells.append(cell_index)
+                wait_start = time.perf_counter()
+                prepared = self.engine.take(cell_index, timeout=timeout)
+                wait_seconds += time.perf_counter() - wait_start
+                if prepared is None:
+                    continue
+
+            if prepared.is_video:
+                result.videos_skipped += 1
+                self._draw(cell_index, None)
+            elif prepared.error:
+                result.errors += 1
+                self._draw(cell_index, None)
+            else:
+                image = prepared.image if prepared.image is not None else prepared.gif_frames.frames[0]
+                self._draw(cell_index, image)
+                self.engine.mark_shown()
+                result.cells_drawn += 1
+
+            self.engine.request(cell_index, self.cell_sizes[cell_index])
+
+        result.latency_ms = (time.perf_counter() - start) * 1000
+        result.wait_ms = wait_seconds * 1000
+        return result
+
+    def _draw(self, cell_index: int, image: Optional[Image.Image]):
+        """Clear a cell's rectangle and draw an image centered in it"""
+        x, y, width, height = self.rects[cell_index]
+        self.frame.paste((0, 0, 0), (x, y, x + width, y + height))
+        if image is None:
+            return
+
+        position = (x + (width - image.width) // 2, y + (height - image.height) // 2)
+        if image.mode == "RGBA":
+            self.frame.paste(image, position, image)
+        else:
+            self.frame.paste(image, position)
+
+    def save_frame(self, file_path: str):
+        """Save the current composited frame, e.g. to check the layout"""
+        self.frame.save(file_path)
+
+    def shutdown(self):
+        """Stop the engine's worker threads"""
+        self.engine.shutdown()
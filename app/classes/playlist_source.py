@@ -0,0 +1,269 @@
+# /app/classes/playlist_source.py
+"""
+Where a slideshow gets its next file from.
+
+A PlaylistSource hands out files in random order as a shuffle bag: every file
+is shown once per cycle before any file repeats. Files are drawn lazily, so
+the first one is available straight away however large the source is:
+
+    ShuffleBagSource   a list in memory, shuffled with a lazy Fisher-Yates:
+                       each draw swaps one random remaining element into place,
+                       so nothing is copied or shuffled up front
+    DatabaseSource     files in the database, e.g. a smart collection, read in
+                       keyset blocks of up to block_size files starting at
+                       random media_file_ids; only one block is in memory at a time
+
+OrderedSource hands out a list in its own order instead, e.g. sorted by capture
+date, starting over at the end.
+
+next() takes the keys of files other cells are showing or preparing, and holds
+such a file back for a later draw, so two cells don't show the same file at
+once unless there are fewer files than cells.
+"""
+import random
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Collection, Deque, Dict, Iterable, List, Optional, Tuple, Union
+from .media_file import MediaFile
+
+# Files per keyset block of a DatabaseSource
+DEFAULT_BLOCK_SIZE = 256
+
+FileKey = Union[int, Tuple[str, str]]
+
+
+def file_key(media_file: MediaFile) -> FileKey:
+    """Identify a file: its media_file_id, or its path for files that aren't stored yet"""
+    if media_file.media_file_id is not None:
+        return media_file.media_file_id
+    return (media_file.folder_path, media_file.file_name)
+
+
+class PlaylistSource(ABC):
+    """Base class of the slideshow sources, subclasses implement _draw()"""
+
+    def __init__(self, rng: Optional[random.Random] = None):
+        """
+        Initialize the PlaylistSource.
+
+        Args:
+            rng: Random number generator, e.g. seeded for benchmarks
+        """
+        self.rng = rng or random.Random()
+        self.cycles = 0  # Completed passes over the whole source
+        self._held_back: Deque[MediaFile] = deque()  # Drawn while another cell had them
+
+    @abstractmethod
+    def _draw(self) -> Optional[MediaFile]:
+        """Draw the next file of the shuffle bag, starting a new cycle when it is empty; None if there are no files"""
+
+    def next(self, exclude: Collection[FileKey] = ()) -> Optional[MediaFile]:
+        """
+        Get the next file to show.
+
+        Args:
+            exclude: Keys (see file_key) of files that must not be returned now, e.g. those in other cells
+
+        Returns:
+            The file, None if the source has no files
+        """
+        for index, media_file in enumerate(self._held_back):
+            if file_key(media_file) not in exclude:
+                del self._held_back[index]
+                return media_file
+        # Every excluded file is drawn at most once before a free one turns up
+        for _ in range(len(exclude) + 1):
+            media_file = self._draw()
+            if media_file is None:
+                break
+            if file_key(media_file) not in exclude:
+                return media_file
+            self._held_back.append(media_file)
+        # Fewer files than cells, a repeat can't be avoided
+        return self._held_back.popleft() if self._held_back else None
+
+    def has_files(self) -> bool:
+        """Whether there is anything to show, without drawing a file for good"""
+        if self._held_back:
+            return True
+        media_file = self._draw()
+        if media_file is None:
+            return False
+        self._held_back.appendleft(media_file)
+        return True
+
+    def close(self):
+        """Release what the source holds, e.g. buffered rows"""
+        self._held_back.clear()
+
+
+class ShuffleBagSource(PlaylistSource):
+    """A shuffle bag over a list of MediaFiles"""
+
+    def __init__(self, media_files: List[MediaFile], media_types: Optional[Iterable[str]] = None,
+                 rng: Optional[random.Random] = None):
+        """
+        Initialize the ShuffleBagSource.
+
+        Args:
+            media_files: The files, the list is not copied
+            media_types: Only hand out files of these media types, skipped lazily as they are drawn
+            rng: Random number generator
+        """
+        super().__init__(rng)
+        self.media_files = media_files
+        self.media_types = {media_type.lower() for media_type in media_types} if media_types else None
+        self._swaps: Dict[int, int] = {}  # Positions whose element was swapped, the rest hold themselves
+        self._drawn = 0  # Positions before this one have been drawn in this cycle
+        self._hits = 0  # Files handed out in this cycle
+
+    def _draw(self) -> Optional[MediaFile]:
+        size = len(self.media_files)
+        while True:
+            if self._drawn >= size:
+                if self._hits == 0:
+                    return None  # A whole cycle without a single file to show
+                self.cycles += 1
+                self._swaps.clear()
+                self._drawn = self._hits = 0
+                if size == 0:
+                    return None
+            # One step of Fisher-Yates: swap a random remaining position into the next place
+            chosen = self.rng.randrange(self._drawn, size)
+            picked = self._swaps.get(chosen, chosen)
+            current = self._swaps.pop(self._drawn, self._drawn)
+            if chosen != self._drawn:
+                self._swaps[chosen] = current
+            self._drawn += 1
+            media_file = self.media_files[picked]
+            if self.media_types is None or media_file.media_type.lower() in self.media_types:
+                self._hits += 1
+                return media_file
+
+
+class OrderedSource(PlaylistSource):
+    """A list of MediaFiles handed out in order, over and over"""
+
+    def __init__(self, media_files: List[MediaFile], media_types: Optional[Iterable[str]] = None):
+        """
+        Initialize the OrderedSource.
+
+        Args:
+            media_files: The files in the order to show them, the list is not copied
+            media_types: Only hand out files of these media types, skipped as they come up
+        """
+        super().__init__()
+        self.media_files = media_files
+        self.media_types = {media_type.lower() for media_type in media_types} if media_types else None
+        self._position = 0
+        self._hits = 0  # Files handed out in this cycle
+
+    def _draw(self) -> Optional[MediaFile]:
+        while True:
+            if self._position >= len(self.media_files):
+                if self._hits == 0:
+                    return None  # A whole cycle without a single file to show
+                self.cycles += 1
+                self._position = self._hits = 0
+            media_file = self.media_files[self._position]
+            self._position += 1
+            if self.media_types is None or media_file.media_type.lower() in self.media_types:
+                self._hits += 1
+                return media_file
+
+
+class DatabaseSource(PlaylistSource):
+    """
+    A shuffle bag over files in the database, read a keyset block at a time.
+    A cycle keeps the media_file_id ranges it hasn't read yet. Each block starts
+    at a random id in a random unread range and takes the next block_size files
+    from there through the primary key, so sparse ids cost no empty reads; the
+    ids it covered are cut out of the range. Files are drawn from the block in
+    random order; files added during a cycle join the next one, files deleted
+    drop out when their range is read.
+    """
+
+    def __init__(self, library, collection_id: Optional[int] = None, root_ids: Optional[List[int]] = None,
+                 media_types: Optional[Iterable[str]] = None, block_size: int = DEFAULT_BLOCK_SIZE,
+                 rng: Optional[random.Random] = None):
+        """
+        Initialize the DatabaseSource.
+
+        Args:
+            library: The MediaLibrary to read from
+            collection_id: Only the members of this smart collection
+            root_ids: Only files in these roots, None for all roots
+            media_types: Only files of these media types
+            block_size: Files per block, and the number of files kept buffered
+            rng: Random number generator
+        """
+        super().__init__(rng)
+        self.library = library
+        self.collection_id = collection_id
+        self.root_ids = root_ids
+        self.media_types = list(media_types) if media_types else None
+        self.block_size = max(block_size, 1)
+        self.queries = 0  # Blocks read, for the stats
+        self._unread: List[Tuple[int, int]] = []  # [low, high) id ranges still to read in this cycle
+        self._buffer: List[MediaFile] = []
+        self._cycle_started = False
+        self._hits = 0
+
+    def _start_cycle(self) -> bool:
+        """Start a cycle over the current id range, False if there are no files at all"""
+        id_range = self.library.media_file_id_range(self.collection_id, self.root_ids)
+        if id_range is None:
+            return False
+        low, high = id_range
+        self._unread = [(low, high + 1)]
+        self._cycle_started = True
+        self._hits = 0
+        return True
+
+    def _read(self, low: int, high: int):
+        """Read a block from low on into the buffer, keeping the part of [low, high) it didn't reach unread"""
+        self._buffer = self.library.files_from_id(
+            low, high, self.block_size, self.collection_id, self.root_ids, self.media_types
+        )
+        self.queries += 1
+        if len(self._buffer) == self.block_size and self._buffer[-1].media_file_id + 1 < high:
+            self._unread.append((self._buffer[-1].media_file_id + 1, high))
+
+    def _fill(self) -> bool:
+        """Read blocks until the buffer has files or the cycle is over"""
+        while not self._buffer and self._unread:
+            # Take a random unread range, swapping it with the last one so the removal is O(1)
+            index = self.rng.randrange(len(self._unread))
+            self._unread[index], self._unread[-1] = self._unread[-1], self._unread[index]
+            low, high = self._unread.pop()
+            start = self.rng.randrange(low, high)
+            self._read(start, high)
+            if start > low:
+                if self._buffer:
+                    self._unread.append((low, start))
+                else:
+                    # Nothing from start on, read the rest of the range right away rather than sampling it again
+                    self._read(low, start)
+        return bool(self._buffer)
+
+    def _draw(self) -> Optional[MediaFile]:
+        if not self._cycle_started and not self._start_cycle():
+            return None
+        if not self._fill():
+            if self._hits == 0:
+                self._cycle_started = False
+                return None
+            self.cycles += 1
+            if not self._start_cycle() or not self._fill():
+                self._cycle_started = False
+                return None
+        # Swap a random buffered file to the end and take it
+        index = self.rng.randrange(len(self._buffer))
+        self._buffer[index], self._buffer[-1] = self._buffer[-1], self._buffer[index]
+        self._hits += 1
+        return self._buffer.pop()
+
+    def close(self):
+        super().close()
+        self._buffer = []
+        self._unread = []
@@ -0,0 +1,157 @@
+# /app/classes/scan_rules.py
+"""
+Rules deciding which directories and files a scan skips.
+
+Stored in the Parameters table:
+    scan_exclude          Globs separated by ';', e.g. ".git;node_modules;@eaDir".
+                          A glob without '/' matches the name of a directory or file,
+                          one with '/' its path relative to the root. Defaults to
+                          DEFAULT_EXCLUDE, an empty value excludes nothing.
+    scan_exclude_regex    Regular expressions separated by ';', matched against the
+                          path relative to the root (with '/' separators)
+    scan_ignore_file      Name of per-directory ignore files, default ".mediaignore".
+                          Each line is a glob applying to that directory and everything
+                          below it ('#' starts a comment). An empty ignore file skips
+                          the directory it is in, like Android's .nomedia.
+    scan_max_depth        Deepest level to descend to, the root is level 0. Empty for no limit.
+    scan_follow_symlinks  'true' to descend into symlinked directories. Directories are
+                          never visited twice either way, so symlink loops and bind
+                          mounts can't make a scan run forever.
+"""
+import fnmatch
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Pattern
+
+# Version control, caches and NAS/OS metadata that never hold media worth showing
+DEFAULT_EXCLUDE = [
+    ".git", ".hg", ".svn", "node_modules", "__pycache__", ".cache", ".venv",
+    "@eaDir", "#recycle", "#snapshot", ".@__thumb", "$RECYCLE.BIN", "System Volume Information",
+    ".Trash-*", ".Trashes", ".Spotlight-V100", ".fseventsd",
+]
+DEFAULT_IGNORE_FILE = ".mediaignore"
+PATTERN_SEPARATOR = ";"
+
+
+def _split(value: Optional[str]) -> List[str]:
+    """Split a parameter value into its patterns"""
+    if not value:
+        return []
+    return [pattern.strip() for pattern in value.split(PATTERN_SEPARATOR) if pattern.strip()]
+
+
+def compile_globs(globs: List[str]) -> Optional[Pattern]:
+    """
+    Compile globs into one regular expression matched against a name or relative path.
+
+    Returns:
+        The compiled pattern, None if there are no globs
+    """
+    parts = []
+    for glob in globs:
+        glob = glob.strip().rstrip("/")
+        if not glob:
+            continue
+        if "/" in glob:
+            # Relative path, e.g. "photos/raw" or "**/exports"
+            parts.append(fnmatch.translate(glob.lstrip("/")))
+        else:
+            # Name of any directory or file, wherever it is
+            parts.append(r"(?:.*/)?" + fnmatch.translate(glob))
+    return re.compile("|".join(parts)) if parts else None
+
+
+def read_ignore_file(path: str) -> Optional[List[str]]:
+    """
+    Read the globs of an ignore file.
+
+    Returns:
+        The globs, an empty list if the file has none (skip the whole directory), None if it can't be read
+    """
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            lines = [line.split("#", 1)[0].strip() for line in f]
+    except OSError:
+        return None
+    return [line for line in lines if line]
+
+
+@dataclass
+class SkipCounts:
+    """What a scan skipped, and why"""
+    excluded_directories: int = 0  # Matched scan_exclude or scan_exclude_regex
+    excluded_files: int = 0
+    ignored_directories: int = 0  # Matched an ignore file, or contain an empty one
+    ignored_files: int = 0
+    too_deep: int = 0  # Directories below scan_max_depth
+    symlinks: int = 0  # Symlinked directories not followed
+    revisited: int = 0  # Directories already scanned through another path (symlink loops, bind mounts)
+
+    def add(self, other: 'SkipCounts'):
+        """Add the counts of another SkipCounts"""
+        for name in self.__dataclass_fields__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def to_dict(self) -> Dict[str, int]:
+        """Convert to a dictionary for progress output"""
+        counts = {name: getattr(self, name) for name in self.__dataclass_fields__}
+        counts['directories'] = (self.excluded_directories + self.ignored_directories + self.too_deep
+                                 + self.symlinks + self.revisited)
+        counts['files'] = self.excluded_files + self.ignored_files
+        return counts
+
+
+@dataclass
+class ScanRules:
+    """Exclusion rules for a scan, compiled once in compile() before the scan starts"""
+    exclude: List[str] = field(default_factory=lambda: list(DEFAULT_EXCLUDE))
+    exclude_regex: List[str] = field(default_factory=list)
+    ignore_file: Optional[str] = DEFAULT_IGNORE_FILE
+    max_depth: Optional[int] = None
+    follow_symlinks: bool = False
+    _glob_pattern: Optional[Pattern] = field(default=None, init=False, repr=False, compare=False)
+    _regex_pattern: Optional[Pattern] = field(default=None, init=False, repr=False, compare=False)
+
+    @classmethod
+    def from_parameters(cls, get_parameter: Callable) -> 'ScanRules':
+        """
+        Read the rules from the Parameters table.
+
+        Args:
+            get_parameter: Like MediaLibrary.get_parameter(name, default)
+        """
+        exclude = get_parameter('scan_exclude')
+        max_depth = get_parameter('scan_max_depth')
+        try:
+            max_depth = int(max_depth) if max_depth not in (None, "") else None
+        except ValueError:
+            print(f"Ignoring invalid scan_max_depth: {max_depth}", file=sys.stderr)
+            max_depth = None
+        return cls(
+            exclude=list(DEFAULT_EXCLUDE) if exclude is None else _split(exclude),
+            exclude_regex=_split(get_parameter('scan_exclude_regex')),
+            ignore_file=get_parameter('scan_ignore_file', DEFAULT_IGNORE_FILE) or None,
+            max_depth=max_depth,
+            follow_symlinks=str(get_parameter('scan_follow_symlinks', 'false')).lower() == 'true',
+        )
+
+    def compile(self) -> 'ScanRules':
+        """Compile the globs and the regular expressions, each into one pattern; raises ValueError on a bad regex"""
+        self._glob_pattern = compile_globs(self.exclude)
+        for regex in self.exclude_regex:
+            try:
+                re.compile(regex)
+            except re.error as e:
+                raise ValueError(f"Invalid scan_exclude_regex {regex!r}: {e}") from e
+        self._regex_pattern = (
+            re.compile("|".join(f"(?:{regex})" for regex in self.exclude_regex)) if self.exclude_regex else None
+        )
+        return self
+
+    def excludes(self, relative_path: str) -> bool:
+        """Whether a directory or file, given by its path relative to the root with '/' separators, is excluded"""
+        # Globs are anchored by fnmatch.translate, the regular expressions may match anywhere
+        if self._glob_pattern is not None and self._glob_pattern.match(relative_path):
+            return True
+        return self._regex_pattern is not None and self._regex_pattern.search(relative_path) is not None
@@ -0,0 +1,92 @@
+# /app/classes/slideshow_engine.py
+from typing import List, Optional, Tuple, Union
+from .media_file import MediaFile
+from .image_loading import get_display_box
+from .image_prefetcher import ImagePrefetcher, PreparedImage, PrefetchStats
+from .gif_frame_cache import GifFrameCache
+from .decode_backend import DecodeBackend
+from .slideshow_layout import SlideshowLayout
+from .playlist_source import PlaylistSource, ShuffleBagSource
+from .slideshow_transition import DEFAULT_TRANSITION_MS
+
+# Media types a slideshow can show
+SLIDESHOW_MEDIA_TYPES = ["image", "gif", "video"]
+
+
+class SlideshowEngine:
+    """
+    The part of a slideshow that doesn't need Tk: which media it shows, how
+    the window is divided into cells, and picking, decoding and scaling the
+    next item for every cell. MultiSlideshowWindow draws its output on screen,
+    OffscreenSlideshow draws it into an image buffer.
+    """
+
+    def __init__(self, media_files: Union[List[MediaFile], PlaylistSource], layout: Optional[SlideshowLayout] = None,
+                 max_workers: int = 2, gif_cache: Optional[GifFrameCache] = None,
+                 decode_backend: Optional[DecodeBackend] = None):
+        """
+        Initialize the SlideshowEngine.
+
+        Args:
+            media_files: A PlaylistSource, or a list of MediaFile objects; anything that can't be shown is skipped
+            layout: Grid and cell spans, defaults to a 2x4 grid
+            max_workers: Number of decode worker threads
+            gif_cache: Cache for decoded GIF frames, shared between all cells
+            decode_backend: Where still images are decoded, e.g. a ProcessDecodeBackend; the caller shuts it down
+        """
+        self.source = self.make_source(media_files)
+        self.layout = layout or SlideshowLayout(rows=2, columns=4)
+        self.prefetcher = ImagePrefetcher(self.source, max_workers=max_workers, gif_cache=gif_cache,
+                                          decode_backend=decode_backend)
+
+    @staticmethod
+    def make_source(media_files: Union[List[MediaFile], PlaylistSource]) -> PlaylistSource:
+        """Wrap a list in a shuffle bag that skips what a slideshow can't show, sources are used as they are"""
+        if isinstance(media_files, PlaylistSource):
+            return media_files
+        return ShuffleBagSource(media_files, SLIDESHOW_MEDIA_TYPES)
+
+    @staticmethod
+    def filter_media(media_files: List[MediaFile]) -> List[MediaFile]:
+        """Keep only the files a slideshow can show"""
+        return [f for f in media_files if f.media_type.lower() in SLIDESHOW_MEDIA_TYPES]
+
+    @property
+    def cell_count(self) -> int:
+        """Number of cells in the layout"""
+        return len(self.layout.cells)
+
+    @property
+    def stats(self) -> PrefetchStats:
+        """Prefetch statistics"""
+        return self.prefetcher.stats
+
+    def compute_cell_sizes(self, width: int, height: int) -> List[Tuple[int, int]]:
+        """
+        Get the box every cell scales its images to, for a window size.
+
+        Args:
+            width: Window width in pixels
+            height: Window height in pixels
+
+        Returns:
+            One (width, height) box per cell, in cell order
+        """
+        return [get_display_box(w, h) for _, _, w, h in self.layout.compute_rects(width, height)]
+
+    def request(self, cell_index: int, target_size: Tuple[int, int], transition_steps: int = 0,
+                transition_ms: int = DEFAULT_TRANSITION_MS):
+        """Start preparing the next item for a cell, with a crossfade of transition_steps frames to it"""
+        self.prefetcher.request(cell_index, target_size, transition_steps, transition_ms)
+
+    def take(self, cell_index: int, timeout: Optional[float] = 0.0) -> Optional[PreparedImage]:
+        """Take the prepared item for a cell, see ImagePrefetcher.take"""
+        return self.prefetcher.take(cell_index, timeout)
+
+    def mark_shown(self):
+        """Count an item that made it onto the screen (or buffer)"""
+        self.prefetcher.mark_shown()
+
+    def shutdown(self):
+        """Stop the worker threads"""
+        self.prefetcher.shutdown()
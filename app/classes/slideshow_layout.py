@@ -0,0 +1,111 @@
+# /app/classes/slideshow_layout.py
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+# (x, y, width, height) in pixels
+Rect = Tuple[int, int, int, int]
+
+
+@dataclass(frozen=True)
+class CellSpec:
+    """Position of a slideshow cell in the grid, spanning one or more rows/columns"""
+    row: int
+    column: int
+    rowspan: int = 1
+    columnspan: int = 1
+
+
+class SlideshowLayout:
+    """
+    Describes how the slideshow window is divided into cells.
+    Any rows x columns grid, where cells can be merged by giving them a span > 1.
+    """
+
+    def __init__(self, rows: int = 2, columns: int = 4, cells: Optional[List[CellSpec]] = None):
+        """
+        Initialize the SlideshowLayout.
+
+        Args:
+            rows: Number of grid rows
+            columns: Number of grid columns
+            cells: Cell positions; defaults to one cell per grid position
+        """
+        if rows < 1 or columns < 1:
+            raise ValueError("A slideshow layout needs at least one row and one column")
+
+        self.rows = rows
+        self.columns = columns
+        self.cells: List[CellSpec] = cells or [
+            CellSpec(row, column) for row in range(rows) for column in range(columns)
+        ]
+        self._validate()
+
+    @classmethod
+    def from_spec(cls, rows: int, columns: int, merged: str = "") -> 'SlideshowLayout':
+        """
+        Build a layout from the way it is stored in the parameters.
+
+        Args:
+            rows: Number of grid rows
+            columns: Number of grid columns
+            merged: Merged cells as 'row,column,rowspan,columnspan' separated by ';', counted from 0,
+                    e.g. '0,0,2,2' for a big cell in the top left; every other grid position is a cell of its own
+
+        Returns:
+            The SlideshowLayout, cells in row-major order; raises ValueError for an invalid spec
+        """
+        cells = []
+        for part in filter(None, (p.strip() for p in merged.split(";"))):
+            try:
+                row, column, rowspan, columnspan = (int(value) for value in part.split(","))
+            except ValueError:
+                raise ValueError(f"Invalid merged cell {part!r}, expected row,column,rowspan,columnspan") from None
+            cells.append(CellSpec(row, column, rowspan, columnspan))
+        covered = {(row, column) for cell in cells
+                   for row in range(cell.row, cell.row + cell.rowspan)
+                   for column in range(cell.column, cell.column + cell.columnspan)}
+        cells.extend(CellSpec(row, column) for row in range(rows) for column in range(columns)
+                     if (row, column) not in covered)
+        return cls(rows, columns, sorted(cells, key=lambda cell: (cell.row, cell.column)))
+
+    def _validate(self):
+        """Check that all cells are inside the grid and don't overlap"""
+        occupied = set()
+        for cell in self.cells:
+            if cell.rowspan < 1 or cell.columnspan < 1:
+                raise ValueError(f"Cell {cell} must span at least one row and column")
+            if cell.row < 0 or cell.column < 0 or cell.row + cell.rowspan > self.rows \
+                    or cell.column + cell.columnspan > self.columns:
+                raise ValueError(f"Cell {cell} does not fit in a {self.rows}x{self.columns} grid")
+
+            for row in range(cell.row, cell.row + cell.rowspan):
+                for column in range(cell.column, cell.column + cell.columnspan):
+                    if (row, column) in occupied:
+                        raise ValueError(f"Cell {cell} overlaps another cell at row {row}, column {column}")
+                    occupied.add((row, column))
+
+    def compute_rects(self, width: int, height: int) -> List[Rect]:
+        """
+        Compute the pixel rectangle of every cell for a window size.
+        Grid lines are rounded once, so neighbouring cells tile without gaps.
+
+        Args:
+            width: Window width in pixels
+            height: Window height in pixels
+
+        Returns:
+            One (x, y, width, height) rectangle per cell, in cell order
+        """
+        column_edges = [round(width * i / self.columns) for i in range(self.columns + 1)]
+        row_edges = [round(height * i / self.rows) for i in range(self.rows + 1)]
+
+        rects = []
+        for cell in self.cells:
+            x = column_edges[cell.column]
+            y = row_edges[cell.row]
+            rects.append((
+                x, y,
+                column_edges[cell.column + cell.columnspan] - x,
+                row_edges[cell.row + cell.rowspan] - y
+            ))
+        return rects
@@ -1,16 +1,281 @@
 # /app/classes/slideshow_manager.py
+import time
 import tkinter as tk
+from abc import ABC, abstractmethod
 from tkinter import messagebox
-from typing import List, Optional
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from PIL import Image, ImageTk
-import os
-import random
 from .media_file import MediaFile
+from .image_loading import get_display_box
+from .decode_backend import DecodeBackend
+from .slideshow_engine import SlideshowEngine
+from .playlist_source import PlaylistSource
+from .slideshow_scheduler import SlideshowScheduler, SlideshowTimer
+from .video_player import VideoPlayer
+from .gif_frame_cache import GifFrames
+from .slideshow_layout import Rect, SlideshowLayout
+from .slideshow_metrics import CellRenderRecord, SlideshowMetrics, TickRecord
+from .slideshow_transition import DEFAULT_TRANSITION_MS, DEFAULT_TRANSITION_STEPS, Crossfade, TransitionBudget
+
+# A video with a known duration is cut off this long after it should have ended, in case playback stalls
+CLIP_STALL_GRACE_MS = 2000
+
+
+class BaseSlideshowCell(ABC):
+    """
+    Playback logic shared by all slideshow cells: images, animated GIFs and videos.
+    Subclasses decide where the PhotoImage is drawn.
+    Each cell displays images but doesn't manage timing.
+    """
+    def __init__(self, widget: tk.Misc):
+        """
+        Initialize the cell.
+
+        Args:
+            widget: The widget the cell draws on, also used to schedule after() callbacks
+        """
+        self.widget = widget
+        self.decode_backend = DecodeBackend()  # Used by display_image
+        self.video_player: Optional[VideoPlayer] = None
+        self.gif_frames: Optional[GifFrames] = None
+        self.gif_frame_index = 0
+        self.gif_after_id = None
+        self.transition: Optional[Crossfade] = None  # The crossfade playing, its target image and when it started
+        self.transition_image: Optional[Image.Image] = None
+        self.transition_start = 0.0
+        self.transition_index = 0  # The frame shown
+        self.transition_after_id = None
+        self.transition_skipped = 0
+        self.on_transition_done: Optional[Callable[[int], None]] = None  # Called with the frames skipped
+        self.last_timings_ms: Dict[str, float] = {}  # Tk side timings of the last item shown
+
+    @abstractmethod
+    def _get_frame_size(self) -> Tuple[int, int]:
+        """Get the size of the area this cell occupies."""
+
+    @abstractmethod
+    def _get_photo(self) -> Optional[ImageTk.PhotoImage]:
+        """Get the PhotoImage the cell shows now."""
+
+    @abstractmethod
+    def _set_photo(self, tk_image: Optional[ImageTk.PhotoImage]):
+        """Show a PhotoImage in the cell, or nothing for None."""
+
+    def get_display_size(self) -> Tuple[int, int]:
+        """Get the (width, height) box images should be scaled to for this cell."""
+        return get_display_box(*self._get_frame_size())
+
+    def display_image(self, image_path: str):
+        """
+        Display an image in this cell, decoded by the cell's decode_backend while the calling thread waits.
+
+        Args:
+            image_path: Path to the image file to display
+        """
+        try:
+            self.show_image(self.decode_backend.decode(image_path, self.get_display_size()))
+        except Exception as e:
+            print(f"Error loading image: {e}")
+            # Clear the cell if there's an error
+            self.clear()
+
+    def show_image(self, pil_image: Image.Image, transition: Optional[Crossfade] = None):
+        """
+        Show an image that has already been scaled to this cell's size.
+
+        Args:
+            pil_image: The scaled PIL image
+            transition: Crossfade frames to play first, from the image the cell shows now
+        """
+        self.stop_video()
+        self.stop_gif()
+        self.stop_transition(finish=False)
+
+        if transition is not None and self.has_image():
+            self._start_transition(pil_image, transition)
+            return
+
+        # Convert to PhotoImage
+        start = time.perf_counter()
+        tk_image = ImageTk.PhotoImage(pil_image)
+        converted = time.perf_counter()
+        self._set_photo(tk_image)
+        self.last_timings_ms = {
+            'photo_ms': (converted - start) * 1000,
+            'configure_ms': (time.perf_counter() - converted) * 1000,
+        }
+
+    def _start_transition(self, pil_image: Image.Image, transition: Crossfade):
+        """Show the first crossfade frame in a new PhotoImage, the later ones are pasted into it"""
+        start = time.perf_counter()
+        tk_image = ImageTk.PhotoImage(transition.frames[0])
+        converted = time.perf_counter()
+        self._set_photo(tk_image)
+        self.last_timings_ms = {
+            'photo_ms': (converted - start) * 1000,
+            'configure_ms': (time.perf_counter() - converted) * 1000,
+        }
+        self.transition = transition
+        self.transition_image = pil_image
+        self.transition_start = start
+        self.transition_index = 0
+        self.transition_skipped = 0
+        self.transition_after_id = self.widget.after(max(int(transition.frame_ms), 1), self._show_transition_frame)
+
+    def _show_transition_frame(self):
+        """
+        Paste the crossfade frame that is due now and schedule the next one. Frames
+        whose time has passed are skipped, so a busy Tk loop shortens the fade
+        instead of stretching it; once the frames are over the target image is shown.
+        """
+        self.transition_after_id = None
+        transition = self.transition
+        if transition is None:
+            return
+        elapsed_ms = (time.perf_counter() - self.transition_start) * 1000
+        due = int(elapsed_ms // transition.frame_ms)
+        if due > self.transition_index:
+            self.transition_skipped += min(due, len(transition.frames)) - self.transition_index - 1
+            if due >= len(transition.frames):
+                self._finish_transition()
+                return
+            tk_image = self._get_photo()
+            if isinstance(tk_image, ImageTk.PhotoImage):
+                tk_image.paste(transition.frames[due])
+            self.transition_index = due
+        next_due_ms = (self.transition_index + 1) * transition.frame_ms - elapsed_ms
+        self.transition_after_id = self.widget.after(max(int(next_due_ms), 1), self._show_transition_frame)
+
+    def _finish_transition(self):
+        """Show the target image of the crossfade and report the frames that were skipped"""
+        pil_image, skipped = self.transition_image, self.transition_skipped
+        self.transition = None
+        self.transition_image = None
+        tk_image = self._get_photo()
+        if isinstance(tk_image, ImageTk.PhotoImage) and (tk_image.width(), tk_image.height()) == pil_image.size \
+                and pil_image.mode == "RGB":
+            tk_image.paste(pil_image)
+        else:
+            self._set_photo(ImageTk.PhotoImage(pil_image))
+        if self.on_transition_done is not None:
+            self.on_transition_done(skipped)
+
+    def stop_transition(self, finish: bool = True):
+        """
+        Stop the crossfade playing in this cell, if any.
+
+        Args:
+            finish: Show its target image straight away, rather than leaving the cell to be replaced
+        """
+        if self.transition_after_id:
+            self.widget.after_cancel(self.transition_after_id)
+            self.transition_after_id = None
+        if self.transition is not None:
+            if finish:
+                self._finish_transition()
+            else:
+                self.transition = None
+                self.transition_image = None
+
+    def play_video(self, video_path: str, on_finished):
+        """
+        Play a video in this cell, replacing whatever it shows now.
 
-class SlideshowCell:
+        Args:
+            video_path: Path to the video file
+            on_finished: Called when the clip has ended or could not be played
+        """
+        self.stop_video()
+        self.stop_gif()
+        self.stop_transition(finish=False)
+
+        start = time.perf_counter()
+        self.video_player = VideoPlayer(
+            self.widget, video_path, self.get_display_size(),
+            on_frame=self._show_video_frame, on_finished=on_finished
+        )
+        self.video_player.start()
+        self.last_timings_ms = {'video_start_ms': (time.perf_counter() - start) * 1000}
+
+    def is_playing_video(self) -> bool:
+        """Check whether a video is currently playing in this cell."""
+        return self.video_player is not None and self.video_player.is_playing
+
+    def stop_video(self):
+        """Stop the video playing in this cell, if any."""
+        if self.video_player:
+            self.video_player.stop()
+            self.video_player = None
+
+    def _show_video_frame(self, pil_image: Image.Image):
+        """Show a video frame, reusing the current PhotoImage when the size matches."""
+        tk_image = self._get_photo()
+        if isinstance(tk_image, ImageTk.PhotoImage) and (tk_image.width(), tk_image.height()) == pil_image.size:
+            # Pasting into the existing PhotoImage avoids a new image and a reconfigure per frame
+            tk_image.paste(pil_image)
+            return
+
+        self._set_photo(ImageTk.PhotoImage(pil_image))
+
+    def play_gif(self, gif_frames: GifFrames):
+        """
+        Play an animated GIF whose frames have already been scaled to this cell's size.
+
+        Args:
+            gif_frames: The decoded frames, possibly shared with other cells
+        """
+        self.stop_video()
+        self.stop_gif()
+        self.stop_transition(finish=False)
+
+        # Each frame's PhotoImage is built when it is first shown, every cell showing this GIF reuses them
+        start = time.perf_counter()
+        photo = gif_frames.photo_frame(0)
+        converted = time.perf_counter()
+
+        self.gif_frames = gif_frames
+        self.gif_frame_index = 0
+        self._show_gif_frame(photo)
+        self.last_timings_ms = {
+            'photo_ms': (converted - start) * 1000,
+            'configure_ms': (time.perf_counter() - converted) * 1000,
+        }
+
+    def _show_gif_frame(self, photo: Optional[ImageTk.PhotoImage] = None):
+        """Swap to the current GIF frame, converting it if no cell showed it before, and schedule the next one."""
+        self.gif_after_id = None
+        if not self.gif_frames:
+            return
+
+        self._set_photo(photo or self.gif_frames.photo_frame(self.gif_frame_index))
+
+        duration = self.gif_frames.durations_ms[self.gif_frame_index]
+        self.gif_frame_index = (self.gif_frame_index + 1) % len(self.gif_frames.frames)
+        self.gif_after_id = self.widget.after(duration, self._show_gif_frame)
+
+    def stop_gif(self):
+        """Stop the GIF animation in this cell, if any."""
+        if self.gif_after_id:
+            self.widget.after_cancel(self.gif_after_id)
+            self.gif_after_id = None
+        self.gif_frames = None
+
+    def has_image(self) -> bool:
+        """Check whether the cell is currently showing an image."""
+        return self._get_photo() is not None
+
+    def clear(self):
+        """Clear the current image display."""
+        self.stop_video()
+        self.stop_gif()
+        self.stop_transition(finish=False)
+        self._set_photo(None)
+
+class SlideshowCell(BaseSlideshowCell):
     """
     A class to manage a single cell in the slideshow grid.
-    Each cell displays images but doesn't manage timing.
+    The cell shows its images in a label inside its own frame.
     """
     def __init__(self, parent_frame: tk.Frame):
         """
@@ -19,6 +284,7 @@ class SlideshowCell:
         Args:
             parent_frame: The frame where this cell will display images
         """
+        super().__init__(parent_frame)
         self.parent_frame = parent_frame
         self.current_image_label = None
         self._create_image_label()
@@ -41,59 +307,70 @@ class SlideshowCell:
         self.current_image_label = tk.Label(self.parent_frame, bg='black', borderwidth=0, highlightthickness=0)
         self.current_image_label.pack(fill="both", expand=True)
 
-    def display_image(self, image_path: str):
-        """
-        Display an image in this cell.
-
-        Args:
-            image_path: Path to the image file to display
-        """
-        try:
-            # Open the image
-            pil_image = Image.open(image_path)
+    def _get_frame_size(self) -> Tuple[int, int]:
+        return self.parent_frame.winfo_width(), self.parent_frame.winfo_height()
 
-            # Get frame dimensions - ensure we have valid dimensions
-            frame_width = self.parent_frame.winfo_width()
-            frame_height = self.parent_frame.winfo_height()
+    def _get_photo(self) -> Optional[ImageTk.PhotoImage]:
+        return getattr(self.current_image_label, 'image', None)
 
-            # If dimensions are too small (like 1x1), use a default size
-            if frame_width <= 1 or frame_height <= 1:
-                frame_width = 400  # Default width
-                frame_height = 300  # Default height
+    def _set_photo(self, tk_image: Optional[ImageTk.PhotoImage]):
+        if self.current_image_label:
+            self.current_image_label.configure(image=tk_image or '')
+            self.current_image_label.image = tk_image  # Keep a reference
 
-            # Minimum dimensions to prevent tiny images
-            min_width, min_height = 100, 100
-            display_width = max(frame_width - 20, min_width)
-            display_height = max(frame_height - 20, min_height)
+class CanvasSlideshowCell(BaseSlideshowCell):
+    """
+    A slideshow cell drawn as a single image item on a canvas shared by all cells.
+    Swapping the image only damages the cell's own rectangle, and resizing just
+    moves the item, so there are no per-cell widgets to lay out.
+    """
+    def __init__(self, canvas: tk.Canvas, rect: Rect):
+        """
+        Initialize the CanvasSlideshowCell.
 
-            # Scale image to fit while maintaining aspect ratio
-            width, height = pil_image.size
-            ratio = min(display_width/width, display_height/height)
-            new_size = (int(width * ratio), int(height * ratio))
+        Args:
+            canvas: The canvas shared by all cells
+            rect: The (x, y, width, height) area of the canvas this cell occupies
+        """
+        super().__init__(canvas)
+        self.canvas = canvas
+        self.rect = rect
+        self.photo: Optional[ImageTk.PhotoImage] = None
+        self.image_item = canvas.create_image(*self._center(), anchor="center")
+
+    def _center(self) -> Tuple[int, int]:
+        """Get the center of the cell's rectangle."""
+        x, y, width, height = self.rect
+        return x + width // 2, y + height // 2
+
+    def set_rect(self, rect: Rect):
+        """
+        Move the cell to a new rectangle, e.g. after the window was resized.
 
-            # Resize the image
-            resized_image = pil_image.resize(new_size, Image.LANCZOS)
+        Args:
+            rect: The new (x, y, width, height) area
+        """
+        if rect != self.rect:
+            self.rect = rect
+            self.canvas.coords(self.image_item, *self._center())
 
-            # Convert to PhotoImage
-            tk_image = ImageTk.PhotoImage(resized_image)
+    def _get_frame_size(self) -> Tuple[int, int]:
+        return self.rect[2], self.rect[3]
 
-            # Update the label
-            if self.current_image_label:
-                self.current_image_label.configure(image=tk_image)
-                self.current_image_label.image = tk_image  # Keep a reference
+    def _get_photo(self) -> Optional[ImageTk.PhotoImage]:
+        return self.photo
 
-        except Exception as e:
-            print(f"Error loading image: {e}")
-            # Clear the label if there's an error
-            if self.current_image_label:
-                self.current_image_label.configure(image='')
-                self.current_image_label.image = None
+    def _set_photo(self, tk_image: Optional[ImageTk.PhotoImage]):
+        if tk_image is not self.photo:
+            self.canvas.itemconfigure(self.image_item, image=tk_image or '')
+            self.photo = tk_image  # Keep a reference
 
-    def clear(self):
-        """Clear the current image display."""
-        if self.current_image_label:
-            self.current_image_label.configure(image='')
-            self.current_image_label.image = None
+@dataclass
+class CellTimerConfig:
+    """Timing for a group of slideshow cells that change image together"""
+    cells: List[int]
+    interval_ms: int
+    phase_ms: Optional[int] = None  # None staggers the group evenly with the others
 
 class MultiSlideshowWindow:
     """
@@ -101,12 +378,28 @@ class MultiSlideshowWindow:
     This class is responsible for scheduling all image changes.
     """
 
-    def __init__(self, image_files: List[MediaFile]):
+    def __init__(self, image_files: Union[List[MediaFile], PlaylistSource], delay: int = 8000,
+                 timer_configs: Optional[List[CellTimerConfig]] = None,
+                 layout: Optional[SlideshowLayout] = None, renderer: str = "frames",
+                 metrics_log_path: Optional[str] = None, max_clip_ms: Optional[int] = None,
+                 transition_ms: int = DEFAULT_TRANSITION_MS, transition_steps: int = DEFAULT_TRANSITION_STEPS,
+                 decode_backend: Optional[DecodeBackend] = None):
         """
         Initialize the MultiSlideshowWindow with image files.
 
         Args:
-            image_files: List of MediaFile objects to display across all slideshows
+            image_files: MediaFile objects to display across all slideshows, or a PlaylistSource
+                         drawing them e.g. from the database
+            delay: Time in ms each cell shows an image, when no timer_configs are given
+            timer_configs: Optional per cell (group) intervals and phase offsets
+            layout: Grid and cell spans, defaults to a 2x4 grid
+            renderer: "frames" for a frame and label per cell, "canvas" to draw all cells on one canvas
+            metrics_log_path: Optional JSON lines file that tick and cell timings are appended to
+            max_clip_ms: Cut videos off after this long, None to play them to the end
+            transition_ms: Length of the crossfade from one image to the next
+            transition_steps: Crossfade frames while the Tk loop keeps up, fewer when it doesn't; 0 for hard cuts
+            decode_backend: Where images are decoded and scaled, by default the prefetch threads.
+                            Owned by the caller, so a process pool survives the window.
         """
         # Create the slideshow window
         self.slideshow_window = tk.Toplevel()
@@ -116,38 +409,62 @@ class MultiSlideshowWindow:
         self.slideshow_window.update_idletasks()  # Process all pending events
         self.slideshow_window.attributes('-fullscreen', True)
 
-        # Store and filter image files
-        self.all_image_files = [
-            f for f in image_files
-            if f.media_type.lower() in ["image", "gif"]
-        ]
+        # Files are drawn lazily, so even a huge source shows its first image straight away
+        self.source = SlideshowEngine.make_source(image_files)
 
-        if not self.all_image_files:
-            messagebox.showwarning("Warning", "No image files to display.")
+        if not self.source.has_files():
+            messagebox.showwarning("Warning", "No image or video files to display.")
             self.slideshow_window.destroy()
             return
 
         # Grid configuration
-        self.rows = 2
-        self.cols = 4
-        self.slideshow_cells = []  # List to hold all slideshow cells
+        self.layout = layout or SlideshowLayout(rows=2, columns=4)
+        self.rows = self.layout.rows
+        self.cols = self.layout.columns
+        self.slideshow_cells: List[BaseSlideshowCell] = []  # List to hold all slideshow cells
+        self.canvas: Optional[tk.Canvas] = None
 
         # Create the grid and cells
-        self._create_grid()
+        if renderer == "canvas":
+            self._create_canvas()
+        else:
+            self._create_grid()
 
-        # Bind escape key to close
+        # Bind escape key to close, space to pause/resume, F3 to show the timing overlay
         self.slideshow_window.bind("<Escape>", lambda e: self.close())
+        self.slideshow_window.bind("<space>", lambda e: self.scheduler.toggle_pause())
+        self.slideshow_window.bind("<F3>", lambda e: self.toggle_overlay())
+
+        # Render timings, shown in the overlay and optionally logged as JSON lines
+        self.metrics = SlideshowMetrics(metrics_log_path)
+        self.overlay_label: Optional[tk.Label] = None
+        self.overlay_after_id = None
 
         # Scheduling variables
-        self.delay = 8000  # 8 seconds between images
-        self.cell_indices = []  # Track index for each cell
+        self.delay = delay
+        self.late_retry_delay = 100  # Poll interval for cells whose image wasn't ready on time
         self.is_running = False
-        self.after_id = None
         self.first_update = True  # Flag for first update
+        self.late_cells: Dict[SlideshowTimer, List[int]] = {}  # Cells still waiting for their image
+        self.cell_timers: Dict[int, SlideshowTimer] = {}  # The timer driving each cell
+        self.max_clip_ms = max_clip_ms
+        self.clip_after_ids: Dict[int, str] = {}  # Cells whose video is cut off (or given up on) by an after()
+        # Crossfades are blended by the prefetch workers, with fewer frames while ticks run late
+        self.transition_ms = transition_ms
+        self.transition_budget = TransitionBudget(transition_steps)
+        for cell in self.slideshow_cells:
+            cell.on_transition_done = self.transition_budget.record_transition
+            if decode_backend is not None:
+                cell.decode_backend = decode_backend
+
+        # Images are picked ahead of time in worker threads, and decoded and scaled there or in worker processes
+        self.engine = SlideshowEngine(self.source, self.layout, decode_backend=decode_backend)
 
-        # Initialize random indices for each cell
-        for _ in range(self.rows * self.cols):
-            self.cell_indices.append(random.randint(0, len(self.all_image_files) - 1))
+        # Every cell (group) gets its own timer, staggered so decode work is spread evenly
+        self.scheduler = SlideshowScheduler(self.slideshow_window)
+        self._create_timers(timer_configs or [
+            CellTimerConfig(cells=[i], interval_ms=self.delay) for i in range(len(self.slideshow_cells))
+        ])
 
         # Start slideshows when window is visible and properly sized
         self.slideshow_window.bind("<Visibility>", self._on_window_visible)
@@ -162,54 +479,264 @@ class MultiSlideshowWindow:
         """Create the grid layout for slideshows."""
         # Configure grid weights
         for i in range(self.rows):
-            self.slideshow_window.grid_rowconfigure(i, weight=1)
+            self.slideshow_window.grid_rowconfigure(i, weight=1, uniform="cell")
         for j in range(self.cols):
-            self.slideshow_window.grid_columnconfigure(j, weight=1)
+            self.slideshow_window.grid_columnconfigure(j, weight=1, uniform="cell")
 
         # Create slideshow cells in a grid
-        for row in range(self.rows):
-            for col in range(self.cols):
-                # Create a frame for each cell
-                cell_frame = tk.Frame(self.slideshow_window, bg='black')
-                cell_frame.grid(row=row, column=col, sticky="nsew", padx=0, pady=0)
-
-                # Create a slideshow cell for this frame
-                cell = SlideshowCell(cell_frame)
-                self.slideshow_cells.append(cell)
+        for spec in self.layout.cells:
+            # Create a frame for each cell
+            cell_frame = tk.Frame(self.slideshow_window, bg='black')
+            cell_frame.grid(row=spec.row, column=spec.column, rowspan=spec.rowspan,
+                            columnspan=spec.columnspan, sticky="nsew", padx=0, pady=0)
+
+            # Create a slideshow cell for this frame
+            cell = SlideshowCell(cell_frame)
+            self.slideshow_cells.append(cell)
+
+    def _create_canvas(self):
+        """Create a single canvas that all cells draw on."""
+        self.canvas = tk.Canvas(self.slideshow_window, bg='black', borderwidth=0, highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+
+        rects = self.layout.compute_rects(self.canvas.winfo_width(), self.canvas.winfo_height())
+        for rect in rects:
+            self.slideshow_cells.append(CanvasSlideshowCell(self.canvas, rect))
+
+        self.canvas_size = (self.canvas.winfo_width(), self.canvas.winfo_height())
+        self.canvas.bind("<Configure>", self._on_canvas_configure)
+
+    def _on_canvas_configure(self, event):
+        """Move the cells to their new rectangles when the canvas size changes."""
+        if (event.width, event.height) == self.canvas_size:
+            return
+        self.canvas_size = (event.width, event.height)
+
+        for cell, rect in zip(self.slideshow_cells, self.layout.compute_rects(event.width, event.height)):
+            cell.set_rect(rect)
+
+    def _create_timers(self, timer_configs: List[CellTimerConfig]):
+        """Create a scheduler timer for every cell group."""
+        for index, config in enumerate(timer_configs):
+            phase_ms = config.phase_ms
+            if phase_ms is None:
+                phase_ms = config.interval_ms * index // len(timer_configs)
+
+            timer = self.scheduler.add_timer(
+                name=f"cells {','.join(str(c) for c in config.cells)}",
+                interval_ms=config.interval_ms,
+                callback=lambda timer, cells=config.cells: self._on_timer(timer, cells),
+                phase_ms=phase_ms
+            )
+            for cell_index in config.cells:
+                self.cell_timers[cell_index] = timer
 
     def _start_slideshows(self):
         """Start all slideshows after the window is visible and sized."""
         if not self.is_running:
             self.is_running = True
-            if self.first_update:
-                # Add a small delay for the first update to ensure proper sizing
-                self.first_update = False
-                self.slideshow_window.after(500, self._update_all_cells)
-            else:
-                self._update_all_cells()
 
-    def _update_all_cells(self):
-        """Update all cells with new random images."""
+            # Start preparing the first image for every cell now the sizes are known
+            for i, cell in enumerate(self.slideshow_cells):
+                self.engine.request(i, cell.get_display_size())
+
+            # Add a small delay for the first update to ensure proper sizing
+            start_delay = 500 if self.first_update else 0
+            self.first_update = False
+
+            # Fill every cell once as soon as its image is ready, the staggered timers take over from there
+            self.scheduler.start(delay_ms=start_delay)
+            self.slideshow_window.after(start_delay, self._advance_cells,
+                                        list(range(len(self.slideshow_cells))), True)
+
+    def _advance_cells(self, cells: List[int], only_empty: bool = False):
+        """
+        Move cells on to their next item outside of their timer, polling until each one has.
+
+        Args:
+            cells: Indices of the cells to advance
+            only_empty: Skip cells that already show something, e.g. because their timer fired first
+        """
+        if not self.is_running:
+            return
+
+        if only_empty:
+            cells = [i for i in cells if not self.slideshow_cells[i].has_image()]
+        cells = [i for i in cells if not self._show_next_image(i)]
+        if cells:
+            self.slideshow_window.after(self.late_retry_delay, self._advance_cells, cells, only_empty)
+
+    def _on_timer(self, timer: SlideshowTimer, cells: List[int]):
+        """Swap the cells driven by a timer to their prepared images."""
+        if not self.is_running:
+            return
+
+        start = time.perf_counter()
+
+        # A deferred fire only retries the cells that were late last time,
+        # cells playing a video move on by themselves when the clip ends
+        cells = self.late_cells.pop(timer, cells)
+        cells = [i for i in cells if not self.slideshow_cells[i].is_playing_video()]
+        late_cells = [i for i in cells if not self._show_next_image(i)]
+        if late_cells:
+            # Retry shortly, the timer's regular interval restarts from that fire
+            self.late_cells[timer] = late_cells
+            self.scheduler.defer(timer, self.late_retry_delay)
+
+        self.transition_budget.record_tick((timer.last_fired - timer.last_due) * 1000)
+        self.metrics.record_tick(TickRecord(
+            timer=timer.name,
+            scheduled_ms=self.metrics.to_relative_ms(timer.last_due),
+            fired_ms=self.metrics.to_relative_ms(timer.last_fired),
+            late_ms=round((timer.last_fired - timer.last_due) * 1000, 2),
+            callback_ms=round((time.perf_counter() - start) * 1000, 2),
+            cells=cells,
+            late_cells=late_cells
+        ))
+
+    def _show_next_image(self, cell_index: int) -> bool:
+        """
+        Show the prepared image for a cell and start preparing the one after it.
+
+        Args:
+            cell_index: Index of the cell to update
+
+        Returns:
+            False if the image for this cell was not ready yet
+        """
+        prepared = self.engine.take(cell_index)
+        if prepared is None:
+            return False
+
+        cell = self.slideshow_cells[cell_index]
+        if prepared.is_video:
+            self._play_video(cell_index, prepared.media_file, prepared.image_path)
+            self.engine.mark_shown()
+        elif prepared.gif_frames is not None:
+            # PhotoImages of GIFs the cache evicted are released here, on the Tk thread
+            self.engine.prefetcher.gif_cache.drop_evicted_photos()
+            cell.play_gif(prepared.gif_frames)
+            self.engine.mark_shown()
+        elif prepared.image is not None:
+            cell.show_image(prepared.image, prepared.transition)
+            self.engine.mark_shown()
+        else:
+            cell.clear()
+
+        timings = dict(prepared.timings_ms)
+        timings.update(cell.last_timings_ms)
+        self.metrics.record_cell(CellRenderRecord(
+            cell=cell_index,
+            path=prepared.image_path,
+            media_type=prepared.media_file.media_type,
+            at_ms=self.metrics.to_relative_ms(time.perf_counter()),
+            timings_ms={stage: round(value, 2) for stage, value in timings.items()}
+        ))
+
+        # Prepare the following image right away so it is ready well before the next tick
+        self.engine.request(cell_index, cell.get_display_size(), self.transition_budget.steps, self.transition_ms)
+        return True
+
+    def _clip_length_ms(self, media_file: MediaFile) -> Optional[int]:
+        """
+        How long a video may play, from its stored duration and max_clip_ms; None for no limit.
+        With a known duration the clip also ends if playback stalls, a little after it should have.
+        """
+        if media_file.duration_s:
+            clip_ms = int(media_file.duration_s * 1000) + CLIP_STALL_GRACE_MS
+            return min(clip_ms, self.max_clip_ms) if self.max_clip_ms else clip_ms
+        return self.max_clip_ms
+
+    def _play_video(self, cell_index: int, media_file: MediaFile, video_path: str):
+        """Play a video in a cell, holding its timer until the clip has ended."""
+        timer = self.cell_timers.get(cell_index)
+        if timer and self._timer_cells(timer) == [cell_index]:
+            self.scheduler.pause_timer(timer)
+
+        self.slideshow_cells[cell_index].play_video(
+            video_path, on_finished=lambda: self._on_video_finished(cell_index)
+        )
+        clip_ms = self._clip_length_ms(media_file)
+        if clip_ms:
+            self.clip_after_ids[cell_index] = self.slideshow_window.after(
+                clip_ms, self._end_clip, cell_index
+            )
+
+    def _end_clip(self, cell_index: int):
+        """Stop a video that has played as long as it may."""
+        self.clip_after_ids.pop(cell_index, None)
+        cell = self.slideshow_cells[cell_index]
+        if cell.is_playing_video():
+            cell.stop_video()
+            self._on_video_finished(cell_index)
+
+    def _on_video_finished(self, cell_index: int):
+        """Advance a cell to its next item once its video has ended."""
+        after_id = self.clip_after_ids.pop(cell_index, None)
+        if after_id:
+            self.slideshow_window.after_cancel(after_id)
         if not self.is_running:
             return
 
-        # Update each cell with a new random image
-        for i, cell in enumerate(self.slideshow_cells):
-            if self.all_image_files:
-                # Get a random image for this cell
-                self.cell_indices[i] = random.randint(0, len(self.all_image_files) - 1)
-                media_file = self.all_image_files[self.cell_indices[i]]
-                full_path = os.path.join(media_file.folder_path, media_file.file_name)
-                cell.display_image(full_path)
+        timer = self.cell_timers.get(cell_index)
+        if timer and timer.is_paused:
+            # The cell has its own timer, restart it from now
+            self.scheduler.resume_timer(timer, delay_ms=0)
+        else:
+            # The cell shares its timer with others, advance just this cell
+            self._advance_cells([cell_index])
+
+    def _timer_cells(self, timer: SlideshowTimer) -> List[int]:
+        """Get the indices of the cells driven by a timer."""
+        return [i for i, t in self.cell_timers.items() if t is timer]
+
+    def toggle_overlay(self):
+        """Show or hide the on-screen timing overlay."""
+        if self.overlay_label:
+            if self.overlay_after_id:
+                self.slideshow_window.after_cancel(self.overlay_after_id)
+                self.overlay_after_id = None
+            self.overlay_label.destroy()
+            self.overlay_label = None
+            return
+
+        self.overlay_label = tk.Label(
+            self.slideshow_window, bg='black', fg='lime', justify='left',
+            font=('Courier', 10), anchor='nw'
+        )
+        self.overlay_label.place(x=10, y=10)
+        self._update_overlay()
+
+    def _update_overlay(self):
+        """Refresh the overlay text once a second."""
+        self.overlay_after_id = None
+        if not self.overlay_label:
+            return
 
-        # Schedule the next update
-        self.after_id = self.slideshow_window.after(self.delay, self._update_all_cells)
+        lines = self.metrics.summary_lines()
+        prefetch = self.engine.stats
+        lines.append(f"late frames {prefetch.late_frames}  max late ms {prefetch.max_late_ms:.1f}")
+        budget = self.transition_budget
+        lines.append(f"crossfade steps {budget.steps}/{budget.max_steps}  reduced {budget.reductions}x")
+        if self.scheduler.is_paused:
+            lines.append("PAUSED")
+        self.overlay_label.configure(text="\n".join(lines))
+        self.overlay_label.lift()
+        self.overlay_after_id = self.slideshow_window.after(1000, self._update_overlay)
 
     def close(self):
         """Close the slideshow window."""
         self.is_running = False
-        if self.after_id:
-            self.slideshow_window.after_cancel(self.after_id)
+        self.scheduler.stop()
+
+        self.engine.shutdown()
+        self.metrics.record_summary(self.engine.stats.to_dict(), self.scheduler.get_stats())
+        if self.overlay_after_id:
+            self.slideshow_window.after_cancel(self.overlay_after_id)
+        for after_id in self.clip_after_ids.values():
+            self.slideshow_window.after_cancel(after_id)
+        self.clip_after_ids.clear()
+        self.metrics.close()
 
         # Clear all cells
         for cell in self.slideshow_cells:
@@ -0,0 +1,122 @@
+# /app/classes/slideshow_metrics.py
+import json
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Deque, Dict, List, Optional
+
+
+@dataclass
+class TickRecord:
+    """One fire of a slideshow timer: when it was due, when it ran and how long it took"""
+    timer: str
+    scheduled_ms: float  # Relative to the start of the slideshow
+    fired_ms: float
+    late_ms: float
+    callback_ms: float
+    cells: List[int] = field(default_factory=list)
+    late_cells: List[int] = field(default_factory=list)
+    kind: str = "tick"
+
+
+@dataclass
+class CellRenderRecord:
+    """Where the time went for one item shown in one cell"""
+    cell: int
+    path: str
+    media_type: str
+    at_ms: float  # Relative to the start of the slideshow
+    timings_ms: Dict[str, float] = field(default_factory=dict)
+    kind: str = "cell"
+
+
+@dataclass
+class SummaryRecord:
+    """Totals of a whole slideshow, written when it closes"""
+    at_ms: float  # Relative to the start of the slideshow
+    prefetch: Dict[str, float] = field(default_factory=dict)
+    timers: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    kind: str = "summary"
+
+
+class SlideshowMetrics:
+    """
+    Collects per-tick and per-cell render timings for a slideshow.
+    Recent records are kept in memory for the on-screen overlay, and all
+    records can be written to a JSON lines file for offline analysis.
+    """
+
+    def __init__(self, log_path: Optional[str] = None, history: int = 200):
+        """
+        Initialize the SlideshowMetrics.
+
+        Args:
+            log_path: Optional JSON lines file that every record is appended to
+            history: Number of recent records kept for the overlay
+        """
+        self.start = time.perf_counter()
+        self.ticks: Deque[TickRecord] = deque(maxlen=history)
+        self.cells: Deque[CellRenderRecord] = deque(maxlen=history)
+        self.tick_count = 0
+        self.late_tick_count = 0
+        self._log_file = open(log_path, "a", encoding="utf-8") if log_path else None
+
+    def to_relative_ms(self, perf_counter_value: float) -> float:
+        """Convert a time.perf_counter() value to ms since the slideshow started"""
+        return round((perf_counter_value - self.start) * 1000, 2)
+
+    def record_tick(self, record: TickRecord):
+        """Record a timer fire"""
+        self.tick_count += 1
+        if record.late_cells:
+            self.late_tick_count += 1
+        self.ticks.append(record)
+        self._write(record)
+
+    def record_cell(self, record: CellRenderRecord):
+        """Record an item shown in a cell"""
+        self.cells.append(record)
+        self._write(record)
+
+    def record_summary(self, prefetch: Dict[str, float], timers: Dict[str, Dict[str, float]]):
+        """Record the prefetch and timer totals of the slideshow, when it closes"""
+        self._write(SummaryRecord(self.to_relative_ms(time.perf_counter()), prefetch, timers))
+
+    def _write(self, record):
+        """Append a record to the JSON lines log, if there is one"""
+        if self._log_file:
+            self._log_file.write(json.dumps(asdict(record)) + "\n")
+
+    @staticmethod
+    def _percentile(values: List[float], percentile: float) -> float:
+        """Get a percentile of a list of values, 0.0 for an empty list"""
+        if not values:
+            return 0.0
+        values = sorted(values)
+        return values[min(int(len(values) * percentile / 100), len(values) - 1)]
+
+    def summary_lines(self) -> List[str]:
+        """Get a short human readable summary of the recent records, for the overlay"""
+        late = [t.late_ms for t in self.ticks]
+        callback = [t.callback_ms for t in self.ticks]
+        lines = [
+            f"ticks {self.tick_count}  with late cells {self.late_tick_count}",
+            f"timer late ms  p50 {self._percentile(late, 50):.1f}  p95 {self._percentile(late, 95):.1f}"
+            f"  max {max(late, default=0.0):.1f}",
+            f"tick work ms   p50 {self._percentile(callback, 50):.1f}  p95 {self._percentile(callback, 95):.1f}"
+            f"  max {max(callback, default=0.0):.1f}",
+        ]
+
+        stages: Dict[str, List[float]] = {}
+        for record in self.cells:
+            for stage, value in record.timings_ms.items():
+                stages.setdefault(stage, []).append(value)
+        for stage, values in stages.items():
+            lines.append(f"{stage:<13} p50 {self._percentile(values, 50):.1f}  p95 {self._percentile(values, 95):.1f}")
+        return lines
+
+    def close(self):
+        """Close the JSON lines log"""
+        if self._log_file:
+            self._log_file.close()
+            self._log_file = None
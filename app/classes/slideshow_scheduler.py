@@ -0,0 +1,284 @@
+# /app/classes/slideshow_scheduler.py
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+import tkinter as tk
+
+
+@dataclass
+class TimerStats:
+    """Timing statistics for a single SlideshowTimer"""
+    fires: int = 0
+    deferrals: int = 0
+    total_late_ms: float = 0.0
+    max_late_ms: float = 0.0
+    total_callback_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        """Convert to a dictionary for logging"""
+        return {
+            'fires': self.fires,
+            'deferrals': self.deferrals,
+            'avg_late_ms': round(self.total_late_ms / self.fires, 1) if self.fires else 0.0,
+            'max_late_ms': round(self.max_late_ms, 1),
+            'avg_callback_ms': round(self.total_callback_ms / self.fires, 1) if self.fires else 0.0,
+        }
+
+
+@dataclass(eq=False)
+class SlideshowTimer:
+    """
+    A reusable timer that fires its callback every interval_ms, offset by phase_ms.
+    Timers are driven by a SlideshowScheduler and can drive one cell or a group of cells.
+    """
+    name: str
+    interval_ms: int
+    callback: Callable[['SlideshowTimer'], None]
+    phase_ms: int = 0
+    stats: TimerStats = field(default_factory=TimerStats)
+    is_paused: bool = False
+    next_due: Optional[float] = field(default=None, repr=False)  # perf_counter() seconds
+    last_due: Optional[float] = field(default=None, repr=False)  # When the current/last fire was due
+    last_fired: Optional[float] = field(default=None, repr=False)  # When it actually ran
+    _remaining: Optional[float] = field(default=None, repr=False)  # Seconds left when paused
+    _generation: int = field(default=0, repr=False)  # Invalidates stale heap entries
+
+
+class SlideshowScheduler:
+    """
+    Drives any number of SlideshowTimers from a single Tk after() loop.
+    Due times are kept in a priority queue, so only the earliest timer is
+    ever scheduled with Tk, no matter how many timers are registered.
+    """
+
+    def __init__(self, widget: tk.Misc):
+        """
+        Initialize the SlideshowScheduler.
+
+        Args:
+            widget: Any Tk widget, used to schedule after() callbacks
+        """
+        self.widget = widget
+        self.timers: List[SlideshowTimer] = []
+        self.is_running = False
+        self.is_paused = False
+        self._heap: List[Tuple[float, int, int, SlideshowTimer]] = []
+        self._sequence = itertools.count()  # Tie breaker for timers due at the same time
+        self._after_id = None
+
+    def add_timer(self, name: str, interval_ms: int, callback: Callable[[SlideshowTimer], None],
+                  phase_ms: int = 0) -> SlideshowTimer:
+        """
+        Register a new timer.
+
+        Args:
+            name: Name of the timer, used in the stats
+            interval_ms: Time between fires
+            callback: Called with the timer each time it fires
+            phase_ms: Offset of the first fire relative to the scheduler start
+
+        Returns:
+            The new SlideshowTimer
+        """
+        timer = SlideshowTimer(name=name, interval_ms=interval_ms, callback=callback, phase_ms=phase_ms)
+        self.timers.append(timer)
+        if self.is_running:
+            self._schedule(timer, time.perf_counter() + phase_ms / 1000)
+            self._reschedule()
+        return timer
+
+    def remove_timer(self, timer: SlideshowTimer):
+        """Unregister a timer"""
+        if timer in self.timers:
+            self.timers.remove(timer)
+            timer._generation += 1
+            self._reschedule()
+
+    def start(self, delay_ms: int = 0):
+        """
+        Start all timers.
+
+        Args:
+            delay_ms: Extra delay before the first fire of every timer
+        """
+        if self.is_running:
+            return
+        self.is_running = True
+        self.is_paused = False
+        now = time.perf_counter()
+        for timer in self.timers:
+            if not timer.is_paused:
+                self._schedule(timer, now + (delay_ms + timer.phase_ms) / 1000)
+        self._reschedule()
+
+    def stop(self):
+        """Stop all timers"""
+        self.is_running = False
+        self._heap.clear()
+        for timer in self.timers:
+            timer._generation += 1
+            timer.next_due = None
+            timer._remaining = None
+        self._cancel_after()
+
+    def pause(self):
+        """Pause all timers, remembering how far along each one was"""
+        if not self.is_running or self.is_paused:
+            return
+        self.is_paused = True
+        now = time.perf_counter()
+        for timer in self.timers:
+            if timer.next_due is not None:
+                timer._remaining = max(timer.next_due - now, 0.0)
+        self._cancel_after()
+
+    def resume(self):
+        """Resume all timers where they left off"""
+        if not self.is_running or not self.is_paused:
+            return
+        self.is_paused = False
+        now = time.perf_counter()
+        for timer in self.timers:
+            if timer._remaining is not None and not timer.is_paused:
+                self._schedule(timer, now + timer._remaining)
+                timer._remaining = None
+        self._reschedule()
+
+    def toggle_pause(self):
+        """Pause if running, resume if paused"""
+        if self.is_paused:
+            self.resume()
+        else:
+            self.pause()
+
+    def pause_timer(self, timer: SlideshowTimer):
+        """Pause a single timer"""
+        if timer.is_paused:
+            return
+        timer.is_paused = True
+        if timer.next_due is not None and timer._remaining is None:
+            timer._remaining = max(timer.next_due - time.perf_counter(), 0.0)
+        timer.next_due = None
+        timer._generation += 1
+        self._reschedule()
+
+    def resume_timer(self, timer: SlideshowTimer, delay_ms: Optional[int] = None):
+        """
+        Resume a single timer.
+
+        Args:
+            timer: The timer to resume
+            delay_ms: Fire after this delay instead of the time that was left when paused
+        """
+        if not timer.is_paused:
+            return
+        timer.is_paused = False
+        remaining = delay_ms / 1000 if delay_ms is not None else (timer._remaining or 0.0)
+        timer._remaining = None
+        if self.is_running:
+            if self.is_paused:
+                timer._remaining = remaining
+            else:
+                self._schedule(timer, time.perf_counter() + remaining)
+                self._reschedule()
+
+    def defer(self, timer: SlideshowTimer, delay_ms: int):
+        """
+        Fire a timer again after a short delay, e.g. when its cell was not ready yet.
+        The regular interval resumes from that fire.
+
+        Args:
+            timer: The timer to defer
+            delay_ms: Delay before the retry
+        """
+        timer.stats.deferrals += 1
+        self._schedule(timer, time.perf_counter() + delay_ms / 1000)
+        self._reschedule()
+
+    def fire_now(self, timer: SlideshowTimer):
+        """Fire a timer as soon as possible, e.g. when its video has ended"""
+        self._schedule(timer, time.perf_counter())
+        self._reschedule()
+
+    def set_interval(self, timer: SlideshowTimer, interval_ms: int):
+        """Change the interval of a timer, effective from its next fire"""
+        timer.interval_ms = interval_ms
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Get the timing statistics for all timers, keyed by timer name"""
+        return {timer.name: timer.stats.to_dict() for timer in self.timers}
+
+    def _schedule(self, timer: SlideshowTimer, due: float):
+        """Push a new due time for a timer, invalidating any older one"""
+        timer._generation += 1
+        timer.next_due = due
+        heapq.heappush(self._heap, (due, next(self._sequence), timer._generation, timer))
+
+    def _cancel_after(self):
+        """Cancel the pending Tk callback"""
+        if self._after_id:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass  # Widget already destroyed
+            self._after_id = None
+
+    def _discard_stale(self):
+        """Drop heap entries that were superseded or belong to removed/paused timers"""
+        while self._heap:
+            _, _, generation, timer = self._heap[0]
+            if generation == timer._generation and timer in self.timers and not timer.is_paused:
+                return
+            heapq.heappop(self._heap)
+
+    def _reschedule(self):
+        """Schedule a single Tk callback for the earliest due timer"""
+        self._cancel_after()
+        if not self.is_running or self.is_paused:
+            return
+
+        self._discard_stale()
+        if not self._heap:
+            return
+
+        delay = max(int((self._heap[0][0] - time.perf_counter()) * 1000), 0)
+        self._after_id = self.widget.after(delay, self._run_due)
+
+    def _run_due(self):
+        """Fire every timer that is due and schedule the next wake up"""
+        self._after_id = None
+        if not self.is_running or self.is_paused:
+            return
+
+        now = time.perf_counter()
+        while self._heap and self._heap[0][0] <= now:
+            due, _, generation, timer = heapq.heappop(self._heap)
+            if generation != timer._generation or timer not in self.timers or timer.is_paused:
+                continue
+
+            late_ms = (now - due) * 1000
+            timer.last_due = due
+            timer.last_fired = now
+            timer.stats.fires += 1
+            timer.stats.total_late_ms += late_ms
+            timer.stats.max_late_ms = max(timer.stats.max_late_ms, late_ms)
+
+            # Keep the cadence fixed to the original phase, unless we fell a whole interval behind
+            next_due = due + timer.interval_ms / 1000
+            if next_due <= now:
+                next_due = now + timer.interval_ms / 1000
+            self._schedule(timer, next_due)
+
+            callback_start = time.perf_counter()
+            try:
+                timer.callback(timer)
+            except Exception as e:
+                print(f"Error in timer {timer.name}: {e}")
+            timer.stats.total_callback_ms += (time.perf_counter() - callback_start) * 1000
+
+            if not self.is_running or self.is_paused:
+                return
+
+        self._reschedule()
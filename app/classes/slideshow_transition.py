@@ -0,0 +1,122 @@
+# /app/classes/slideshow_transition.py
+"""
+Crossfades between the images of a slideshow cell.
+
+The blended frames are built ahead of time by the prefetch workers, from the
+image the cell shows and the already scaled next image, with NumPy fixed point
+arithmetic; the Tk thread only pastes them into one PhotoImage, paced by
+after() calls. A cell that falls behind skips frames to stay on time, and
+TransitionBudget lowers the number of frames built (down to a hard cut) while
+the Tk loop misses its ticks, raising it again once it keeps up.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_TRANSITION_MS = 400
+DEFAULT_TRANSITION_STEPS = 6
+# Timer lateness, or frames skipped by a cell, that count as the Tk loop falling behind
+LATE_TICK_MS = 50
+# Ticks in a row without falling behind before a step is added back
+RECOVERY_TICKS = 20
+BACKGROUND = (0, 0, 0)
+
+
+@dataclass
+class Crossfade:
+    """The intermediate frames from one image to the next, all of the same size"""
+    frames: List[Image.Image]
+    duration_ms: int
+
+    @property
+    def frame_ms(self) -> float:
+        """How long each frame is shown"""
+        return self.duration_ms / (len(self.frames) + 1)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.frames[0].size
+
+
+def _on_background(image: Image.Image, size: Tuple[int, int]) -> np.ndarray:
+    """An image centred on a black canvas of the given size, the way a cell shows it, as a (height, width, 3) array"""
+    canvas = Image.new("RGB", size, BACKGROUND)
+    offset = ((size[0] - image.width) // 2, (size[1] - image.height) // 2)
+    if image.mode == "RGBA":
+        canvas.paste(image, offset, image)
+    else:
+        canvas.paste(image.convert("RGB"), offset)
+    return np.asarray(canvas, dtype=np.uint16)
+
+
+def build_crossfade(previous: Image.Image, following: Image.Image, steps: int = DEFAULT_TRANSITION_STEPS,
+                    duration_ms: int = DEFAULT_TRANSITION_MS) -> Optional[Crossfade]:
+    """
+    Blend the frames between two images. Safe to call from worker threads, it doesn't touch Tk.
+    The frames cover both images, each centred, so the fade ends exactly on the next image.
+
+    Args:
+        previous: The image the cell shows now
+        following: The scaled image it changes to
+        steps: Intermediate frames, 0 for a hard cut
+        duration_ms: Length of the whole fade
+
+    Returns:
+        The Crossfade, None for a hard cut
+    """
+    if steps <= 0 or duration_ms <= 0:
+        return None
+    size = (max(previous.width, following.width), max(previous.height, following.height))
+    start = _on_background(previous, size)
+    end = _on_background(following, size)
+    frames = []
+    # Weights out of 256, so a * (256 - w) + b * w stays within uint16
+    for weight in np.linspace(0, 256, steps + 2)[1:-1].astype(np.uint16):
+        blended = (start * (256 - weight) + end * weight) >> 8
+        frames.append(Image.fromarray(blended.astype(np.uint8), "RGB"))
+    return Crossfade(frames, duration_ms)
+
+
+class TransitionBudget:
+    """
+    The number of crossfade frames cells get, adapted to how well the Tk loop
+    keeps up: halved whenever a tick is late or a cell had to skip frames, down
+    to 0 (hard cuts), and raised by one after RECOVERY_TICKS ticks on time.
+    """
+
+    def __init__(self, max_steps: int = DEFAULT_TRANSITION_STEPS, late_tick_ms: float = LATE_TICK_MS):
+        """
+        Initialize the TransitionBudget.
+
+        Args:
+            max_steps: Frames per crossfade while everything keeps up, 0 disables crossfades
+            late_tick_ms: Timer lateness that counts as falling behind
+        """
+        self.max_steps = max(max_steps, 0)
+        self.steps = self.max_steps
+        self.late_tick_ms = late_tick_ms
+        self._ticks_on_time = 0
+        self.reductions = 0
+
+    def _fall_behind(self):
+        if self.steps > 0:
+            self.steps //= 2
+            self.reductions += 1
+        self._ticks_on_time = 0
+
+    def record_tick(self, late_ms: float):
+        """Record how late a slideshow timer fired"""
+        if late_ms > self.late_tick_ms:
+            self._fall_behind()
+            return
+        self._ticks_on_time += 1
+        if self._ticks_on_time >= RECOVERY_TICKS and self.steps < self.max_steps:
+            self.steps += 1
+            self._ticks_on_time = 0
+
+    def record_transition(self, skipped: int):
+        """Record a crossfade a cell played, with the number of frames it had to skip"""
+        if skipped:
+            self._fall_behind()
@@ -0,0 +1,135 @@
+# /app/classes/smart_collection.py
+"""
+Smart collections: named, saved filters over the stored file attributes
+(folder, media type, extension, size, capture date, modification date, camera).
+
+A collection's members are materialized into the collection_members table with
+a sort key, so opening it is one read of the (collection_id, sort_key) index.
+MediaLibrary keeps the table current incrementally: files that are added or
+changed are queued in collection_changes and only those are re-evaluated
+against each filter; deleted files leave through ON DELETE CASCADE.
+"""
+import json
+import os
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Sort key expressions per order; undated files come last ('~' sorts after digits)
+ORDERS = {
+    'path': "folder_path || '/' || file_name",
+    'captured': "COALESCE(CAST(captured_at AS TEXT), '~') || '|' || folder_path || '/' || file_name",
+}
+DEFAULT_ORDER = 'path'
+
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards in a literal prefix, with '\\' as the escape character"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _parse_date(value: Optional[str], name: str) -> Optional[datetime]:
+    """Parse an ISO date or date and time, raises ValueError naming the field"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a date like 2020-07-14, not {value!r}") from None
+
+
+@dataclass
+class CollectionFilter:
+    """What a smart collection holds; every field that is set must match, unset fields match everything"""
+    folder_path: Optional[str] = None  # Files in this folder and its subfolders
+    root_ids: List[int] = field(default_factory=list)
+    media_types: List[str] = field(default_factory=list)  # e.g. ['image', 'gif']
+    extensions: List[str] = field(default_factory=list)  # e.g. ['.jpg']
+    min_size_kb: Optional[int] = None
+    max_size_kb: Optional[int] = None
+    captured_from: Optional[str] = None  # ISO date, inclusive
+    captured_before: Optional[str] = None  # ISO date, exclusive
+    modified_from: Optional[str] = None
+    modified_before: Optional[str] = None
+    camera_model: Optional[str] = None
+
+    def to_json(self) -> str:
+        """Serialize for the smart_collections table, leaving out unset fields"""
+        return json.dumps({name: value for name, value in asdict(self).items() if value not in (None, [])},
+                          sort_keys=True)
+
+    @classmethod
+    def from_json(cls, text: str) -> 'CollectionFilter':
+        """Deserialize, ignoring fields this version doesn't know"""
+        known = {f.name for f in fields(cls)}
+        return cls(**{name: value for name, value in json.loads(text or "{}").items() if name in known})
+
+    def validate(self):
+        """Check the dates parse and the ranges make sense, raises ValueError"""
+        for name in ("captured_from", "captured_before", "modified_from", "modified_before"):
+            _parse_date(getattr(self, name), name)
+        if self.min_size_kb is not None and self.max_size_kb is not None and self.min_size_kb > self.max_size_kb:
+            raise ValueError("min_size_kb is larger than max_size_kb")
+
+    def to_sql(self, extension_to_type: Dict[str, str]) -> Tuple[str, list]:
+        """
+        The condition on media_files rows.
+
+        Args:
+            extension_to_type: Extension to media type mapping, media types are stored as extensions
+
+        Returns:
+            The SQL condition and its parameters
+        """
+        conditions, params = [], []
+        if self.folder_path:
+            folder_path = self.folder_path.rstrip("/\\") or self.folder_path
+            conditions.append("(folder_path = %s OR folder_path LIKE %s ESCAPE '\\')")
+            params += [folder_path, _escape_like(os.path.join(folder_path, "")) + "%"]
+        if self.root_ids:
+            conditions.append(f"root_id IN ({', '.join(['%s'] * len(self.root_ids))})")
+            params += list(self.root_ids)
+        extensions = {extension.lower() for extension in self.extensions}
+        if self.media_types:
+            wanted = {media_type.lower() for media_type in self.media_types}
+            type_extensions = {ext for ext, media_type in extension_to_type.items() if media_type.lower() in wanted}
+            extensions = extensions & type_extensions if self.extensions else type_extensions
+        if self.media_types or self.extensions:
+            if not extensions:
+                return "1 = 0", []
+            conditions.append(f"LOWER(file_extension) IN ({', '.join(['%s'] * len(extensions))})")
+            params += sorted(extensions)
+        if self.min_size_kb is not None:
+            conditions.append("file_size_kb >= %s")
+            params.append(self.min_size_kb)
+        if self.max_size_kb is not None:
+            conditions.append("file_size_kb <= %s")
+            params.append(self.max_size_kb)
+        for name, operator in (("captured_from", ">="), ("captured_before", "<")):
+            date = _parse_date(getattr(self, name), name)
+            if date is not None:
+                conditions.append(f"captured_at {operator} %s")
+                params.append(date.isoformat(sep=" "))
+        for name, operator in (("modified_from", ">="), ("modified_before", "<")):
+            date = _parse_date(getattr(self, name), name)
+            if date is not None:
+                conditions.append(f"file_mtime {operator} %s")
+                params.append(date.timestamp())
+        if self.camera_model:
+            conditions.append("camera_model = %s")
+            params.append(self.camera_model)
+        return (" AND ".join(conditions) or "1 = 1"), params
+
+    def describe(self) -> str:
+        """Short summary for menus"""
+        return ", ".join(f"{name}={value}" for name, value in json.loads(self.to_json()).items()) or "all files"
+
+
+@dataclass
+class SmartCollection:
+    """A saved filter and the order its members are shown in"""
+    collection_id: int
+    name: str
+    filter: CollectionFilter
+    order_by: str = DEFAULT_ORDER  # A key of ORDERS
+    member_count: int = 0
@@ -0,0 +1,311 @@
+# /app/classes/thumbnail_atlas.py
+"""
+Thumbnails of one folder packed into a single memory-mapped atlas file.
+
+The atlas is the thumbnails' JPEG bytes back to back, in the order they were
+built, which is the folder's order, so the thumbnails of a screenful are
+neighbours on disk and load with a few sequential page reads. A JSON index next
+to it maps every file name to its slice and the mtime it was built from; a
+thumbnail whose file has changed since is rebuilt and appended, the old bytes
+stay behind as dead space until the atlas is compacted.
+
+FolderThumbnails builds and reads the atlas of a folder's files; images and
+GIFs are thumbnailed from the file, videos from their poster frame in the
+ThumbnailStore. Only one thread may use an atlas at a time.
+"""
+import io
+import json
+import mmap
+import os
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from PIL import Image
+from .instrumentation import timed
+from .media_file import MediaFile
+from .thumbnail_store import ThumbnailStore
+
+THUMBNAIL_SIZE = (128, 128)
+THUMBNAIL_JPEG_QUALITY = 80
+ATLAS_EXTENSION = ".atlas"
+INDEX_EXTENSION = ".json"
+INDEX_VERSION = 1
+# Compact once this share of the atlas is thumbnails that were replaced
+MAX_DEAD_SHARE = 0.5
+
+
+def make_thumbnail(path: str, size: Tuple[int, int] = THUMBNAIL_SIZE) -> bytes:
+    """
+    Decode an image (or a video poster) at reduced size and encode it as a thumbnail JPEG.
+
+    Args:
+        path: Path to the image
+        size: The box the thumbnail fits into
+
+    Returns:
+        The JPEG bytes
+    """
+    with Image.open(path) as pil_image:
+        # Let the JPEG decoder skip the detail a thumbnail throws away anyway
+        pil_image.draft("RGB", size)
+        pil_image.thumbnail(size, Image.BILINEAR)
+        if pil_image.mode != "RGB":
+            pil_image = pil_image.convert("RGB")
+        buffer = io.BytesIO()
+        pil_image.save(buffer, "JPEG", quality=THUMBNAIL_JPEG_QUALITY)
+    return buffer.getvalue()
+
+
+class ThumbnailAtlas:
+    """The atlas and index files of one folder's thumbnails"""
+
+    def __init__(self, path_prefix: str, size: Tuple[int, int] = THUMBNAIL_SIZE):
+        """
+        Initialize the ThumbnailAtlas and load its index, if it exists.
+
+        Args:
+            path_prefix: Path of the files without extension, see ThumbnailStore.atlas_prefix()
+            size: The box thumbnails fit into; an atlas built for another size is started over
+        """
+        self.atlas_path = path_prefix + ATLAS_EXTENSION
+        self.index_path = path_prefix + INDEX_EXTENSION
+        self.size = tuple(size)
+        self.entries: Dict[str, list] = {}  # {file_name: [offset, length, mtime]}
+        self.dead_bytes = 0
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped_length = 0
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable thumbnail index {self.index_path}: {e}")
+            return
+        if index.get('version') != INDEX_VERSION or tuple(index.get('size', ())) != self.size:
+            return
+        try:
+            atlas_length = os.path.getsize(self.atlas_path)
+        except OSError:
+            return
+        # Entries past the end were written to an index whose atlas write didn't make it
+        self.entries = {name: entry for name, entry in index.get('entries', {}).items()
+                        if entry[0] + entry[1] <= atlas_length}
+        self.dead_bytes = index.get('dead_bytes', 0)
+
+    def _save_index(self):
+        """Write the index through a temporary file, so a crash leaves the old one"""
+        temporary_path = self.index_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump({'version': INDEX_VERSION, 'size': list(self.size),
+                       'dead_bytes': self.dead_bytes, 'entries': self.entries}, f, separators=(",", ":"))
+        os.replace(temporary_path, self.index_path)
+
+    def _map(self) -> Optional[mmap.mmap]:
+        """Map the atlas, again if it has grown since it was mapped"""
+        try:
+            length = os.path.getsize(self.atlas_path)
+        except OSError:
+            return None
+        if self._mmap is None or length != self._mapped_length:
+            self._unmap()
+            if length == 0:
+                return None
+            with open(self.atlas_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_length = length
+        return self._mmap
+
+    def _unmap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+            self._mapped_length = 0
+
+    def is_fresh(self, file_name: str, mtime: Optional[float]) -> bool:
+        """Whether the atlas has a thumbnail of the file that is not older than the file"""
+        entry = self.entries.get(file_name)
+        return entry is not None and (mtime is None or entry[2] == mtime)
+
+    def read(self, requests: Iterable[Tuple[str, Optional[float]]]) -> Dict[str, Image.Image]:
+        """
+        Decode the fresh thumbnails of some files, reading the atlas in offset order.
+
+        Args:
+            requests: (file_name, mtime) pairs; files without a fresh thumbnail are left out
+
+        Returns:
+            The decoded thumbnails by file name
+        """
+        fresh = [(self.entries[name], name) for name, mtime in requests if self.is_fresh(name, mtime)]
+        if not fresh:
+            return {}
+        atlas = self._map()
+        if atlas is None:
+            return {}
+        images = {}
+        for (offset, length, _), name in sorted(fresh):
+            try:
+                pil_image = Image.open(io.BytesIO(atlas[offset:offset + length]))
+                pil_image.load()
+                images[name] = pil_image
+            except (OSError, ValueError) as e:
+                print(f"Damaged thumbnail of {name} in {self.atlas_path}: {e}")
+                del self.entries[name]
+        return images
+
+    def add(self, thumbnails: List[Tuple[str, Optional[float], bytes]]):
+        """
+        Append thumbnails, replacing older ones of the same files, and save the index.
+
+        Args:
+            thumbnails: (file_name, mtime, JPEG bytes) of every thumbnail
+        """
+        if not thumbnails:
+            return
+        os.makedirs(os.path.dirname(self.atlas_path), exist_ok=True)
+        with open(self.atlas_path, "ab") as f:
+            offset = f.tell()
+            for file_name, mtime, data in thumbnails:
+                old = self.entries.get(file_name)
+                if old is not None:
+                    self.dead_bytes += old[1]
+                f.write(data)
+                self.entries[file_name] = [offset, len(data), mtime]
+                offset += len(data)
+        self._save_index()
+
+    def needs_compaction(self) -> bool:
+        """Whether enough of the atlas is replaced or removed thumbnails to rewrite it"""
+        total = sum(entry[1] for entry in self.entries.values()) + self.dead_bytes
+        return total > 0 and self.dead_bytes / total > MAX_DEAD_SHARE
+
+    def compact(self, order: Iterable[str]):
+        """
+        Rewrite the atlas without dead space, with the thumbnails in the given order.
+
+        Args:
+            order: The folder's file names in display order; thumbnails of files not in it are dropped
+        """
+        atlas = self._map()
+        new_entries = {}
+        temporary_path = self.atlas_path + ".tmp"
+        with open(temporary_path, "wb") as f:
+            for name in order:
+                entry = self.entries.get(name)
+                if entry is None or atlas is None or name in new_entries:
+                    continue
+                offset, length, mtime = entry
+                new_entries[name] = [f.tell(), length, mtime]
+                f.write(atlas[offset:offset + length])
+        self._unmap()
+        os.replace(temporary_path, self.atlas_path)
+        self.entries = new_entries
+        self.dead_bytes = 0
+        self._save_index()
+
+    def close(self):
+        """Unmap the atlas"""
+        self._unmap()
+
+
+class FolderThumbnails:
+    """The thumbnails of a folder's files, by position in the file list, built into the folder's atlas as needed"""
+
+    def __init__(self, files: List[MediaFile], store: ThumbnailStore, folder_path: str,
+                 size: Tuple[int, int] = THUMBNAIL_SIZE):
+        """
+        Initialize the FolderThumbnails.
+
+        Args:
+            files: The folder's files in display order
+            store: Where the atlas and the video posters are
+            folder_path: The folder, names the atlas
+            size: The box thumbnails fit into
+        """
+        self.files = files
+        self.store = store
+        self.size = size
+        self.atlas = ThumbnailAtlas(store.atlas_prefix(folder_path), size)
+        self.failed: Set[int] = set()  # Positions without a thumbnail source, or whose source can't be read
+
+    def _source_path(self, media_file: MediaFile) -> Optional[str]:
+        """The file a thumbnail is made from, None if there is none"""
+        media_type = media_file.media_type.lower()
+        if media_type in ("image", "gif"):
+            return os.path.join(media_file.folder_path, media_file.file_name)
+        if media_type == "video" and media_file.media_file_id is not None and self.store.has(media_file.media_file_id):
+            return self.store.path_for(media_file.media_file_id)
+        return None
+
+    def _build(self, indices: Iterable[int]) -> Dict[int, bytes]:
+        """Make the thumbnails of some positions and append them to the atlas"""
+        built, thumbnails = {}, []
+        for index in indices:
+            media_file = self.files[index]
+            path = self._source_path(media_file)
+            if path is None:
+                self.failed.add(index)
+                continue
+            try:
+                data = make_thumbnail(path, self.size)
+            except (OSError, ValueError, Image.DecompressionBombError) as e:
+                print(f"Error making thumbnail of {path}: {e}")
+                self.failed.add(index)
+                continue
+            built[index] = data
+            thumbnails.append((media_file.file_name, media_file.file_mtime, data))
+        self.atlas.add(thumbnails)
+        return built
+
+    @timed("thumbnail_load")
+    def load(self, indices: List[int]) -> Dict[int, Optional[Image.Image]]:
+        """
+        Get the thumbnails of some positions, building the ones the atlas doesn't have yet.
+
+        Args:
+            indices: Positions in the file list, e.g. the rows in view
+
+        Returns:
+            The thumbnail of every position, None for files that have none
+        """
+        requests = [(self.files[i].file_name, self.files[i].file_mtime) for i in indices]
+        by_name = self.atlas.read(requests)
+        result: Dict[int, Optional[Image.Image]] = {}
+        missing = []
+        for index, (name, _) in zip(indices, requests):
+            if name in by_name:
+                result[index] = by_name[name]
+            elif index in self.failed:
+                result[index] = None
+            else:
+                missing.append(index)
+        built = self._build(missing)
+        for index in missing:
+            data = built.get(index)
+            result[index] = Image.open(io.BytesIO(data)) if data is not None else None
+        return result
+
+    def build_missing(self, start: int, limit: int) -> Optional[int]:
+        """
+        Build up to limit missing thumbnails from a position on, so they are ready before they are scrolled to.
+
+        Returns:
+            The position to continue from, None once every file from start on has been looked at
+        """
+        missing = []
+        index = start
+        while index < len(self.files) and len(missing) < limit:
+            media_file = self.files[index]
+            if index not in self.failed and not self.atlas.is_fresh(media_file.file_name, media_file.file_mtime):
+                missing.append(index)
+            index += 1
+        self._build(missing)
+        return index if index < len(self.files) else None
+
+    def close(self):
+        """Compact the atlas if a lot of it is replaced thumbnails, and unmap it"""
+        if self.atlas.needs_compaction():
+            self.atlas.compact(media_file.file_name for media_file in self.files)
+        self.atlas.close()
@@ -0,0 +1,264 @@
+# /app/classes/thumbnail_browser.py
+import os
+import tkinter as tk
+from tkinter import ttk
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Set
+from PIL import Image, ImageTk
+from .media_file import MediaFile
+from .media_folder import MediaFolder
+from .thumbnail_atlas import THUMBNAIL_SIZE, FolderThumbnails
+from .thumbnail_store import ThumbnailStore
+
+CELL_PADDING = 8
+LABEL_HEIGHT = 18
+# Decoded thumbnails kept for scrolling back, PhotoImages only exist for the rows in view
+CACHED_THUMBNAILS = 600
+# Thumbnails built ahead per background job while nothing in view is missing
+BUILD_BATCH = 128
+POLL_MS = 30
+
+
+class ThumbnailBrowser:
+    """
+    A contact sheet of a folder's files on a Canvas. Scrolling is virtual: only
+    the rows in view (and one row around them) have canvas items and
+    PhotoImages, so memory stays bounded however many files the folder has.
+    Thumbnails are read from the folder's atlas, and built into it, by one
+    worker thread; the rows in view go first, the rest are built ahead while idle.
+    """
+
+    def __init__(self, parent: tk.Misc, folder: MediaFolder, store: ThumbnailStore,
+                 on_open: Optional[Callable[[MediaFile], None]] = None):
+        """
+        Initialize the ThumbnailBrowser.
+
+        Args:
+            parent: The parent window
+            folder: The folder whose files are shown, its subfolders are not
+            store: Where the atlases and video posters are kept
+            on_open: Called with the file that is double-clicked
+        """
+        self.files: List[MediaFile] = list(folder.files)
+        self.on_open = on_open
+        self.cell_width = THUMBNAIL_SIZE[0] + 2 * CELL_PADDING
+        self.cell_height = THUMBNAIL_SIZE[1] + LABEL_HEIGHT + 2 * CELL_PADDING
+
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"Thumbnails - {folder.folder_path}")
+        self.window.geometry("960x720")
+        self.status = ttk.Label(self.window, anchor="w")
+        self.status.pack(side="bottom", fill="x")
+        scrollbar = ttk.Scrollbar(self.window, orient="vertical", command=self._on_scrollbar)
+        scrollbar.pack(side="right", fill="y")
+        self.canvas = tk.Canvas(self.window, background="#202020", highlightthickness=0,
+                                yscrollcommand=scrollbar.set, yscrollincrement=self.cell_height // 4)
+        self.canvas.pack(side="left", fill="both", expand=True)
+
+        self.thumbnails = FolderThumbnails(self.files, store, folder.folder_path)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnail-browser")
+        self._future: Optional[Future] = None
+        self._future_is_build = False
+        self._build_cursor: Optional[int] = 0  # Where building ahead continues, None once done
+        self._images: 'OrderedDict[int, Optional[Image.Image]]' = OrderedDict()  # Least recently used first
+        self._photos: Dict[int, Optional[ImageTk.PhotoImage]] = {}  # None for cells showing their media type
+        self._drawn: Set[int] = set()  # Positions that have canvas items
+        self._columns = 0
+        self._selected: Optional[int] = None
+        self._render_id = None
+        self._poll_id = None
+        self._closed = False
+
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Button-4>", lambda e: self._scroll_units(-3))
+        self.canvas.bind("<Button-5>", lambda e: self._scroll_units(3))
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Double-Button-1>", self._on_double_click)
+        self.window.bind("<Prior>", lambda e: self._scroll_pages(-1))
+        self.window.bind("<Next>", lambda e: self._scroll_pages(1))
+        self.window.bind("<Escape>", lambda e: self.close())
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        self._update_status()
+
+    def _on_configure(self, event):
+        """Lay the cells out again when the number of columns changes"""
+        columns = max(event.width // self.cell_width, 1)
+        if columns != self._columns:
+            self._columns = columns
+            self.canvas.delete("cell")
+            self._drawn.clear()
+            self._photos.clear()
+            rows = -(-len(self.files) // columns)
+            self.canvas.configure(scrollregion=(0, 0, columns * self.cell_width, rows * self.cell_height))
+        self._schedule_render()
+
+    def _on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self._schedule_render()
+
+    def _on_mousewheel(self, event):
+        self._scroll_units(-3 if event.delta > 0 else 3)
+
+    def _scroll_units(self, units: int):
+        self.canvas.yview_scroll(units, "units")
+        self._schedule_render()
+
+    def _scroll_pages(self, pages: int):
+        self.canvas.yview_scroll(pages, "pages")
+        self._schedule_render()
+
+    def _schedule_render(self):
+        """Render once the pending scroll and resize events are handled, however many there were"""
+        if self._render_id is None and not self._closed:
+            self._render_id = self.canvas.after_idle(self._render)
+
+    def _visible_range(self) -> range:
+        """The positions in view, with one row more above and below"""
+        if not self._columns:
+            return range(0)
+        top = self.canvas.canvasy(0)
+        bottom = self.canvas.canvasy(self.canvas.winfo_height())
+        first_row = max(int(top // self.cell_height) - 1, 0)
+        last_row = int(bottom // self.cell_height) + 2
+        return range(first_row * self._columns, min(last_row * self._columns, len(self.files)))
+
+    def _render(self):
+        """Create the items of the cells that came into view and drop those of the cells that left it"""
+        self._render_id = None
+        visible = self._visible_range()
+        for index in [i for i in self._drawn if i not in visible]:
+            self.canvas.delete(f"cell{index}")
+            self._drawn.discard(index)
+            self._photos.pop(index, None)
+        for index in visible:
+            if index not in self._drawn:
+                self._draw_cell(index)
+            if index not in self._photos and index in self._images:
+                self._show_thumbnail(index)
+        self._submit()
+
+    def _cell_origin(self, index: int):
+        row, column = divmod(index, self._columns)
+        return column * self.cell_width, row * self.cell_height
+
+    def _draw_cell(self, index: int):
+        """A placeholder box and the file name, the thumbnail is drawn on it when it is ready"""
+        x, y = self._cell_origin(index)
+        tags = ("cell", f"cell{index}")
+        self.canvas.create_rectangle(
+            x + CELL_PADDING - 2, y + CELL_PADDING - 2,
+            x + self.cell_width - CELL_PADDING + 2, y + CELL_PADDING + THUMBNAIL_SIZE[1] + 2,
+            fill="#303030", outline="#f0c040" if index == self._selected else "", width=2,
+            tags=tags + (f"frame{index}",)
+        )
+        media_file = self.files[index]
+        name = media_file.file_name if len(media_file.file_name) <= 20 else media_file.file_name[:19] + "…"
+        self.canvas.create_text(
+            x + self.cell_width // 2, y + CELL_PADDING + THUMBNAIL_SIZE[1] + LABEL_HEIGHT // 2 + 2,
+            text=name, fill="#d0d0d0", font=("TkDefaultFont", 8), tags=tags
+        )
+        self._drawn.add(index)
+
+    def _show_thumbnail(self, index: int):
+        """Draw a decoded thumbnail into its cell, or the media type for files that have none"""
+        image = self._images[index]
+        self._images.move_to_end(index)
+        x, y = self._cell_origin(index)
+        center = (x + self.cell_width // 2, y + CELL_PADDING + THUMBNAIL_SIZE[1] // 2)
+        if image is None:
+            self.canvas.create_text(*center, text=self.files[index].media_type, fill="#808080",
+                                    tags=("cell", f"cell{index}"))
+            self._photos[index] = None
+            return
+        photo = ImageTk.PhotoImage(image)
+        self._photos[index] = photo
+        self.canvas.create_image(*center, image=photo, tags=("cell", f"cell{index}"))
+
+    def _remember(self, images: Dict[int, Optional[Image.Image]]):
+        for index, image in images.items():
+            self._images[index] = image
+            self._images.move_to_end(index)
+        while len(self._images) > CACHED_THUMBNAILS:
+            self._images.popitem(last=False)
+
+    def _submit(self):
+        """Start the next worker job, unless one is running: the missing rows in view, else building ahead"""
+        if self._future is not None or self._closed:
+            return
+        missing = [i for i in self._visible_range() if i not in self._images]
+        if missing:
+            self._future = self._executor.submit(self.thumbnails.load, missing)
+            self._future_is_build = False
+        elif self._build_cursor is not None:
+            self._future = self._executor.submit(self.thumbnails.build_missing, self._build_cursor, BUILD_BATCH)
+            self._future_is_build = True
+        else:
+            return
+        self._poll_id = self.canvas.after(POLL_MS, self._poll)
+
+    def _poll(self):
+        """Take the result of the worker job once it is done"""
+        self._poll_id = None
+        if not self._future.done():
+            self._poll_id = self.canvas.after(POLL_MS, self._poll)
+            return
+        future, self._future = self._future, None
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Error loading thumbnails: {e}")
+            self._build_cursor = None
+            return
+        if self._future_is_build:
+            self._build_cursor = result
+            self._update_status()
+        else:
+            self._remember(result)
+        self._render()
+
+    def _update_status(self):
+        built = "all thumbnails built" if self._build_cursor is None else "building thumbnails..."
+        self.status["text"] = f"{len(self.files)} files, {built}"
+
+    def _index_at(self, event) -> Optional[int]:
+        if not self._columns:
+            return None
+        x, y = self.canvas.canvasx(event.x), self.canvas.canvasy(event.y)
+        column, row = int(x // self.cell_width), int(y // self.cell_height)
+        index = row * self._columns + column
+        return index if column < self._columns and 0 <= index < len(self.files) else None
+
+    def _on_click(self, event):
+        """Select the clicked file"""
+        index = self._index_at(event)
+        if self._selected is not None:
+            self.canvas.itemconfigure(f"frame{self._selected}", outline="")
+        self._selected = index
+        if index is not None:
+            self.canvas.itemconfigure(f"frame{index}", outline="#f0c040")
+            media_file = self.files[index]
+            self.status["text"] = f"{os.path.join(media_file.folder_path, media_file.file_name)}, " \
+                                  f"{media_file.file_size_kb:,} KB"
+
+    def _on_double_click(self, event):
+        index = self._index_at(event)
+        if index is not None and self.on_open is not None:
+            self.on_open(self.files[index])
+
+    def close(self):
+        """Close the window; the worker finishes its job, then compacts and unmaps the atlas"""
+        if self._closed:
+            return
+        self._closed = True
+        for after_id in (self._render_id, self._poll_id):
+            if after_id is not None:
+                self.canvas.after_cancel(after_id)
+        if self._future is not None:
+            self._future.cancel()
+        self._executor.submit(self.thumbnails.close)
+        self._executor.shutdown(wait=False)
+        self._photos.clear()
+        self._images.clear()
+        self.window.destroy()
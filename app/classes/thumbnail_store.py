@@ -0,0 +1,122 @@
+# /app/classes/thumbnail_store.py
+"""
+Thumbnails and video poster frames on disk, one JPEG per media file.
+
+Files are named after their media_file_id and spread over 256 subdirectories,
+so no directory grows huge: <directory>/<id % 256 as 2 hex digits>/<id>.jpg.
+Writers write a temporary file and rename it, so a reader never sees half a JPEG.
+The thumbnails of the browser are packed per folder into atlases (see
+ThumbnailAtlas) in <directory>/atlas, named after a hash of the folder path.
+"""
+import hashlib
+import os
+from typing import Dict, Iterable, Optional
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cache", "media_manager", "thumbnails")
+EXTENSION = ".jpg"
+# Suffix of files being written, left behind only if a writer died
+TEMPORARY_SUFFIX = ".tmp" + EXTENSION
+ATLAS_DIRECTORY = "atlas"
+
+
+class ThumbnailStore:
+    """A directory of JPEG thumbnails keyed by media_file_id"""
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Initialize the ThumbnailStore.
+
+        Args:
+            directory: Where the thumbnails are kept, defaults to DEFAULT_DIRECTORY
+        """
+        self.directory = directory or DEFAULT_DIRECTORY
+
+    def path_for(self, media_file_id: int) -> str:
+        """Get the path of a file's thumbnail, whether it exists or not"""
+        return os.path.join(self.directory, f"{media_file_id % 256:02x}", f"{media_file_id}{EXTENSION}")
+
+    def prepare(self, media_file_id: int) -> str:
+        """Create the directory of a file's thumbnail and return its path"""
+        path = self.path_for(media_file_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def atlas_prefix(self, folder_path: str) -> str:
+        """Get the path, without extension, of the thumbnail atlas of a folder"""
+        digest = hashlib.sha1(os.path.normcase(os.path.abspath(folder_path)).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, ATLAS_DIRECTORY, digest)
+
+    def has(self, media_file_id: int) -> bool:
+        """Check whether a file has a thumbnail"""
+        return os.path.isfile(self.path_for(media_file_id))
+
+    def remove(self, media_file_id: int):
+        """Delete a file's thumbnail, if it has one"""
+        try:
+            os.remove(self.path_for(media_file_id))
+        except FileNotFoundError:
+            pass
+
+    def vacuum(self, keep_ids: Iterable[int], keep_folder_paths: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        Delete thumbnails of files that are no longer in the library, and leftover temporary files.
+
+        Args:
+            keep_ids: The media_file_ids whose thumbnails stay
+            keep_folder_paths: The folders whose atlases stay, None leaves all atlases alone
+
+        Returns:
+            Number of thumbnails kept and removed, and the bytes freed
+        """
+        keep_ids = set(keep_ids)
+        counts = {'kept': 0, 'removed': 0, 'bytes_freed': 0}
+        if not os.path.isdir(self.directory):
+            return counts
+        if keep_folder_paths is not None:
+            self._vacuum_atlases(keep_folder_paths, counts)
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir() or shard.name == ATLAS_DIRECTORY:
+                continue
+            for entry in os.scandir(shard.path):
+                name = entry.name
+                stem = name[:-len(EXTENSION)] if name.endswith(EXTENSION) else None
+                if stem is not None and stem.isdigit() and int(stem) in keep_ids:
+                    counts['kept'] += 1
+                    continue
+                if stem is None or not (stem.isdigit() or name.endswith(TEMPORARY_SUFFIX)):
+                    continue  # Not ours
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                except OSError:
+                    continue
+                counts['removed'] += 1
+                counts['bytes_freed'] += size
+        return counts
+
+    def _vacuum_atlases(self, keep_folder_paths: Iterable[str], counts: Dict[str, int]):
+        """Delete the atlases of folders that are no longer in the library"""
+        directory = os.path.join(self.directory, ATLAS_DIRECTORY)
+        if not os.path.isdir(directory):
+            return
+        keep = {os.path.basename(self.atlas_prefix(path)) for path in keep_folder_paths}
+        counts['atlases_removed'] = 0
+        for entry in os.scandir(directory):
+            stem = entry.name.split(".", 1)[0]
+            if stem in keep or len(stem) != 40:
+                continue
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            counts['atlases_removed'] += 1
+            counts['bytes_freed'] += size
+
+
+def write_atomically(path: str, data: bytes):
+    """Write a thumbnail through a temporary file, so readers never see a partial one"""
+    temporary_path = path[:-len(EXTENSION)] + TEMPORARY_SUFFIX
+    with open(temporary_path, "wb") as f:
+        f.write(data)
+    os.replace(temporary_path, path)
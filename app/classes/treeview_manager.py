@@ -1,13 +1,17 @@
 # /app/classes/treeview_manager.py
 #import tkinter as tk
-from tkinter import ttk, Menu
-from typing import Dict, Optional, List, Any
+from tkinter import ttk, Menu, filedialog, messagebox, simpledialog
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, List, Any, Callable
 import os
 import platform
 import subprocess
+import time
 from .media_file import MediaFile 
 from .media_folder import MediaFolder 
-from .slideshow_manager import MultiSlideshowWindow 
+from . import instrumentation
+from .instrumentation import timed
+from .file_operations import DELETE, FileOperation, plan_delete, plan_move, plan_rename, run_operations
 
 class TreeviewManager:
     def __init__(self, tree: ttk.Treeview, image_manager=None):
@@ -20,7 +24,14 @@ class TreeviewManager:
         """
         self.tree = tree
         self.item_to_object: Dict[str, Any] = {}  # Maps item IDs to MediaFolder/MediaFile objects
+        self.object_items: Dict[int, str] = {}  # Maps id() of MediaFolder/MediaFile objects back to item IDs
         self.image_manager = image_manager  # Store reference to ImageManager
+        self.slideshow_options: Dict[str, Any] = {}  # Extra keyword arguments for MultiSlideshowWindow
+        self.library = None  # MediaLibrary that tags are stored in, set by the app; no tag menu without it
+        self.media_manager = None  # The MediaManager shown, for its tag index
+        self.on_new_collection: Optional[Callable[[MediaFolder], None]] = None  # Creates a smart collection from a folder
+        self._populate_job: Optional[str] = None  # after() id of a running progressive populate
+        self._file_job: Optional[Future] = None  # Move, rename or delete batch running on disk
 
         # Configure treeview columns
         self._configure_columns()
@@ -32,18 +43,21 @@ class TreeviewManager:
 
     def _configure_columns(self):
         """Configure the treeview columns"""
-        self.tree["columns"] = ("type", "size", "path")
+        self.tree["columns"] = ("type", "size", "details", "path")
         self.tree.column("#0", width=300, stretch=True)  # Name column
         self.tree.column("type", width=100, anchor="w")
         self.tree.column("size", width=80, anchor="e")
+        self.tree.column("details", width=150, anchor="w")
         self.tree.column("path", width=200, stretch=True)
 
         # Set column headings
         self.tree.heading("#0", text="Name")
         self.tree.heading("type", text="Type")
         self.tree.heading("size", text="Size (KB)")
+        self.tree.heading("details", text="Details")
         self.tree.heading("path", text="Path")
 
+    @timed("treeview_populate")
     def populate(self, media_manager):
         """
         Populate the treeview using the MediaManager data.
@@ -52,12 +66,16 @@ class TreeviewManager:
             media_manager: The MediaManager instance containing the media data
         """
         try:
+            self._cancel_populate()
+            self.media_manager = media_manager
+
             # Clear existing items
             for item in self.tree.get_children():
                 self.tree.delete(item)
 
-            # Clear the item-to-object mapping
+            # Clear the item-to-object mappings
             self.item_to_object = {}
+            self.object_items = {}
 
             # Add root folders
             for folder in media_manager.get_root_folders():
@@ -66,6 +84,116 @@ class TreeviewManager:
         except Exception as e:
             raise Exception(f"Failed to populate treeview: {e}")
 
+    def populate_progressive(self, media_manager, chunk_size: int = 500,
+                             on_progress: Optional[Callable[[int], None]] = None,
+                             on_done: Optional[Callable[[int], None]] = None):
+        """
+        Populate the treeview in chunks from the Tk event loop, so the window
+        stays responsive while a large library is inserted.
+        Items appear in the same order as with populate().
+
+        Args:
+            media_manager: The MediaManager instance containing the media data
+            chunk_size: Number of items inserted per event loop iteration
+            on_progress: Called with the number of items inserted so far after every chunk
+            on_done: Called with the total number of items once everything is inserted
+        """
+        self.clear()
+        self.media_manager = media_manager
+
+        insertions = (
+            item_id
+            for folder in media_manager.get_root_folders()
+            for item_id in self._iter_folder_insertions("", folder)
+        )
+        start = time.perf_counter()
+        inserted = 0
+
+        def insert_chunk():
+            nonlocal inserted
+            self._populate_job = None
+            try:
+                for _ in range(chunk_size):
+                    next(insertions)
+                    inserted += 1
+            except StopIteration:
+                if instrumentation.is_enabled():
+                    instrumentation.record("treeview_populate", time.perf_counter() - start)
+                if on_done:
+                    on_done(inserted)
+                return
+            if on_progress:
+                on_progress(inserted)
+            self._populate_job = self.tree.after(1, insert_chunk)
+
+        insert_chunk()
+
+    def _cancel_populate(self):
+        """Stop a progressive populate that is still running"""
+        if self._populate_job is not None:
+            self.tree.after_cancel(self._populate_job)
+            self._populate_job = None
+
+    def _iter_folder_insertions(self, parent_item_id, folder):
+        """
+        Add a folder and its contents to the treeview one item at a time,
+        in the same order as _add_folder_to_treeview.
+
+        Yields:
+            The item ID of every inserted item
+        """
+        folder_item_id = self._insert_folder_item(parent_item_id, folder)
+        yield folder_item_id
+
+        for subfolder in folder.subfolders:
+            yield from self._iter_folder_insertions(folder_item_id, subfolder)
+
+        for file in folder.files:
+            yield self._insert_file_item(folder_item_id, file)
+
+    def _insert_folder_item(self, parent_item_id, folder) -> str:
+        """Insert a single folder item and remember its MediaFolder"""
+        folder_item_id = self.tree.insert(
+            parent_item_id,
+            "end",
+            text=os.path.basename(folder.folder_path),
+            values=("", "", "", folder.folder_path),  # Empty values for type, size and details
+            tags=("folder",)
+        )
+        self.item_to_object[folder_item_id] = folder
+        self.object_items[id(folder)] = folder_item_id
+        return folder_item_id
+
+    def _insert_file_item(self, folder_item_id, file) -> str:
+        """Insert a single file item and remember its MediaFile"""
+        file_item_id = self.tree.insert(
+            folder_item_id,
+            "end",
+            text=file.file_name,
+            values=self._file_values(file),
+            tags=("file",)
+        )
+        self.item_to_object[file_item_id] = file
+        self.object_items[id(file)] = file_item_id
+        return file_item_id
+
+    def _file_values(self, file: MediaFile) -> tuple:
+        """The type, size, details and path columns of a file"""
+        return (file.media_type, f"{file.file_size_kb:,}", self._file_details(file), file.folder_path)
+
+    @staticmethod
+    def _file_details(file: MediaFile) -> str:
+        """Resolution and length of videos, capture date of photos, from the stored metadata"""
+        details = []
+        if file.media_width and file.media_height:
+            details.append(f"{file.media_width}x{file.media_height}")
+        if file.duration_s is not None:
+            minutes, seconds = divmod(int(round(file.duration_s)), 60)
+            details.append(f"{minutes}:{seconds:02d}")
+        if file.captured_at is not None:
+            details.append(file.captured_at.strftime("%Y-%m-%d"))
+        return ", ".join(details)
+
     def _add_folder_to_treeview(self, parent_item_id, folder):
         """
         Recursively add a folder and its contents to the treeview.
@@ -79,16 +207,7 @@ class TreeviewManager:
             The created treeview item ID
         """
         # Create folder item
-        folder_item_id = self.tree.insert(
-            parent_item_id,
-            "end",
-            text=os.path.basename(folder.folder_path),
-            values=("", "", folder.folder_path),  # Empty values for type and size
-            tags=("folder",)
-        )
-
-        # Store the association between item and folder
-        self.item_to_object[folder_item_id] = folder
+        folder_item_id = self._insert_folder_item(parent_item_id, folder)
 
         # First add subfolders
         for subfolder in folder.subfolders:
@@ -96,18 +215,7 @@ class TreeviewManager:
 
         # Then add files in this folder
         for file in folder.files:
-            file_item_id = self.tree.insert(
-                folder_item_id,
-                "end",
-                text=file.file_name,
-                values=(
-                    file.media_type,
-                    f"{file.file_size_kb:,}",
-                    file.folder_path
-                ),
-                tags=("file",)
-            )
-            self.item_to_object[file_item_id] = file
+            self._insert_file_item(folder_item_id, file)
 
         return folder_item_id
 
@@ -137,9 +245,11 @@ class TreeviewManager:
 
     def clear(self):
         """Clear all items from the treeview"""
+        self._cancel_populate()
         for item in self.tree.get_children():
             self.tree.delete(item)
         self.item_to_object = {}
+        self.object_items = {}
 
     def refresh(self, media_manager):
         """Refresh the treeview with updated data from the MediaManager"""
@@ -195,10 +305,11 @@ class TreeviewManager:
         # Close any existing menu
         #self._close_context_menu_on_click()
 
-        # Select the item under the cursor
+        # Select the item under the cursor, unless it is part of a selection to act on as a whole
         item = self.tree.identify_row(event.y)
         if item:
-            self.tree.selection_set(item)
+            if item not in self.tree.selection():
+                self.tree.selection_set(item)
             self.tree.focus(item)
 
             # Create context menu
@@ -219,6 +330,37 @@ class TreeviewManager:
                     label="Start Slideshow",
                     command=lambda: self._start_folder_slideshow(selected_obj)
                 )
+                self.context_menu.add_command(
+                    label="Browse Thumbnails",
+                    command=lambda: self._browse_thumbnails(selected_obj)
+                )
+                # Years come from the stored EXIF capture dates, no files are opened
+                years = self.media_manager.get_capture_years(selected_obj.get_files_recursive()) \
+                    if self.media_manager is not None else {}
+                if years:
+                    self.context_menu.add_command(
+                        label="Start Slideshow By Capture Date",
+                        command=lambda: self._start_capture_date_slideshow(selected_obj)
+                    )
+                    year_menu = Menu(self.context_menu, tearoff=0)
+                    for year, count in years.items():
+                        year_menu.add_command(
+                            label=f"{year} ({count})",
+                            command=lambda year=year: self._start_capture_date_slideshow(selected_obj, year)
+                        )
+                    self.context_menu.add_cascade(label="Start Slideshow From Year", menu=year_menu)
+                if self.media_manager is not None and self.media_manager.color_index is not None:
+                    self._add_color_menu_items(selected_obj)
+                if self.on_new_collection is not None:
+                    self.context_menu.add_command(
+                        label="New Collection From Folder...",
+                        command=lambda: self.on_new_collection(selected_obj)
+                    )
+
+            if self.library is not None and self.media_manager is not None:
+                if any(isinstance(obj, MediaFile) for obj in self.get_selected_objects()):
+                    self._add_file_operation_menu_items()
+                self._add_tag_menu_items()
 
             # Show the menu
             try:
@@ -232,9 +374,293 @@ class TreeviewManager:
         """Start a slideshow for all images in the selected folder."""
         # Get all image files recursively from the folder
         all_files = folder.get_files_recursive()
-        self.multi_slideshow_manager = MultiSlideshowWindow(all_files)
-        # Create and start the multi-slideshow
-        self.multi_slideshow_manager.start_slideshows(all_files)
+        # The slideshow pulls in Pillow and OpenCV, so it is only imported when one is started
+        from .slideshow_manager import MultiSlideshowWindow
+        # Create the multi-slideshow, it starts by itself once the window is visible
+        self.multi_slideshow_manager = MultiSlideshowWindow(all_files, **self.slideshow_options)
+
+    def _start_capture_date_slideshow(self, folder: MediaFolder, year: Optional[int] = None):
+        """
+        Show the files below a folder in capture date order, from the MediaManager's capture date index.
+
+        Args:
+            folder: The folder
+            year: Only files captured in this year, None for all files, undated ones last
+        """
+        folder_files = folder.get_files_recursive()
+        if year is None:
+            files = self.media_manager.get_files_sorted_by_capture_date(folder_files)
+        else:
+            in_folder = {id(file) for file in folder_files}
+            files = [file for file in self.media_manager.get_files_from_year(year) if id(file) in in_folder]
+        from .playlist_source import OrderedSource
+        from .slideshow_engine import SLIDESHOW_MEDIA_TYPES
+        from .slideshow_manager import MultiSlideshowWindow
+        self.multi_slideshow_manager = MultiSlideshowWindow(OrderedSource(files, SLIDESHOW_MEDIA_TYPES),
+                                                            **self.slideshow_options)
+
+    def _add_color_menu_items(self, folder: MediaFolder):
+        """Add sorting the folder by colour and colour slideshows, from the stored colour features"""
+        from .color_features import COLOR_NAMES
+        self.context_menu.add_command(label="Sort Files By Colour", command=lambda: self._sort_folder_by_color(folder))
+        color_menu = Menu(self.context_menu, tearoff=0)
+        for name, colors in COLOR_NAMES.items():
+            color_menu.add_command(label=name.capitalize(),
+                                   command=lambda colors=colors: self._start_color_slideshow(folder, colors))
+        color_menu.add_separator()
+        color_menu.add_command(label="Other Colour...", command=lambda: self._ask_color_slideshow(folder))
+        self.context_menu.add_cascade(label="Start Slideshow By Colour", menu=color_menu)
+
+    def _sort_folder_by_color(self, folder: MediaFolder):
+        """Reorder the folder's file items by dominant colour; subfolders stay first, the folder itself is unchanged"""
+        folder_item = self.object_items.get(id(folder))
+        if folder_item is None:
+            return
+        children = [self.object_items.get(id(sub)) for sub in folder.subfolders]
+        children += [self.object_items.get(id(f)) for f in self.media_manager.sort_files_by_color(folder.files)]
+        self.tree.set_children(folder_item, *[child for child in children if child is not None])
+
+    def _ask_color_slideshow(self, folder: MediaFolder):
+        from .color_features import parse_color
+        text = simpledialog.askstring("Start Slideshow By Colour", "Colour (#rrggbb or a name):", parent=self.tree)
+        if not text:
+            return
+        try:
+            colors = parse_color(text)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self._start_color_slideshow(folder, colors)
+
+    def _start_color_slideshow(self, folder: MediaFolder, colors: List[tuple]):
+        """Show the files below a folder whose pixels are mostly near some colours; only the colour index is read"""
+        files = self.media_manager.get_files_by_color(colors, files=folder.get_files_recursive())
+        if not files:
+            messagebox.showinfo("Start Slideshow By Colour", "No files in this folder have that colour.")
+            return
+        from .slideshow_manager import MultiSlideshowWindow
+        self.multi_slideshow_manager = MultiSlideshowWindow(files, **self.slideshow_options)
+
+    def _browse_thumbnails(self, folder: MediaFolder):
+        """Open a contact sheet of the folder's files, double-clicking one shows it in the image pane"""
+        # Pillow is only imported once a browser is opened
+        from .thumbnail_browser import ThumbnailBrowser
+        from .thumbnail_store import ThumbnailStore
+        store = self.library.thumbnail_store if self.library is not None else ThumbnailStore()
+        self.thumbnail_browser = ThumbnailBrowser(self.tree.winfo_toplevel(), folder, store,
+                                                  on_open=self._show_in_image_pane)
+
+    def _show_in_image_pane(self, media_file: MediaFile):
+        """Show an image or GIF in the ImageManager pane"""
+        if self.image_manager and media_file.media_type.lower() in ["image", "gif"]:
+            self.image_manager.display_image(os.path.join(media_file.folder_path, media_file.file_name))
+
+    def _add_file_operation_menu_items(self):
+        """Add moving, renaming and deleting the selected files to the context menu"""
+        count = sum(1 for obj in self.get_selected_objects() if isinstance(obj, MediaFile))
+        suffix = f" {count} Files" if count > 1 else ""
+        self.context_menu.add_separator()
+        self.context_menu.add_command(label=f"Move{suffix} To Folder...", command=self._move_selection)
+        self.context_menu.add_command(label=f"Rename{suffix}...", command=self._rename_selection)
+        self.context_menu.add_command(label=f"Delete{suffix}...", command=self._delete_selection)
+
+    def _selected_files(self) -> List[MediaFile]:
+        return [obj for obj in self.get_selected_objects() if isinstance(obj, MediaFile)]
+
+    def _move_selection(self):
+        """Ask for a library folder and move the selected files into it"""
+        files = self._selected_files()
+        if not files or not self._can_start_file_job():
+            return
+        destination = filedialog.askdirectory(parent=self.tree, initialdir=files[0].folder_path,
+                                              title="Move To Folder", mustexist=True)
+        if not destination:
+            return
+        folder = (self.media_manager.get_folder_by_path(destination)
+                  or self.media_manager.get_folder_by_path(os.path.normpath(destination)))
+        if folder is None:
+            messagebox.showerror("Error", f"{destination} is not a folder of the library, scan it first.")
+            return
+        try:
+            operations = plan_move(files, folder)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self._start_file_job(operations)
+
+    def _rename_selection(self):
+        """Ask for a new name, or a pattern for several files, and rename the selected files"""
+        files = self._selected_files()
+        if not files or not self._can_start_file_job():
+            return
+        if len(files) == 1:
+            pattern = simpledialog.askstring("Rename", "New name:", initialvalue=files[0].file_name, parent=self.tree)
+        else:
+            pattern = simpledialog.askstring(
+                "Rename", f"Pattern for {len(files)} files, {{name}} is the old name without extension,\n"
+                          "{ext} the extension and {n} the number, e.g. holiday_{n:03}{ext}:",
+                initialvalue="{name}_{n:03}{ext}", parent=self.tree
+            )
+        if not pattern:
+            return
+        try:
+            operations = plan_rename(files, pattern, self.media_manager.extension_to_type,
+                                     self.media_manager.folder_by_id)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self._start_file_job(operations)
+
+    def _delete_selection(self):
+        """Delete the selected files from disk after asking"""
+        files = self._selected_files()
+        if not files or not self._can_start_file_job():
+            return
+        what = files[0].file_name if len(files) == 1 else f"{len(files)} files"
+        if not messagebox.askyesno("Delete", f"Permanently delete {what} from disk?", parent=self.tree):
+            return
+        self._start_file_job(plan_delete(files))
+
+    def _can_start_file_job(self) -> bool:
+        if self._file_job is not None:
+            messagebox.showinfo("Busy", "Wait until the running file operation has finished.")
+            return False
+        if self._populate_job is not None:
+            messagebox.showinfo("Busy", "Wait until the library has been loaded.")
+            return False
+        return True
+
+    def _start_file_job(self, operations: List[FileOperation]):
+        """Run the filesystem side of a batch in worker threads, the rest follows on the Tk thread"""
+        if not operations:
+            return
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-job")
+        self._file_job = executor.submit(run_operations, operations)
+        executor.shutdown(wait=False)
+        self.tree.configure(cursor="watch")
+        self._poll_file_job(operations)
+
+    def _poll_file_job(self, operations: List[FileOperation]):
+        if not self._file_job.done():
+            self.tree.after(50, self._poll_file_job, operations)
+            return
+        job, self._file_job = self._file_job, None
+        self.tree.configure(cursor="")
+        try:
+            job.result()
+            self.library.apply_file_operations(operations)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to update the library, rescan to bring it up to date: {e}")
+            return
+        self.media_manager.apply_file_operations(operations)
+        self.apply_file_operations(operations)
+        failed = [op for op in operations if op.error is not None]
+        if failed:
+            details = "\n".join(f"{op.media_file.file_name}: {op.error}" for op in failed[:10])
+            more = f"\n... and {len(failed) - 10} more" if len(failed) > 10 else ""
+            messagebox.showwarning("File Operations", f"{len(failed)} of {len(operations)} files failed:\n"
+                                                      f"{details}{more}")
+
+    def apply_file_operations(self, operations: List[FileOperation]):
+        """
+        Patch the items of moved, renamed and deleted files in place, after the MediaManager
+        has been patched: one set_children call per touched folder puts its files in order.
+        """
+        done = [op for op in operations if op.error is None]
+        touched = {}
+        for op in done:
+            item = self.object_items.get(id(op.media_file))
+            if op.kind == DELETE:
+                if item is not None:
+                    self.tree.delete(item)
+                    del self.item_to_object[item]
+                    del self.object_items[id(op.media_file)]
+                continue
+            if item is not None:
+                self.tree.item(item, text=op.media_file.file_name, values=self._file_values(op.media_file))
+            touched[id(op.target_folder)] = op.target_folder
+            # A moved file's old folder only lost it, set_children on the new folder takes the item along
+        for folder in touched.values():
+            folder_item = self.object_items.get(id(folder))
+            if folder_item is None:
+                continue
+            children = [self.object_items.get(id(sub)) for sub in folder.subfolders]
+            children += [self.object_items.get(id(f)) for f in folder.files]
+            self.tree.set_children(folder_item, *[child for child in children if child is not None])
+
+    def _add_tag_menu_items(self):
+        """Add tagging the selected items and tag query slideshows to the context menu"""
+        count = len(self.tree.selection())
+        self.context_menu.add_separator()
+        self.context_menu.add_command(
+            label=f"Add Tag to {count} Items..." if count > 1 else "Add Tag...",
+            command=self._tag_selection
+        )
+        tag_index = self.media_manager.tag_index
+        tags = tag_index.tags() if tag_index is not None else []
+        if tags:
+            remove_menu = Menu(self.context_menu, tearoff=0)
+            for tag in tags:
+                remove_menu.add_command(label=tag, command=lambda tag=tag: self._untag_selection(tag))
+            self.context_menu.add_cascade(label="Remove Tag", menu=remove_menu)
+        self.context_menu.add_command(label="Start Slideshow From Tags...", command=self._start_tag_slideshow)
+
+    def _selected_ids(self):
+        """The media_file_ids and folder_ids of the selected items"""
+        file_ids, folder_ids = [], []
+        for obj in self.get_selected_objects():
+            if isinstance(obj, MediaFolder):
+                folder_ids.append(obj.folder_id)
+            elif isinstance(obj, MediaFile) and obj.media_file_id is not None:
+                file_ids.append(obj.media_file_id)
+        return file_ids, folder_ids
+
+    def _tag_selection(self):
+        """Ask for a tag and add it to all selected files and folders"""
+        file_ids, folder_ids = self._selected_ids()
+        if not file_ids and not folder_ids:
+            return
+        tag = simpledialog.askstring("Add Tag", "Tag:", parent=self.tree)
+        if not tag:
+            return
+        try:
+            tag = self.library.tag(tag, file_ids, folder_ids)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to add tag: {e}")
+            return
+        if self.media_manager.tag_index is None:
+            self.media_manager.build_tag_index({}, {})
+        self.media_manager.tag_index.add_files(tag, file_ids)
+        self.media_manager.tag_index.add_folders(tag, folder_ids)
+
+    def _untag_selection(self, tag: str):
+        """Take a tag off all selected files and folders"""
+        file_ids, folder_ids = self._selected_ids()
+        try:
+            self.library.untag(tag, file_ids, folder_ids)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to remove tag: {e}")
+            return
+        self.media_manager.tag_index.remove_files(tag, file_ids)
+        self.media_manager.tag_index.remove_folders(tag, folder_ids)
+
+    def _start_tag_slideshow(self):
+        """Ask for a tag query like 'family AND 2020 AND NOT blurry' and show the matching files"""
+        expression = simpledialog.askstring(
+            "Start Slideshow From Tags", "Tags (AND, OR, NOT, parentheses):", parent=self.tree
+        )
+        if not expression:
+            return
+        try:
+            files = self.media_manager.get_files_matching(expression)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        if not files:
+            messagebox.showinfo("Start Slideshow From Tags", f"No files match {expression}")
+            return
+        from .slideshow_manager import MultiSlideshowWindow
+        self.multi_slideshow_manager = MultiSlideshowWindow(files, **self.slideshow_options)
 
     def _close_context_menu_on_click(self, event):
         """Close context menu when clicking, but only if it's open"""
@@ -0,0 +1,209 @@
+# /app/classes/video_metadata.py
+"""
+Reading video metadata (duration, fps, resolution, codec) and a poster frame with cv2.
+
+Probing runs in worker processes, one file at a time per worker. A worker that
+takes longer than the timeout on a file is killed and replaced, so a corrupt
+container that makes the decoder hang (or crash) costs one file, not the batch.
+Poster frames are scaled and written by the worker straight into the
+ThumbnailStore, only the few metadata fields travel back to the parent.
+"""
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import Connection, wait
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Seconds into the clip the poster frame is taken from, at most half the clip
+POSTER_OFFSET_S = 3.0
+# Posters are scaled down to fit this box
+POSTER_SIZE = (320, 320)
+POSTER_JPEG_QUALITY = 85
+DEFAULT_TIMEOUT_S = 30.0
+
+# (media_file_id, video path, poster path or None)
+ProbeTask = Tuple[int, str, Optional[str]]
+
+
+@dataclass
+class VideoInfo:
+    """The stored metadata of a video"""
+    duration_s: Optional[float] = None
+    fps: Optional[float] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    codec: Optional[str] = None
+    has_poster: bool = False
+
+    def to_tuple(self):
+        """Convert to tuple for database updates, in column order"""
+        return (self.duration_s, self.fps, self.width, self.height, self.codec)
+
+
+def _fourcc_to_text(fourcc: float) -> Optional[str]:
+    """Decode cv2's CAP_PROP_FOURCC, e.g. 'avc1' or 'hevc'"""
+    code = int(fourcc)
+    if code <= 0:
+        return None
+    text = "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip("\x00 ")
+    return text if text.isprintable() and text else None
+
+
+def probe_video(path: str, poster_path: Optional[str] = None,
+                poster_offset_s: float = POSTER_OFFSET_S) -> Optional[VideoInfo]:
+    """
+    Read a video's metadata and optionally write a poster frame.
+
+    Args:
+        path: Path to the video file
+        poster_path: Where to write the poster JPEG, None for no poster
+        poster_offset_s: Seconds into the clip to take the poster from
+
+    Returns:
+        The metadata, None if the file can't be opened
+    """
+    import cv2
+    from .image_loading import fit_size
+    from .thumbnail_store import write_atomically
+
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            return None
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        info = VideoInfo(
+            duration_s=round(frame_count / fps, 3) if fps > 0 and frame_count > 0 else None,
+            fps=round(fps, 3) if 0 < fps < 1000 else None,
+            width=int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)) or None,
+            height=int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)) or None,
+            codec=_fourcc_to_text(capture.get(cv2.CAP_PROP_FOURCC)),
+        )
+        if poster_path is None:
+            return info
+
+        # Skip the usual black first frames, but stay inside short clips
+        offset_s = min(poster_offset_s, info.duration_s / 2) if info.duration_s else 0
+        capture.set(cv2.CAP_PROP_POS_MSEC, offset_s * 1000)
+        ok, frame = capture.read()
+        if not ok and offset_s:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = capture.read()
+        if ok and frame is not None:
+            height, width = frame.shape[:2]
+            if width > POSTER_SIZE[0] or height > POSTER_SIZE[1]:
+                frame = cv2.resize(frame, fit_size((width, height), POSTER_SIZE), interpolation=cv2.INTER_AREA)
+            ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, POSTER_JPEG_QUALITY])
+            if ok:
+                write_atomically(poster_path, encoded.tobytes())
+                info.has_poster = True
+        return info
+    finally:
+        capture.release()
+
+
+def _probe_worker(conn: Connection):
+    """Worker process: probe the tasks sent over the pipe until None arrives"""
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        media_file_id, path, poster_path = task
+        try:
+            info = probe_video(path, poster_path)
+        except Exception:
+            info = None
+        conn.send((media_file_id, info))
+
+
+class VideoProbePool:
+    """
+    Worker processes probing videos with a timeout per file.
+    Every worker gets one task at a time over its own pipe, so the parent
+    knows which file a stuck worker is on and can kill just that worker.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout_s: float = DEFAULT_TIMEOUT_S):
+        """
+        Initialize the VideoProbePool.
+
+        Args:
+            workers: Number of worker processes, defaults to the number of CPUs
+            timeout_s: Seconds a single file may take before its worker is killed
+        """
+        self.workers = max(workers or os.cpu_count() or 1, 1)
+        self.timeout_s = timeout_s
+        # Spawned rather than forked, the app has threads running (prefetching, loading)
+        self._context = multiprocessing.get_context("spawn")
+
+    def _start_worker(self) -> Tuple[multiprocessing.Process, Connection]:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_probe_worker, args=(child_conn,), daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    @staticmethod
+    def _kill(process: multiprocessing.Process, conn: Connection):
+        conn.close()
+        process.kill()
+        process.join()
+
+    def run(self, tasks: Iterable[ProbeTask],
+            on_result: Callable[[int, Optional[VideoInfo], Optional[str]], None]):
+        """
+        Probe all tasks, calling on_result(media_file_id, info, failure) in the calling
+        thread as each finishes; failure is None, "timeout" or "crashed".
+        """
+        tasks = iter(tasks)
+        idle = [self._start_worker() for _ in range(self.workers)]
+        busy: Dict[Connection, Tuple[multiprocessing.Process, int, float]] = {}
+        try:
+            while True:
+                while idle:
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    process, conn = idle.pop()
+                    conn.send(task)
+                    busy[conn] = (process, task[0], time.monotonic() + self.timeout_s)
+                if not busy:
+                    break
+
+                timeout = max(min(deadline for _, _, deadline in busy.values()) - time.monotonic(), 0)
+                for conn in wait(list(busy), timeout):
+                    process, media_file_id, _ = busy.pop(conn)
+                    try:
+                        _, info = conn.recv()
+                    except (EOFError, OSError):
+                        # The decoder took the worker down with it
+                        self._kill(process, conn)
+                        idle.append(self._start_worker())
+                        on_result(media_file_id, None, "crashed")
+                        continue
+                    idle.append((process, conn))
+                    on_result(media_file_id, info, None)
+
+                now = time.monotonic()
+                for conn, (process, media_file_id, deadline) in list(busy.items()):
+                    if deadline <= now:
+                        del busy[conn]
+                        self._kill(process, conn)
+                        idle.append(self._start_worker())
+                        on_result(media_file_id, None, "timeout")
+        finally:
+            for process, conn in idle:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+                conn.close()
+                process.join(timeout=1)
+                if process.is_alive():
+                    process.kill()
+            for conn, (process, _, _) in busy.items():
+                self._kill(process, conn)
@@ -0,0 +1,203 @@
+# /app/classes/video_player.py
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+import tkinter as tk
+import cv2
+from PIL import Image
+from .image_loading import fit_size
+
+
+@dataclass
+class VideoStats:
+    """Counters for a single video playback"""
+    frames_decoded: int = 0
+    frames_shown: int = 0
+    frames_skipped: int = 0  # Grabbed but never decoded because the decoder was behind
+    frames_dropped: int = 0  # Decoded but already late when the display loop got to them
+
+    def to_dict(self) -> Dict[str, int]:
+        """Convert to a dictionary for logging"""
+        return {
+            'frames_decoded': self.frames_decoded,
+            'frames_shown': self.frames_shown,
+            'frames_skipped': self.frames_skipped,
+            'frames_dropped': self.frames_dropped,
+        }
+
+
+class VideoPlayer:
+    """
+    Plays a video file for a slideshow cell.
+    A decode thread reads frames with cv2, scales them down to the cell size
+    straight away and feeds them into a small bounded queue. The Tk side
+    shows each frame when its timestamp comes up, dropping frames when behind.
+    """
+
+    # Marks the end of the stream in the frame queue
+    _END_OF_STREAM = (float("inf"), None)
+
+    def __init__(self, widget: tk.Misc, video_path: str, target_size: Tuple[int, int],
+                 on_frame: Callable[[Image.Image], None], on_finished: Callable[[], None],
+                 queue_size: int = 4):
+        """
+        Initialize the VideoPlayer.
+
+        Args:
+            widget: Any Tk widget, used to schedule after() callbacks
+            video_path: Path to the video file
+            target_size: The (width, height) box frames are scaled to fit into
+            on_frame: Called on the Tk thread with every frame that should be shown
+            on_finished: Called on the Tk thread when the clip has ended or failed
+            queue_size: Number of decoded frames buffered ahead of the display
+        """
+        self.widget = widget
+        self.video_path = video_path
+        self.target_size = target_size
+        self.on_frame = on_frame
+        self.on_finished = on_finished
+        self.stats = VideoStats()
+        self.frame_interval = 1 / 25  # Replaced by the real fps once the file is opened
+
+        self._frames: "queue.Queue[Tuple[float, Optional[Image.Image]]]" = queue.Queue(maxsize=queue_size)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._after_id = None
+        self._clock_start: Optional[float] = None  # perf_counter() matching timestamp 0 of the clip
+        self._next_frame: Optional[Tuple[float, Optional[Image.Image]]] = None
+        self.is_playing = False
+
+    def start(self):
+        """Start decoding and playing the video"""
+        self.is_playing = True
+        self._thread = threading.Thread(target=self._decode_loop, name="video-decode", daemon=True)
+        self._thread.start()
+        self._after_id = self.widget.after(10, self._display_loop)
+
+    def stop(self):
+        """Stop playback without calling on_finished"""
+        self.is_playing = False
+        self._stop_event.set()
+        if self._after_id:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except tk.TclError:
+                pass  # Widget already destroyed
+            self._after_id = None
+
+        # Unblock the decode thread if it is waiting on a full queue
+        while True:
+            try:
+                self._frames.get_nowait()
+            except queue.Empty:
+                break
+
+    def _playback_position(self) -> Optional[float]:
+        """Get the clip timestamp that should be on screen now, None before the first frame"""
+        if self._clock_start is None:
+            return None
+        return time.perf_counter() - self._clock_start
+
+    def _put(self, item: Tuple[float, Optional[Image.Image]]) -> bool:
+        """Put an item in the frame queue, giving up when playback is stopped"""
+        while not self._stop_event.is_set():
+            try:
+                self._frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode_loop(self):
+        """Read, scale and queue frames. Runs in the decode thread."""
+        capture = cv2.VideoCapture(self.video_path)
+        try:
+            if not capture.isOpened():
+                print(f"Error opening video: {self.video_path}")
+                return
+
+            fps = capture.get(cv2.CAP_PROP_FPS)
+            if fps and fps > 0:
+                self.frame_interval = 1 / fps
+
+            frame_size = None
+            frame_index = 0
+            while not self._stop_event.is_set():
+                # grab() demuxes and decodes, retrieve() converts: skip the conversion for late frames
+                if not capture.grab():
+                    break
+
+                timestamp = capture.get(cv2.CAP_PROP_POS_MSEC) / 1000 or frame_index * self.frame_interval
+                frame_index += 1
+
+                position = self._playback_position()
+                if position is not None and timestamp < position - self.frame_interval:
+                    self.stats.frames_skipped += 1
+                    continue
+
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+
+                # Scale down at decode time, full resolution frames never leave this thread
+                if frame_size is None:
+                    height, width = frame.shape[:2]
+                    frame_size = fit_size((width, height), self.target_size)
+                frame = cv2.resize(frame, frame_size, interpolation=cv2.INTER_AREA)
+                image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                self.stats.frames_decoded += 1
+
+                if not self._put((timestamp, image)):
+                    return
+        except Exception as e:
+            print(f"Error decoding video {self.video_path}: {e}")
+        finally:
+            capture.release()
+            self._put(self._END_OF_STREAM)
+
+    def _display_loop(self):
+        """Show the frame that is due, dropping any that are already late. Runs on the Tk thread."""
+        self._after_id = None
+        if not self.is_playing:
+            return
+
+        due_frame = None
+        while True:
+            if self._next_frame is None:
+                try:
+                    self._next_frame = self._frames.get_nowait()
+                except queue.Empty:
+                    break
+
+            timestamp, image = self._next_frame
+            if image is None:
+                # End of stream, but show the last due frame first
+                if due_frame is None:
+                    self.is_playing = False
+                    self.on_finished()
+                    return
+                break
+
+            if self._clock_start is None:
+                # Start the clock on the first frame so slow opening doesn't count as lateness
+                self._clock_start = time.perf_counter() - timestamp
+
+            if timestamp > self._playback_position():
+                break
+
+            if due_frame is not None:
+                self.stats.frames_dropped += 1
+            due_frame = self._next_frame
+            self._next_frame = None
+
+        if due_frame is not None:
+            self.stats.frames_shown += 1
+            self.on_frame(due_frame[1])
+
+        # Sleep until the next frame is due, or poll at the frame rate while the queue is empty
+        delay = self.frame_interval
+        if self._next_frame is not None and self._next_frame[1] is not None:
+            delay = self._next_frame[0] - self._playback_position()
+        self._after_id = self.widget.after(max(int(delay * 1000), 1), self._display_loop)
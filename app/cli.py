@@ -0,0 +1,389 @@
+# /app/cli.py
+"""
+Command line for library jobs that don't need the user interface, e.g. from cron
+on a headless server. Never imports Tk.
+
+Run from the app directory:
+    python cli.py scan --root /media/photos --workers 16
+    python cli.py scan                      # every root that hasn't been scanned yet
+    python cli.py rescan --root /media/photos --exclude "*.tmp" --max-depth 6
+    python cli.py resume                    # continue scans that were interrupted
+    python cli.py metadata                  # EXIF of new and changed images
+    python cli.py video-metadata --timeout 20   # duration, resolution and poster frame of new videos
+    python cli.py colors                    # colour histograms of new and changed images and posters
+    python cli.py colors --query warm --limit 20   # the files that are mostly warm tones
+    python cli.py vacuum-thumbnails         # delete posters of files no longer in the library
+    python cli.py roots
+    python cli.py tags
+    python cli.py add-collection "Summer 2020" --type image --captured-from 2020-06-01 --captured-before 2020-09-01
+    python cli.py collections
+    python cli.py refresh-collections       # after files were changed outside of scans
+    python cli.py remove-root /media/archive
+    python cli.py stats
+    python cli.py prune
+    python cli.py vacuum
+
+Progress and the result are written to stdout as JSON lines, one object per
+line with an "event" key. The last line is either {"event": "done", ...} or
+{"event": "error", ...}; the exit code is 0 or 1 accordingly. A directory that
+can't be listed is reported as a "scan_error" line; anything else that is
+printed, warnings included, goes to stderr.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+from classes import MediaLibrary, MediaRoot, connect_to_db
+from classes.smart_collection import DEFAULT_ORDER, ORDERS, CollectionFilter, SmartCollection
+from classes.media_library import COLOR_BATCH_SIZE, METADATA_BATCH_SIZE, default_workers
+from classes.video_metadata import DEFAULT_TIMEOUT_S
+from classes.scan_rules import ScanRules
+
+
+# Where emit() writes, the real stdout while main() sends everything else printed to stderr
+_json_stream = None
+
+
+def emit(event: str, **details):
+    """Write one JSON line to stdout"""
+    print(json.dumps({'event': event, **details}), file=_json_stream or sys.stdout, flush=True)
+
+
+def _root_dict(root: MediaRoot) -> dict:
+    """A root as a JSON serializable dictionary"""
+    return {'root_id': root.root_id, 'root_path': root.root_path, 'scan_status': root.scan_status,
+            'folders': root.folder_count, 'files': root.file_count, 'last_scanned': root.last_scanned}
+
+
+def _scan_rules(library: MediaLibrary, args) -> ScanRules:
+    """The stored scan rules with the --exclude and --max-depth options added"""
+    rules = library.scan_rules()
+    rules.exclude.extend(args.exclude or [])
+    if args.max_depth is not None:
+        rules.max_depth = args.max_depth
+    return rules
+
+
+def _scan_roots(library: MediaLibrary, roots: List[MediaRoot], args, progress, resume: bool = False) -> dict:
+    """Scan roots one after another, other roots are left alone"""
+    rules = _scan_rules(library, args)
+    scanned = []
+    for root in roots:
+        if progress:
+            progress("root", root_id=root.root_id, root_path=root.root_path, resume=resume)
+        library.scan_root(root, args.workers, progress, rules, resume)
+        root_dict = _root_dict(library.get_root(root.root_id))
+        root_dict['skipped'] = library.skip_counts.to_dict()
+        root_dict['devices'] = [stats.to_dict() for stats in library.device_stats]
+        scanned.append(root_dict)
+    return {'roots': scanned}
+
+
+def command_scan(library: MediaLibrary, args, progress) -> dict:
+    """Add a root and scan it, or scan every root that hasn't been scanned yet"""
+    if args.root:
+        if not os.path.isdir(args.root):
+            raise ValueError(f"Root folder does not exist: {args.root}")
+        root = library.add_root(args.root)
+        if root.is_scanned:
+            raise ValueError(f"{root.root_path} has already been scanned, use rescan to scan it again")
+        roots = [root]
+    else:
+        roots = [root for root in library.list_roots() if not root.is_scanned]
+    return _scan_roots(library, roots, args, progress)
+
+
+def command_rescan(library: MediaLibrary, args, progress) -> dict:
+    """Scan a root again, or all roots, updating their stored folders and files"""
+    if args.root:
+        root = library.find_root(args.root)
+        if root is None:
+            raise ValueError(f"{args.root} is not a root, use scan to add it")
+        roots = [root]
+    else:
+        roots = library.list_roots()
+    return _scan_roots(library, roots, args, progress)
+
+
+def command_resume(library: MediaLibrary, args, progress) -> dict:
+    """Continue interrupted scans from their last checkpoint"""
+    roots = library.resumable_roots()
+    if args.root:
+        root = library.find_root(args.root)
+        roots = [resumable for resumable in roots if root and resumable.root_id == root.root_id]
+        if not roots:
+            raise ValueError(f"{args.root} has no interrupted scan to resume")
+    return _scan_roots(library, roots, args, progress, resume=True)
+
+
+def _selected_root_ids(library: MediaLibrary, root_path: Optional[str]) -> Optional[List[int]]:
+    """The id of the --root given, None for all roots"""
+    if not root_path:
+        return None
+    root = library.find_root(root_path)
+    if root is None:
+        raise ValueError(f"{root_path} is not a root")
+    return [root.root_id]
+
+
+def command_metadata(library: MediaLibrary, args, progress) -> dict:
+    """Read the EXIF of new and changed images into the database"""
+    root_ids = _selected_root_ids(library, args.root)
+    return library.extract_metadata(root_ids, args.workers, progress, args.batch_size)
+
+
+def command_video_metadata(library: MediaLibrary, args, progress) -> dict:
+    """Read the duration, fps, resolution and codec of new videos and write their poster frames"""
+    root_ids = _selected_root_ids(library, args.root)
+    return library.extract_video_metadata(root_ids, args.workers, progress, args.timeout)
+
+
+def command_colors(library: MediaLibrary, args, progress) -> dict:
+    """Compute the colour features of new and changed files, or with --query list the files of a colour"""
+    root_ids = _selected_root_ids(library, args.root)
+    if not args.query:
+        return library.extract_color_features(root_ids, args.workers, progress, args.batch_size)
+    from classes.color_features import DEFAULT_MIN_SHARE, parse_color
+    colors = parse_color(args.query)
+    index = library.load_color_index(root_ids)
+    if index is None:
+        return {'files': []}
+    min_share = DEFAULT_MIN_SHARE if args.min_share is None else args.min_share
+    media_file_ids = index.nearest(colors, min_share, args.limit)
+    paths = library.file_paths(media_file_ids)
+    return {'files': [paths[i] for i in media_file_ids if i in paths]}
+
+
+def command_vacuum_thumbnails(library: MediaLibrary, args, progress) -> dict:
+    """Delete thumbnails and posters of files that are no longer in the library"""
+    return library.vacuum_thumbnails()
+
+
+def command_roots(library: MediaLibrary, args, progress) -> dict:
+    """List the roots"""
+    resumable_ids = {root.root_id for root in library.resumable_roots()}
+    return {'roots': [dict(_root_dict(root), resumable=root.root_id in resumable_ids) for root in library.list_roots()]}
+
+
+def command_tags(library: MediaLibrary, args, progress) -> dict:
+    """List the tags and how many files and folders carry them"""
+    return {'tags': library.list_tags()}
+
+
+def _collection_dict(collection: SmartCollection) -> dict:
+    """A smart collection as a JSON serializable dictionary"""
+    return {'collection_id': collection.collection_id, 'name': collection.name,
+            'filter': json.loads(collection.filter.to_json()), 'order_by': collection.order_by,
+            'files': collection.member_count}
+
+
+def command_collections(library: MediaLibrary, args, progress) -> dict:
+    """List the smart collections"""
+    return {'collections': [_collection_dict(collection) for collection in library.list_collections()]}
+
+
+def command_add_collection(library: MediaLibrary, args, progress) -> dict:
+    """Create or replace a smart collection and materialize its members"""
+    collection_filter = CollectionFilter(
+        folder_path=os.path.abspath(args.folder) if args.folder else None,
+        root_ids=_selected_root_ids(library, args.root) or [],
+        media_types=args.type or [],
+        extensions=args.ext or [],
+        min_size_kb=args.min_size,
+        max_size_kb=args.max_size,
+        captured_from=args.captured_from,
+        captured_before=args.captured_before,
+        modified_from=args.modified_from,
+        modified_before=args.modified_before,
+        camera_model=args.camera,
+    )
+    return {'collection': _collection_dict(library.save_collection(args.name, collection_filter, args.order))}
+
+
+def command_remove_collection(library: MediaLibrary, args, progress) -> dict:
+    """Delete a smart collection"""
+    collection = library.find_collection(args.name)
+    if collection is None:
+        raise ValueError(f"{args.name} is not a collection")
+    library.delete_collection(collection.collection_id)
+    return {'removed': _collection_dict(collection)}
+
+
+def command_refresh_collections(library: MediaLibrary, args, progress) -> dict:
+    """Bring the smart collections up to date with the files changed since their last refresh"""
+    return library.refresh_collections(full=args.full)
+
+
+def command_remove_root(library: MediaLibrary, args, progress) -> dict:
+    """Remove a root and its stored folders and files"""
+    root = library.find_root(args.path)
+    if root is None:
+        raise ValueError(f"{args.path} is not a root")
+    library.remove_root(root.root_id)
+    return {'removed': _root_dict(root)}
+
+
+def command_stats(library: MediaLibrary, args, progress) -> dict:
+    """Summarize the library"""
+    return library.stats()
+
+
+def command_prune(library: MediaLibrary, args, progress) -> dict:
+    """Delete rows of files and folders that are gone from disk"""
+    return {'deleted': library.prune(progress)}
+
+
+def command_vacuum(library: MediaLibrary, args, progress) -> dict:
+    """VACUUM ANALYZE the media tables"""
+    library.vacuum()
+    return {}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Media manager library jobs")
+    parser.add_argument("--dsn", default=os.environ.get("MEDIA_MANAGER_DSN"),
+                        help="PostgreSQL connection string, defaults to $MEDIA_MANAGER_DSN "
+                             "or the docker-compose database")
+    parser.add_argument("--quiet", action="store_true", help="Only write the final result line")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text, root_help in (
+        ("scan", "Add a root and scan it, or scan all roots that haven't been scanned yet",
+         "Root folder to add and scan"),
+        ("rescan", "Scan roots again, updating their stored folders and files",
+         "Root to rescan, defaults to all roots"),
+        ("resume", "Continue interrupted scans from their last checkpoint",
+         "Root to resume, defaults to all roots with an interrupted scan"),
+    ):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument("--root", help=root_help)
+        subparser.add_argument("--workers", type=int, default=default_workers(),
+                               help="Maximum concurrent directory listings per device, the actual "
+                                    "limit is tuned from the listing latency (default: %(default)s)")
+        subparser.add_argument("--exclude", action="append", metavar="GLOB",
+                               help="Also skip directories and files matching this glob, on top of the "
+                                    "scan_exclude parameter (repeatable)")
+        subparser.add_argument("--max-depth", type=int,
+                               help="Deepest folder level to scan, the root is 0 (default: scan_max_depth parameter)")
+
+    metadata_parser = subparsers.add_parser(
+        "metadata", help="Read EXIF (capture time, camera, orientation, GPS) of new and changed images"
+    )
+    metadata_parser.add_argument("--root", help="Only this root, defaults to all roots")
+    metadata_parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                                 help="Worker processes (default: %(default)s)")
+    metadata_parser.add_argument("--batch-size", type=int, default=METADATA_BATCH_SIZE,
+                                 help="Files per worker task (default: %(default)s)")
+
+    video_parser = subparsers.add_parser(
+        "video-metadata", help="Read duration, fps, resolution and codec of new videos and write their poster frames"
+    )
+    video_parser.add_argument("--root", help="Only this root, defaults to all roots")
+    video_parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                              help="Worker processes (default: %(default)s)")
+    video_parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_S,
+                              help="Seconds a single video may take before its worker is killed (default: %(default)s)")
+    colors_parser = subparsers.add_parser(
+        "colors", help="Compute colour histograms and dominant colours of new and changed images and video posters"
+    )
+    colors_parser.add_argument("--root", help="Only this root, defaults to all roots")
+    colors_parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                               help="Worker processes (default: %(default)s)")
+    colors_parser.add_argument("--batch-size", type=int, default=COLOR_BATCH_SIZE,
+                               help="Files per worker task (default: %(default)s)")
+    colors_parser.add_argument("--query", metavar="COLOUR",
+                               help="Instead list the files near a colour, #rrggbb or a name like warm or blue")
+    colors_parser.add_argument("--min-share", type=float,
+                               help="Share of a file's pixels that must be near the colour (default: 0.3)")
+    colors_parser.add_argument("--limit", type=int, help="List at most this many files")
+    subparsers.add_parser("vacuum-thumbnails", help="Delete thumbnails and posters of files no longer in the library")
+
+    subparsers.add_parser("roots", help="List the root folders and their scan status")
+    subparsers.add_parser("tags", help="List the tags and the number of files and folders tagged with each")
+    subparsers.add_parser("collections", help="List the smart collections and their number of files")
+    collection_parser = subparsers.add_parser(
+        "add-collection", help="Create a smart collection, or replace the filter of one with the same name"
+    )
+    collection_parser.add_argument("name", help="Name of the collection")
+    collection_parser.add_argument("--folder", help="Only files in this folder and its subfolders")
+    collection_parser.add_argument("--root", help="Only files in this root")
+    collection_parser.add_argument("--type", action="append", metavar="MEDIA_TYPE",
+                                   help="Only this media type, e.g. image (repeatable)")
+    collection_parser.add_argument("--ext", action="append", metavar="EXTENSION",
+                                   help="Only this extension, e.g. .jpg (repeatable)")
+    collection_parser.add_argument("--min-size", type=int, help="Minimum size in KB")
+    collection_parser.add_argument("--max-size", type=int, help="Maximum size in KB")
+    collection_parser.add_argument("--captured-from", metavar="DATE", help="Captured on or after this ISO date")
+    collection_parser.add_argument("--captured-before", metavar="DATE", help="Captured before this ISO date")
+    collection_parser.add_argument("--modified-from", metavar="DATE", help="Modified on or after this ISO date")
+    collection_parser.add_argument("--modified-before", metavar="DATE", help="Modified before this ISO date")
+    collection_parser.add_argument("--camera", help="Only files taken with this camera model")
+    collection_parser.add_argument("--order", choices=list(ORDERS), default=DEFAULT_ORDER,
+                                   help="Order of the files (default: %(default)s)")
+    remove_collection_parser = subparsers.add_parser("remove-collection", help="Delete a smart collection")
+    remove_collection_parser.add_argument("name", help="Name of the collection")
+    refresh_parser = subparsers.add_parser(
+        "refresh-collections", help="Re-evaluate files added or changed since the last refresh against every collection"
+    )
+    refresh_parser.add_argument("--full", action="store_true", help="Rebuild every collection from scratch")
+    remove_parser = subparsers.add_parser("remove-root", help="Remove a root and its stored folders and files")
+    remove_parser.add_argument("path", help="The root folder")
+    subparsers.add_parser("stats", help="Show folder and file counts per media type and root")
+    subparsers.add_parser("prune", help="Delete rows of files and folders that no longer exist on disk")
+    subparsers.add_parser("vacuum", help="VACUUM ANALYZE the media tables")
+    return parser
+
+
+COMMANDS = {
+    'scan': command_scan,
+    'rescan': command_rescan,
+    'resume': command_resume,
+    'metadata': command_metadata,
+    'video-metadata': command_video_metadata,
+    'colors': command_colors,
+    'vacuum-thumbnails': command_vacuum_thumbnails,
+    'roots': command_roots,
+    'tags': command_tags,
+    'collections': command_collections,
+    'add-collection': command_add_collection,
+    'remove-collection': command_remove_collection,
+    'refresh-collections': command_refresh_collections,
+    'remove-root': command_remove_root,
+    'stats': command_stats,
+    'prune': command_prune,
+    'vacuum': command_vacuum,
+}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    global _json_stream
+    args = build_parser().parse_args(argv)
+    progress = None if args.quiet else emit
+    start = time.perf_counter()
+
+    # Only the JSON lines go to stdout, anything else the library prints goes to stderr
+    _json_stream = sys.stdout
+    conn = None
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            try:
+                conn = connect_to_db(dsn=args.dsn)
+                result = COMMANDS[args.command](MediaLibrary(conn), args, progress)
+            except Exception as e:
+                emit("error", command=args.command, message=str(e))
+                return 1
+            finally:
+                if conn is not None:
+                    conn.close()
+
+            emit("done", command=args.command, elapsed_s=round(time.perf_counter() - start, 3), **result)
+            return 0
+    finally:
+        _json_stream = None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
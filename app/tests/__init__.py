@@ -0,0 +1 @@
+# /app/tests/__init__.py
@@ -0,0 +1,62 @@
+# /app/tests/test_collection_changes.py
+"""Scans queue only new and modified files for the smart collections, run against the SQLite stand-in"""
+import os
+
+import pytest
+
+from benchmarks.sqlite_standin import StandInConnection
+from classes.media_library import MediaLibrary
+from classes.smart_collection import CollectionFilter
+
+
+def write_file(path: str, mtime: float = 1_600_000_000):
+    with open(path, "wb") as file:
+        file.write(b"x")
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    library = MediaLibrary(StandInConnection())
+    library.queued = []  # The files queued for each refresh, oldest first
+    refresh = library.refresh_collections
+
+    def record_and_refresh(full: bool = False):
+        cur = library.conn.cursor()
+        cur.execute("SELECT DISTINCT media_file_id FROM collection_changes;")
+        library.queued.append(sorted(row[0] for row in cur.fetchall()))
+        return refresh(full)
+
+    monkeypatch.setattr(library, "refresh_collections", record_and_refresh)
+    return library
+
+
+def file_ids(library: MediaLibrary) -> dict:
+    cur = library.conn.cursor()
+    cur.execute("SELECT file_name, media_file_id FROM media_files;")
+    return dict(cur.fetchall())
+
+
+def test_rescan_queues_only_new_and_modified_files(library, tmp_path):
+    for name in ("a.jpg", "b.jpg", "c.jpg"):
+        write_file(str(tmp_path / name))
+    root = library.add_root(str(tmp_path))
+    library.save_collection("all", CollectionFilter())
+    library.scan_root(root)
+    assert library.queued[-1] == sorted(file_ids(library).values())
+
+    write_file(str(tmp_path / "b.jpg"), mtime=1_700_000_000)
+    write_file(str(tmp_path / "d.jpg"))
+    library.scan_root(root)
+    ids = file_ids(library)
+    assert library.queued[-1] == sorted([ids["b.jpg"], ids["d.jpg"]])
+    assert [file.file_name for file in library.collection_files(library.find_collection("all").collection_id)] \
+        == ["a.jpg", "b.jpg", "c.jpg", "d.jpg"]
+
+
+def test_unchanged_rescan_queues_nothing(library, tmp_path):
+    write_file(str(tmp_path / "a.jpg"))
+    root = library.add_root(str(tmp_path))
+    library.scan_root(root)
+    library.scan_root(root)
+    assert library.queued[-1] == []
@@ -0,0 +1,88 @@
+# /app/tests/test_file_operations.py
+"""Planning renames and moves: patterns, name clashes within the batch and on disk"""
+import os
+
+import pytest
+
+from classes.file_operations import RENAME, plan_move, plan_rename
+from classes.media_file import MediaFile
+from classes.media_folder import MediaFolder
+
+EXTENSION_TO_TYPE = {".jpg": "image", ".png": "image", ".mp4": "video"}
+
+
+@pytest.fixture
+def folder(tmp_path) -> MediaFolder:
+    return MediaFolder(1, str(tmp_path))
+
+
+def make_files(folder: MediaFolder, *names: str) -> list:
+    """Create the files on disk and their MediaFiles"""
+    files = []
+    for media_file_id, name in enumerate(names, start=1):
+        with open(os.path.join(folder.folder_path, name), "wb"):
+            pass
+        files.append(MediaFile(folder.folder_id, name, os.path.splitext(name)[1].lower(), 0,
+                               folder.folder_path, media_file_id=media_file_id))
+    return files
+
+
+def test_pattern_numbers_files_in_order(folder):
+    files = make_files(folder, "b.jpg", "a.png")
+    operations = plan_rename(files, "holiday_{n:03}{ext}", EXTENSION_TO_TYPE, {1: folder})
+    assert [(op.kind, op.media_file.file_name, op.target_name) for op in operations] == [
+        (RENAME, "b.jpg", "holiday_001.jpg"), (RENAME, "a.png", "holiday_002.png")
+    ]
+    assert operations[0].target_path == os.path.join(folder.folder_path, "holiday_001.jpg")
+
+
+def test_unchanged_names_are_left_out(folder):
+    files = make_files(folder, "a.jpg", "b.jpg")
+    assert plan_rename(files, "{name}{ext}", EXTENSION_TO_TYPE, {1: folder}) == []
+
+
+def test_names_clashing_within_the_batch_raise(folder):
+    files = make_files(folder, "a.jpg", "b.jpg")
+    with pytest.raises(ValueError, match="More than one file"):
+        plan_rename(files, "same{ext}", EXTENSION_TO_TYPE, {1: folder})
+
+
+def test_name_taken_on_disk_raises(folder):
+    files = make_files(folder, "a.jpg", "taken.jpg")
+    with pytest.raises(ValueError, match="already exists"):
+        plan_rename(files[:1], "taken.jpg", EXTENSION_TO_TYPE, {1: folder})
+
+
+def test_swapping_names_within_the_batch_is_a_clash_on_disk(folder):
+    files = make_files(folder, "1.jpg", "2.jpg")
+    with pytest.raises(ValueError, match="already exists"):
+        plan_rename(list(reversed(files)), "{n}{ext}", EXTENSION_TO_TYPE, {1: folder})
+
+
+def test_changing_only_the_case_of_a_name_is_allowed(folder):
+    files = make_files(folder, "photo.jpg")
+    operations = plan_rename(files, "Photo{ext}", EXTENSION_TO_TYPE, {1: folder})
+    assert [op.target_name for op in operations] == ["Photo.jpg"]
+
+
+@pytest.mark.parametrize("pattern, message", [
+    ("same.jpg", "needs a pattern"),
+    ("{nope}{ext}", "Invalid rename pattern"),
+    ("{n:q}{ext}", "Invalid rename pattern"),
+    ("sub/{n}{ext}", "not a valid file name"),
+    ("{n}.txt", "media file extension"),
+])
+def test_invalid_patterns_raise(folder, pattern, message):
+    files = make_files(folder, "a.jpg", "b.jpg")
+    with pytest.raises(ValueError, match=message):
+        plan_rename(files, pattern, EXTENSION_TO_TYPE, {1: folder})
+
+
+def test_move_clash_in_destination_raises(folder, tmp_path):
+    files = make_files(folder, "a.jpg")
+    destination = MediaFolder(2, str(tmp_path / "dest"))
+    os.mkdir(destination.folder_path)
+    assert [op.target_name for op in plan_move(files, destination)] == ["a.jpg"]
+    make_files(destination, "a.jpg")
+    with pytest.raises(ValueError, match="already exists"):
+        plan_move(files, destination)
@@ -0,0 +1,54 @@
+# /app/tests/test_media_manager.py
+"""The MediaManager's capture date index: years, date ranges and sorting"""
+from datetime import datetime
+
+import pytest
+
+from classes.media_file import MediaFile
+from classes.media_folder import MediaFolder
+from classes.media_manager import MediaManager
+
+CAPTURED = {
+    "a.jpg": datetime(2019, 6, 1),
+    "b.jpg": datetime(2020, 1, 1),
+    "c.jpg": None,
+    "d.jpg": datetime(2019, 1, 1),
+    "e.jpg": datetime(2019, 12, 31, 23, 59),
+}
+
+
+@pytest.fixture
+def manager() -> MediaManager:
+    files = []
+    for media_file_id, (name, captured_at) in enumerate(CAPTURED.items(), start=1):
+        folder_id = 2 if name == "b.jpg" else 1
+        media_file = MediaFile(folder_id, name, ".jpg", 1, f"/photos/{folder_id}", media_file_id=media_file_id)
+        media_file.captured_at = captured_at
+        files.append(media_file)
+    folders = [MediaFolder(1, "/photos/1"), MediaFolder(2, "/photos/2")]
+    return MediaManager(folders, files, {".jpg": "image"})
+
+
+def names(files) -> list:
+    return [file.file_name for file in files]
+
+
+def test_files_from_year_are_sorted_by_capture_date(manager):
+    assert names(manager.get_files_from_year(2019)) == ["d.jpg", "a.jpg", "e.jpg"]
+    assert manager.get_files_from_year(2018) == []
+
+
+def test_files_captured_between_is_half_open(manager):
+    assert names(manager.get_files_captured_between(datetime(2019, 6, 1), datetime(2020, 1, 1))) == ["a.jpg", "e.jpg"]
+    assert names(manager.get_files_captured_between(end=datetime(2019, 6, 1))) == ["d.jpg"]
+
+
+def test_capture_years(manager):
+    assert manager.get_capture_years() == {2019: 3, 2020: 1}
+    assert list(manager.get_capture_years(manager.folder_by_id[1].files).items()) == [(2019, 3)]
+
+
+def test_sorted_by_capture_date_puts_undated_files_last(manager):
+    assert names(manager.get_files_sorted_by_capture_date()) == ["d.jpg", "a.jpg", "e.jpg", "b.jpg", "c.jpg"]
+    assert names(manager.get_files_sorted_by_capture_date(manager.folder_by_id[1].files)) == \
+        ["d.jpg", "a.jpg", "e.jpg", "c.jpg"]
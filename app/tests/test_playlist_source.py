@@ -0,0 +1,90 @@
+# /app/tests/test_playlist_source.py
+"""Shuffle bag sources: every file once per cycle, media type filtering, held back files"""
+import random
+from collections import Counter
+
+import pytest
+
+from classes.media_file import MediaFile
+from classes.playlist_source import OrderedSource, PlaylistSource, ShuffleBagSource, file_key
+
+
+def make_files(count: int, media_type: str = "image") -> list:
+    files = []
+    for media_file_id in range(1, count + 1):
+        media_file = MediaFile(1, f"{media_file_id}.jpg", ".jpg", 0, "/photos", media_file_id=media_file_id)
+        media_file.media_type = media_type
+        files.append(media_file)
+    return files
+
+
+def test_playlist_source_is_abstract():
+    with pytest.raises(TypeError):
+        PlaylistSource()
+
+
+def test_every_file_once_per_cycle():
+    files = make_files(50)
+    source = ShuffleBagSource(files, rng=random.Random(1))
+    for cycle in range(3):
+        drawn = [source.next() for _ in files]
+        assert sorted(f.media_file_id for f in drawn) == list(range(1, 51))
+        assert source.cycles == cycle
+    source.next()
+    assert source.cycles == 3
+
+
+def test_order_differs_between_cycles():
+    files = make_files(50)
+    source = ShuffleBagSource(files, rng=random.Random(2))
+    first = [source.next().media_file_id for _ in files]
+    second = [source.next().media_file_id for _ in files]
+    assert first != second
+
+
+def test_files_of_other_media_types_are_skipped():
+    files = make_files(10) + make_files(5, "document")
+    source = ShuffleBagSource(files, media_types=["IMAGE"], rng=random.Random(3))
+    drawn = Counter(file_key(source.next()) for _ in range(20))
+    assert len(drawn) == 10 and set(drawn.values()) == {2}
+    assert all(files[index].media_type == "image" for index in range(10))
+
+
+def test_no_files_to_show():
+    assert ShuffleBagSource([]).next() is None
+    source = ShuffleBagSource(make_files(3, "document"), media_types=["image"])
+    assert not source.has_files()
+    assert source.next() is None
+
+
+def test_excluded_files_are_held_back():
+    files = make_files(5)
+    source = ShuffleBagSource(files, rng=random.Random(4))
+    showing = {1, 2, 3}
+    drawn = [source.next(exclude=showing) for _ in range(2)]
+    assert sorted(f.media_file_id for f in drawn) == [4, 5]
+    # The held back files come next, before the cycle starts over
+    assert sorted(source.next().media_file_id for _ in range(3)) == [1, 2, 3]
+    assert source.cycles == 0
+
+
+def test_repeat_when_fewer_files_than_cells():
+    files = make_files(1)
+    source = ShuffleBagSource(files, rng=random.Random(5))
+    assert source.next(exclude={1}) is files[0]
+
+
+def test_has_files_doesnt_use_up_a_draw():
+    files = make_files(3)
+    source = ShuffleBagSource(files, rng=random.Random(6))
+    assert source.has_files()
+    assert sorted(source.next().media_file_id for _ in range(3)) == [1, 2, 3]
+    assert source.cycles == 0
+
+
+def test_ordered_source_keeps_the_order_and_starts_over():
+    files = make_files(3) + make_files(2, "document")
+    source = OrderedSource(list(reversed(files)), media_types=["image"])
+    assert [source.next().media_file_id for _ in range(4)] == [3, 2, 1, 3]
+    assert source.cycles == 1
+    assert OrderedSource(make_files(2, "document"), media_types=["image"]).next() is None
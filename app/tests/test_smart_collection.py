@@ -0,0 +1,76 @@
+# /app/tests/test_smart_collection.py
+"""CollectionFilter.to_sql run against SQLite, and filter validation"""
+import os
+import sqlite3
+
+import pytest
+
+from classes.smart_collection import CollectionFilter
+
+EXTENSION_TO_TYPE = {".jpg": "image", ".png": "image", ".gif": "gif", ".mp4": "video"}
+
+# (file_name, folder_path, file_extension, file_size_kb, root_id, camera_model)
+ROWS = [
+    ("a.jpg", "/photos/2020", ".jpg", 100, 1, "X100"),
+    ("b.PNG", "/photos/2020/trip", ".PNG", 2000, 1, None),
+    ("c.mp4", "/photos/2020_old", ".mp4", 50000, 1, None),
+    ("d.gif", "/photos/2021", ".gif", 10, 2, None),
+    ("e.jpg", "/other", ".jpg", 300, 2, "X100"),
+]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE media_files (file_name TEXT, folder_path TEXT, file_extension TEXT, "
+                 "file_size_kb INTEGER, root_id INTEGER, camera_model TEXT)")
+    conn.executemany("INSERT INTO media_files VALUES (?, ?, ?, ?, ?, ?)", ROWS)
+    return conn
+
+
+def matching(conn, collection_filter: CollectionFilter) -> list:
+    condition, params = collection_filter.to_sql(EXTENSION_TO_TYPE)
+    condition = condition.replace("%s", "?")  # psycopg2 placeholders, as in benchmarks.sqlite_standin
+    rows = conn.execute(f"SELECT file_name FROM media_files WHERE {condition} ORDER BY file_name",
+                        params).fetchall()
+    return [row[0] for row in rows]
+
+
+def test_empty_filter_matches_everything(conn):
+    assert matching(conn, CollectionFilter()) == ["a.jpg", "b.PNG", "c.mp4", "d.gif", "e.jpg"]
+
+
+@pytest.mark.skipif(os.sep != "/", reason="Folder paths in the rows use '/'")
+def test_folder_includes_subfolders_but_not_siblings_with_the_same_prefix(conn):
+    # '_' is a LIKE wildcard, it must not make /photos/2020_old match /photos/2020
+    assert matching(conn, CollectionFilter(folder_path="/photos/2020/")) == ["a.jpg", "b.PNG"]
+
+
+def test_media_types_match_extensions_case_insensitively(conn):
+    assert matching(conn, CollectionFilter(media_types=["image"])) == ["a.jpg", "b.PNG", "e.jpg"]
+
+
+def test_extensions_and_media_types_intersect(conn):
+    assert matching(conn, CollectionFilter(media_types=["image"], extensions=[".PNG"])) == ["b.PNG"]
+    assert matching(conn, CollectionFilter(media_types=["video"], extensions=[".jpg"])) == []
+
+
+def test_conditions_are_anded(conn):
+    collection_filter = CollectionFilter(root_ids=[1, 2], min_size_kb=100, max_size_kb=2000, camera_model="X100")
+    assert matching(conn, collection_filter) == ["a.jpg", "e.jpg"]
+
+
+def test_json_round_trip_leaves_out_unset_fields():
+    collection_filter = CollectionFilter(root_ids=[1], captured_from="2020-01-01")
+    assert CollectionFilter.from_json(collection_filter.to_json()) == collection_filter
+    assert "camera_model" not in collection_filter.to_json()
+    assert CollectionFilter.from_json('{"root_ids": [2], "unknown_field": 1}') == CollectionFilter(root_ids=[2])
+
+
+@pytest.mark.parametrize("collection_filter", [
+    CollectionFilter(captured_from="not a date"),
+    CollectionFilter(min_size_kb=10, max_size_kb=5),
+])
+def test_invalid_filters_raise(collection_filter):
+    with pytest.raises(ValueError):
+        collection_filter.validate()
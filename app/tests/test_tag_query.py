@@ -0,0 +1,92 @@
+# /app/tests/test_tag_query.py
+"""Tag query parsing: keyword precedence, implicit AND, quoting and errors"""
+import pytest
+
+from classes.tag_index import TagIndex, _tokenize
+
+# media_file_id -> tags; ordinals are the ids, so query results read as ids
+FILE_TAGS = {
+    0: ["family", "2020"],
+    1: ["family", "2021", "blurry"],
+    2: ["holiday", "2020"],
+    3: ["holiday", "2021"],
+    4: ["new york"],
+    5: ["and"],
+    6: [],
+}
+
+
+@pytest.fixture
+def index() -> TagIndex:
+    index = TagIndex(len(FILE_TAGS), {file_id: file_id for file_id in FILE_TAGS}, lambda folder_id: [])
+    for file_id, tags in FILE_TAGS.items():
+        for tag in tags:
+            index.add_files(tag, [file_id])
+    return index
+
+
+def matches(index: TagIndex, expression: str) -> list:
+    return index.query(expression).tolist()
+
+
+def test_and_binds_tighter_than_or(index):
+    assert matches(index, "family OR holiday AND 2021") == [0, 1, 3]
+    assert matches(index, "holiday AND 2021 OR family") == [0, 1, 3]
+
+
+def test_parentheses_override_precedence(index):
+    assert matches(index, "(family OR holiday) AND 2021") == [1, 3]
+
+
+def test_not_binds_tightest(index):
+    assert matches(index, "NOT family AND 2020") == [2]
+    assert matches(index, "NOT (family AND 2020)") == [1, 2, 3, 4, 5, 6]
+    assert matches(index, "NOT NOT blurry") == [1]
+
+
+def test_adjacent_terms_are_anded(index):
+    assert matches(index, "family 2021") == matches(index, "family AND 2021") == [1]
+    assert matches(index, "family NOT blurry") == [0]
+
+
+def test_keywords_are_case_insensitive(index):
+    assert matches(index, "family or holiday and not 2020") == [0, 1, 3]
+
+
+def test_tag_names_are_compared_lower_case(index):
+    assert matches(index, "FAMILY") == [0, 1]
+
+
+def test_quoted_names(index):
+    assert matches(index, '"new york"') == [4]
+    assert matches(index, '"New   York" OR family') == [0, 1, 4]
+    # A quoted keyword is a tag name
+    assert matches(index, '"and"') == [5]
+
+
+def test_unknown_tag_matches_nothing(index):
+    assert matches(index, "nosuchtag") == []
+    assert matches(index, "NOT nosuchtag") == list(range(len(FILE_TAGS)))
+
+
+def test_tokenize():
+    assert _tokenize('a AND ("b c" or not d)') == [
+        ("tag", "a"), ("AND",), ("(",), ("tag", "b c"), ("OR",), ("NOT",), ("tag", "d"), (")",)
+    ]
+
+
+@pytest.mark.parametrize("expression", [
+    "",
+    "   ",
+    '"unbalanced',
+    '""',
+    "(family",
+    "family)",
+    "family AND",
+    "OR family",
+    "NOT",
+    "()",
+])
+def test_invalid_queries_raise(index, expression):
+    with pytest.raises(ValueError):
+        index.query(expression)
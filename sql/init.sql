@@ -6,12 +6,25 @@ CREATE TABLE IF NOT EXISTS Media_Types (
     UNIQUE (Media_Type_Description, Media_Type_Extension)  -- Add this line
 );
 
+-- Library roots, each scanned and loaded independently
+CREATE TABLE IF NOT EXISTS media_roots (
+    root_id SERIAL PRIMARY KEY,
+    root_path TEXT UNIQUE NOT NULL,
+    scan_status VARCHAR(20) NOT NULL DEFAULT 'new',  -- new, scanning, scanned or failed
+    folder_count INTEGER NOT NULL DEFAULT 0,
+    file_count INTEGER NOT NULL DEFAULT 0,
+    last_scan_started TIMESTAMP,
+    last_scan_finished TIMESTAMP
+);
+
 -- Folders table with explicit ID and parent relationship
 CREATE TABLE media_folders (
     folder_id INTEGER PRIMARY KEY,
     folder_path TEXT UNIQUE NOT NULL,
-    parent_folder_id INTEGER REFERENCES media_folders(folder_id) ON DELETE CASCADE
+    parent_folder_id INTEGER REFERENCES media_folders(folder_id) ON DELETE CASCADE,
+    root_id INTEGER REFERENCES media_roots(root_id) ON DELETE CASCADE
 );
+CREATE INDEX IF NOT EXISTS media_folders_root_id ON media_folders (root_id);
 
 -- Files table with foreign key to folders
 CREATE TABLE media_files (
@@ -21,8 +34,99 @@ CREATE TABLE media_files (
     file_extension TEXT NOT NULL,
     file_size_kb INTEGER,
     folder_path TEXT,
+    root_id INTEGER REFERENCES media_roots(root_id) ON DELETE CASCADE,
+    file_mtime DOUBLE PRECISION,      -- st_mtime when scanned
+    -- EXIF, read from the header; metadata_mtime is the file_mtime it was read at
+    metadata_mtime DOUBLE PRECISION,
+    captured_at TIMESTAMP,
+    camera_make TEXT,
+    camera_model TEXT,
+    orientation SMALLINT,
+    gps_latitude DOUBLE PRECISION,
+    gps_longitude DOUBLE PRECISION,
+    -- Videos, read with cv2; the poster frame is in the thumbnail store
+    duration_s DOUBLE PRECISION,
+    fps DOUBLE PRECISION,
+    media_width INTEGER,
+    media_height INTEGER,
+    video_codec TEXT,
     UNIQUE (folder_id, file_name)
 );
+CREATE INDEX IF NOT EXISTS media_files_root_id ON media_files (root_id);
+CREATE INDEX IF NOT EXISTS media_files_captured_at ON media_files (captured_at);
+CREATE INDEX IF NOT EXISTS media_files_camera ON media_files (camera_make, camera_model);
+CREATE INDEX IF NOT EXISTS media_folders_parent_folder_id ON media_folders (parent_folder_id);
+
+-- Journal of a running scan: every directory found and whether it has been listed.
+-- Kept after a crash so the scan can be resumed, deleted when the scan completes.
+CREATE TABLE IF NOT EXISTS scan_queue (
+    root_id INTEGER REFERENCES media_roots(root_id) ON DELETE CASCADE,
+    folder_id INTEGER NOT NULL,
+    folder_path TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    device BIGINT NOT NULL,  -- st_dev and st_ino, so a resumed scan doesn't list a directory twice
+    inode BIGINT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending',  -- pending or done
+    PRIMARY KEY (root_id, folder_id)
+);
+
+-- User tags on files and folders; a folder's tag applies to every file below it
+CREATE TABLE IF NOT EXISTS tags (
+    tag_id SERIAL PRIMARY KEY,
+    tag_name TEXT UNIQUE NOT NULL  -- Trimmed and lower case
+);
+CREATE TABLE IF NOT EXISTS file_tags (
+    tag_id INTEGER REFERENCES tags(tag_id) ON DELETE CASCADE,
+    media_file_id INTEGER REFERENCES media_files(media_file_id) ON DELETE CASCADE,
+    PRIMARY KEY (tag_id, media_file_id)
+);
+CREATE TABLE IF NOT EXISTS folder_tags (
+    tag_id INTEGER REFERENCES tags(tag_id) ON DELETE CASCADE,
+    folder_id INTEGER REFERENCES media_folders(folder_id) ON DELETE CASCADE,
+    PRIMARY KEY (tag_id, folder_id)
+);
+CREATE INDEX IF NOT EXISTS file_tags_media_file_id ON file_tags (media_file_id);
+CREATE INDEX IF NOT EXISTS folder_tags_folder_id ON folder_tags (folder_id);
+
+-- Smart collections: saved filters (a CollectionFilter as JSON) materialized into
+-- collection_members, ordered by sort_key, and refreshed from collection_changes
+CREATE TABLE IF NOT EXISTS smart_collections (
+    collection_id SERIAL PRIMARY KEY,
+    collection_name TEXT UNIQUE NOT NULL,
+    filter_json TEXT NOT NULL,
+    order_by VARCHAR(20) NOT NULL DEFAULT 'path'  -- path or captured
+);
+CREATE TABLE IF NOT EXISTS collection_members (
+    collection_id INTEGER REFERENCES smart_collections(collection_id) ON DELETE CASCADE,
+    media_file_id INTEGER REFERENCES media_files(media_file_id) ON DELETE CASCADE,
+    sort_key TEXT NOT NULL,
+    PRIMARY KEY (collection_id, media_file_id)
+);
+CREATE INDEX IF NOT EXISTS collection_members_order ON collection_members (collection_id, sort_key, media_file_id);
+CREATE INDEX IF NOT EXISTS collection_members_media_file_id ON collection_members (media_file_id);
+-- Files added or modified since the collections were last refreshed
+CREATE TABLE IF NOT EXISTS collection_changes (
+    change_id SERIAL PRIMARY KEY,
+    media_file_id INTEGER NOT NULL
+);
+
+-- Colour features of images and video posters: a 64 bin colour histogram (4 levels
+-- per channel, pixel shares scaled to 0..255) and the dominant colour as 0xRRGGBB,
+-- both NULL for files that couldn't be read; feature_mtime is the file_mtime they are of
+CREATE TABLE IF NOT EXISTS color_features (
+    media_file_id INTEGER PRIMARY KEY REFERENCES media_files(media_file_id) ON DELETE CASCADE,
+    feature_mtime DOUBLE PRECISION,
+    dominant_rgb INTEGER,
+    histogram BYTEA
+);
+
+-- Counters ids are reserved from in blocks, one row per counter; folder ids come from
+-- here so scans of different roots running at the same time never hand out the same id
+CREATE TABLE IF NOT EXISTS id_counters (
+    counter_name VARCHAR(50) PRIMARY KEY,
+    next_id INTEGER NOT NULL
+);
+INSERT INTO id_counters (counter_name, next_id) VALUES ('folder_id', 1) ON CONFLICT (counter_name) DO NOTHING;
 
 CREATE TABLE IF NOT EXISTS Parameters (
     Parameter_Name VARCHAR(100) PRIMARY KEY,